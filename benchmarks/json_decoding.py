@@ -0,0 +1,90 @@
+"""Benchmark of the JSON decoder backends
+
+For every installed backend, messages are decoded one by one, in batches (see
+JSONBackend.loads_batch()) and end to end through FileDataSource, which reads a
+generated JSON file in auto-tune mode. Throughput is reported in messages per
+second (best of several runs).
+
+Usage:
+    python benchmarks/json_decoding.py [--messages N] [--batch-size N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_backends import available_backends, get_backend  # noqa: E402
+from src.sources.file_data_source import FileDataSource  # noqa: E402
+
+
+def generate_messages(count: int) -> list:
+    """Generate JSON texts of messages
+
+    :param count: number of messages
+    :type count: int
+
+    :return: JSON texts of messages
+    :rtype: list
+    """
+    return [json.dumps({"key": f"K{i % 1000:03}", "value": f"{i * 0.25:.2f}",
+                        "ts": "2020-10-07 13:28:43.399620+02:00"}) for i in range(count)]
+
+
+def best_of(repeat: int, function) -> float:
+    """Run a function several times
+
+    :param repeat: number of runs
+    :type repeat: int
+    :param function: function without arguments
+    :type function: Callable
+
+    :return: shortest run time, in seconds
+    :rtype: float
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def read_file(source_filepath: str, decoder: str) -> None:
+    """Read all messages of a JSON file"""
+    with FileDataSource(source_filepath, auto_tune=True, decoder=decoder) as source:
+        while source.has_message():
+            source.read()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the JSON decoder backends")
+    parser.add_argument("--messages", type=int, default=200000, help="number of messages (default is 200000)")
+    parser.add_argument("--batch-size", type=int, default=10000, help="messages per batch (default is 10000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (default is 3)")
+    args = parser.parse_args()
+
+    texts = generate_messages(args.messages)
+    batches = [texts[i:i + args.batch_size] for i in range(0, len(texts), args.batch_size)]
+    with tempfile.TemporaryDirectory() as directory:
+        source_filepath = os.path.join(directory, "messages.json")
+        with open(source_filepath, 'w') as source_file:
+            source_file.write("[" + ",\n".join(texts) + "]")
+
+        print(f"{args.messages} messages, batch size {args.batch_size}, best of {args.repeat} runs (messages/s)")
+        print(f"{'backend':<12}{'one by one':>14}{'batch':>14}{'file source':>14}")
+        for name in available_backends():
+            backend = get_backend(name)
+            single = best_of(args.repeat, lambda: [backend.loads(text) for text in texts])
+            batch = best_of(args.repeat, lambda: [backend.loads_batch(texts) for texts in batches])
+            file_source = best_of(args.repeat, lambda: read_file(source_filepath, name))
+            print(f"{name:<12}{args.messages / single:>14,.0f}{args.messages / batch:>14,.0f}"
+                  f"{args.messages / file_source:>14,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Benchmark of the transports of messages between pipeline processes
+
+A producer process hands messages over to the consumer (this process), either
+as pickled batches of dictionaries through a 'multiprocessing.Queue', or as
+fixed-layout records through a shared-memory ring buffer (see
+SharedRingBuffer). In both cases, the consumer turns the messages into table
+rows (key, value, timestamp, timezone), as the PostgreSQL data sink does.
+Throughput is reported in messages per second (best of several runs),
+including the producer's encoding work.
+
+Usage:
+    python benchmarks/ring_buffer.py [--messages N] [--batch-size N] [--capacity N] [--repeat N]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ring_buffer import SharedRingBuffer  # noqa: E402
+from src.timestamps import split_timestamp  # noqa: E402
+
+
+def generate_messages(count: int) -> list:
+    """Generate messages
+
+    :param count: number of messages
+    :type count: int
+
+    :return: bodies of messages
+    :rtype: list
+    """
+    return [{"key": f"K{i % 1000:03}", "value": f"{i * 0.25:.2f}", "ts": "2020-10-07 13:28:43.399620+02:00"}
+            for i in range(count)]
+
+
+def produce_queue(queue, count: int, batch_size: int) -> None:
+    """Put batches of messages into a queue, followed by None"""
+    messages = generate_messages(count)
+    for start in range(0, count, batch_size):
+        queue.put(messages[start:start + batch_size])
+    queue.put(None)
+
+
+def produce_ring_buffer(name: str, count: int, batch_size: int) -> None:
+    """Write batches of messages into a ring buffer and close it"""
+    messages = generate_messages(count)
+    ring_buffer = SharedRingBuffer(name=name)
+    for start in range(0, count, batch_size):
+        ring_buffer.put_batch([SharedRingBuffer.encode_message(message)
+                               for message in messages[start:start + batch_size]])
+    ring_buffer.close()
+    ring_buffer.release()
+
+
+def consume_queue(context, count: int, batch_size: int) -> float:
+    """Receive all messages through a queue
+
+    :return: elapsed time, in seconds
+    :rtype: float
+    """
+    queue = context.Queue(maxsize=8)
+    started = time.perf_counter()
+    producer = context.Process(target=produce_queue, args=(queue, count, batch_size))
+    producer.start()
+    received = 0
+    while (batch := queue.get()) is not None:
+        rows = [(message["key"], message["value"], *split_timestamp(message["ts"])) for message in batch]
+        received += len(rows)
+    producer.join()
+    assert received == count
+    return time.perf_counter() - started
+
+
+def consume_ring_buffer(context, count: int, batch_size: int, capacity: int) -> float:
+    """Receive all messages through a shared-memory ring buffer
+
+    :return: elapsed time, in seconds
+    :rtype: float
+    """
+    ring_buffer = SharedRingBuffer(capacity)
+    try:
+        started = time.perf_counter()
+        producer = context.Process(target=produce_ring_buffer, args=(ring_buffer.name, count, batch_size))
+        producer.start()
+        received = 0
+        while len(records := ring_buffer.get_batch(batch_size)) > 0:
+            rows = [SharedRingBuffer.decode_record(record) for record in records]
+            received += len(rows)
+        producer.join()
+        assert received == count
+        return time.perf_counter() - started
+    finally:
+        ring_buffer.release()
+        ring_buffer.unlink()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the transports between pipeline processes")
+    parser.add_argument("--messages", type=int, default=200000, help="number of messages (default is 200000)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="messages per batch (default is 5000)")
+    parser.add_argument("--capacity", type=int, default=65536, help="ring buffer records (default is 65536)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (default is 3)")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    queue = min(consume_queue(context, args.messages, args.batch_size) for _ in range(args.repeat))
+    ring_buffer = min(consume_ring_buffer(context, args.messages, args.batch_size, args.capacity)
+                      for _ in range(args.repeat))
+    print(f"{args.messages} messages, batch size {args.batch_size}, {os.cpu_count()} CPUs, "
+          f"best of {args.repeat} runs (messages/s)")
+    print(f"{'multiprocessing.Queue':<24}{args.messages / queue:>14,.0f}")
+    print(f"{'SharedRingBuffer':<24}{args.messages / ring_buffer:>14,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Benchmark of the startup time of the ETL system
+
+Every scenario is run in a fresh interpreter several times, and the best and
+median wall times are reported along with the heavy dependencies which have
+been imported. With '--max-ms', the benchmark fails if the median startup time
+of any scenario exceeds the limit, so it may guard startup time in CI.
+
+Usage:
+    python benchmarks/startup.py [--repeat N] [--max-ms MS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("psycopg2", "pytz", "asyncio", "concurrent.futures.process")
+SCENARIOS = {
+    "interpreter": "pass",
+    "import main": "import main",
+    "file -> console": (
+        "import os, contextlib\n"
+        "from src.definitions import INPUT_FILES_DIR\n"
+        "from src.etl import ETL\n"
+        "with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):\n"
+        "    ETL().source('file', os.path.join(INPUT_FILES_DIR, 'multiple_messages.json'))"
+        ".sink('console', 'key: {} | value: {} | ts: {}').run()\n"
+    ),
+}
+REPORT_HEAVY_MODULES = (
+    "\nimport sys\n"
+    f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n"
+)
+
+
+def run_scenario(code: str) -> tuple:
+    """Run a scenario in a fresh interpreter
+
+    :param code: source code of the scenario
+    :type code: str
+
+    :return: wall time, in milliseconds, and imported heavy modules
+    :rtype: tuple
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code + REPORT_HEAVY_MODULES], cwd=ROOT_DIR,
+                            capture_output=True, text=True, check=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, result.stdout.strip()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the startup time of the ETL system")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per scenario (default is 10)")
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if any median exceeds this limit")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'scenario':<20}{'best (ms)':>12}{'median (ms)':>14}  heavy imports")
+    for name, code in SCENARIOS.items():
+        timings, heavy_modules = [], ""
+        for _ in range(args.repeat):
+            elapsed, heavy_modules = run_scenario(code)
+            timings.append(elapsed)
+        median = statistics.median(timings)
+        print(f"{name:<20}{min(timings):>12.1f}{median:>14.1f}  {heavy_modules or '-'}")
+        if args.max_ms is not None and median > args.max_ms:
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
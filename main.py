@@ -1,14 +1,8 @@
 import os
-from typing import Tuple
 
-from src.definitions import INPUT_FILES_DIR, DATABASE_ENV
+from src import definitions
+from src.definitions import INPUT_FILES_DIR
 from src.etl import ETL
-from src.sources.data_source import DataSource
-from src.sources.file_data_source import FileDataSource
-from src.sources.simulation_data_source import SimulationDataSource
-from src.sinks.data_sink import DataSink
-from src.sinks.console_data_sink import ConsoleDataSink
-from src.sinks.postgresql_data_sink import PostgreSQLDataSink
 
 
 def main() -> None:
@@ -20,10 +14,10 @@ def main() -> None:
         print(">> ", end='')
         option = input()
         if option == '1':
-            source_cls, source_args = select_source()
-            sink_cls, sink_args = select_sink()
+            source_name, source_args = select_source()
+            sink_name, sink_args = select_sink()
             print("Launching ETL process...")
-            ETL().source(source_cls, *source_args).sink(sink_cls, *sink_args).run()
+            ETL().source(source_name, *source_args).sink(sink_name, *sink_args).run()
             print("ETL process has finished. Press 'Enter' to continue...")
             input()
         elif option == '2':
@@ -34,8 +28,8 @@ def main() -> None:
             input()
 
 
-def select_source() -> Tuple[DataSource, list]:
-    source_cls, source_args = None, []
+def select_source() -> tuple[str, list]:
+    source_name, source_args = None, []
     valid = False
     while not valid:
         clear()
@@ -45,44 +39,49 @@ def select_source() -> Tuple[DataSource, list]:
         print(">> ", end='')
         option = input()
         if option == '1':
-            source_cls = SimulationDataSource
+            source_name = "simulation"
             valid = True
         elif option == '2':
-            source_cls = FileDataSource
+            source_name = "file"
             print("'source filepath':")
             print(f">> {INPUT_FILES_DIR}/", end='')
             source_args.append(os.path.join(INPUT_FILES_DIR, input()))
-            print("'chunk size': (default is 256)")
+            print("'chunk size': (default is 256, 'auto' picks it from file and block size)")
             print(">> ", end='')
             chunk_size = input()
-            if len(chunk_size.strip()):  # user has entered custom chunk size
+            if chunk_size.strip() == "auto":  # chunk size is auto-tuned
+                source_args.extend([256, True])
+            elif len(chunk_size.strip()):  # user has entered custom chunk size
                 source_args.append(int(chunk_size))
             valid = True
         else:
             print("Invalid input. Press 'Enter' to continue...")
             input()
-    return source_cls, source_args
+    return source_name, source_args
 
 
-def select_sink() -> Tuple[DataSink, list]:
-    sink_cls, sink_args = None, []
+def select_sink() -> tuple[str, list]:
+    sink_name, sink_args = None, []
     valid = False
     while not valid:
         clear()
         print("Select a data sink class:")
         print("1: Console")
         print("2: PostgreSQL")
+        print("3: SQLite")
+        print("4: File (NDJSON)")
         print(">> ", end='')
         option = input()
         if option == '1':
-            sink_cls = ConsoleDataSink
+            sink_name = "console"
             print("'output format': (default is 'key: {} | value: {} | ts: {}')")
             print(">> ", end='')
             output_format = input()
             sink_args.append(output_format if len(output_format.strip()) else "key: {} | value: {} | ts: {}")
             valid = True
         elif option == '2':
-            sink_cls = PostgreSQLDataSink
+            sink_name = "postgresql"
+            DATABASE_ENV = definitions.DATABASE_ENV  # "database.env" is only read when required
             print(f"'DB name': (default is '{DATABASE_ENV['POSTGRES_DB']}')")
             print(f">> ", end='')
             dbname = input()
@@ -106,10 +105,22 @@ def select_sink() -> Tuple[DataSink, list]:
             if len(dbport.strip()):  # user has entered custom DB port
                 sink_args.append(int(dbport))
             valid = True
+        elif option == '3':
+            sink_name = "sqlite"
+            print("'database filepath':")
+            print(">> ", end='')
+            sink_args.append(input().strip())
+            valid = True
+        elif option == '4':
+            sink_name = "file"
+            print("'target filepath':")
+            print(">> ", end='')
+            sink_args.append(input().strip())
+            valid = True
         else:
             print("Invalid input. Press 'Enter' to continue...")
             input()
-    return sink_cls, sink_args
+    return sink_name, sink_args
 
 
 def clear() -> None:
@@ -0,0 +1,325 @@
+"""Non-interactive command line interface of the ETL system
+
+A pipeline is described by a configuration file (TOML or JSON) and/or command
+line options, which take precedence over the configuration file. The
+configuration has five sections - 'source' and 'sink', which name a registered
+component via 'type' and hold the keyword arguments of its constructor,
+'batch', which holds the keyword arguments of ETL.batch(), 'where', which
+selects the transmitted messages by key and/or timestamp (see
+build_predicate()), and 'sort', which holds the keyword arguments of
+ETL.sort(), so messages are transmitted in timestamp order. For example:
+    [source]
+    type = "file"
+    source_filepath = "input_files/multiple_messages.json"
+    auto_tune = true
+
+    [sink]
+    type = "postgresql"
+    writers = 4
+    commit_interval = 10
+
+    [batch]
+    batch_size = 1000
+    target_latency = 0.25
+
+    [where]
+    keys = ["A123", "B123"]
+    ts_from = "2020-10-07 00:00:00+00:00"
+
+    [sort]
+    sort_by = "ts"
+    max_memory_messages = 2000000
+
+Database credentials of PostgreSQL components default to the ones in
+"database.env". After the run, a throughput summary is printed on STDERR, so it
+does not mix with the output of the console data sink. Errors of the run (e.g. a
+missing input file or a lost database connection) are printed on STDERR as well,
+and the exit status is 1.
+
+Usage:
+    python -m src run --source file --sink console -S source_filepath=messages.json
+    python -m src run --config pipeline.toml --batch-size 500 --writers 2
+    python -m src run --config pipeline.toml -W 'keys:=["A123"]' -S auto_tune:=true
+    python -m src run --config pipeline.toml --sort-by ts --max-memory-messages 500000
+    python -m src list
+"""
+import argparse
+import json
+import os
+import sys
+
+from src.etl import ETL
+from src.exceptions.ring_buffer_closed import RingBufferClosed
+from src.predicates import build_predicate
+from src.registry import SOURCES, SINKS
+
+SECTIONS = ("source", "sink", "batch", "where", "sort")
+# database drivers whose errors are reported without a traceback, if they were imported by a component
+DATABASE_DRIVERS = ("psycopg2", "sqlite3")
+DATABASE_COMPONENTS = ("postgresql",)
+# initial batch size of an adaptive batch size, unless one is given (it grows by a quarter of it per dump)
+ADAPTIVE_BATCH_SIZE = 1000
+# command line options mapped to the configuration section and key they override
+TUNING_OPTIONS = {
+    "batch_size": ("batch", "batch_size"),
+    "target_latency": ("batch", "target_latency"),
+    "max_rate": ("batch", "max_rate"),
+    "workers": ("source", "workers"),
+    "writers": ("sink", "writers"),
+    "queue_depth": ("sink", "queue_depth"),
+    "order": ("sink", "order"),
+    "commit_interval": ("sink", "commit_interval"),
+    "sort_by": ("sort", "sort_by"),
+    "max_memory_messages": ("sort", "max_memory_messages"),
+}
+# keyword arguments of tuning options which differ for some components, by section and component
+COMPONENT_OPTION_NAMES = {
+    ("source", "file", "workers"): "processes",
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the parser of command line arguments
+
+    :return: parser of command line arguments
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(prog="python -m src", description="Lightweight ETL system")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run an ETL pipeline")
+    run.add_argument("-c", "--config", help="pipeline configuration file (.toml or .json)")
+    run.add_argument("--source", help="registered name of the data source")
+    run.add_argument("--sink", help="registered name of the data sink")
+    run.add_argument("-S", "--source-option", action="append", default=[], metavar="NAME=VALUE",
+                     help="keyword argument of the data source, NAME:=VALUE for JSON values (may be repeated)")
+    run.add_argument("-K", "--sink-option", action="append", default=[], metavar="NAME=VALUE",
+                     help="keyword argument of the data sink, NAME:=VALUE for JSON values (may be repeated)")
+    run.add_argument("-W", "--where", action="append", default=[], metavar="NAME=VALUE",
+                     help="condition on the transmitted messages - keys:=[...], ts_from or ts_to (may be repeated)")
+    run.add_argument("--batch-size", type=int,
+                     help="number of messages dumped into the sink at once (initial one with --target-latency)")
+    run.add_argument("--target-latency", type=float, help="target dump latency in seconds (adaptive batch size)")
+    run.add_argument("--max-rate", type=float, help="maximum number of messages dumped per second")
+    run.add_argument("--workers", type=int,
+                     help="number of concurrent readers of the data source (decoding processes of a file)")
+    run.add_argument("--writers", type=int, help="number of concurrent writers of the data sink")
+    run.add_argument("--queue-depth", type=int, help="number of batches queued per writer of the data sink")
+    run.add_argument("--order", choices=("none", "key", "global"),
+                     help="order in which batches of concurrent writers of the data sink are committed")
+    run.add_argument("--commit-interval", type=int, help="number of batches between checkpoints of the data sink")
+    run.add_argument("--sort-by", choices=("ts", "key_ts"),
+                     help="order in which messages are transmitted (sorted before the first one is dumped)")
+    run.add_argument("--max-memory-messages", type=int,
+                     help="largest number of messages held in memory while sorting")
+    run.add_argument("--summary", choices=("text", "json", "none"), default="text",
+                     help="format of the throughput summary (default is 'text')")
+
+    commands.add_parser("list", help="list registered data sources and data sinks")
+    return parser
+
+
+def load_config(filepath: str) -> dict:
+    """Load a pipeline configuration file
+
+    TOML files are parsed with 'tomllib' (Python 3.11+), or with 'tomli' if the
+    former is not available.
+
+    :param filepath: path to configuration file (.toml or .json)
+    :type filepath: str
+
+    :raises ValueError: unsupported file format, unknown section or no TOML parser
+
+    :return: configuration sections mapped to their options
+    :rtype: dict
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == ".json":
+        with open(filepath) as config_file:
+            config = json.load(config_file)
+    elif extension == ".toml":
+        try:
+            import tomllib
+        except ModuleNotFoundError:  # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ModuleNotFoundError:
+                raise ValueError("TOML configuration requires Python 3.11+ or the 'tomli' package") from None
+        with open(filepath, 'rb') as config_file:
+            config = tomllib.load(config_file)
+    else:
+        raise ValueError(f"Unsupported configuration file format: {filepath}")
+    unknown_sections = set(config) - set(SECTIONS)
+    if unknown_sections:
+        raise ValueError(f"Unknown configuration sections: {', '.join(sorted(unknown_sections))}")
+    return config
+
+
+def parse_option(option: str) -> tuple:
+    """Parse a component option in the format `NAME=VALUE` or `NAME:=VALUE`
+
+    The value of `NAME=VALUE` is always kept as a string (e.g. a file path or an
+    output format), while the value of `NAME:=VALUE` is parsed as JSON (e.g.
+    numbers, booleans, lists).
+
+    :param option: option in the format `NAME=VALUE` or `NAME:=VALUE`
+    :type option: str
+
+    :raises ValueError: improperly formatted option or invalid JSON value
+
+    :return: name and value of the option
+    :rtype: tuple
+    """
+    name, separator, value = option.partition('=')
+    is_json = name.endswith(':')
+    name = name[:-1].strip() if is_json else name.strip()
+    if not separator or not name:
+        raise ValueError(f"Option must have the format 'NAME=VALUE' or 'NAME:=VALUE': {option}")
+    if not is_json:
+        return name, value
+    try:
+        return name, json.loads(value)
+    except json.JSONDecodeError:
+        raise ValueError(f"Option value is not valid JSON: {option}") from None
+
+
+def build_config(args: argparse.Namespace) -> dict:
+    """Merge the configuration file and the command line options
+
+    :param args: parsed command line arguments
+    :type args: argparse.Namespace
+
+    :raises ValueError: invalid configuration or options, missing source or sink
+
+    :return: configuration sections mapped to their options
+    :rtype: dict
+    """
+    config = load_config(args.config) if args.config is not None else {}
+    config = {section: dict(config.get(section, {})) for section in SECTIONS}
+    if args.source is not None:
+        config["source"]["type"] = args.source
+    if args.sink is not None:
+        config["sink"]["type"] = args.sink
+    config["source"].update(parse_option(option) for option in args.source_option)
+    config["sink"].update(parse_option(option) for option in args.sink_option)
+    config["where"].update(parse_option(option) for option in args.where)
+    for option, (section, key) in TUNING_OPTIONS.items():
+        value = getattr(args, option)
+        if value is not None:
+            key = COMPONENT_OPTION_NAMES.get((section, config[section].get("type"), key), key)
+            config[section][key] = value
+    for section in ("source", "sink"):
+        if "type" not in config[section]:
+            raise ValueError(f"No data {section} is specified (use --{section} or the 'type' option)")
+    return config
+
+
+def build_etl(config: dict) -> ETL:
+    """Build an ETL pipeline from its configuration
+
+    :param config: configuration sections mapped to their options
+    :type config: dict
+
+    :raises KeyError: unknown data source or data sink
+    :raises TypeError: unknown condition on the transmitted messages or sort option
+
+    :return: configured ETL pipeline
+    :rtype: ETL
+    """
+    source_options, sink_options = dict(config["source"]), dict(config["sink"])
+    source_name, sink_name = source_options.pop("type"), sink_options.pop("type")
+    for name, options in ((source_name, source_options), (sink_name, sink_options)):
+        if name in DATABASE_COMPONENTS:
+            _set_database_defaults(options)
+    etl = ETL().source(source_name, **source_options).sink(sink_name, **sink_options)
+    batch_options = dict(config["batch"])
+    if batch_options:
+        default_batch_size = ADAPTIVE_BATCH_SIZE if batch_options.get("target_latency") is not None else 1
+        etl.batch(batch_options.pop("batch_size", default_batch_size), **batch_options)
+    if config.get("where"):
+        etl.where(build_predicate(**config["where"]))
+    if config.get("sort"):
+        etl.sort(**config["sort"])
+    return etl
+
+
+def format_summary(stats: dict, summary_format: str = "text") -> str:
+    """Format the throughput summary of an ETL run
+
+    :param stats: statistics of the ETL run (see ETL.stats)
+    :type stats: dict
+    :param summary_format: 'text' or 'json'
+    :type summary_format: str
+
+    :return: formatted summary
+    :rtype: str
+    """
+    if summary_format == "json":
+        return json.dumps(stats, default=str)
+    summary = (f"messages: {stats['messages']} | batches: {stats['batches']} | "
+               f"elapsed: {stats['elapsed']:.3f} s | throughput: {stats['throughput']:.1f} msg/s | "
+               f"dump latency: {stats['dump_latency']:.3f} s | batch size: {stats['batch_size']}")
+    if stats.get("source"):
+        summary += " | source: " + ", ".join(f"{name}={value}" for name, value in stats["source"].items())
+    if stats.get("sink"):
+        summary += " | sink: " + ", ".join(f"{name}={value}" for name, value in stats["sink"].items())
+    return summary
+
+
+def main(argv: list = None) -> int:
+    """Run the command line interface
+
+    :param argv: command line arguments (default is 'sys.argv[1:]')
+    :type argv: list
+
+    :return: exit status
+    :rtype: int
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "list":
+        print("sources: " + ", ".join(SOURCES.names()))
+        print("sinks: " + ", ".join(SINKS.names()))
+        return 0
+
+    try:
+        etl = build_etl(build_config(args))
+    except KeyError as error:  # str() of a KeyError is the repr of its message
+        parser.error(str(error.args[0]) if error.args else "unknown component")
+    except (ValueError, TypeError, OSError) as error:
+        parser.error(str(error))
+    try:
+        etl.run()
+    except _runtime_errors() as error:
+        print(f"{parser.prog}: error: {error}".rstrip(), file=sys.stderr)
+        return 1
+    if args.summary != "none":
+        print(format_summary(etl.stats, args.summary), file=sys.stderr)
+    return 0
+
+
+def _runtime_errors() -> tuple:
+    """Return the types of errors expected while running a pipeline
+
+    The errors of a database driver are only included if the driver has already
+    been imported by a component, so that no unused driver is imported.
+
+    :return: types of errors which are reported without a traceback
+    :rtype: tuple
+    """
+    errors = [OSError, ValueError, RingBufferClosed]
+    errors.extend(sys.modules[driver].Error for driver in DATABASE_DRIVERS if driver in sys.modules)
+    return tuple(errors)
+
+
+def _set_database_defaults(options: dict) -> None:
+    """Fill in missing database credentials from "database.env"
+
+    :param options: keyword arguments of a PostgreSQL component
+    :type options: dict
+    """
+    from src.definitions import DATABASE_ENV  # "database.env" is only read when required
+
+    options.setdefault("dbname", DATABASE_ENV["POSTGRES_DB"])
+    options.setdefault("dbuser", DATABASE_ENV["POSTGRES_USER"])
+    options.setdefault("dbpassword", DATABASE_ENV["POSTGRES_PASSWORD"])
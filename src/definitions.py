@@ -3,4 +3,38 @@ import os
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SRC_DIR)
 INPUT_FILES_DIR = os.path.join(ROOT_DIR, "input_files")
-DATABASE_ENV = {}  # see corresponding "__init__.py" file
+DATABASE_ENV_FILEPATH = os.path.join(ROOT_DIR, "database.env")
+
+
+def load_database_env(filepath: str = DATABASE_ENV_FILEPATH) -> dict:
+    """Load database parameters from an environment file
+
+    Every non-empty line of the file must have the format `<name>=<value>`.
+
+    :param filepath: path to environment file
+    :type filepath: str
+
+    :return: parameter names mapped to their values
+    :rtype: dict
+    """
+    database_env = {}
+    with open(filepath) as dbenv:
+        for parameter in dbenv:
+            if len(parameter.strip()) == 0:
+                continue
+            parameter_name, parameter_value = parameter.strip().split('=')
+            database_env[parameter_name] = parameter_value
+    return database_env
+
+
+def __getattr__(name: str):
+    """Load 'DATABASE_ENV' from "database.env" on first access
+
+    Only components which talk to a database need its parameters, so the file
+    is not read when the package is imported.
+    """
+    if name == "DATABASE_ENV":
+        database_env = load_database_env()
+        globals()["DATABASE_ENV"] = database_env  # later accesses skip this hook
+        return database_env
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
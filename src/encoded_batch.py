@@ -0,0 +1,175 @@
+from collections.abc import Sequence
+
+from src.json_backends import get_backend
+from src.timestamps import split_timestamp
+
+COPY_ESCAPE = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+COPY_UNESCAPE = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+
+
+class EncodedBatch(Sequence):
+    """Batch of messages which are pre-encoded as rows in the text format of COPY
+
+    Pre-encoded batches are produced by worker processes (see encode_chunk()),
+    which decode JSON messages and validate and split their timestamps, so that
+    a data sink which supports them (e.g. PostgreSQLDataSink) only has to stream
+    the COPY data to the database. Every row holds the 'key', 'value', 'ts' and
+    'tz' columns of a message. The batch also holds the distinct dates of its
+    messages, which are enough to create any missing table partitions.
+
+    Any other data sink may use a pre-encoded batch as an ordinary sequence of
+    messages: the messages are decoded from the COPY data on first access (with
+    their values as text).
+
+    Attributes:
+        copy_data(str): rows in the text format of COPY
+        dates(list): sorted distinct dates (YYYY-MM-DD) of the messages
+        _count(int): number of messages
+        _messages(list): decoded messages, or None if not decoded yet
+
+    Properties:
+        messages(list): decoded messages
+
+    Methods:
+        __getitem__(index): get a decoded message
+        __len__(): number of messages
+    """
+
+    __slots__ = ("copy_data", "dates", "_count", "_messages")
+
+    def __init__(self, copy_data: str, count: int, dates: list) -> None:
+        """Construct pre-encoded batch
+
+        :param copy_data: rows in the text format of COPY
+        :type copy_data: str
+        :param count: number of messages
+        :type count: int
+        :param dates: sorted distinct dates (YYYY-MM-DD) of the messages
+        :type dates: list
+        """
+        self.copy_data = copy_data
+        self.dates = dates
+        self._count = count
+        self._messages = None
+
+    def __getstate__(self) -> tuple:
+        return self.copy_data, self.dates, self._count  # decoded messages are not shipped
+
+    def __setstate__(self, state: tuple) -> None:
+        self.copy_data, self.dates, self._count = state
+        self._messages = None
+
+    @property
+    def messages(self) -> list:
+        """Decoded messages"""
+        if self._messages is None:
+            self._messages = [{"key": key, "value": value, "ts": ts + tz}
+                              for key, value, ts, tz in decode_copy_rows(self.copy_data)]
+        return self._messages
+
+    def __getitem__(self, index):
+        """Get a decoded message"""
+        return self.messages[index]
+
+    def __len__(self) -> int:
+        """Number of messages"""
+        return self._count
+
+    def __repr__(self) -> str:
+        return f"EncodedBatch({self._count} messages)"
+
+
+def encode_copy_rows(rows) -> str:
+    """Serialize rows in the text format of COPY
+
+    Column values are separated by tabs and rows by newlines. Backslashes,
+    tabs and newlines inside values are escaped.
+
+    :param rows: database table rows
+    :type rows: Iterable[tuple]
+
+    :return: rows in the text format of COPY
+    :rtype: str
+    """
+    lines = []
+    for row in rows:
+        values = [str(value) for value in row]
+        line = "\t".join(values)
+        # values are only escaped if the row contains any character which requires it
+        if "\\" in line or "\n" in line or "\r" in line or line.count("\t") != len(values) - 1:
+            line = "\t".join(value.translate(COPY_ESCAPE) for value in values)
+        lines.append(line + "\n")
+    return "".join(lines)
+
+
+def decode_copy_rows(copy_data: str) -> list:
+    """Deserialize rows from the text format of COPY
+
+    :param copy_data: rows in the text format of COPY
+    :type copy_data: str
+
+    :return: database table rows with text values
+    :rtype: list
+    """
+    rows = []
+    for line in copy_data.split("\n")[:-1]:  # every row ends with a newline
+        values = line.split("\t")
+        if "\\" in line:
+            values = [_unescape_copy_value(value) for value in values]
+        rows.append(tuple(values))
+    return rows
+
+
+def encode_chunk(text: str, decoder: str = "auto", predicate=None) -> EncodedBatch:
+    """Decode a chunk of JSON messages into a pre-encoded batch
+
+    This is the task of the worker processes of FileDataSource. The chunk must
+    only hold complete messages. All messages are decoded with a single call to
+    the JSON decoder backend, and their timestamps are validated and split into
+    their datetime and timezone parts. If a predicate is given, messages which
+    are not selected are dropped - most of them by its prefilter, before they
+    are decoded (see Predicate).
+
+    :param text: chunk of complete JSON messages, separated by commas
+    :type text: str
+    :param decoder: name of the JSON decoder backend, or "auto"
+    :type decoder: str
+    :param predicate: condition which selects the encoded messages, or None
+    :type predicate: Predicate
+
+    :raises ValueError: invalid JSON message or improperly formatted timestamp
+
+    :return: pre-encoded batch of the messages
+    :rtype: EncodedBatch
+    """
+    from src.sources.file_data_source import FileDataSource  # imported here to avoid a circular import
+
+    backend = get_backend(decoder)
+    text_messages = FileDataSource._split_json_chunk(text)
+    if predicate is not None:
+        text_messages = filter(predicate.prefilter, text_messages)
+    try:
+        messages = backend.loads_batch(list(text_messages))
+    except backend.decode_error as error:  # library errors may not survive pickling
+        raise ValueError(f"Invalid JSON message: {error}") from None
+    rows, dates = [], set()
+    for message in messages:
+        if predicate is not None and not predicate.matches(message):
+            continue
+        ts, tz = split_timestamp(message["ts"])
+        rows.append((message["key"], message["value"], ts, tz))
+        dates.add(ts[:10])
+    return EncodedBatch(encode_copy_rows(rows), len(rows), sorted(dates))
+
+
+def _unescape_copy_value(value: str) -> str:
+    """Reverse the escaping of a value in the text format of COPY"""
+    result, index = [], 0
+    while True:
+        backslash = value.find("\\", index)
+        if backslash == -1 or backslash == len(value) - 1:
+            result.append(value[index:])
+            return "".join(result)
+        result.append(value[index:backslash])
+        result.append(COPY_UNESCAPE.get(value[backslash + 1], value[backslash + 1]))
+        index = backslash + 2
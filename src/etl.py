@@ -1,8 +1,21 @@
 from __future__ import annotations  # introduced in Python 3.10+
 
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+
+from src.flow_control import AdaptiveBatchSize, TokenBucket
+from src.predicates import Predicate
+from src.registry import SOURCES, SINKS
 from src.sources.data_source import DataSource
+from src.sources.sorted_data_source import SortedDataSource
 from src.sinks.data_sink import DataSink
 
+if TYPE_CHECKING:  # asynchronous runs are optional, and asyncio slows down startup
+    from concurrent.futures import Executor
+
+    from src.sinks.async_data_sink import AsyncDataSink
+
 
 class ETL:
     """Pseudo Extract,Transform,Load (ETL) interface
@@ -14,32 +27,89 @@ class ETL:
     more details)
 
     Data is extracted in the form of singular messages from the data source.
-    Afterwards, the message is immediately passed to the data sink, i.e. it is
-    transmitted on a one by one basis. This ETL does not perform any analysis,
-    manipulation, buffering, etc. of the received data.
+    By default, the message is immediately passed to the data sink, i.e. it is
+    transmitted on a one by one basis. Alternatively, messages may be collected
+    into batches of fixed size which are dumped into the sink at once (see
+    DataSink.dump_batch()). This ETL does not perform any analysis, manipulation,
+    etc. of the received data.
+
+    When a target latency is set, the latency of every batch dump is measured
+    and the batch size is adjusted after each dump (see AdaptiveBatchSize), so
+    batches grow while the sink keeps up and shrink as soon as it slows down.
+    Independently, the number of messages dumped per second may be capped with
+    a token bucket (see TokenBucket), which keeps a backfill from saturating a
+    shared database. Both work with any sink which implements 'dump_batch'.
+
+    Alternatively, the ETL process may run as a coroutine (see run_async()), so
+    that many pipelines share a single event loop instead of occupying one OS
+    thread each. Asynchronous data sources and sinks ('AsyncDataSource' and
+    'AsyncDataSink') are used as they are, while synchronous ones are wrapped in
+    adapters which run their blocking calls in a thread pool. The next batch is
+    read while up to 'max_in_flight' batches are being dumped.
+
+    Only messages selected by a predicate may be transmitted (see where()). The
+    predicate is pushed down into the data source if it supports predicates
+    (see DataSource.where()), so it is evaluated before messages are decoded or
+    even fetched; otherwise, messages are filtered after they are extracted.
+
+    Messages may be transmitted in timestamp order, regardless of the order of
+    the data source (see sort()). They are sorted by an external merge sort with
+    a bounded memory budget before the first one is dumped, so the sink writes
+    BRIN indexes and partitions of the message table sequentially.
 
     Attributes:
-        data_source(DataSource): instance of the data source
-        data_sink(DataSink): instance of the data sink
+        data_source(DataSource|AsyncDataSource): instance of the data source
+        data_sink(DataSink|AsyncDataSink): instance of the data sink
+        batch_size(int): number of messages dumped into the sink at once
+        adaptive_batch_size(AdaptiveBatchSize): controller of the batch size, or
+                                                None if the batch size is fixed
+        rate_limiter(TokenBucket): cap of dumped messages per second, or None
+        predicate(Predicate): condition which selects transmitted messages, or None
+        stats(dict): statistics of the last run - number of messages, number of
+                     batches, elapsed time, throughput, dump latency, final
+                     batch size, number of messages filtered out after extraction
+                     and statistics of the data source and sink
 
     Methods:
         source(source_cls, *args, **kwargs): create an instance of a chosen type
-                                             of data source
+                                             (or registered name) of data source
         sink(sink_cls, *args, **kwargs): create an instance of a chosen type
-                                         of data sink
+                                         (or registered name) of data sink
+        batch(batch_size, target_latency, min_batch_size, max_batch_size, max_rate):
+            set the number of messages dumped into the sink at once
+        where(predicate): select the transmitted messages
+        sort(sort_by, **kwargs): transmit messages in sorted order
         run(): extract messages from the source and dump them in the sink
+        run_async(max_in_flight, executor): extract messages from the source and dump
+                                            them in the sink, as a coroutine
+        _push_down_predicate(data_source): push the predicate down into the data source
+        _filter(batch): drop the messages of a batch which are not selected
+        _dump_batch(batch): dump a batch while throttling and adapting the batch size
+        _dump_batch_async(data_sink, batch): dump a batch asynchronously while
+                                             throttling and adapting the batch size
+        _record_dump(count, latency): adapt the batch size and count a dumped batch
+        _finish_stats(elapsed): complete the statistics of a run
     """
 
     def __init__(self):
         """Construct ETL instance"""
         self.data_source = None
         self.data_sink = None
+        self.batch_size = 1
+        self.adaptive_batch_size = None
+        self.rate_limiter = None
+        self.predicate = None
+        self._filtering = False
+        self.stats = {}
 
     def source(self, source_cls: DataSource, *args, **kwargs) -> ETL:
         """Instantiate a data source and save a reference to it
 
-        :param source_cls: class of data source
-        :type: DataSource
+        The data source may be given by its registered name (see SOURCES), in
+        which case its class is imported only now.
+
+        :param source_cls: class or registered name of data source
+        :type: DataSource|str
         :param args: arguments to data source constructor
         :type: tuple
         :param kwargs: keyword arguments to data source constructor
@@ -48,14 +118,19 @@ class ETL:
         :return: reference to self
         :rtype: ETL
         """
+        if isinstance(source_cls, str):
+            source_cls = SOURCES.get(source_cls)
         self.data_source = source_cls(*args, **kwargs)
         return self
 
     def sink(self, sink_cls: DataSink, *args, **kwargs) -> ETL:
         """Instantiate a data sink and save a reference to it
 
-        :param sink_cls: class of data sink
-        :type: DataSink
+        The data sink may be given by its registered name (see SINKS), in which
+        case its class is imported only now.
+
+        :param sink_cls: class or registered name of data sink
+        :type: DataSink|str
         :param args: arguments to data sink constructor
         :type: tuple
         :param kwargs: keyword arguments to data sink constructor
@@ -64,17 +139,240 @@ class ETL:
         :return: reference to self
         :rtype: ETL
         """
+        if isinstance(sink_cls, str):
+            sink_cls = SINKS.get(sink_cls)
         self.data_sink = sink_cls(*args, **kwargs)
         return self
 
+    def batch(self, batch_size: int, target_latency: float = None, min_batch_size: int = 1,
+              max_batch_size: int = 100000, max_rate: float = None) -> ETL:
+        """Set the number of messages dumped into the sink at once
+
+        If a target latency is given, the batch size is only the initial one and
+        is adjusted with respect to the measured dump latency within the range
+        [min_batch_size, max_batch_size]. If a maximum rate is given, no more
+        than that many messages per second are dumped into the sink.
+
+        :param batch_size: number of messages per batch
+        :type batch_size: int
+        :param target_latency: target dump latency, in seconds
+        :type target_latency: float
+        :param min_batch_size: smallest adjusted batch size
+        :type min_batch_size: int
+        :param max_batch_size: largest adjusted batch size
+        :type max_batch_size: int
+        :param max_rate: maximum number of messages dumped per second
+        :type max_rate: float
+
+        :raises ValueError: batch size must be a positive integer, invalid
+                            target latency, batch size bounds or maximum rate
+
+        :return: reference to self
+        :rtype: ETL
+        """
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be a positive integer: {batch_size}")
+        self.batch_size = batch_size
+        self.adaptive_batch_size = None
+        if target_latency is not None:
+            self.adaptive_batch_size = AdaptiveBatchSize(batch_size, target_latency,
+                                                         min_batch_size, max_batch_size)
+            self.batch_size = self.adaptive_batch_size.batch_size
+        self.rate_limiter = TokenBucket(max_rate) if max_rate is not None else None
+        return self
+
+    def where(self, predicate: Predicate) -> ETL:
+        """Select the transmitted messages
+
+        :param predicate: condition which selects transmitted messages, or None
+                          to transmit all messages
+        :type predicate: Predicate
+
+        :return: reference to self
+        :rtype: ETL
+        """
+        self.predicate = predicate
+        return self
+
+    def sort(self, sort_by: str = "ts", **kwargs) -> ETL:
+        """Transmit messages in sorted order
+
+        The data source is wrapped in a sorted data source, which sorts all of
+        its messages when it is initialized (see SortedDataSource). Therefore,
+        the data source must be set first.
+
+        :param sort_by: order of the transmitted messages - "ts" or "key_ts"
+        :type sort_by: str
+        :param kwargs: keyword arguments to sorted data source constructor
+                       (e.g. 'max_memory_messages', 'directory')
+        :type kwargs: dict
+
+        :raises ValueError: no data source is set, unsupported order or invalid limits
+
+        :return: reference to self
+        :rtype: ETL
+        """
+        if self.data_source is None:
+            raise ValueError("Data source must be set before sorting its messages")
+        self.data_source = SortedDataSource(self.data_source, sort_by, **kwargs)
+        return self
+
     def run(self) -> None:
         """Extract messages from the source and dump them in the sink
 
         The data source and data sink are properly initialized and terminated
         via context management.
-        Messages are read and transmitted on a one by one basis.
+        Messages are read and transmitted on a one by one basis, unless a batch
+        size greater than one, a target latency or a maximum rate is set, in
+        which case they are transmitted in batches (see DataSource.read_batch()).
+        The last batch may contain fewer messages. Statistics of the run are
+        saved in 'stats'.
         """
+        self.stats = {"messages": 0, "batches": 0, "elapsed": 0.0, "throughput": 0.0,
+                      "dump_latency": 0.0, "batch_size": self.batch_size, "filtered": 0}
+        self._push_down_predicate(self.data_source)
+        started = time.perf_counter()
         with self.data_source, self.data_sink:
-            while self.data_source.has_message():
-                message = self.data_source.read()
-                self.data_sink.dump(message)
+            if self.batch_size == 1 and self.adaptive_batch_size is None and self.rate_limiter is None:
+                while self.data_source.has_message():
+                    message = self.data_source.read()
+                    if self._filtering and not self.predicate.matches(message):
+                        self.stats["filtered"] += 1
+                        continue
+                    self.data_sink.dump(message)
+                    self.stats["messages"] += 1
+            else:
+                while self.data_source.has_message():
+                    batch = self._filter(self.data_source.read_batch(self.batch_size))
+                    if len(batch) > 0:
+                        self._dump_batch(batch)
+        self._finish_stats(time.perf_counter() - started)
+
+    async def run_async(self, max_in_flight: int = 2, executor: Executor = None) -> None:
+        """Extract messages from the source and dump them in the sink, as a coroutine
+
+        Messages are always transmitted in batches (see batch()). While batches
+        are being dumped, the next batch is already read from the source; at most
+        'max_in_flight' batches are being dumped at once, after which reading
+        waits for the oldest dump to finish. Synchronous data sources and sinks
+        are wrapped in 'ThreadedDataSource' and 'ThreadedDataSink', which run their
+        blocking calls in 'executor'. If any dump fails, the pending dumps are
+        cancelled and the error is raised. Statistics of the run are saved in
+        'stats'.
+
+        :param max_in_flight: largest number of batches being dumped at once
+        :type max_in_flight: int
+        :param executor: thread pool for synchronous data sources and sinks
+                         (default is the default executor of the event loop)
+        :type executor: Executor
+
+        :raises ValueError: number of batches in flight must be a positive integer
+        """
+        import asyncio  # imported lazily, since it slows down startup
+        from src.sources.async_data_source import AsyncDataSource, ThreadedDataSource
+        from src.sinks.async_data_sink import AsyncDataSink, ThreadedDataSink
+
+        if max_in_flight < 1:
+            raise ValueError(f"Number of batches in flight must be a positive integer: {max_in_flight}")
+        data_source = self.data_source
+        if not isinstance(data_source, AsyncDataSource):
+            data_source = ThreadedDataSource(data_source, executor)
+        data_sink = self.data_sink
+        if not isinstance(data_sink, AsyncDataSink):
+            data_sink = ThreadedDataSink(data_sink, executor)
+        self.stats = {"messages": 0, "batches": 0, "elapsed": 0.0, "throughput": 0.0,
+                      "dump_latency": 0.0, "batch_size": self.batch_size, "filtered": 0}
+        self._push_down_predicate(data_source)
+        started = time.perf_counter()
+        async with data_source, data_sink:
+            dumps = deque()  # pending dumps, oldest first
+            try:
+                while await data_source.has_message():
+                    batch = self._filter(await data_source.read_batch(self.batch_size))
+                    if len(batch) == 0:
+                        continue
+                    if len(dumps) == max_in_flight:
+                        await dumps.popleft()
+                    dumps.append(asyncio.ensure_future(self._dump_batch_async(data_sink, batch)))
+                while len(dumps) > 0:
+                    await dumps.popleft()
+            finally:
+                for dump in dumps:
+                    dump.cancel()
+                await asyncio.gather(*dumps, return_exceptions=True)
+        self._finish_stats(time.perf_counter() - started)
+
+    def _push_down_predicate(self, data_source) -> None:
+        """Push the predicate down into the data source, or filter messages after extraction
+
+        :param data_source: data source of the run
+        :type data_source: DataSource|AsyncDataSource
+        """
+        self._filtering = self.predicate is not None and not data_source.where(self.predicate)
+
+    def _filter(self, batch: list) -> list:
+        """Drop the messages of a batch which are not selected, unless the data source did
+
+        :param batch: bodies of the messages, or a pre-encoded batch
+        :type batch: list|EncodedBatch
+
+        :return: bodies of the selected messages, or the batch itself
+        :rtype: list|EncodedBatch
+        """
+        if not self._filtering:
+            return batch
+        selected = [message for message in batch if self.predicate.matches(message)]
+        self.stats["filtered"] += len(batch) - len(selected)
+        return selected
+
+    def _dump_batch(self, batch: list) -> None:
+        """Dump a batch while throttling and adapting the batch size
+
+        :param batch: bodies of the messages
+        :type batch: list
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(len(batch))
+        started = time.perf_counter()
+        self.data_sink.dump_batch(batch)
+        self._record_dump(len(batch), time.perf_counter() - started)
+
+    async def _dump_batch_async(self, data_sink: AsyncDataSink, batch: list) -> None:
+        """Dump a batch asynchronously while throttling and adapting the batch size
+
+        :param data_sink: asynchronous data sink
+        :type data_sink: AsyncDataSink
+        :param batch: bodies of the messages
+        :type batch: list
+        """
+        import asyncio  # imported lazily, since it slows down startup
+
+        if self.rate_limiter is not None:
+            await asyncio.sleep(self.rate_limiter.reserve(len(batch)))
+        self._record_dump(len(batch), await data_sink.timed_dump_batch(batch))
+
+    def _record_dump(self, count: int, latency: float) -> None:
+        """Adapt the batch size and count a dumped batch
+
+        :param count: number of messages in the batch
+        :type count: int
+        :param latency: dump latency, in seconds
+        :type latency: float
+        """
+        if self.adaptive_batch_size is not None:
+            self.batch_size = self.adaptive_batch_size.update(latency)
+        self.stats["messages"] += count
+        self.stats["batches"] += 1
+        self.stats["dump_latency"] += latency
+
+    def _finish_stats(self, elapsed: float) -> None:
+        """Complete the statistics of a run
+
+        :param elapsed: duration of the run, in seconds
+        :type elapsed: float
+        """
+        self.stats["elapsed"] = elapsed
+        self.stats["throughput"] = self.stats["messages"] / elapsed if elapsed > 0 else 0.0
+        self.stats["batch_size"] = self.batch_size
+        self.stats["source"] = self.data_source.stats
+        self.stats["sink"] = self.data_sink.stats
@@ -0,0 +1,27 @@
+class DatabaseSourceDepleted(Exception):
+    """Exception raised when attempting to read from a depleted source database
+
+    Attributes:
+        dbname(str): name of depleted database
+        message(str): error message
+    """
+
+    def __init__(self, dbname: str, message: str = "Database source is depleted"):
+        """Construct DatabaseSourceDepleted
+
+        :param dbname: name of depleted database
+        :type dbname: str
+        :param message: error message
+        :type message: str
+        """
+        self.dbname = dbname
+        self.message = message
+        super().__init__(message)
+
+    def __str__(self) -> str:
+        """Get the informal string representation of the error
+
+        :return: full error message
+        :rtype: str
+        """
+        return f"{self.dbname}: {self.message}"
@@ -0,0 +1,27 @@
+class RingBufferClosed(Exception):
+    """Exception raised when attempting to write into (or read past the end of) a closed ring buffer
+
+    Attributes:
+        name(str): name of the shared memory block of the ring buffer
+        message(str): error message
+    """
+
+    def __init__(self, name: str, message: str = "Ring buffer is closed"):
+        """Construct RingBufferClosed
+
+        :param name: name of the shared memory block of the ring buffer
+        :type name: str
+        :param message: error message
+        :type message: str
+        """
+        self.name = name
+        self.message = message
+        super().__init__(message)
+
+    def __str__(self) -> str:
+        """Get the informal string representation of the error
+
+        :return: full error message
+        :rtype: str
+        """
+        return f"{self.name}: {self.message}"
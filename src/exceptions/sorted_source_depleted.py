@@ -0,0 +1,27 @@
+class SortedSourceDepleted(Exception):
+    """Exception raised when attempting to read from a depleted sorted source
+
+    Attributes:
+        sort_by(str): order of the depleted source
+        message(str): error message
+    """
+
+    def __init__(self, sort_by: str, message: str = "Sorted source is depleted"):
+        """Construct SortedSourceDepleted
+
+        :param sort_by: order of the depleted source
+        :type sort_by: str
+        :param message: error message
+        :type message: str
+        """
+        self.sort_by = sort_by
+        self.message = message
+        super().__init__(message)
+
+    def __str__(self) -> str:
+        """Get the informal string representation of the error
+
+        :return: full error message
+        :rtype: str
+        """
+        return f"{self.sort_by}: {self.message}"
@@ -0,0 +1,236 @@
+import heapq
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+from operator import itemgetter
+from typing import Callable, Iterator
+
+from src.timestamps import utc_microseconds
+
+_SORT_KEY = itemgetter(0)
+
+
+def ts_sort_key(message) -> int:
+    """Sort key of a message by its timestamp, as a point in time (regardless of its timezone)
+
+    :param message: body of the message
+    :type message: dict
+
+    :raises ValueError: improperly formatted timestamp
+
+    :return: UTC timestamp, in microseconds since the epoch
+    :rtype: int
+    """
+    return utc_microseconds(message["ts"])
+
+
+def key_ts_sort_key(message) -> tuple:
+    """Sort key of a message by its key, then by its timestamp
+
+    :param message: body of the message
+    :type message: dict
+
+    :raises ValueError: improperly formatted timestamp
+
+    :return: key and UTC timestamp, in microseconds since the epoch
+    :rtype: tuple
+    """
+    return message["key"], utc_microseconds(message["ts"])
+
+
+class ExternalSorter:
+    """Sorter of arbitrarily many messages within a bounded amount of memory
+
+    Messages are added in batches and collected in memory, along with their sort
+    keys. Whenever 'max_memory_messages' messages have been collected, they are
+    sorted and spilled to a temporary run file (pickled in blocks of
+    'block_messages' messages, each prefixed by its length). Once all messages
+    have been added, the runs - and the messages which are still in memory - are
+    merged with a k-way heap merge (see heapq.merge()), which reads one block per
+    run at a time. If there are more than 'fan_in' runs, groups of 'fan_in' runs
+    are merged into longer runs first, so the number of open files and the
+    memory used by the merge stay bounded as well. Thus, sorting a file many
+    times larger than the memory takes two or three sequential passes over the
+    data on disk. If all messages fit into memory, nothing is written to disk.
+
+    The sort is stable, i.e. messages with equal sort keys keep the order in
+    which they were added. Run files are deleted as soon as they have been
+    merged, and all of them are deleted once the sorted messages have been
+    taken out (or by cleanup()).
+
+    Class attributes:
+        LENGTH(struct.Struct): length prefix of a block of a run file
+
+    Attributes:
+        key(Callable): function which computes the sort key of a message
+        max_memory_messages(int): largest number of messages held in memory
+        directory(str): parent directory of the run files (default is the
+                        system's temporary directory)
+        fan_in(int): largest number of runs merged at once
+        block_messages(int): number of messages per block of a run file
+        runs(int): number of run files written so far (including merged runs)
+        spilled_messages(int): number of messages written to run files so far
+        merge_passes(int): number of intermediate merges of runs so far
+        _memory(list): messages held in memory with their sort keys, in order of addition
+        _run_paths(list): paths of the run files, in order of addition
+        _run_directory(str): directory of the run files, or None
+
+    Properties:
+        stats(dict): number of runs, spilled messages and intermediate merges
+
+    Methods:
+        add(messages): add a batch of messages
+        sorted(): take out all messages in sorted order
+        cleanup(): delete all run files
+        _spill_run(): sort the messages in memory and write them to a run file
+        _write_run(records): write sorted messages to a new run file
+        _read_run(path): read the messages of a run file, then delete it
+    """
+
+    LENGTH = struct.Struct("<Q")
+
+    def __init__(self, key: Callable = ts_sort_key, max_memory_messages: int = 1000000, directory: str = None,
+                 fan_in: int = 64, block_messages: int = 1000) -> None:
+        """Construct external sorter
+
+        :param key: function which computes the sort key of a message
+        :type key: Callable
+        :param max_memory_messages: largest number of messages held in memory
+        :type max_memory_messages: int
+        :param directory: parent directory of the run files (default is the
+                          system's temporary directory)
+        :type directory: str
+        :param fan_in: largest number of runs merged at once
+        :type fan_in: int
+        :param block_messages: number of messages per block of a run file
+        :type block_messages: int
+
+        :raises ValueError: limits must be positive integers, and at least two
+                            runs must be merged at once
+        """
+        if max_memory_messages < 1:
+            raise ValueError(f"Number of messages in memory must be a positive integer: {max_memory_messages}")
+        if fan_in < 2:
+            raise ValueError(f"Fan-in must be at least 2: {fan_in}")
+        if block_messages < 1:
+            raise ValueError(f"Number of messages per block must be a positive integer: {block_messages}")
+        self.key = key
+        self.max_memory_messages = max_memory_messages
+        self.directory = directory
+        self.fan_in = fan_in
+        self.block_messages = block_messages
+        self.runs = 0
+        self.spilled_messages = 0
+        self.merge_passes = 0
+        self._memory = []
+        self._run_paths = []
+        self._run_directory = None
+
+    @property
+    def stats(self) -> dict:
+        """Number of written run files, spilled messages and intermediate merges"""
+        return {"runs": self.runs, "spilled_messages": self.spilled_messages, "merge_passes": self.merge_passes}
+
+    def add(self, messages) -> None:
+        """Add a batch of messages, spilling a sorted run to disk whenever memory is full
+
+        :param messages: bodies of the messages
+        :type messages: Iterable[dict]
+
+        :raises ValueError: improperly formatted sort key (e.g. timestamp)
+        """
+        key = self.key
+        for message in messages:
+            self._memory.append((key(message), message))
+            if len(self._memory) >= self.max_memory_messages:
+                self._spill_run()
+
+    def sorted(self) -> Iterator:
+        """Take out all added messages in sorted order
+
+        The runs are merged lazily, while the messages are taken out. Groups of
+        runs are merged into longer runs first if there are more than 'fan_in'
+        runs (counting the messages in memory as one).
+
+        :return: bodies of the messages, in sorted order
+        :rtype: Iterator[dict]
+        """
+        self._memory.sort(key=_SORT_KEY)
+        memory, self._memory = self._memory, []
+        while len(self._run_paths) + (len(memory) > 0) > self.fan_in:
+            group, self._run_paths = self._run_paths[:self.fan_in], self._run_paths[self.fan_in:]
+            path = self._write_run(heapq.merge(*map(self._read_run, group), key=_SORT_KEY))
+            self._run_paths.insert(0, path)  # earlier runs stay first, so the sort stays stable
+            self.merge_passes += 1
+        sources = [self._read_run(path) for path in self._run_paths] + [iter(memory)]
+        self._run_paths = []
+        try:
+            for _, message in heapq.merge(*sources, key=_SORT_KEY):
+                yield message
+        finally:
+            self.cleanup()
+
+    def cleanup(self) -> None:
+        """Delete all run files, including any runs which have not been merged"""
+        if self._run_directory is not None:
+            shutil.rmtree(self._run_directory, ignore_errors=True)
+            self._run_directory = None
+        self._run_paths = []
+
+    def _spill_run(self) -> None:
+        """Sort the messages in memory and write them to a new run file"""
+        self._memory.sort(key=_SORT_KEY)
+        self._run_paths.append(self._write_run(self._memory))
+        self._memory = []
+
+    def _write_run(self, records) -> str:
+        """Write sorted messages (with their sort keys) to a new run file
+
+        :param records: sort keys and bodies of the messages, in sorted order
+        :type records: Iterable[tuple]
+
+        :return: path to the run file
+        :rtype: str
+        """
+        if self._run_directory is None:
+            if self.directory is not None:
+                os.makedirs(self.directory, exist_ok=True)
+            self._run_directory = tempfile.mkdtemp(prefix="sort-", dir=self.directory)
+        path = os.path.join(self._run_directory, f"run-{self.runs:06d}.run")
+        with open(path, 'wb') as run_file:
+            block = []
+            for record in records:
+                block.append(record)
+                if len(block) == self.block_messages:
+                    data = pickle.dumps(block, pickle.HIGHEST_PROTOCOL)
+                    run_file.write(self.LENGTH.pack(len(data)) + data)
+                    self.spilled_messages += len(block)
+                    block = []
+            if len(block) > 0:
+                data = pickle.dumps(block, pickle.HIGHEST_PROTOCOL)
+                run_file.write(self.LENGTH.pack(len(data)) + data)
+                self.spilled_messages += len(block)
+        self.runs += 1
+        return path
+
+    def _read_run(self, path: str) -> Iterator:
+        """Read the messages (with their sort keys) of a run file block by block, then delete it
+
+        :param path: path to the run file
+        :type path: str
+
+        :return: sort keys and bodies of the messages, in sorted order
+        :rtype: Iterator[tuple]
+        """
+        with open(path, 'rb') as run_file:
+            while True:
+                prefix = run_file.read(self.LENGTH.size)
+                if len(prefix) < self.LENGTH.size:
+                    break
+                yield from pickle.loads(run_file.read(self.LENGTH.unpack(prefix)[0]))
+        os.remove(path)
+
+    def __repr__(self) -> str:
+        return f"ExternalSorter(max_memory_messages={self.max_memory_messages}, fan_in={self.fan_in})"
@@ -0,0 +1,350 @@
+import os
+import re
+import struct
+from array import array
+
+from src.timestamps import utc_microseconds
+
+# every message is a flat JSON object, so it spans from a '{' to the next '}'
+MESSAGE_PATTERN = re.compile(rb"\{[^{}]*\}")
+TS_PATTERN = re.compile(rb'"ts"\s*:\s*"([^"]*)"')
+
+
+class FileIndex:
+    """Sidecar offset index of the messages of a JSON file
+
+    The index is built in a single pass over the file (see build()), which only
+    locates messages and extracts their timestamps at the byte level, without
+    decoding them. Messages are grouped into blocks of 'stride' consecutive
+    messages, and the index holds the byte offset of the first message of every
+    block, along with the earliest and latest timestamp of the block (in
+    microseconds since the epoch, UTC). Thus, a file of a billion messages is
+    indexed in about 24 MB with the default stride.
+
+    The index is saved next to the file (SUFFIX), as a fixed header followed by
+    the raw 'array' data, and is only valid as long as the size and modification
+    time of the file match the ones recorded in the header (see is_fresh()).
+
+    With the index, a data source may seek to any message (see block_of()), read
+    only the blocks whose timestamps overlap a range (see segments()), or split
+    the file into byte ranges of equal numbers of messages (see partitions()),
+    and the number of messages is known right away.
+
+    Class attributes:
+        MAGIC(bytes): marker at the start of an index file
+        HEADER(struct.Struct): layout of the header - marker, stride, number of
+                               messages, file size, file modification time and
+                               number of blocks
+        SUFFIX(str): suffix of the path of an index file, after the file path
+        DEFAULT_STRIDE(int): default number of messages per block
+        EMPTY_BLOCK(tuple): earliest and latest timestamp of a block without any
+                            (valid) timestamps
+
+    Attributes:
+        stride(int): number of messages per block
+        message_count(int): number of messages in the file
+        file_size(int): size of the indexed file, in bytes
+        file_mtime_ns(int): modification time of the indexed file, in nanoseconds
+        offsets(array): byte offsets of the first message of every block
+        min_ts(array): earliest timestamp of every block, in microseconds since the epoch
+        max_ts(array): latest timestamp of every block, in microseconds since the epoch
+
+    Properties:
+        block_count(int): number of blocks
+
+    Methods:
+        save(index_filepath): write the index to a file
+        is_fresh(source_filepath): indicate whether the index matches a file
+        block_of(message_number): get the block which holds a message
+        segments(ts_from, ts_to, lower, upper): get the byte ranges of the blocks
+                                                which may hold timestamps of a range
+        partitions(count): split the file into byte ranges of equal numbers of messages
+
+    Class methods:
+        build(source_filepath, stride, chunk_size): index a file in a single pass
+        load(index_filepath): read an index from a file
+        open(source_filepath, index_filepath, stride): load the index of a file,
+                                                       or build and save it if stale
+        index_filepath_of(source_filepath): get the default path of the index of a file
+    """
+
+    MAGIC = b"ETLIDX01"
+    HEADER = struct.Struct("<8sqqqqq")
+    SUFFIX = ".idx"
+    DEFAULT_STRIDE = 1000
+    EMPTY_BLOCK = (2 ** 63 - 1, -2 ** 63)
+
+    def __init__(self, stride: int, message_count: int, file_size: int, file_mtime_ns: int,
+                 offsets: array, min_ts: array, max_ts: array) -> None:
+        """Construct file index
+
+        :param stride: number of messages per block
+        :type stride: int
+        :param message_count: number of messages in the file
+        :type message_count: int
+        :param file_size: size of the indexed file, in bytes
+        :type file_size: int
+        :param file_mtime_ns: modification time of the indexed file, in nanoseconds
+        :type file_mtime_ns: int
+        :param offsets: byte offsets of the first message of every block
+        :type offsets: array
+        :param min_ts: earliest timestamp of every block, in microseconds since the epoch
+        :type min_ts: array
+        :param max_ts: latest timestamp of every block, in microseconds since the epoch
+        :type max_ts: array
+        """
+        self.stride = stride
+        self.message_count = message_count
+        self.file_size = file_size
+        self.file_mtime_ns = file_mtime_ns
+        self.offsets = offsets
+        self.min_ts = min_ts
+        self.max_ts = max_ts
+
+    @property
+    def block_count(self) -> int:
+        """Number of blocks"""
+        return len(self.offsets)
+
+    @classmethod
+    def build(cls, source_filepath: str, stride: int = DEFAULT_STRIDE, chunk_size: int = 16 * 1024 * 1024):
+        """Index a JSON file in a single pass
+
+        The file is read in binary chunks. Messages are located with a regular
+        expression, and only the timestamps of messages are decoded. Messages
+        without a valid timestamp are counted, but do not affect the timestamps
+        of their block.
+
+        :param source_filepath: path to JSON file
+        :type source_filepath: str
+        :param stride: number of messages per block
+        :type stride: int
+        :param chunk_size: size of the read chunks, in bytes
+        :type chunk_size: int
+
+        :raises ValueError: stride must be a positive integer
+
+        :return: index of the file
+        :rtype: FileIndex
+        """
+        if stride < 1:
+            raise ValueError(f"Stride must be a positive integer: {stride}")
+        offsets, min_ts, max_ts = array('q'), array('q'), array('q')
+        message_count = 0
+        block_min, block_max = cls.EMPTY_BLOCK
+        with open(source_filepath, 'rb') as source_file:
+            file_stat = os.fstat(source_file.fileno())
+            base, pending = 0, b""  # offset of the pending bytes, which hold an incomplete message
+            while True:
+                chunk = source_file.read(chunk_size)
+                data = pending + chunk
+                end = 0
+                for match in MESSAGE_PATTERN.finditer(data):
+                    if message_count % stride == 0:
+                        if message_count > 0:
+                            min_ts.append(block_min)
+                            max_ts.append(block_max)
+                        offsets.append(base + match.start())
+                        block_min, block_max = cls.EMPTY_BLOCK
+                    message_count += 1
+                    ts_match = TS_PATTERN.search(match.group())
+                    if ts_match is not None:
+                        try:
+                            ts = utc_microseconds(ts_match.group(1).decode())
+                        except ValueError:  # reported when the message is loaded
+                            pass
+                        else:
+                            block_min, block_max = min(block_min, ts), max(block_max, ts)
+                    end = match.end()
+                if len(chunk) == 0:
+                    break
+                start = data.find(b"{", end)  # start of an incomplete message, if any
+                start = len(data) if start == -1 else start
+                base, pending = base + start, data[start:]
+        if message_count > 0:
+            min_ts.append(block_min)
+            max_ts.append(block_max)
+        return cls(stride, message_count, file_stat.st_size, file_stat.st_mtime_ns, offsets, min_ts, max_ts)
+
+    @classmethod
+    def load(cls, index_filepath: str):
+        """Read an index from a file
+
+        :param index_filepath: path to index file
+        :type index_filepath: str
+
+        :raises ValueError: not an index file
+
+        :return: index
+        :rtype: FileIndex
+        """
+        with open(index_filepath, 'rb') as index_file:
+            header = index_file.read(cls.HEADER.size)
+            if len(header) < cls.HEADER.size or not header.startswith(cls.MAGIC):
+                raise ValueError(f"Not an index file: {index_filepath}")
+            _, stride, message_count, file_size, file_mtime_ns, block_count = cls.HEADER.unpack(header)
+            arrays = []
+            for _ in range(3):  # offsets, earliest and latest timestamps
+                values = array('q')
+                values.fromfile(index_file, block_count)
+                arrays.append(values)
+        return cls(stride, message_count, file_size, file_mtime_ns, *arrays)
+
+    @classmethod
+    def open(cls, source_filepath: str, index_filepath: str = None, stride: int = DEFAULT_STRIDE):
+        """Load the index of a file, or build and save it if it is missing or stale
+
+        If the index cannot be saved (e.g. the directory is read-only), the built
+        index is only kept in memory, and it is built again the next time.
+
+        :param source_filepath: path to JSON file
+        :type source_filepath: str
+        :param index_filepath: path to index file (default is the path to the
+                               JSON file followed by SUFFIX)
+        :type index_filepath: str
+        :param stride: number of messages per block of a new index
+        :type stride: int
+
+        :return: up-to-date index of the file
+        :rtype: FileIndex
+        """
+        index_filepath = index_filepath or cls.index_filepath_of(source_filepath)
+        try:
+            index = cls.load(index_filepath)
+            if index.is_fresh(source_filepath):
+                return index
+        except (OSError, ValueError):  # missing or damaged index file
+            pass
+        index = cls.build(source_filepath, stride)
+        try:
+            index.save(index_filepath)
+        except OSError:  # kept in memory only
+            pass
+        return index
+
+    @classmethod
+    def index_filepath_of(cls, source_filepath: str) -> str:
+        """Get the default path of the index of a file
+
+        :param source_filepath: path to JSON file
+        :type source_filepath: str
+
+        :return: path to index file
+        :rtype: str
+        """
+        return source_filepath + cls.SUFFIX
+
+    def save(self, index_filepath: str) -> None:
+        """Write the index to a file
+
+        The index is written to a temporary file first, which then replaces the
+        index file, so readers never see a partially written index.
+
+        :param index_filepath: path to index file
+        :type index_filepath: str
+
+        :raises OSError: the index file cannot be written
+        """
+        temporary_filepath = f"{index_filepath}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_filepath, 'wb') as index_file:
+                index_file.write(self.HEADER.pack(self.MAGIC, self.stride, self.message_count, self.file_size,
+                                                  self.file_mtime_ns, self.block_count))
+                for values in (self.offsets, self.min_ts, self.max_ts):
+                    values.tofile(index_file)
+            os.replace(temporary_filepath, index_filepath)
+        except OSError:  # e.g. the disk is full, so no partial temporary file is left behind
+            if os.path.exists(temporary_filepath):
+                os.remove(temporary_filepath)
+            raise
+
+    def is_fresh(self, source_filepath: str) -> bool:
+        """Indicate whether the index matches the current size and modification time of a file
+
+        :param source_filepath: path to JSON file
+        :type source_filepath: str
+
+        :return: true if the index is up to date
+        :rtype: bool
+        """
+        file_stat = os.stat(source_filepath)
+        return file_stat.st_size == self.file_size and file_stat.st_mtime_ns == self.file_mtime_ns
+
+    def block_of(self, message_number: int) -> int:
+        """Get the block which holds a message
+
+        :param message_number: number of the message (starting at 0)
+        :type message_number: int
+
+        :raises IndexError: there is no such message
+
+        :return: number of the block (starting at 0)
+        :rtype: int
+        """
+        if not 0 <= message_number < self.message_count:
+            raise IndexError(f"Message {message_number} is out of range (0-{self.message_count - 1})")
+        return message_number // self.stride
+
+    def segments(self, ts_from: str = None, ts_to: str = None, lower: int = 0, upper: int = None) -> list:
+        """Get the byte ranges of the blocks which may hold timestamps of a range
+
+        Adjacent blocks are merged into a single byte range. Only the parts of the
+        blocks within the byte range [lower, upper) are returned.
+
+        :param ts_from: earliest timestamp (with timezone), or None
+        :type ts_from: str
+        :param ts_to: latest timestamp (with timezone), or None
+        :type ts_to: str
+        :param lower: start of the byte range to which the blocks are limited
+        :type lower: int
+        :param upper: end of the byte range to which the blocks are limited
+                      (default is the file size)
+        :type upper: int
+
+        :raises ValueError: improperly formatted timestamp
+
+        :return: byte ranges (start, end) in the order of the file
+        :rtype: list
+        """
+        low = utc_microseconds(ts_from) if ts_from is not None else -2 ** 63
+        high = utc_microseconds(ts_to) if ts_to is not None else 2 ** 63 - 1
+        upper = self.file_size if upper is None else upper
+        segments = []
+        for block in range(self.block_count):
+            if self.min_ts[block] > high or self.max_ts[block] < low:
+                continue
+            start = max(self.offsets[block], lower)
+            end = min(self.offsets[block + 1] if block + 1 < self.block_count else self.file_size, upper)
+            if start >= end:
+                continue
+            if len(segments) > 0 and segments[-1][1] == start:
+                segments[-1] = (segments[-1][0], end)
+            else:
+                segments.append((start, end))
+        return segments
+
+    def partitions(self, count: int) -> list:
+        """Split the file into byte ranges of (roughly) equal numbers of messages
+
+        Byte ranges start at the first message of a block, so every message is
+        part of exactly one of them. There are fewer byte ranges than requested
+        if there are fewer blocks.
+
+        :param count: number of byte ranges
+        :type count: int
+
+        :raises ValueError: number of byte ranges must be a positive integer
+
+        :return: byte ranges (start, end) in the order of the file
+        :rtype: list
+        """
+        if count < 1:
+            raise ValueError(f"Number of partitions must be a positive integer: {count}")
+        if self.block_count == 0:
+            return [(0, self.file_size)]
+        starts = sorted({self.offsets[block * self.block_count // count] for block in range(count)})
+        starts[0] = 0  # the first byte range holds the beginning of the file as well
+        return list(zip(starts, starts[1:] + [self.file_size]))
+
+    def __repr__(self) -> str:
+        return f"FileIndex({self.message_count} messages, stride={self.stride})"
@@ -0,0 +1,163 @@
+import time
+
+
+class AdaptiveBatchSize:
+    """Batch size which adapts to the latency of the data sink (AIMD)
+
+    After every batch is dumped, the size of the next batch is adjusted with
+    respect to the measured dump latency. While the latency does not exceed the
+    target latency, the batch size increases additively by a fixed step. As soon
+    as it exceeds the target, the batch size decreases multiplicatively. Thus,
+    the batch size converges to the largest size which the data sink can
+    currently dump within the target latency, and backs off quickly when the
+    data sink slows down.
+
+    Attributes:
+        batch_size(int): size of the next batch
+        target_latency(float): target dump latency, in seconds
+        minimum(int): smallest allowed batch size
+        maximum(int): largest allowed batch size
+        increase(int): step of additive increase
+        decrease(float): factor of multiplicative decrease, in the range (0, 1)
+
+    Methods:
+        update(latency): adjust the batch size to the latency of the last dump
+    """
+
+    def __init__(self, batch_size: int, target_latency: float, minimum: int = 1,
+                 maximum: int = 100000, increase: int = None, decrease: float = 0.5) -> None:
+        """Construct adaptive batch size
+
+        :param batch_size: initial batch size
+        :type batch_size: int
+        :param target_latency: target dump latency, in seconds
+        :type target_latency: float
+        :param minimum: smallest allowed batch size
+        :type minimum: int
+        :param maximum: largest allowed batch size
+        :type maximum: int
+        :param increase: step of additive increase (default is a quarter of the
+                         initial batch size)
+        :type increase: int
+        :param decrease: factor of multiplicative decrease, in the range (0, 1)
+        :type decrease: float
+
+        :raises ValueError: invalid target latency, bounds or decrease factor
+        """
+        if target_latency <= 0:
+            raise ValueError(f"Target latency must be positive: {target_latency}")
+        if not 1 <= minimum <= maximum:
+            raise ValueError(f"Invalid batch size bounds: [{minimum}, {maximum}]")
+        if not 0 < decrease < 1:
+            raise ValueError(f"Decrease factor must be in the range (0, 1): {decrease}")
+        self.batch_size = min(max(batch_size, minimum), maximum)
+        self.target_latency = target_latency
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase if increase is not None else max(1, batch_size // 4)
+        self.decrease = decrease
+
+    def update(self, latency: float) -> int:
+        """Adjust the batch size to the latency of the last dump
+
+        :param latency: latency of the last dump, in seconds
+        :type latency: float
+
+        :return: size of the next batch
+        :rtype: int
+        """
+        if latency > self.target_latency:
+            self.batch_size = max(self.minimum, int(self.batch_size * self.decrease))
+        else:
+            self.batch_size = min(self.maximum, self.batch_size + self.increase)
+        return self.batch_size
+
+
+class TokenBucket:
+    """Rate limiter which caps the number of messages per second
+
+    The bucket holds up to 'capacity' tokens and is refilled with 'rate' tokens
+    per second. Every dumped message takes one token. If there are not enough
+    tokens in the bucket, the caller sleeps until the bucket is refilled, so the
+    average rate never exceeds the cap, while short bursts up to the capacity
+    are allowed. Batches larger than the capacity are let through after waiting
+    for the whole deficit, which empties the bucket.
+
+    Attributes:
+        rate(float): number of tokens added per second
+        capacity(float): largest number of tokens in the bucket
+        tokens(float): number of tokens currently in the bucket
+        clock(Callable): monotonic clock, in seconds
+        sleep(Callable): function which suspends the caller, in seconds
+        _last_refill(float): time of the last refill
+
+    Methods:
+        acquire(count): take tokens from the bucket, waiting for them if required
+        reserve(count): take tokens from the bucket without waiting for them
+        _refill(): add tokens for the time elapsed since the last refill
+    """
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        """Construct token bucket
+
+        :param rate: number of tokens added per second
+        :type rate: float
+        :param capacity: largest number of tokens in the bucket (default is the
+                         rate, i.e. a burst of up to one second)
+        :type capacity: float
+
+        :raises ValueError: rate and capacity must be positive
+        """
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive: {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        if self.capacity <= 0:
+            raise ValueError(f"Capacity must be positive: {self.capacity}")
+        self.tokens = self.capacity
+        self.clock = time.monotonic
+        self.sleep = time.sleep
+        self._last_refill = self.clock()
+
+    def acquire(self, count: float = 1) -> float:
+        """Take tokens from the bucket, waiting for them if required
+
+        :param count: number of tokens
+        :type count: float
+
+        :return: time spent waiting, in seconds
+        :rtype: float
+        """
+        self._refill()
+        wait = 0.0
+        if self.tokens < count:
+            wait = (count - self.tokens) / self.rate
+            self.sleep(wait)
+            self._refill()
+            self.tokens = max(self.tokens, count)  # deficit is covered even beyond the capacity
+        self.tokens -= count
+        return wait
+
+    def reserve(self, count: float = 1) -> float:
+        """Take tokens from the bucket without waiting for them
+
+        The tokens are taken right away, even if the bucket runs into a deficit,
+        and the caller is told how long to wait before using them. Thus, callers
+        which must not block (e.g. coroutines, see ETL.run_async()) may wait in
+        their own way, and concurrent callers queue up behind each other.
+
+        :param count: number of tokens
+        :type count: float
+
+        :return: time to wait before using the tokens, in seconds
+        :rtype: float
+        """
+        self._refill()
+        self.tokens -= count
+        return max(0.0, -self.tokens / self.rate)
+
+    def _refill(self) -> None:
+        """Add tokens for the time elapsed since the last refill"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
@@ -0,0 +1,122 @@
+import json
+from importlib import import_module
+
+
+class JSONBackend:
+    """JSON decoder backend
+
+    Wraps the decoding function of a JSON library with a common interface. Next
+    to decoding a single JSON text, a backend decodes a batch of JSON texts with
+    a single call to the library, by joining them into one JSON array. Thus, the
+    overhead of calling into the library is paid once per batch instead of once
+    per message. If the joined array cannot be decoded, e.g. because one of the
+    texts is invalid, the error is raised and the caller may fall back to
+    decoding the texts one by one.
+
+    Attributes:
+        name(str): name of the backend
+        decode_error(type): exception raised on invalid JSON text
+        _loads(Callable): decoding function of the JSON library
+
+    Methods:
+        loads(text): decode a single JSON text
+        loads_batch(texts): decode many JSON texts with a single call
+    """
+
+    def __init__(self, name: str, loads, decode_error: type) -> None:
+        """Construct JSON backend
+
+        :param name: name of the backend
+        :type name: str
+        :param loads: decoding function of the JSON library
+        :type loads: Callable
+        :param decode_error: exception raised on invalid JSON text
+        :type decode_error: type
+        """
+        self.name = name
+        self.decode_error = decode_error
+        self._loads = loads
+
+    def loads(self, text: str):
+        """Decode a single JSON text
+
+        :param text: JSON text
+        :type text: str
+
+        :raises decode_error: invalid JSON text
+
+        :return: decoded value
+        :rtype: Any
+        """
+        return self._loads(text)
+
+    def loads_batch(self, texts: list) -> list:
+        """Decode many JSON texts with a single call
+
+        :param texts: JSON texts
+        :type texts: list
+
+        :raises decode_error: any of the JSON texts is invalid
+
+        :return: decoded values, in the same order as the texts
+        :rtype: list
+        """
+        if len(texts) == 0:
+            return []
+        return self._loads("[" + ",".join(texts) + "]")
+
+    def __repr__(self) -> str:
+        return f"JSONBackend({self.name!r})"
+
+
+# backend names mapped to their module and exception raised on invalid JSON text
+BACKENDS = {
+    "orjson": ("orjson", "JSONDecodeError"),
+    "simdjson": ("simdjson", None),  # pysimdjson raises ValueError
+    "json": ("json", "JSONDecodeError"),
+}
+BACKEND_PREFERENCE = ("orjson", "simdjson", "json")  # fastest first
+_backends = {}  # cache of created backends
+
+
+def get_backend(name: str = "auto") -> JSONBackend:
+    """Get a JSON backend by name
+
+    With "auto", the fastest installed backend is picked (see BACKEND_PREFERENCE);
+    the standard library's 'json' is always available.
+
+    :param name: name of the backend, or "auto"
+    :type name: str
+
+    :raises ValueError: unknown backend
+    :raises ModuleNotFoundError: the backend's library is not installed
+
+    :return: JSON backend
+    :rtype: JSONBackend
+    """
+    if name == "auto":
+        return get_backend(available_backends()[0])
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend '{name}', expected one of: auto, {', '.join(BACKENDS)}")
+    if name not in _backends:
+        module_name, decode_error_name = BACKENDS[name]
+        module = json if module_name == "json" else import_module(module_name)
+        decode_error = getattr(module, decode_error_name) if decode_error_name is not None else ValueError
+        _backends[name] = JSONBackend(name, module.loads, decode_error)
+    return _backends[name]
+
+
+def available_backends() -> list:
+    """List the names of installed JSON backends, fastest first
+
+    :return: names of installed backends
+    :rtype: list
+    """
+    available = []
+    for name in BACKEND_PREFERENCE:
+        try:
+            get_backend(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
@@ -0,0 +1,331 @@
+import re
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+from src.timestamps import EPOCH, utc_microseconds
+
+# flat JSON objects hold their fields at the top level, so the first match is the field itself;
+# strings with escape sequences are not matched (a prefilter then accepts the message)
+KEY_FIELD_PATTERN = re.compile(r'"key"\s*:\s*"([^"\\]*)"')
+TS_FIELD_PATTERN = re.compile(r'"ts"\s*:\s*"([^"\\]*)"')
+# largest UTC offset of any timezone, by which local and UTC timestamps differ at most
+MAX_TZ_OFFSET = timedelta(hours=14)
+
+
+class Predicate(ABC):
+    """Interface for conditions which select messages
+
+    A predicate may be pushed down into a data source (see DataSource.where()),
+    which then only extracts the selected messages and applies the predicate as
+    early and as cheaply as it can, instead of having every message decoded and
+    filtered afterwards:
+        * prefilter(text) decides on the text of a message before it is decoded.
+          It may accept messages which are not selected (e.g. if the text cannot
+          be checked cheaply), but never rejects selected ones.
+        * matches(message) decides exactly on a decoded message.
+        * to_sql(columns) translates the predicate into an SQL condition.
+    Predicates are combined with '&' (see AllOf).
+
+    Methods:
+        matches(message): indicate whether a message is selected
+        prefilter(text): indicate whether the text of a message may be selected
+        to_sql(columns): translate the predicate into an SQL condition
+        __and__(other): combine two predicates into their conjunction
+    """
+
+    @abstractmethod
+    def matches(self, message: dict) -> bool:
+        """Indicate whether a message is selected
+
+        :param message: body of the message
+        :type message: dict
+
+        :return: true if the message is selected
+        :rtype: bool
+        """
+        pass
+
+    def prefilter(self, text: str) -> bool:
+        """Indicate whether the text of a message may be selected, without decoding it
+
+        By default, every message is accepted.
+
+        :param text: JSON text of the message
+        :type text: str
+
+        :return: false if the message is certainly not selected
+        :rtype: bool
+        """
+        return True
+
+    @abstractmethod
+    def to_sql(self, columns: dict) -> tuple:
+        """Translate the predicate into an SQL condition
+
+        :param columns: SQL expressions of the message fields - "key", "ts" (local
+                        timestamp) and "utc_ts" (UTC timestamp)
+        :type columns: dict
+
+        :return: SQL condition and its parameters
+        :rtype: tuple
+        """
+        pass
+
+    def __and__(self, other):
+        """Combine two predicates into their conjunction
+
+        :param other: other predicate
+        :type other: Predicate
+
+        :return: predicate which selects messages selected by both
+        :rtype: AllOf
+        """
+        if not isinstance(other, Predicate):
+            return NotImplemented
+        return AllOf(self, other)
+
+
+class KeyIn(Predicate):
+    """Predicate which selects messages with any of the given keys
+
+    Attributes:
+        keys(frozenset): selected message keys
+
+    Methods:
+        matches(message): (see Predicate)
+        prefilter(text): (see Predicate)
+        to_sql(columns): (see Predicate)
+    """
+
+    def __init__(self, keys) -> None:
+        """Construct key predicate
+
+        :param keys: selected message keys
+        :type keys: Iterable[str]
+
+        :raises ValueError: at least one key must be selected
+        """
+        self.keys = frozenset(keys)
+        if len(self.keys) == 0:
+            raise ValueError("At least one key must be selected")
+
+    def matches(self, message: dict) -> bool:
+        """Indicate whether the key of a message is selected
+
+        :param message: body of the message
+        :type message: dict
+
+        :return: true if the message is selected
+        :rtype: bool
+        """
+        return message["key"] in self.keys
+
+    def prefilter(self, text: str) -> bool:
+        """Look the key of a message up, without decoding the message
+
+        :param text: JSON text of the message
+        :type text: str
+
+        :return: false if the message is certainly not selected
+        :rtype: bool
+        """
+        match = KEY_FIELD_PATTERN.search(text)
+        return match is None or match.group(1) in self.keys
+
+    def to_sql(self, columns: dict) -> tuple:
+        """Translate the predicate into an SQL condition on the key column
+
+        :param columns: SQL expressions of the message fields
+        :type columns: dict
+
+        :return: SQL condition and its parameters
+        :rtype: tuple
+        """
+        return f"{columns['key']} = ANY(%s)", [sorted(self.keys)]
+
+    def __repr__(self) -> str:
+        return f"KeyIn({sorted(self.keys)})"
+
+
+class TsBetween(Predicate):
+    """Predicate which selects messages within an inclusive timestamp range
+
+    Timestamps are compared as points in time, i.e. regardless of their timezone.
+    Either bound may be omitted.
+
+    Attributes:
+        ts_from(str): earliest timestamp (with timezone), or None
+        ts_to(str): latest timestamp (with timezone), or None
+        bounds(tuple): earliest and latest timestamp, in microseconds since the epoch
+
+    Methods:
+        matches(message): (see Predicate)
+        prefilter(text): (see Predicate)
+        to_sql(columns): (see Predicate)
+    """
+
+    def __init__(self, ts_from: str = None, ts_to: str = None) -> None:
+        """Construct timestamp predicate
+
+        :param ts_from: earliest timestamp (with timezone), or None
+        :type ts_from: str
+        :param ts_to: latest timestamp (with timezone), or None
+        :type ts_to: str
+
+        :raises ValueError: improperly formatted timestamp
+        """
+        self.ts_from = ts_from
+        self.ts_to = ts_to
+        self.bounds = (utc_microseconds(ts_from) if ts_from is not None else -2 ** 63,
+                       utc_microseconds(ts_to) if ts_to is not None else 2 ** 63 - 1)
+
+    def matches(self, message: dict) -> bool:
+        """Indicate whether the timestamp of a message is within the range
+
+        :param message: body of the message
+        :type message: dict
+
+        :raises ValueError: improperly formatted timestamp
+
+        :return: true if the message is selected
+        :rtype: bool
+        """
+        return self.bounds[0] <= utc_microseconds(message["ts"]) <= self.bounds[1]
+
+    def prefilter(self, text: str) -> bool:
+        """Compare the timestamp of a message with the range, without decoding the message
+
+        :param text: JSON text of the message
+        :type text: str
+
+        :return: false if the message is certainly not selected
+        :rtype: bool
+        """
+        match = TS_FIELD_PATTERN.search(text)
+        if match is None:
+            return True
+        try:
+            return self.bounds[0] <= utc_microseconds(match.group(1)) <= self.bounds[1]
+        except ValueError:  # reported when the message is decoded
+            return True
+
+    def to_sql(self, columns: dict) -> tuple:
+        """Translate the predicate into SQL conditions on the timestamp column
+
+        The UTC timestamp is computed per row, so the local timestamp column is
+        also limited to the range widened by the largest UTC offset, which lets
+        the database use an index on it.
+
+        :param columns: SQL expressions of the message fields
+        :type columns: dict
+
+        :return: SQL condition and its parameters
+        :rtype: tuple
+        """
+        conditions, parameters = [], []
+        if self.ts_from is not None:
+            ts_from = EPOCH + timedelta(microseconds=self.bounds[0])
+            conditions += [f"{columns['ts']} >= %s", f"{columns['utc_ts']} >= %s"]
+            parameters += [ts_from - MAX_TZ_OFFSET, ts_from]
+        if self.ts_to is not None:
+            ts_to = EPOCH + timedelta(microseconds=self.bounds[1])
+            conditions += [f"{columns['ts']} <= %s", f"{columns['utc_ts']} <= %s"]
+            parameters += [ts_to + MAX_TZ_OFFSET, ts_to]
+        return (" AND ".join(conditions) or "TRUE"), parameters
+
+    def __repr__(self) -> str:
+        return f"TsBetween({self.ts_from!r}, {self.ts_to!r})"
+
+
+class AllOf(Predicate):
+    """Predicate which selects messages selected by all of the given predicates
+
+    Attributes:
+        predicates(tuple): combined predicates
+
+    Methods:
+        matches(message): (see Predicate)
+        prefilter(text): (see Predicate)
+        to_sql(columns): (see Predicate)
+    """
+
+    def __init__(self, *predicates: Predicate) -> None:
+        """Construct conjunction of predicates
+
+        Nested conjunctions are flattened.
+
+        :param predicates: combined predicates
+        :type predicates: tuple
+        """
+        flattened = []
+        for predicate in predicates:
+            flattened.extend(predicate.predicates if isinstance(predicate, AllOf) else (predicate,))
+        self.predicates = tuple(flattened)
+
+    def matches(self, message: dict) -> bool:
+        """Indicate whether a message is selected by all predicates
+
+        :param message: body of the message
+        :type message: dict
+
+        :return: true if the message is selected
+        :rtype: bool
+        """
+        return all(predicate.matches(message) for predicate in self.predicates)
+
+    def prefilter(self, text: str) -> bool:
+        """Indicate whether the text of a message may be selected by all predicates
+
+        :param text: JSON text of the message
+        :type text: str
+
+        :return: false if the message is certainly not selected
+        :rtype: bool
+        """
+        return all(predicate.prefilter(text) for predicate in self.predicates)
+
+    def to_sql(self, columns: dict) -> tuple:
+        """Translate the predicates into a conjunction of SQL conditions
+
+        :param columns: SQL expressions of the message fields
+        :type columns: dict
+
+        :return: SQL condition and its parameters
+        :rtype: tuple
+        """
+        conditions, parameters = [], []
+        for predicate in self.predicates:
+            condition, condition_parameters = predicate.to_sql(columns)
+            conditions.append(f"({condition})")
+            parameters.extend(condition_parameters)
+        return (" AND ".join(conditions) or "TRUE"), parameters
+
+    def __repr__(self) -> str:
+        return " & ".join(repr(predicate) for predicate in self.predicates) or "AllOf()"
+
+
+def build_predicate(keys=None, ts_from: str = None, ts_to: str = None) -> Predicate:
+    """Build the predicate which selects messages by key and/or timestamp
+
+    This is the form in which predicates are configured (see the CLI).
+
+    :param keys: selected message keys, or None for any key
+    :type keys: Iterable[str]
+    :param ts_from: earliest timestamp (with timezone), or None
+    :type ts_from: str
+    :param ts_to: latest timestamp (with timezone), or None
+    :type ts_to: str
+
+    :raises ValueError: no conditions, no keys or improperly formatted timestamp
+
+    :return: predicate, or conjunction of predicates
+    :rtype: Predicate
+    """
+    predicates = []
+    if keys is not None:
+        predicates.append(KeyIn([keys] if isinstance(keys, str) else keys))
+    if ts_from is not None or ts_to is not None:
+        predicates.append(TsBetween(ts_from, ts_to))
+    if len(predicates) == 0:
+        raise ValueError("A predicate requires keys and/or a timestamp range")
+    return predicates[0] if len(predicates) == 1 else AllOf(*predicates)
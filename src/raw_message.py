@@ -0,0 +1,62 @@
+import json
+from collections.abc import Mapping
+
+
+class RawMessage(Mapping):
+    """Message which keeps its original JSON text and decodes its fields lazily
+
+    Data sources may hand over raw messages instead of dictionaries, so jobs
+    which only copy messages (e.g. re-chunking, splitting or archiving) do not
+    pay for decoding and re-encoding every message. Data sinks which consume raw
+    messages write the original text through untouched (see 'raw'), while all
+    other data sinks may use a raw message as an ordinary read-only mapping: its
+    fields are decoded from the original text on first access only.
+
+    Attributes:
+        raw(str): original JSON text of the message
+        _fields(dict): decoded fields of the message, or None if not decoded yet
+
+    Properties:
+        fields(dict): decoded fields of the message
+
+    Methods:
+        __getitem__(key): get the value of a decoded field
+        __iter__(): iterate over the names of the decoded fields
+        __len__(): number of decoded fields
+    """
+
+    __slots__ = ("raw", "_fields")
+
+    def __init__(self, raw: str) -> None:
+        """Construct raw message
+
+        :param raw: original JSON text of the message
+        :type raw: str
+        """
+        self.raw = raw
+        self._fields = None
+
+    @property
+    def fields(self) -> dict:
+        """Decoded fields of the message
+
+        :raises json.JSONDecodeError: original text is not a valid JSON object
+        """
+        if self._fields is None:
+            self._fields = json.loads(self.raw)
+        return self._fields
+
+    def __getitem__(self, key: str):
+        """Get the value of a decoded field"""
+        return self.fields[key]
+
+    def __iter__(self):
+        """Iterate over the names of the decoded fields"""
+        return iter(self.fields)
+
+    def __len__(self) -> int:
+        """Number of decoded fields"""
+        return len(self.fields)
+
+    def __repr__(self) -> str:
+        return f"RawMessage({self.raw!r})"
@@ -0,0 +1,131 @@
+from importlib import import_module
+
+
+class Registry:
+    """Registry of components (data sources or data sinks) by name
+
+    Components are registered by the import path of their class, in the format
+    `<module>:<class name>`, and are only imported when they are first looked
+    up. Thus, heavy dependencies of a component (e.g. a database driver) are
+    only imported when that component is actually used. Already imported
+    classes may be registered as well.
+
+    Components of other packages may be registered via entry points of the
+    registry's entry point group, e.g. in a 'pyproject.toml':
+        `[project.entry-points."adastra_etl.sinks"]`
+        `kafka = "my_package.sinks:KafkaDataSink"`
+    Entry points are discovered on the first lookup of an unknown name and
+    never override explicitly registered components.
+
+    Attributes:
+        entry_point_group(str): name of the entry point group, or None
+        _components(dict): names mapped to import paths or imported classes
+        _entry_points_loaded(bool): true if entry points have been discovered
+
+    Methods:
+        register(name, component): register a component by name
+        get(name): look up and import a component by name
+        names(): list names of all registered components
+        _load_entry_points(): register all components of the entry point group
+
+    Static methods:
+        _import_component(import_path): import a class by its import path
+    """
+
+    def __init__(self, entry_point_group: str = None, components: dict = None) -> None:
+        """Construct registry
+
+        :param entry_point_group: name of the entry point group
+        :type entry_point_group: str
+        :param components: names mapped to import paths or classes
+        :type components: dict
+        """
+        self.entry_point_group = entry_point_group
+        self._components = dict(components) if components is not None else {}
+        self._entry_points_loaded = entry_point_group is None
+
+    def register(self, name: str, component) -> None:
+        """Register a component by name
+
+        :param name: name of the component
+        :type name: str
+        :param component: import path (`<module>:<class name>`) or class
+        :type component: str|type
+        """
+        self._components[name] = component
+
+    def get(self, name: str) -> type:
+        """Look up and import a component by name
+
+        :param name: name of the component
+        :type name: str
+
+        :raises KeyError: unknown component name
+
+        :return: class of the component
+        :rtype: type
+        """
+        if name not in self._components and not self._entry_points_loaded:
+            self._load_entry_points()
+        if name not in self._components:
+            raise KeyError(f"Unknown component '{name}', expected one of: {', '.join(self.names())}")
+        component = self._components[name]
+        if isinstance(component, str):
+            component = self._import_component(component)
+            self._components[name] = component
+        return component
+
+    def names(self) -> list:
+        """List names of all registered components
+
+        :return: sorted names of the components
+        :rtype: list
+        """
+        if not self._entry_points_loaded:
+            self._load_entry_points()
+        return sorted(self._components)
+
+    def _load_entry_points(self) -> None:
+        """Register all components of the entry point group
+
+        Entry points are registered by their import paths, so the components
+        themselves are not imported.
+        """
+        from importlib import metadata  # imported lazily, since scanning packages is slow
+
+        self._entry_points_loaded = True
+        for entry_point in metadata.entry_points(group=self.entry_point_group):
+            self._components.setdefault(entry_point.name, entry_point.value)
+
+    @staticmethod
+    def _import_component(import_path: str) -> type:
+        """Import a class by its import path
+
+        :param import_path: import path in the format `<module>:<class name>`
+        :type import_path: str
+
+        :raises ValueError: improperly formatted import path
+
+        :return: imported class
+        :rtype: type
+        """
+        module_name, separator, class_name = import_path.partition(':')
+        if not separator or not module_name or not class_name:
+            raise ValueError(f"Import path must have the format '<module>:<class name>': {import_path}")
+        return getattr(import_module(module_name), class_name)
+
+
+SOURCES = Registry("adastra_etl.sources", {
+    "simulation": "src.sources.simulation_data_source:SimulationDataSource",
+    "file": "src.sources.file_data_source:FileDataSource",
+    "postgresql": "src.sources.postgresql_data_source:PostgreSQLDataSource",
+    "ring_buffer": "src.sources.ring_buffer_data_source:RingBufferDataSource",
+})
+
+SINKS = Registry("adastra_etl.sinks", {
+    "console": "src.sinks.console_data_sink:ConsoleDataSink",
+    "file": "src.sinks.file_data_sink:FileDataSink",
+    "postgresql": "src.sinks.postgresql_data_sink:PostgreSQLDataSink",
+    "ring_buffer": "src.sinks.ring_buffer_data_sink:RingBufferDataSink",
+    "sqlite": "src.sinks.sqlite_data_sink:SQLiteDataSink",
+})
@@ -0,0 +1,94 @@
+import threading
+
+
+class ReorderBuffer:
+    """Bounded window of work which is done out of order but retired in order
+
+    Every unit of work (e.g. a batch) is stamped with a sequence number where it
+    enters the parallel stage, in the order of its arrival. Workers then do the
+    work in parallel, in any order, but each of them waits for the turn of its
+    sequence number before it makes its result visible (e.g. commits it), and
+    retires the sequence number afterwards. Thus, results are made visible
+    strictly in the order of arrival, as in the reorder buffer of an
+    out-of-order processor.
+
+    At most 'window' sequence numbers may be stamped but not yet retired, so
+    stamping waits while the window is full. The buffer is thread-safe.
+
+    Attributes:
+        window(int): largest number of stamped sequence numbers which are not retired
+        _next_sequence(int): sequence number of the next unit of work
+        _retired_sequence(int): number of retired sequence numbers, which is the
+                                sequence number whose turn it is
+        _condition(threading.Condition): condition which guards the buffer
+
+    Properties:
+        pending(int): number of stamped sequence numbers which are not retired
+
+    Methods:
+        stamp(): get the sequence number of the next unit of work
+        wait(sequence): wait for the turn of a sequence number
+        retire(sequence): wait for the turn of a sequence number and pass it on
+    """
+
+    def __init__(self, window: int) -> None:
+        """Construct reorder buffer
+
+        :param window: largest number of stamped sequence numbers which are not retired
+        :type window: int
+
+        :raises ValueError: window must be a positive integer
+        """
+        if window < 1:
+            raise ValueError(f"Window must be a positive integer: {window}")
+        self.window = window
+        self._next_sequence = 0
+        self._retired_sequence = 0
+        self._condition = threading.Condition()
+
+    @property
+    def pending(self) -> int:
+        """Number of stamped sequence numbers which are not retired"""
+        with self._condition:
+            return self._next_sequence - self._retired_sequence
+
+    def stamp(self) -> int:
+        """Get the sequence number of the next unit of work, waiting while the window is full
+
+        :return: sequence number
+        :rtype: int
+        """
+        with self._condition:
+            while self._next_sequence - self._retired_sequence >= self.window:
+                self._condition.wait()
+            sequence = self._next_sequence
+            self._next_sequence += 1
+            return sequence
+
+    def wait(self, sequence: int) -> None:
+        """Wait for the turn of a sequence number, i.e. until all earlier ones are retired
+
+        :param sequence: sequence number
+        :type sequence: int
+        """
+        with self._condition:
+            while self._retired_sequence < sequence:
+                self._condition.wait()
+
+    def retire(self, sequence: int) -> None:
+        """Wait for the turn of a sequence number and pass the turn on to the next one
+
+        Every stamped sequence number must be retired exactly once, even if its
+        work failed, since later ones wait for it.
+
+        :param sequence: sequence number
+        :type sequence: int
+        """
+        with self._condition:
+            while self._retired_sequence < sequence:
+                self._condition.wait()
+            self._retired_sequence = sequence + 1
+            self._condition.notify_all()
+
+    def __repr__(self) -> str:
+        return f"ReorderBuffer(window={self.window})"
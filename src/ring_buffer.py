@@ -0,0 +1,327 @@
+import os
+import struct
+import time
+from functools import lru_cache
+from multiprocessing import shared_memory
+
+from src.exceptions.ring_buffer_closed import RingBufferClosed
+from src.timestamps import format_tz_offset, split_timestamp, tz_offset_minutes
+
+# there are only a few distinct timezones, so their conversions are cached
+_tz_offset_minutes = lru_cache(maxsize=256)(tz_offset_minutes)
+_format_tz_offset = lru_cache(maxsize=256)(format_tz_offset)
+
+
+def _process_exited(pid: int) -> bool:
+    """Indicate whether a process has exited
+
+    An exited process which has not been waited for by its parent yet (a zombie)
+    still answers to signals, so its state is read from "/proc" where available.
+
+    :param pid: process ID
+    :type pid: int
+
+    :return: true if the process has exited, false if it runs or if it is unknown
+    :rtype: bool
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as stat:
+            return stat.read().rpartition(b")")[2].split()[0] in (b"Z", b"X")
+    except FileNotFoundError:
+        return os.path.isdir("/proc/self")  # no such process, unless there is no "/proc" at all
+    except OSError:
+        pass
+    if os.name != "posix":  # there is no signal 0 to probe the process with
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:  # the process runs as another user
+        return False
+    return False
+
+
+class SharedRingBuffer:
+    """Ring buffer of fixed-layout message records in shared memory
+
+    The ring buffer moves messages between processes without pickling them or
+    sending them through a pipe: the producer packs every message into a record
+    of fixed layout (see RECORD) directly in shared memory, and the consumer
+    unpacks the records right where they are. The buffer has a single producer
+    and a single consumer, which coordinate via two sequence counters in the
+    header of the shared memory block: the producer only advances the write
+    sequence after its records have been written, and the consumer only
+    advances the read sequence after its records have been unpacked. Either
+    side waits (with an increasing back-off) while the buffer is full or empty.
+    The producer closes the buffer after its last record, which tells the
+    consumer that no more records will arrive. The producer also records its
+    process ID (see attach_producer()), so a waiting consumer notices when the
+    producer exits without closing the buffer, instead of waiting forever.
+
+    A record holds the key (up to KEY_SIZE bytes of UTF-8), the value as a
+    double, the wall-clock part of the timestamp as text (up to TS_SIZE bytes)
+    and the timezone as its UTC offset in minutes. The timestamp text is copied
+    as it is, rather than parsed and formatted again, since converting it would
+    cost more than the whole transport; the timezone is restored as "+HH:MM".
+
+    The process which creates the ring buffer owns the shared memory block and
+    must unlink it when the pipeline is done; other processes attach to it by
+    its name. Before Python 3.13, those processes must be started from the
+    creating process via 'multiprocessing', so that they share its resource
+    tracker (which would otherwise destroy the block when they exit).
+
+    Class attributes:
+        HEADER_SIZE(int): size of the header, in bytes
+        RECORD(struct.Struct): layout of a record - key, value, timestamp and
+                               timezone offset
+        KEY_SIZE(int): largest size of an encoded key, in bytes
+        TS_SIZE(int): largest size of the timestamp text (without timezone), in bytes
+        MAX_WAIT(float): longest single wait while the buffer is full or empty,
+                         in seconds
+        LIVENESS_INTERVAL(int): number of longest waits between checks whether
+                                the producer is still running
+
+    Attributes:
+        capacity(int): number of records which fit into the buffer
+        _shared_memory(SharedMemory): shared memory block
+        _buffer(memoryview): view of the shared memory block
+
+    Properties:
+        name(str): name of the shared memory block
+        closed(bool): true if the producer has closed the buffer
+        producer_alive(bool): false if the producer has exited (true while it is unknown)
+        write_sequence(int): number of records written so far
+        read_sequence(int): number of records read so far
+
+    Methods:
+        attach_producer(): record the calling process as the producer
+        put_batch(records): write records, waiting for free space if required
+        get_batch(max_count, wait, timeout): read up to 'max_count' records, waiting for any if required
+        close(): mark the end of the records
+        release(): detach from the shared memory block
+        unlink(): destroy the shared memory block
+
+    Class methods:
+        encode_message(message): convert a message to a record
+        _wait(attempt): wait before checking the sequence counters again
+
+    Static methods:
+        decode_record(record): convert a record to the parts of a message
+    """
+
+    HEADER_SIZE = 256
+    RECORD = struct.Struct("<32sd26sh4x")
+    KEY_SIZE = 32
+    TS_SIZE = 26
+    MAX_WAIT = 0.001
+    LIVENESS_INTERVAL = 100
+
+    # offsets of the header fields, on separate cache lines
+    _WRITE_SEQUENCE_OFFSET = 0
+    _READ_SEQUENCE_OFFSET = 64
+    _CLOSED_OFFSET = 128
+    _PRODUCER_OFFSET = 136  # next to the closed flag, since both are only written by the producer
+    _CAPACITY_OFFSET = 192
+    _COUNTER = struct.Struct("<Q")
+
+    def __init__(self, capacity: int = 65536, name: str = None) -> None:
+        """Construct ring buffer
+
+        Without a name, a new shared memory block is created; otherwise, the
+        existing block of that name is attached and its capacity is used.
+
+        :param capacity: number of records which fit into the buffer
+        :type capacity: int
+        :param name: name of an existing shared memory block
+        :type name: str
+
+        :raises ValueError: capacity must be a positive integer
+        :raises FileNotFoundError: there is no shared memory block of that name
+        """
+        if name is None:
+            if capacity < 1:
+                raise ValueError(f"Capacity must be a positive integer: {capacity}")
+            self._shared_memory = shared_memory.SharedMemory(
+                create=True, size=self.HEADER_SIZE + capacity * self.RECORD.size)
+            self._buffer = self._shared_memory.buf
+            self._buffer[:self.HEADER_SIZE] = bytes(self.HEADER_SIZE)
+            self._COUNTER.pack_into(self._buffer, self._CAPACITY_OFFSET, capacity)
+        else:
+            try:  # the creator unlinks the block, so attached processes must not track it (Python 3.13+)
+                self._shared_memory = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:  # processes started via multiprocessing share the creator's tracker
+                self._shared_memory = shared_memory.SharedMemory(name=name)
+            self._buffer = self._shared_memory.buf
+        self.capacity = self._COUNTER.unpack_from(self._buffer, self._CAPACITY_OFFSET)[0]
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block"""
+        return self._shared_memory.name
+
+    @property
+    def closed(self) -> bool:
+        """True if the producer has closed the buffer"""
+        return self._COUNTER.unpack_from(self._buffer, self._CLOSED_OFFSET)[0] == 1
+
+    @property
+    def producer_alive(self) -> bool:
+        """False if the producer has exited (true while it is unknown)"""
+        pid = self._COUNTER.unpack_from(self._buffer, self._PRODUCER_OFFSET)[0]
+        return pid == 0 or not _process_exited(pid)
+
+    @property
+    def write_sequence(self) -> int:
+        """Number of records written so far"""
+        return self._COUNTER.unpack_from(self._buffer, self._WRITE_SEQUENCE_OFFSET)[0]
+
+    @property
+    def read_sequence(self) -> int:
+        """Number of records read so far"""
+        return self._COUNTER.unpack_from(self._buffer, self._READ_SEQUENCE_OFFSET)[0]
+
+    def attach_producer(self) -> None:
+        """Record the calling process as the producer, whose exit is noticed by the consumer"""
+        self._COUNTER.pack_into(self._buffer, self._PRODUCER_OFFSET, os.getpid())
+
+    def put_batch(self, records: list) -> None:
+        """Write records, waiting for free space if required
+
+        Records are published in contiguous runs, as soon as they are written.
+
+        :param records: records (see RECORD and encode_message()) - key as bytes,
+                        value, timestamp text without timezone as bytes and
+                        timezone offset in minutes
+        :type records: list
+
+        :raises RingBufferClosed: the buffer has been closed
+        """
+        if self.closed:
+            raise RingBufferClosed(self.name)
+        written, attempt = 0, 0
+        write_sequence = self.write_sequence
+        while written < len(records):
+            free = self.capacity - (write_sequence - self.read_sequence)
+            if free == 0:
+                self._wait(attempt)
+                attempt += 1
+                continue
+            attempt = 0
+            slot = write_sequence % self.capacity
+            count = min(free, len(records) - written, self.capacity - slot)  # up to the end of the buffer
+            offset = self.HEADER_SIZE + slot * self.RECORD.size
+            for record in records[written:written + count]:
+                self.RECORD.pack_into(self._buffer, offset, *record)
+                offset += self.RECORD.size
+            written += count
+            write_sequence += count
+            self._COUNTER.pack_into(self._buffer, self._WRITE_SEQUENCE_OFFSET, write_sequence)
+
+    def get_batch(self, max_count: int, wait: bool = True, timeout: float = None) -> list:
+        """Read up to 'max_count' records, waiting for any if required
+
+        While waiting, the producer is checked every LIVENESS_INTERVAL longest
+        waits, so the wait ends once it has exited without closing the buffer.
+
+        :param max_count: largest number of records
+        :type max_count: int
+        :param wait: wait while the buffer is empty (and not closed)
+        :type wait: bool
+        :param timeout: longest wait in seconds (default is to wait while the
+                        producer is running)
+        :type timeout: float
+
+        :raises RingBufferClosed: the producer has exited without closing the buffer
+        :raises TimeoutError: no record has arrived within 'timeout' seconds
+
+        :return: records (see RECORD), or an empty list if the buffer has been
+                 closed and all records have been read (or if it is empty and
+                 waiting is not allowed)
+        :rtype: list
+        """
+        attempt = 0
+        read_sequence = self.read_sequence
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            closed = self.closed  # checked before the write sequence, so no record is missed
+            available = self.write_sequence - read_sequence
+            if available > 0:
+                break
+            if closed or not wait:
+                return []
+            if attempt % self.LIVENESS_INTERVAL == self.LIVENESS_INTERVAL - 1:
+                if not self.producer_alive and self.write_sequence == read_sequence and not self.closed:
+                    raise RingBufferClosed(self.name, "Producer has exited without closing the ring buffer")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"No record has arrived in the ring buffer within {timeout} seconds")
+            self._wait(attempt)
+            attempt += 1
+        slot = read_sequence % self.capacity
+        count = min(available, max_count, self.capacity - slot)  # up to the end of the buffer
+        start = self.HEADER_SIZE + slot * self.RECORD.size
+        records = list(self.RECORD.iter_unpack(self._buffer[start:start + count * self.RECORD.size]))
+        self._COUNTER.pack_into(self._buffer, self._READ_SEQUENCE_OFFSET, read_sequence + count)
+        return records
+
+    def close(self) -> None:
+        """Mark the end of the records"""
+        self._COUNTER.pack_into(self._buffer, self._CLOSED_OFFSET, 1)
+
+    def release(self) -> None:
+        """Detach from the shared memory block"""
+        self._buffer.release()
+        self._shared_memory.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory block (by the process which created it)"""
+        self._shared_memory.unlink()
+
+    @classmethod
+    def encode_message(cls, message: dict) -> tuple:
+        """Convert a message to a record
+
+        :param message: body of the message
+        :type message: dict
+
+        :raises ValueError: key or timestamp is too long, or improperly formatted timestamp
+
+        :return: record - key as bytes, value, timestamp (without timezone) as
+                 bytes and timezone offset in minutes
+        :rtype: tuple
+        """
+        key = message["key"].encode()
+        if len(key) > cls.KEY_SIZE:
+            raise ValueError(f"Key is longer than {cls.KEY_SIZE} bytes: {message['key']}")
+        ts, tz = split_timestamp(message["ts"])
+        if len(ts) > cls.TS_SIZE:
+            raise ValueError(f"Timestamp is longer than {cls.TS_SIZE} bytes: {message['ts']}")
+        return key, float(message["value"]), ts.encode(), _tz_offset_minutes(tz)
+
+    @staticmethod
+    def decode_record(record: tuple) -> tuple:
+        """Convert a record to the key, value, timestamp and timezone of a message
+
+        :param record: record (see RECORD)
+        :type record: tuple
+
+        :return: key, value, timestamp (without timezone) and timezone
+        :rtype: tuple
+        """
+        key, value, ts, tz = record
+        return key.rstrip(b"\0").decode(), value, ts.rstrip(b"\0").decode(), _format_tz_offset(tz)
+
+    @classmethod
+    def _wait(cls, attempt: int) -> None:
+        """Wait before checking the sequence counters again
+
+        The first attempts only yield the processor, later ones sleep for up to
+        MAX_WAIT seconds.
+
+        :param attempt: number of unsuccessful attempts so far
+        :type attempt: int
+        """
+        time.sleep(min(cls.MAX_WAIT, attempt * 0.00001))
+
+    def __repr__(self) -> str:
+        return f"SharedRingBuffer(capacity={self.capacity}, name={self.name!r})"
@@ -0,0 +1,229 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+
+from src.sinks.data_sink import DataSink
+
+
+class AsyncDataSink(ABC):
+    """Interface for container where data can be dumped asynchronously
+
+    The asynchronous counterpart of 'DataSink': every operation is awaitable,
+    so many pipelines may share a single event loop (see ETL.run_async()).
+    Batches may be dumped concurrently, up to the number of batches in flight
+    allowed by the ETL; sinks which cannot handle that must serialize them.
+
+    Properties:
+        stats(dict): counters of the data sink, reported in the statistics of an
+                     ETL run (empty by default)
+
+    Methods:
+        __aenter__(): asynchronous context manager entrance; ensure proper sink initialization
+        __aexit__(): asynchronous context manager exit; ensure proper sink termination
+        initialize(): prepare the data sink for the incoming data dumps
+        dump(message): dump a single message into the sink
+        dump_batch(messages): dump a sequence of messages into the sink
+        timed_dump_batch(messages): dump a sequence of messages and measure the latency of the sink
+        close(): clean up the sink and terminate the connection to it
+    """
+
+    @abstractmethod
+    async def __aenter__(self):
+        """Ensure proper sink initialization"""
+        pass
+
+    @abstractmethod
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper sink termination"""
+        pass
+
+    @property
+    def stats(self) -> dict:
+        """Counters of the data sink (empty by default)"""
+        return {}
+
+    @abstractmethod
+    async def initialize(self) -> None:
+        """Prepare the data sink for the incoming data dumps"""
+        pass
+
+    @abstractmethod
+    async def dump(self, message: dict) -> bool:
+        """Dump a single message into the sink
+
+        :param message: body of the message
+        :type message: dict
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        pass
+
+    async def dump_batch(self, messages: list) -> bool:
+        """Dump a sequence of messages into the sink
+
+        By default, messages are dumped on a one by one basis (see
+        DataSink.dump_batch()).
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :return: status which indicates whether all dumps were successful
+        :rtype: bool
+        """
+        success = True
+        for message in messages:
+            success = await self.dump(message) and success
+        return success
+
+    async def timed_dump_batch(self, messages: list) -> float:
+        """Dump a sequence of messages into the sink and measure the latency of the sink
+
+        By default, the latency is the time until dump_batch() returns. Sinks
+        which queue concurrent dumps should not count the time a dump waits in
+        line, since the batch size is adapted to the latency (see ETL.run_async()).
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :return: latency of the dump in seconds
+        :rtype: float
+        """
+        started = time.perf_counter()
+        await self.dump_batch(messages)
+        return time.perf_counter() - started
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Clean up the sink and terminate the connection to it"""
+        pass
+
+
+class ThreadedDataSink(AsyncDataSink):
+    """Asynchronous adapter of a synchronous data sink
+
+    Every blocking call to the wrapped data sink is run in a thread pool, so
+    the event loop is never blocked. The calls are serialized in the order they
+    were made, since synchronous data sinks are not meant to be used from several
+    threads at once.
+
+    Attributes:
+        data_sink(DataSink): wrapped synchronous data sink
+        executor(Executor): thread pool which runs the blocking calls, or None
+                            for the default executor of the event loop
+        _lock(asyncio.Lock): lock which serializes the blocking calls
+
+    Properties:
+        stats(dict): statistics of the wrapped data sink
+
+    Methods:
+        __aenter__(): (see AsyncDataSink)
+        __aexit__(): (see AsyncDataSink)
+        initialize(): (see AsyncDataSink)
+        dump(message): (see AsyncDataSink)
+        dump_batch(messages): dump a sequence of messages with a single blocking call
+        timed_dump_batch(messages): dump a sequence of messages and measure the blocking call only
+        close(): (see AsyncDataSink)
+        _call(function, *args): run a blocking call in the thread pool
+        _timed_call(function, *args): run a blocking call in the thread pool and measure it
+    """
+
+    def __init__(self, data_sink: DataSink, executor: Executor = None) -> None:
+        """Construct threaded data sink
+
+        :param data_sink: wrapped synchronous data sink
+        :type data_sink: DataSink
+        :param executor: thread pool which runs the blocking calls (default is
+                         the default executor of the event loop)
+        :type executor: Executor
+        """
+        self.data_sink = data_sink
+        self.executor = executor
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        """Ensure proper initialization of the wrapped data sink"""
+        await self._call(self.data_sink.__enter__)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of the wrapped data sink"""
+        await self._call(self.data_sink.__exit__, exc_type, exc_val, exc_tb)
+
+    @property
+    def stats(self) -> dict:
+        """Statistics of the wrapped data sink"""
+        return self.data_sink.stats
+
+    async def initialize(self) -> None:
+        """Prepare the wrapped data sink for the incoming data dumps"""
+        await self._call(self.data_sink.initialize)
+
+    async def dump(self, message: dict) -> bool:
+        """Dump a single message into the wrapped data sink
+
+        :param message: body of the message
+        :type message: dict
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        return await self._call(self.data_sink.dump, message)
+
+    async def dump_batch(self, messages: list) -> bool:
+        """Dump a sequence of messages with a single blocking call
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :return: status which indicates whether all dumps were successful
+        :rtype: bool
+        """
+        return await self._call(self.data_sink.dump_batch, messages)
+
+    async def timed_dump_batch(self, messages: list) -> float:
+        """Dump a sequence of messages and measure the blocking call only
+
+        The time spent waiting for earlier dumps to finish is not counted.
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :return: latency of the dump in seconds
+        :rtype: float
+        """
+        return (await self._timed_call(self.data_sink.dump_batch, messages))[1]
+
+    async def close(self) -> None:
+        """Clean up the wrapped data sink"""
+        await self._call(self.data_sink.close)
+
+    async def _call(self, function, *args):
+        """Run a blocking call in the thread pool
+
+        :param function: blocking function
+        :type function: Callable
+        :param args: arguments to the function
+        :type args: tuple
+
+        :return: result of the function
+        :rtype: Any
+        """
+        return (await self._timed_call(function, *args))[0]
+
+    async def _timed_call(self, function, *args) -> tuple:
+        """Run a blocking call in the thread pool and measure it, once earlier calls have finished
+
+        :param function: blocking function
+        :type function: Callable
+        :param args: arguments to the function
+        :type args: tuple
+
+        :return: result of the function and its latency in seconds
+        :rtype: tuple
+        """
+        async with self._lock:
+            started = time.perf_counter()
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+            return result, time.perf_counter() - started
@@ -0,0 +1,153 @@
+import threading
+
+from src.sinks.data_sink import DataSink
+from src.spill_buffer import SpillBuffer
+
+
+class BufferedDataSink(DataSink):
+    """Data sink which decouples the pipeline from a slower data sink
+
+    Batches are not dumped into the wrapped data sink right away, but put into
+    a spill buffer (see SpillBuffer), from which a writer thread dumps them into
+    the wrapped data sink in order. The buffer holds a bounded number of
+    messages in memory and spills any overflow to append-only segment files on
+    local disk, which are replayed once the wrapped data sink catches up. Thus,
+    a bursty source never waits for a slow sink (e.g. PostgreSQL), and memory
+    use stays bounded.
+
+    If the wrapped data sink fails, the writer discards all pending batches and
+    the error is raised by the next call to the data sink. Closing the data sink
+    waits until all pending batches have been dumped.
+
+    Attributes:
+        data_sink(DataSink): wrapped data sink
+        max_memory_messages(int): largest number of buffered messages held in memory
+        spill_directory(str): parent directory of the segment files (default is
+                              the system's temporary directory)
+        segment_size(int): size of a segment file, in bytes
+        _buffer(SpillBuffer): buffer of pending batches, or None
+        _writer_thread(threading.Thread): thread which dumps the pending batches
+        _writer_error(Exception): first error raised by the wrapped data sink
+
+    Properties:
+        stats(dict): statistics of the spill buffer
+
+    Methods:
+        __enter__(): (see DataSink)
+        __exit__(): (see DataSink)
+        initialize(): initialize the wrapped data sink and start the writer
+        dump(message): buffer a single message
+        dump_batch(messages): buffer a batch of messages
+        close(): dump all pending batches and close the wrapped data sink
+        _write_loop(): dump the pending batches until the buffer is closed
+        _raise_writer_error(): raise the first error of the wrapped data sink
+    """
+
+    def __init__(self, data_sink: DataSink, max_memory_messages: int = 100000, spill_directory: str = None,
+                 segment_size: int = 64 * 1024 * 1024) -> None:
+        """Construct buffered data sink
+
+        :param data_sink: wrapped data sink
+        :type data_sink: DataSink
+        :param max_memory_messages: largest number of buffered messages held in memory
+        :type max_memory_messages: int
+        :param spill_directory: parent directory of the segment files (default
+                                is the system's temporary directory)
+        :type spill_directory: str
+        :param segment_size: size of a segment file, in bytes
+        :type segment_size: int
+        """
+        self.data_sink = data_sink
+        self.max_memory_messages = max_memory_messages
+        self.spill_directory = spill_directory
+        self.segment_size = segment_size
+        self._buffer = None
+        self._writer_thread = None
+        self._writer_error = None
+
+    def __enter__(self):
+        """Ensure proper initialization of buffered data sink"""
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of buffered data sink"""
+        self.close()
+
+    @property
+    def stats(self) -> dict:
+        """Statistics of the spill buffer (see SpillBuffer.stats)"""
+        return self._buffer.stats if self._buffer is not None else {}
+
+    def initialize(self) -> None:
+        """Initialize the wrapped data sink and start the writer
+
+        :raises ValueError: invalid buffer limits
+        """
+        self._buffer = SpillBuffer(self.max_memory_messages, self.spill_directory, self.segment_size)
+        self.data_sink.initialize()
+        self._writer_error = None
+        self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer_thread.start()
+
+    def dump(self, message: dict) -> bool:
+        """Buffer a single message
+
+        :param message: body of the message
+        :type message: dict
+
+        :raises Exception: any error of the wrapped data sink
+
+        :return: status which indicates whether the message was buffered
+        :rtype: bool
+        """
+        return self.dump_batch([message])
+
+    def dump_batch(self, messages: list) -> bool:
+        """Buffer a batch of messages
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :raises Exception: any error of the wrapped data sink
+
+        :return: status which indicates whether the batch was buffered
+        :rtype: bool
+        """
+        self._raise_writer_error()
+        self._buffer.put(messages)
+        return True
+
+    def close(self) -> None:
+        """Dump all pending batches and close the wrapped data sink
+
+        :raises Exception: any error of the wrapped data sink
+        """
+        self._buffer.close()
+        self._writer_thread.join()
+        self._buffer.cleanup()
+        self.data_sink.close()
+        self._raise_writer_error()
+
+    def _write_loop(self) -> None:
+        """Dump the pending batches until the buffer is closed
+
+        After the wrapped data sink fails, the pending batches are discarded,
+        since the error is raised by the next call to the data sink.
+        """
+        while (messages := self._buffer.get()) is not None:
+            if self._writer_error is not None:
+                continue
+            try:
+                self.data_sink.dump_batch(messages)
+            except Exception as error:  # raised by the data sink later
+                self._writer_error = error
+
+    def _raise_writer_error(self) -> None:
+        """Raise the first error of the wrapped data sink, if there is one
+
+        :raises Exception: any error of the wrapped data sink
+        """
+        if self._writer_error is not None:
+            error, self._writer_error = self._writer_error, None
+            raise error
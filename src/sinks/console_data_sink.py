@@ -1,11 +1,19 @@
+import json
+
+from src.raw_message import RawMessage
 from src.sinks.data_sink import DataSink
 
 
 class ConsoleDataSink(DataSink):
     """Data sink which dumps its messages to the console (STDOUT)
 
+    If no output format is given, messages are passed through as JSON text:
+    raw messages (see RawMessage) are printed untouched, without decoding
+    their fields, while any other message is encoded as JSON.
+
     Attributes:
-        output_format(str): string format of the outputted message
+        output_format(str): string format of the outputted message, or None to
+                            pass messages through as JSON text
 
     Methods:
         __enter__(): (see DataSink)
@@ -15,10 +23,11 @@ class ConsoleDataSink(DataSink):
         close(): do nothing (see DataSink)
     """
 
-    def __init__(self, output_format: str) -> None:
+    def __init__(self, output_format: str = None) -> None:
         """Construct console data sink
 
-        :param output_format: string format of outputted message
+        :param output_format: string format of outputted message, or None to
+                              pass messages through as JSON text
         :type output_format: str
         """
         self.output_format = output_format
@@ -44,7 +53,8 @@ class ConsoleDataSink(DataSink):
         Message bodies must be mappings which contain the following keys:
         "key", "value" and "ts". Any other keys in the mapping are ignored.
         The outputted message is formatted with the string format which is
-        initially supplied when the data sink is created.
+        initially supplied when the data sink is created. Without an output
+        format, the message is printed as JSON text (see ConsoleDataSink).
 
         :param message: body of the message
         :type message: dict
@@ -52,9 +62,12 @@ class ConsoleDataSink(DataSink):
         :return: status which indicates whether the dump was successful
         :rtype: bool
         """
-        output = self.output_format.format(message["key"],
-                                           message["value"],
-                                           message["ts"])
+        if self.output_format is None:
+            output = message.raw if isinstance(message, RawMessage) else json.dumps(message)
+        else:
+            output = self.output_format.format(message["key"],
+                                               message["value"],
+                                               message["ts"])
         print(output)
         return True
 
@@ -4,14 +4,26 @@ from abc import ABC, abstractmethod
 class DataSink(ABC):
     """Interface for container where data can be arbitrarily dumped
 
+    Class attributes:
+        TRANSIENT_ERRORS(tuple): types of errors of the data sink which are worth
+                                 retrying, e.g. a lost connection (none by default,
+                                 see RetryingDataSink)
+
+    Properties:
+        stats(dict): counters of the data sink, reported in the statistics of an
+                     ETL run (empty by default)
+
     Methods:
         __enter__(): context manager entrance; ensure proper sink initialization
         __exit__(): context manager exit; ensure proper sink termination
         initialize(): prepare the data sink for the incoming data dumps
         dump(message): dump a single message into the sink
+        dump_batch(messages): dump a sequence of messages into the sink
         close(): clean up the sink and terminate the connection to it
     """
 
+    TRANSIENT_ERRORS = ()
+
     @abstractmethod
     def __enter__(self):
         """Ensure proper sink initialization"""
@@ -22,6 +34,11 @@ class DataSink(ABC):
         """Ensure proper sink termination"""
         pass
 
+    @property
+    def stats(self) -> dict:
+        """Counters of the data sink (empty by default)"""
+        return {}
+
     @abstractmethod
     def initialize(self) -> None:
         """Prepare the data sink for the incoming data dumps"""
@@ -39,6 +56,24 @@ class DataSink(ABC):
         """
         pass
 
+    def dump_batch(self, messages: list) -> bool:
+        """Dump a sequence of messages into the sink
+
+        By default, messages are dumped on a one by one basis. Sinks which can
+        persist many messages at once more efficiently (e.g. in a single database
+        transaction) should override this method.
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :return: status which indicates whether all dumps were successful
+        :rtype: bool
+        """
+        success = True
+        for message in messages:
+            success = self.dump(message) and success
+        return success
+
     @abstractmethod
     def close(self) -> None:
         """Clean up the sink and terminate the connection to it"""
@@ -0,0 +1,113 @@
+import json
+
+from src.raw_message import RawMessage
+from src.sinks.data_sink import DataSink
+
+
+class FileDataSink(DataSink):
+    """Data sink which dumps its messages into a newline-delimited JSON file
+
+    Every message is written as a single JSON object on its own line (NDJSON).
+    Raw messages (see RawMessage) are written through untouched, i.e. their
+    original text is neither decoded nor re-encoded, so copy-only jobs run at
+    close to disk speed - unless their text spans several lines (e.g. in a
+    pretty-printed file), in which case they are re-encoded. Any other message
+    is encoded as JSON. A batch of
+    messages is written with a single call to the file.
+
+    Attributes:
+        target_filepath(str): path to target NDJSON file
+        append(bool): append to an existing file instead of overwriting it
+        _target_file(TextIOWrapper): text stream to target NDJSON file
+
+    Properties:
+        is_open(bool): true if target file has been opened, false otherwise
+
+    Methods:
+        __enter__(): (see DataSink)
+        __exit__(): (see DataSink)
+        initialize(): open the target file in 'write' (or 'append') mode
+        dump(message): write a single message as a line of the target file
+        dump_batch(messages): write all messages as lines of the target file at once
+        close(): close the target file
+
+    Static methods:
+        _message_to_line(message): convert a message to a line of JSON text
+    """
+
+    def __init__(self, target_filepath: str, append: bool = False) -> None:
+        """Construct file data sink
+
+        :param target_filepath: path to target NDJSON file
+        :type target_filepath: str
+        :param append: append to an existing file instead of overwriting it
+        :type append: bool
+        """
+        self.target_filepath = target_filepath
+        self.append = append
+        self._target_file = None
+
+    def __enter__(self):
+        """Ensure proper initialization of file data sink"""
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of file data sink"""
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        """True if target file has been opened, false otherwise"""
+        if self._target_file is None:
+            return False
+        return not self._target_file.closed
+
+    def initialize(self) -> None:
+        """Open the target file in 'write' (or 'append') mode"""
+        self._target_file = open(self.target_filepath, 'a' if self.append else 'w', encoding="utf-8")
+
+    def dump(self, message: dict) -> bool:
+        """Write a single message as a line of the target file
+
+        :param message: body of the message
+        :type message: dict
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        self._target_file.write(self._message_to_line(message))
+        return True
+
+    def dump_batch(self, messages: list) -> bool:
+        """Write all messages as lines of the target file at once
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        self._target_file.write("".join(map(self._message_to_line, messages)))
+        return True
+
+    def close(self) -> None:
+        """Close the target file"""
+        self._target_file.close()
+
+    @staticmethod
+    def _message_to_line(message: dict) -> str:
+        """Convert a message to a line of JSON text
+
+        :param message: body of the message
+        :type message: dict
+
+        :return: original text of a single-line raw message, or JSON encoded
+                 message, followed by a newline
+        :rtype: str
+        """
+        if isinstance(message, RawMessage):
+            if "\n" not in message.raw:
+                return message.raw + "\n"
+            message = message.fields  # pretty-printed over several lines, so it is re-encoded
+        return json.dumps(message) + "\n"
@@ -1,9 +1,20 @@
+import queue
 import re
+import threading
+import zlib
+from array import array
+from datetime import date, datetime, timedelta
+from io import StringIO
 
 import psycopg2
+import psycopg2.extras
+import psycopg2.pool
 
 from src.definitions import DATABASE_ENV
+from src.encoded_batch import EncodedBatch, decode_copy_rows, encode_copy_rows
+from src.reorder_buffer import ReorderBuffer
 from src.sinks.data_sink import DataSink
+from src.timestamps import TIMESTAMP_PATTERN, split_timestamp, tz_offset_minutes
 
 
 class PostgreSQLDataSink(DataSink):
@@ -18,9 +29,103 @@ class PostgreSQLDataSink(DataSink):
     connect to PostgreSQL, the sink will attempt to connect to the default database
     and create a new database from there. Afterwards, it will relog in the new database.
 
+    Optionally, the message table is created as a table which is range-partitioned
+    on 'ts', with one partition per day or per month. Missing partitions are created
+    on the fly from the timestamps of the dumped messages, and old messages can be
+    discarded by dropping whole partitions instead of deleting rows. The bounds of
+    existing partitions are read from the catalog, so partitions which were created
+    otherwise (e.g. by hand, with other names or ranges) are respected as well.
+
+    For bulk loads, the data sink may run in staged mode. Batches of messages are
+    then streamed with COPY into an UNLOGGED staging table, which bypasses the
+    write-ahead log. At every checkpoint (and when the sink is closed) a single
+    set-based 'INSERT ... SELECT' moves all staged rows into the message table.
+    Optionally, secondary indexes of the message table are dropped before and
+    rebuilt after the merge, which is cheaper than maintaining them row by row.
+
+    Optionally, messages are stored in a compact table layout. The timezone is then
+    stored as its UTC offset in minutes ('tz_offset SMALLINT') and the key as a
+    reference ('key_id SMALLINT') into a lookup table of all known keys, which the
+    data sink caches in memory. This makes every row narrower, which speeds up
+    both loads and later scans of the message table.
+
+    Indexes for downstream queries are not maintained during the load, since that
+    would slow it down. Instead, the data sink may build them after the load, when
+    it is closed: a BRIN index on 'ts' and a B-tree index on the key and 'ts'.
+    Optionally, a B-tree index on 'ts' and 'id' is built as well, which parallel
+    exports split by 'ts' require (see PostgreSQLDataSource) - their pages are
+    ordered by both columns, which the BRIN index cannot serve.
+    Existing indexes are rebuilt if any messages were dumped, and the message
+    table is analyzed afterwards, so that the query planner has fresh statistics.
+
+    Optionally, connections are taken from a pool which is shared by all data sinks
+    of the process with the same connection parameters, so that consecutive runs do
+    not pay for connection setup. In pooled mode, batches may also be written by
+    several writer threads concurrently, each over its own connection. The order
+    in which batches become visible then depends on the chosen order (see ORDERS):
+    batches are handed over to the writers round-robin and committed in any order
+    ("none"), split by a hash of the message key, which preserves the order of
+    messages with the same key ("key"), or handed over round-robin and stamped
+    with sequence numbers, so that writers execute them in parallel but commit
+    them in the order of dumping ("global", see ReorderBuffer). Since a writer
+    holds its locks while it waits for its turn, the global order cannot be
+    combined with rollups or idempotent mode, whose writes may lock the same
+    rows. Writes are asynchronous - any error of a writer is raised by the next
+    call to the sink.
+
+    Batches which are pre-encoded by worker processes (see EncodedBatch) are
+    streamed with COPY as they are, into the staging table in staged mode or
+    directly into the message table otherwise, so the calling process neither
+    decodes messages nor parses timestamps. In the compact layout, or if batches
+    are split by key, they are converted to rows like any other batch.
+
+    Optionally, the data sink maintains rollup tables incrementally - one per
+    interval (e.g. per minute and per hour), which hold the count, sum, minimum
+    and maximum of the values per key and time bucket (the timestamp truncated
+    to the interval). Every batch is pre-aggregated in Python and applied with a
+    single 'INSERT ... ON CONFLICT DO UPDATE' per rollup table, within the same
+    transaction as its messages. Aggregates are applied in the order of their
+    key and bucket, so concurrent writers cannot deadlock. In staged mode, the
+    staged rows are aggregated by the database at every checkpoint instead.
+    Dashboards then query thousands of rollup rows instead of the raw messages.
+
+    Optionally, the data sink runs in idempotent mode, in which the natural key
+    of a message - its key, timestamp and timezone - is unique in the message
+    table. Messages which are already stored are skipped ('ON CONFLICT DO
+    NOTHING'), whether batches are inserted directly, streamed with COPY via a
+    temporary table, or merged from the staging table. Thus, a retried or resumed
+    load does not duplicate any messages, and the number of skipped duplicates is
+    reported via 'stats'. Rollup tables only count the messages which were stored.
+
     Class attributes:
         MESSAGE_TABLE_NAME(str): name of database table where messages are dumped
         TIMESTAMP_PATTERN(re.Match): compiled regex object for timestamps with timezone info
+        PARTITION_INTERVALS(tuple): supported intervals of message table partitions
+        PARTITION_BOUND_PATTERN(re.Pattern): compiled regex object for the bounds of a
+                                             range partition (see pg_get_expr())
+        ORDERS(tuple): supported orders in which batches of concurrent writers are committed
+        TRANSIENT_ERRORS(tuple): types of errors which are worth retrying - lost connections
+                                 and other operational errors (see RetryingDataSink)
+        STAGING_TABLE_NAME(str): name of unlogged table where messages are staged
+        KEY_TABLE_NAME(str): name of lookup table of message keys (compact layout)
+        MESSAGE_COLUMNS(tuple): names and types of message table columns
+        COMPACT_MESSAGE_COLUMNS(tuple): names and types of message table columns
+                                        in the compact layout
+        TS_INDEX_NAME(str): name of BRIN index on the message timestamps
+        KEY_TS_INDEX_NAME(str): name of B-tree index on the message keys and timestamps
+        TS_ID_INDEX_NAME(str): name of B-tree index on the message timestamps and ids
+        ROLLUP_TABLE_PREFIX(str): prefix of rollup table names, followed by the interval
+        ROLLUP_INTERVALS(dict): supported rollup intervals mapped to the length of
+                                the timestamp prefix which identifies a bucket and
+                                the suffix which completes it
+        NATURAL_KEY_NAME(str): name of unique constraint on the natural key of messages
+        BATCH_TABLE_NAME(str): name of temporary table into which pre-encoded
+                               batches are copied in idempotent mode
+        _connection_pools(dict): connection pools shared by the data sinks of the process
+        _pool_reservations(dict): number of connections of each pool which are reserved
+                                  by active data sinks
+        _connection_pools_lock(threading.Lock): guards the creation and the sizes of
+                                                connection pools
 
     Attributes:
         dbname(str): database name
@@ -28,23 +133,128 @@ class PostgreSQLDataSink(DataSink):
         dbpassword(str): password for valid PostgreSQL database user
         dbhost(str): ip address of PostgreSQL host (default is "localhost")
         dbport(int): port on which PostgreSQL is running (default is "5432")
+        partitioning(str): interval of message table partitions - "day" or "month"
+                           (default is None, i.e. the table is not partitioned)
+        staging(bool): true if messages are staged before they are merged into
+                       the message table, false otherwise
+        commit_interval(int): number of staged batches between checkpoints (default
+                              is None, i.e. staged messages are merged on close)
+        rebuild_indexes(bool): true if secondary indexes are dropped and rebuilt
+                               around every merge of staged messages
+        compact(bool): true if messages are stored in the compact table layout
+        indexes(bool): true if indexes are built when the data sink is closed
+        export_index(bool): true if the index on 'ts' and 'id' is built as well
+        concurrent_indexes(bool): true if indexes are built without locking out
+                                  writes to the message table (CONCURRENTLY)
+        maintenance_work_mem(str): memory available to index builds, e.g. "1GB"
+                                   (default is None, i.e. the server's setting)
+        pooled(bool): true if connections are taken from a pool shared by the process
+        writers(int): number of concurrent writer threads (default is 1, i.e.
+                      batches are written by the calling thread)
+        partition_by_key(bool): true if batches are split among writers by key
+        order(str): order in which batches of concurrent writers are committed -
+                    "none", "key" or "global"
+        queue_depth(int): number of batches buffered per writer
+        rollups(tuple): intervals of the maintained rollup tables, e.g. ("minute", "hour")
+        idempotent(bool): true if messages which are already stored are skipped
         _connection(psycopg2.extensions.connection): established and active connection
                                                      to the PostgreSQL database
+        _partitions(dict): names of existing message table partitions mapped to their
+                           inclusive lower and exclusive upper bounds (None if unbounded)
+        _overlapped_partitions(set): names of partitions which are not created, since
+                                     existing partitions overlap their range
+        _staged_batches(int): number of batches staged since the last checkpoint
+        _key_ids(dict): cache of message keys mapped to their lookup table ids
+        _dumped_messages(int): number of messages dumped since initialization
+        _pool(psycopg2.pool.ThreadedConnectionPool): pool of connections (pooled mode)
+        _pool_key(tuple): connection parameters which identify the pool
+        _writer_connections(list): connections of the writers
+        _writer_queues(list): queues of batches of rows, one per writer
+        _writer_threads(list): writer threads
+        _next_writer(int): index of the writer which receives the next batch
+        _reorder_buffer(ReorderBuffer): sequence numbers of batches in global order, or None
+        _writer_error(Exception): first error raised by any writer
+        _skipped_messages(int): number of duplicate messages skipped since initialization
+        _stats_lock(threading.Lock): guards the counters updated by writers
+
+    Properties:
+        stats(dict): number of skipped duplicate messages (idempotent mode)
 
     Methods:
         __enter__(): (see DataSink)
         __exit__(): (see DataSink)
         initialize(): connect to and setup the database
         dump(message): save the message as a row in the database message table
-        close(): terminate the connection to the database
+        dump_batch(messages): save all messages in the database message table
+                              within a single transaction
+        close(): merge any staged messages, build indexes and terminate the
+                 connection to the database
+        checkpoint(): merge all staged messages into the message table
+        build_indexes(rebuild): build indexes and analyze the message table
+        drop_partitions_before(cutoff): drop all partitions with messages older
+                                        than the cutoff date
         _connect_to_db(): establish a connection to the database
+        _reset_connection(): roll back the current transaction, or re-establish a lost connection
+        _release_connections(): return or terminate all connections
+        _start_writers(): start the writer threads
+        _stop_writers(): wait for the writers to finish their batches and stop them
+        _dispatch_rows(rows): hand over rows to the writers
+        _write_loop(connection, batches): write batches of rows until stopped
+        _write_rows(connection, rows, sequence): write rows and commit them
+        _wait_for_writers(): wait until all handed over batches are written
+        _raise_writer_error(): raise the first error of any writer
+        _ensure_partitions(timestamps): create missing partitions for timestamps
+        _ensure_key_ids(keys): register missing message keys in the lookup table
+        _update_rollups(cur, rows): apply the aggregates of rows to the rollup tables
+        _rollup_merge_sql(interval, source): get the upsert of the aggregates of a
+                                             relation into a rollup table
+        _count_skipped(count): count skipped duplicate messages
+        _messages_to_rows(messages): convert messages to database table rows
+        _drop_secondary_indexes(cur): drop all secondary indexes of the message table
+        _partition_bounds(timestamp): get the partition which holds a timestamp
+        _next_bound(lower): get the upper bound of a partition
+        _load_partitions(cur): load the existing partitions and their bounds
+
+    Class methods:
+        close_connection_pools(): terminate all connections of the shared pools
+        rollup_table_name(interval): get the name of the rollup table of an interval
+
+    Static methods:
+        _message_to_row(message): convert a message to a database table row
+        _copy_buffer(rows): serialize rows in the text format of COPY
+        _parse_partition_bound(bound): parse a bound of a range partition
     """
 
     MESSAGE_TABLE_NAME = "Message"
-    TIMESTAMP_PATTERN = re.compile(r"^(?P<ts>[-.:0-9 ]+)(?P<tz>[+-][0-9:]+)$")
+    TIMESTAMP_PATTERN = TIMESTAMP_PATTERN
+    PARTITION_INTERVALS = ("day", "month")
+    PARTITION_BOUND_PATTERN = re.compile(r"FOR VALUES FROM \((.+)\) TO \((.+)\)")
+    ORDERS = ("none", "key", "global")
+    TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+    STAGING_TABLE_NAME = f"{MESSAGE_TABLE_NAME}_staging"
+    KEY_TABLE_NAME = f"{MESSAGE_TABLE_NAME}Key"
+    MESSAGE_COLUMNS = (("key", "CHAR(4)"), ("value", "REAL"), ("ts", "TIMESTAMP"), ("tz", "TEXT"))
+    COMPACT_MESSAGE_COLUMNS = (("key_id", "SMALLINT"), ("value", "REAL"), ("ts", "TIMESTAMP"),
+                               ("tz_offset", "SMALLINT"))
+    TS_INDEX_NAME = f"{MESSAGE_TABLE_NAME}_ts_brin"
+    KEY_TS_INDEX_NAME = f"{MESSAGE_TABLE_NAME}_key_ts_idx"
+    TS_ID_INDEX_NAME = f"{MESSAGE_TABLE_NAME}_ts_id_idx"
+    ROLLUP_TABLE_PREFIX = f"{MESSAGE_TABLE_NAME}_rollup_"
+    ROLLUP_INTERVALS = {"minute": (16, ":00"), "hour": (13, ":00:00"), "day": (10, "")}
+    NATURAL_KEY_NAME = f"{MESSAGE_TABLE_NAME}_natural_key"
+    BATCH_TABLE_NAME = f"{MESSAGE_TABLE_NAME}_batch"
+
+    _connection_pools = {}
+    _pool_reservations = {}
+    _connection_pools_lock = threading.Lock()
 
     def __init__(self, dbname: str, dbuser: str, dbpassword: str,
-                 dbhost: str = "127.0.0.1", dbport: int = 5432):
+                 dbhost: str = "127.0.0.1", dbport: int = 5432, partitioning: str = None,
+                 staging: bool = False, commit_interval: int = None, rebuild_indexes: bool = False,
+                 compact: bool = False, indexes: bool = False, concurrent_indexes: bool = False,
+                 maintenance_work_mem: str = None, pooled: bool = False, writers: int = 1,
+                 partition_by_key: bool = False, queue_depth: int = 4, rollups: tuple = (),
+                 idempotent: bool = False, order: str = None, export_index: bool = False):
         """Construct PostgreSQL data sink
 
         :param dbname: database name
@@ -57,13 +267,103 @@ class PostgreSQLDataSink(DataSink):
         :type dbhost: str
         :param dbport: port on which PostgreSQL is running (default is "5432")
         :type dbport: int
+        :param partitioning: interval of message table partitions - "day" or "month"
+                             (default is None, i.e. the table is not partitioned)
+        :type partitioning: str
+        :param staging: stage messages before merging them into the message table
+        :type staging: bool
+        :param commit_interval: number of staged batches between checkpoints (default
+                                is None, i.e. staged messages are merged on close)
+        :type commit_interval: int
+        :param rebuild_indexes: drop and rebuild secondary indexes around every merge
+        :type rebuild_indexes: bool
+        :param compact: store messages in the compact table layout
+        :type compact: bool
+        :param indexes: build indexes when the data sink is closed
+        :type indexes: bool
+        :param concurrent_indexes: build indexes without locking out writes (CONCURRENTLY)
+        :type concurrent_indexes: bool
+        :param maintenance_work_mem: memory available to index builds, e.g. "1GB"
+                                     (default is None, i.e. the server's setting)
+        :type maintenance_work_mem: str
+        :param pooled: take connections from a pool shared by the process
+        :type pooled: bool
+        :param writers: number of concurrent writer threads (implies pooled mode)
+        :type writers: int
+        :param partition_by_key: split batches among writers by message key (same
+                                 as the "key" order)
+        :type partition_by_key: bool
+        :param queue_depth: number of batches buffered per writer
+        :type queue_depth: int
+        :param rollups: intervals of the maintained rollup tables - any of "minute",
+                        "hour" and "day" (default is none)
+        :type rollups: tuple
+        :param idempotent: skip messages whose key, timestamp and timezone are
+                           already stored
+        :type idempotent: bool
+        :param order: order in which batches of concurrent writers are committed -
+                      "none", "key" or "global" (default is "key" if batches are
+                      split by key, "none" otherwise)
+        :type order: str
+        :param export_index: also build a B-tree index on 'ts' and 'id' (requires
+                             indexes), which parallel exports split by 'ts' use
+        :type export_index: bool
+
+        :raises ValueError: unsupported partition interval, number of writers,
+                            rollup interval or order
         """
+        if partitioning is not None and partitioning not in self.PARTITION_INTERVALS:
+            raise ValueError(f"Unsupported partition interval: {partitioning}")
+        if writers < 1:
+            raise ValueError(f"Number of writers must be a positive integer: {writers}")
+        for interval in rollups:
+            if interval not in self.ROLLUP_INTERVALS:
+                raise ValueError(f"Unsupported rollup interval: {interval}")
+        if order is None:
+            order = "key" if partition_by_key else "none"
+        if order not in self.ORDERS:
+            raise ValueError(f"Unsupported order: {order}, expected one of: {', '.join(self.ORDERS)}")
+        if partition_by_key and order != "key":
+            raise ValueError(f"Batches split by key are committed in key order, not in {order} order")
+        if order == "global" and (len(rollups) > 0 or idempotent):
+            raise ValueError("Global order cannot be combined with rollups or idempotent mode")
         self.dbname = dbname
         self.dbuser = dbuser
         self.dbpassword = dbpassword
         self.dbhost = dbhost
         self.dbport = dbport
+        self.partitioning = partitioning
+        self.staging = staging
+        self.commit_interval = commit_interval
+        self.rebuild_indexes = rebuild_indexes
+        self.compact = compact
+        self.indexes = indexes
+        self.export_index = export_index
+        self.concurrent_indexes = concurrent_indexes
+        self.maintenance_work_mem = maintenance_work_mem
+        self.pooled = pooled or writers > 1
+        self.writers = writers
+        self.partition_by_key = order == "key"
+        self.order = order
+        self.queue_depth = queue_depth
+        self.rollups = tuple(rollups)
+        self.idempotent = idempotent
         self._connection = None
+        self._partitions = {}
+        self._overlapped_partitions = set()
+        self._staged_batches = 0
+        self._key_ids = {}
+        self._dumped_messages = 0
+        self._pool = None
+        self._pool_key = None
+        self._writer_connections = []
+        self._writer_queues = []
+        self._writer_threads = []
+        self._next_writer = 0
+        self._reorder_buffer = None
+        self._writer_error = None
+        self._skipped_messages = 0
+        self._stats_lock = threading.Lock()
 
     def __enter__(self):
         """Ensure proper initialization of PostgreSQL data sink"""
@@ -82,7 +382,20 @@ class PostgreSQLDataSink(DataSink):
         and creates a new database, after which the sink connects to the latter.
 
         If the necessary database message table does not exist, it is created.
-        Otherwise, no additional setup is required.
+        Otherwise, no additional setup is required. If the message table is
+        partitioned, its existing partitions and their bounds are loaded; if
+        partitioning is requested, but the existing message table is not
+        partitioned, the data sink refuses to start. In staged
+        mode, the unlogged staging table is created as well. Rows which remain
+        staged from a previous, unfinished run are merged on the next checkpoint.
+        In the compact layout, the key lookup table is created and cached. The
+        rollup tables are created as well, if any. In idempotent mode, the unique
+        constraint on the natural key is added to the message table, which fails
+        if the table already holds duplicates. Finally, the writer threads are
+        started, if there are several writers.
+
+        :raises ValueError: the existing message table is not partitioned, although
+                            partitioning is requested
         """
         # First, establish a connection to the specified database
         try:
@@ -97,23 +410,79 @@ class PostgreSQLDataSink(DataSink):
                     con.autocommit = False
             self._connect_to_db()  # try again
 
-        # Second, create the necessary database table, only if required
+        # Second, create the necessary database tables, only if required
+        columns = ", ".join(f"{name} {data_type} NOT NULL" for name, data_type in self._columns)
         with self._connection.cursor() as cur:
-            cur.execute(f"""
-                CREATE TABLE IF NOT EXISTS "{self.MESSAGE_TABLE_NAME}" (
-                    id SERIAL PRIMARY KEY,
-                    key CHAR(4) NOT NULL,
-                    value REAL NOT NULL,
-                    ts TIMESTAMP NOT NULL,
-                    tz TEXT NOT NULL
-                );
-            """)
+            if self.partitioning is None:
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS "{self.MESSAGE_TABLE_NAME}" (
+                        id SERIAL PRIMARY KEY,
+                        {columns}
+                    );
+                """)
+            else:  # primary key of a partitioned table must contain the partition key
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS "{self.MESSAGE_TABLE_NAME}" (
+                        id SERIAL,
+                        {columns},
+                        PRIMARY KEY (id, ts)
+                    ) PARTITION BY RANGE (ts);
+                """)
+                cur.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass;",
+                            (f'"{self.MESSAGE_TABLE_NAME}"',))
+                if cur.fetchone() is None:  # created earlier without partitioning
+                    self._connection.rollback()
+                    self._release_connections()
+                    raise ValueError(f'Table "{self.MESSAGE_TABLE_NAME}" already exists, but is not partitioned '
+                                     f'(partitioning="{self.partitioning}" requires a partitioned table)')
+                self._load_partitions(cur)
+            if self.staging:
+                cur.execute(f"""
+                    CREATE UNLOGGED TABLE IF NOT EXISTS "{self.STAGING_TABLE_NAME}" (
+                        {columns}
+                    );
+                """)
+            if self.compact:
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS "{self.KEY_TABLE_NAME}" (
+                        id SMALLSERIAL PRIMARY KEY,
+                        key CHAR(4) NOT NULL UNIQUE
+                    );
+                """)
+                cur.execute(f'SELECT key, id FROM "{self.KEY_TABLE_NAME}";')
+                self._key_ids = {key.rstrip(): key_id for key, key_id in cur.fetchall()}
+            if self.idempotent:
+                cur.execute("SELECT 1 FROM pg_constraint WHERE conname = %s;", (self.NATURAL_KEY_NAME,))
+                if cur.fetchone() is None:
+                    cur.execute(f"""
+                        ALTER TABLE "{self.MESSAGE_TABLE_NAME}"
+                        ADD CONSTRAINT "{self.NATURAL_KEY_NAME}" UNIQUE ({self._natural_key});
+                    """)
+            key_column, key_type = self._columns[0]
+            for interval in self.rollups:
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS "{self.rollup_table_name(interval)}" (
+                        {key_column} {key_type} NOT NULL,
+                        bucket TIMESTAMP NOT NULL,
+                        count BIGINT NOT NULL,
+                        sum DOUBLE PRECISION NOT NULL,
+                        min REAL NOT NULL,
+                        max REAL NOT NULL,
+                        PRIMARY KEY ({key_column}, bucket)
+                    );
+                """)
             self._connection.commit()
 
+        # Third, start the writers, if batches are written concurrently
+        if self.writers > 1:
+            self._start_writers()
+
     def dump(self, message: dict) -> bool:
         """Save the message as a row in the database message table
 
-        Note that the message's timestamp must contain timezone info.
+        Note that the message's timestamp must contain timezone info. In staged
+        mode, in the compact layout, with rollup tables or in idempotent mode, the
+        message is dumped as a batch of its own (see dump_batch()).
 
         :param message: body of the message
         :type message: dict
@@ -121,24 +490,742 @@ class PostgreSQLDataSink(DataSink):
         :return: status which indicates whether the dump was successful
         :rtype: bool
         """
-        match = self.TIMESTAMP_PATTERN.match(message["ts"])
-        if not match:  # improperly formatted timestamp
-            raise ValueError(f'Improperly formatted timestamp: {message["ts"]}')
-        ts, tz = match.group("ts"), match.group("tz")
+        if self.staging or self.compact or self.writers > 1 or len(self.rollups) > 0 or self.idempotent:
+            return self.dump_batch([message])
+        ts, tz = split_timestamp(message["ts"])
+        self._ensure_partitions((ts,))
         with self._connection.cursor() as cur:
             cur.execute(f"""
                 INSERT INTO "{self.MESSAGE_TABLE_NAME}" (key, value, ts, tz) 
                 VALUES ('{message["key"]}', {message["value"]}, '{ts}', '{tz}');
             """)
             self._connection.commit()
+        self._dumped_messages += 1
+        return True  # since no errors are raised by psycopg2, dump is successful
+
+    def dump_batch(self, messages: list) -> bool:
+        """Save all messages in the database message table
+
+        All rows are inserted with a single multi-row statement and committed
+        within a single transaction. If any message's timestamp is improperly
+        formatted, none of the messages are saved.
+
+        In staged mode, the rows are streamed with COPY into the staging table
+        instead. Every 'commit_interval' staged batches a checkpoint is made.
+
+        If there are several writers, the rows are handed over to the writers and
+        the method returns without waiting for them to be written.
+
+        Pre-encoded batches (see EncodedBatch) are written with COPY as they are,
+        unless the compact layout is used or batches are split by key.
+
+        If the batch cannot be written, or its keys or partitions cannot be
+        registered, the transaction is rolled back (or the connection is
+        re-established, if it was lost) before the error is raised, so that the
+        data sink remains usable (see RetryingDataSink).
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :raises ValueError: improperly formatted timestamp
+        :raises Exception: any error of a writer, raised while writing a previous batch
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        self._raise_writer_error()
+        try:  # keys and partitions are registered on the connection of the sink as well
+            if isinstance(messages, EncodedBatch) and not self.compact and not self.partition_by_key:
+                rows = messages  # written with COPY as they are
+                self._ensure_partitions(messages.dates)
+            else:
+                rows = self._messages_to_rows(messages)
+                self._ensure_partitions(row[2] for row in rows)
+            if self.writers > 1:
+                self._dispatch_rows(rows)
+            else:
+                self._write_rows(self._connection, rows)
+        except Exception:  # the batch is discarded, and the next one starts afresh
+            self._reset_connection()
+            raise
+        self._dumped_messages += len(rows)
+        if self.staging:
+            self._staged_batches += 1
+            if self.commit_interval is not None and self._staged_batches >= self.commit_interval:
+                self.checkpoint()
         return True  # since no errors are raised by psycopg2, dump is successful
 
     def close(self) -> None:
-        """Terminate the connection to the database"""
-        self._connection.close()
+        """Merge any staged messages, build indexes and terminate the connection
+
+        Writers finish their pending batches before they are stopped. Indexes are
+        only built if enabled. They are not rebuilt if no messages were dumped, or
+        if the merge of staged messages already rebuilt them. In pooled mode, the
+        connections are returned to the shared pool instead of being terminated.
+
+        :raises Exception: any error of a writer
+        """
+        try:
+            self._stop_writers()
+            self._raise_writer_error()
+            if not self._connection.closed:
+                if self.staging:
+                    self.checkpoint()
+                if self.indexes:
+                    rebuilt = self.staging and self.rebuild_indexes
+                    self.build_indexes(rebuild=self._dumped_messages > 0 and not rebuilt)
+        finally:
+            self._release_connections()
+
+    def checkpoint(self) -> int:
+        """Merge all staged messages into the message table
+
+        Staged rows are moved with a single set-based 'INSERT ... SELECT', the
+        aggregates of the moved rows are applied to the rollup tables (if any) and
+        the staging table is truncated afterwards, all within one transaction. In
+        idempotent mode, staged rows which are already stored are skipped. If
+        enabled, secondary indexes of the message table are dropped before the
+        merge and rebuilt after it. Nothing is done if the sink is not staged.
+
+        :return: number of merged messages
+        :rtype: int
+        """
+        if not self.staging:
+            return 0
+        self._wait_for_writers()
+        columns = ", ".join(name for name, _ in self._columns)
+        with self._connection.cursor() as cur:
+            index_definitions = self._drop_secondary_indexes(cur) if self.rebuild_indexes else []
+            merge = f"""
+                INSERT INTO "{self.MESSAGE_TABLE_NAME}" ({columns})
+                SELECT {columns} FROM "{self.STAGING_TABLE_NAME}" {self._on_conflict}
+            """
+            staged = None
+            if len(self.rollups) > 0:  # rollups aggregate the rows which were actually merged
+                rollups = ", ".join(f"rollup_{interval} AS ({self._rollup_merge_sql(interval, 'merged')})"
+                                    for interval in self.rollups)
+                cur.execute(f"""
+                    WITH merged AS ({merge} RETURNING {self._columns[0][0]}, value, ts), {rollups}
+                    SELECT (SELECT count(*) FROM merged), (SELECT count(*) FROM "{self.STAGING_TABLE_NAME}");
+                """)
+                merged, staged = cur.fetchone()
+            else:
+                if self.idempotent:
+                    cur.execute(f'SELECT count(*) FROM "{self.STAGING_TABLE_NAME}";')
+                    staged = cur.fetchone()[0]
+                cur.execute(merge)
+                merged = cur.rowcount
+            cur.execute(f'TRUNCATE "{self.STAGING_TABLE_NAME}";')
+            for index_definition in index_definitions:
+                cur.execute(index_definition)
+            self._connection.commit()
+        self._staged_batches = 0
+        if self.idempotent:
+            self._count_skipped(staged - merged)
+        return merged
+
+    def build_indexes(self, rebuild: bool = True) -> None:
+        """Build indexes for downstream queries and analyze the message table
+
+        Missing indexes are created - a BRIN index on 'ts', which is tiny and
+        effective as long as messages are loaded roughly in time order, and a
+        B-tree index on the key and 'ts', and a B-tree index on 'ts' and 'id' if
+        enabled (see 'export_index'). Existing indexes are reindexed if
+        requested. Indexes are built concurrently if enabled, except on a
+        partitioned message table, where PostgreSQL does not support it.
+
+        :param rebuild: reindex the already existing indexes
+        :type rebuild: bool
+        """
+        key_column = "key_id" if self.compact else "key"
+        definitions = [
+            (self.TS_INDEX_NAME, "BRIN (ts)"),
+            (self.KEY_TS_INDEX_NAME, f"BTREE ({key_column}, ts)")
+        ]
+        if self.export_index:
+            definitions.append((self.TS_ID_INDEX_NAME, "BTREE (ts, id)"))
+        concurrently = "CONCURRENTLY" if self.concurrent_indexes and self.partitioning is None else ""
+        self._connection.commit()
+        self._connection.autocommit = True  # cannot build indexes concurrently inside a transaction
+        try:
+            with self._connection.cursor() as cur:
+                if self.maintenance_work_mem is not None:
+                    cur.execute("SET maintenance_work_mem = %s;", (self.maintenance_work_mem,))
+                for index_name, definition in definitions:
+                    cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (f'"{index_name}"',))
+                    if not cur.fetchone()[0]:
+                        cur.execute(f"""
+                            CREATE INDEX {concurrently} IF NOT EXISTS "{index_name}"
+                            ON "{self.MESSAGE_TABLE_NAME}" USING {definition};
+                        """)
+                    elif rebuild:
+                        cur.execute(f'REINDEX INDEX {concurrently} "{index_name}";')
+                cur.execute(f'ANALYZE "{self.MESSAGE_TABLE_NAME}";')
+                if self.maintenance_work_mem is not None:
+                    cur.execute("RESET maintenance_work_mem;")
+        finally:
+            self._connection.autocommit = False
+
+    def drop_partitions_before(self, cutoff: date) -> list:
+        """Drop all partitions with messages older than the cutoff date
+
+        A partition is dropped only if all of its messages are older than the
+        cutoff date, i.e. it never discards messages on or after the cutoff.
+        Partitions which were not created by the data sink are dropped as well,
+        according to their bounds. Dropping a partition is a cheap metadata operation, as opposed to
+        deleting its rows one by one.
+
+        :param cutoff: earliest date of retained messages
+        :type cutoff: date
+
+        :raises ValueError: the message table is not partitioned
+
+        :return: names of dropped partitions
+        :rtype: list
+        """
+        if self.partitioning is None:
+            raise ValueError(f'Table "{self.MESSAGE_TABLE_NAME}" is not partitioned')
+        cutoff = datetime(cutoff.year, cutoff.month, cutoff.day)
+        dropped = sorted(name for name, (_, upper) in self._partitions.items()
+                         if upper is not None and upper <= cutoff)
+        with self._connection.cursor() as cur:
+            for partition_name in dropped:
+                cur.execute(f'DROP TABLE IF EXISTS "{partition_name}";')
+            self._connection.commit()
+        for partition_name in dropped:
+            del self._partitions[partition_name]
+        self._overlapped_partitions.clear()  # their ranges may be free now
+        return dropped
+
+    @property
+    def stats(self) -> dict:
+        """Number of skipped duplicate messages (idempotent mode)"""
+        if not self.idempotent:
+            return {}
+        return {"skipped_duplicates": self._skipped_messages}
+
+    @property
+    def _columns(self) -> tuple:
+        """Names and types of message table columns in the current layout"""
+        return self.COMPACT_MESSAGE_COLUMNS if self.compact else self.MESSAGE_COLUMNS
+
+    @property
+    def _pool_size(self) -> int:
+        """Number of pooled connections of the data sink - one per writer and one of its own"""
+        return self.writers + 1 if self.writers > 1 else 1
+
+    @property
+    def _natural_key(self) -> str:
+        """Columns of the natural key of messages in the current layout"""
+        return ", ".join(name for name, _ in self._columns if name != "value")
+
+    @property
+    def _on_conflict(self) -> str:
+        """Conflict clause of inserts into the message table"""
+        return f"ON CONFLICT ({self._natural_key}) DO NOTHING" if self.idempotent else ""
+
+    @classmethod
+    def rollup_table_name(cls, interval: str) -> str:
+        """Get the name of the rollup table of an interval
+
+        :param interval: rollup interval, e.g. "minute"
+        :type interval: str
+
+        :return: name of the rollup table, e.g. "Message_rollup_minute"
+        :rtype: str
+        """
+        return f"{cls.ROLLUP_TABLE_PREFIX}{interval}"
+
+    @classmethod
+    def close_connection_pools(cls) -> None:
+        """Terminate all connections of the pools shared by the process"""
+        with cls._connection_pools_lock:
+            for pool in cls._connection_pools.values():
+                pool.closeall()
+            cls._connection_pools.clear()
+            cls._pool_reservations.clear()
 
     def _connect_to_db(self) -> None:
-        """Establish a connection to the PostgreSQL database"""
-        self._connection = psycopg2.connect(database=self.dbname,
-                                            user=self.dbuser, password=self.dbpassword,
-                                            host=self.dbhost, port=str(self.dbport))
+        """Establish a connection to the PostgreSQL database
+
+        In pooled mode, the connection is taken from the shared pool with the
+        same connection parameters, which is created on first use. The data sink
+        reserves a connection for every writer and one for itself. The pool grows
+        to the sum of the reservations of all active data sinks, so concurrent
+        data sinks never exhaust it, and keeps as many idle connections as were
+        ever reserved at once, for later runs.
+        """
+        if not self.pooled:
+            self._connection = psycopg2.connect(database=self.dbname,
+                                                user=self.dbuser, password=self.dbpassword,
+                                                host=self.dbhost, port=str(self.dbport))
+            return
+        if self._pool is None:  # reserve the connections of this data sink
+            pool_key = (self.dbname, self.dbuser, self.dbpassword, self.dbhost, self.dbport)
+            with self._connection_pools_lock:
+                reserved = self._pool_reservations.get(pool_key, 0) + self._pool_size
+                pool = self._connection_pools.get(pool_key)
+                if pool is None:
+                    pool = psycopg2.pool.ThreadedConnectionPool(
+                        reserved, reserved, database=self.dbname, user=self.dbuser, password=self.dbpassword,
+                        host=self.dbhost, port=str(self.dbport)
+                    )
+                    self._connection_pools[pool_key] = pool
+                pool.maxconn = max(pool.maxconn, reserved)
+                pool.minconn = max(pool.minconn, reserved)  # connections kept idle between runs
+                self._pool_reservations[pool_key] = reserved
+            self._pool, self._pool_key = pool, pool_key
+        self._connection = self._pool.getconn()
+
+    def _reset_connection(self) -> None:
+        """Roll back the current transaction, or re-establish a lost connection"""
+        if self._connection.closed == 0:
+            self._connection.rollback()
+            return
+        if self._pool is not None:
+            self._pool.putconn(self._connection, close=True)
+        self._connect_to_db()
+
+    def _release_connections(self) -> None:
+        """Return all connections to the shared pool (and release their reservation) or terminate them"""
+        if self._pool is None:
+            self._connection.close()
+            return
+        for connection in self._writer_connections + [self._connection]:
+            self._pool.putconn(connection)
+        self._writer_connections = []
+        with self._connection_pools_lock:
+            if self._pool_key in self._pool_reservations:  # unless the pools were closed meanwhile
+                self._pool_reservations[self._pool_key] -= self._pool_size
+        self._pool, self._pool_key = None, None
+
+    def _start_writers(self) -> None:
+        """Start the writer threads, each with its own connection and queue
+
+        In global order, the window of the reorder buffer spans all batches which
+        the writers may hold at once.
+        """
+        self._writer_error = None
+        self._next_writer = 0
+        if self.order == "global":
+            self._reorder_buffer = ReorderBuffer(self.writers * (self.queue_depth + 1))
+        self._writer_connections = [self._pool.getconn() for _ in range(self.writers)]
+        self._writer_queues = [queue.Queue(self.queue_depth) for _ in range(self.writers)]
+        self._writer_threads = [
+            threading.Thread(target=self._write_loop, args=(connection, batches), daemon=True)
+            for connection, batches in zip(self._writer_connections, self._writer_queues)
+        ]
+        for thread in self._writer_threads:
+            thread.start()
+
+    def _stop_writers(self) -> None:
+        """Wait for the writers to finish their pending batches and stop them"""
+        for batches in self._writer_queues:
+            batches.put(None)  # sentinel, which stops the writer
+        for thread in self._writer_threads:
+            thread.join()
+        self._writer_queues, self._writer_threads = [], []
+
+    def _dispatch_rows(self, rows: list) -> None:
+        """Hand over rows to the writers
+
+        If batches are split by key, rows are handed over to the writer which is
+        chosen by a hash of their key, so that rows with the same key are always
+        written by the same writer, in order. Otherwise, the whole batch is handed
+        over to the next writer in a round-robin fashion - in global order, along
+        with its sequence number.
+
+        :param rows: database table rows
+        :type rows: list
+        """
+        if not self.partition_by_key:
+            sequence = self._reorder_buffer.stamp() if self._reorder_buffer is not None else None
+            self._writer_queues[self._next_writer].put((rows, sequence))
+            self._next_writer = (self._next_writer + 1) % self.writers
+            return
+        partitions = [[] for _ in range(self.writers)]
+        for row in rows:
+            partitions[zlib.crc32(str(row[0]).encode()) % self.writers].append(row)
+        for batches, partition in zip(self._writer_queues, partitions):
+            if len(partition) > 0:
+                batches.put((partition, None))
+
+    def _write_loop(self, connection, batches: queue.Queue) -> None:
+        """Write batches of rows until the writer is stopped
+
+        After any writer fails, all writers discard their pending batches, since
+        the error is raised by the next call to the data sink. In global order,
+        the sequence number of every batch is retired, whether it was written or
+        not, so that no other writer waits for it forever.
+
+        :param connection: connection of the writer
+        :type connection: psycopg2.extensions.connection
+        :param batches: queue of batches of rows, each with its sequence number (or None)
+        :type batches: queue.Queue
+        """
+        while True:
+            batch = batches.get()
+            try:
+                if batch is None:
+                    return
+                rows, sequence = batch
+                if self._writer_error is None:
+                    self._write_rows(connection, rows, sequence)
+            except Exception as error:  # raised by the data sink later
+                connection.rollback()
+                if self._writer_error is None:
+                    self._writer_error = error
+            finally:
+                if batch is not None and batch[1] is not None:
+                    self._reorder_buffer.retire(batch[1])
+                batches.task_done()
+
+    def _write_rows(self, connection, rows: list, sequence: int = None) -> None:
+        """Write rows into the message (or staging) table and commit them
+
+        Unless the rows are staged, their aggregates are applied to the rollup
+        tables (if any) within the same transaction. In idempotent mode, rows
+        which are already stored are skipped - pre-encoded batches are then
+        copied into a temporary table first. If the rows have a sequence number
+        (global order), they are only committed once it is their turn, and they
+        are rolled back instead if any writer has failed meanwhile.
+
+        :param connection: connection to the database
+        :type connection: psycopg2.extensions.connection
+        :param rows: database table rows, or a pre-encoded batch
+        :type rows: list|EncodedBatch
+        :param sequence: sequence number of the rows (see ReorderBuffer), or None
+        :type sequence: int
+        """
+        columns = ", ".join(name for name, _ in self._columns)
+        returning = ""
+        if self.idempotent and len(self.rollups) > 0:  # rollups aggregate the rows which were stored
+            returning = f"RETURNING {self._columns[0][0]}, value, ts::text, {self._columns[3][0]}"
+        stored = rows
+        with connection.cursor() as cur:
+            if isinstance(rows, EncodedBatch) and (self.staging or not self.idempotent):
+                table_name = self.STAGING_TABLE_NAME if self.staging else self.MESSAGE_TABLE_NAME
+                cur.copy_expert(f'COPY "{table_name}" ({columns}) FROM STDIN;', StringIO(rows.copy_data))
+            elif isinstance(rows, EncodedBatch):
+                types = ", ".join(f"{name} {data_type}" for name, data_type in self._columns)
+                cur.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS "{self.BATCH_TABLE_NAME}" ({types}) '
+                            'ON COMMIT DELETE ROWS;')
+                cur.copy_expert(f'COPY "{self.BATCH_TABLE_NAME}" ({columns}) FROM STDIN;', StringIO(rows.copy_data))
+                cur.execute(f"""
+                    INSERT INTO "{self.MESSAGE_TABLE_NAME}" ({columns})
+                    SELECT {columns} FROM "{self.BATCH_TABLE_NAME}" {self._on_conflict} {returning};
+                """)
+                stored = cur.fetchall() if returning else cur.rowcount
+            elif self.staging:
+                cur.copy_expert(f'COPY "{self.STAGING_TABLE_NAME}" ({columns}) FROM STDIN;',
+                                self._copy_buffer(rows))
+            else:
+                stored = psycopg2.extras.execute_values(cur, f"""
+                    INSERT INTO "{self.MESSAGE_TABLE_NAME}" ({columns}) VALUES %s {self._on_conflict} {returning};
+                """, rows, page_size=max(len(rows), 1), fetch=returning != "")
+                if returning == "":
+                    stored = cur.rowcount if self.idempotent else rows
+            if len(self.rollups) > 0 and not self.staging:
+                self._update_rollups(cur, stored)
+            if sequence is not None:
+                self._reorder_buffer.wait(sequence)
+                if self._writer_error is not None:  # an earlier batch failed, so no later one is committed
+                    connection.rollback()
+                    return
+            connection.commit()
+        if self.idempotent and not self.staging:
+            self._count_skipped(len(rows) - (stored if isinstance(stored, int) else len(stored)))
+
+    def _wait_for_writers(self) -> None:
+        """Wait until all batches handed over to the writers are written
+
+        :raises Exception: any error of a writer
+        """
+        for batches in self._writer_queues:
+            batches.join()
+        self._raise_writer_error()
+
+    def _raise_writer_error(self) -> None:
+        """Raise the first error of any writer, if there is one
+
+        :raises Exception: any error of a writer
+        """
+        if self._writer_error is not None:
+            error, self._writer_error = self._writer_error, None
+            raise error
+
+    def _ensure_partitions(self, timestamps) -> None:
+        """Create the missing partitions which hold the given timestamps
+
+        Partitions are created in their own transaction, so that they are not
+        discarded if the insertion of messages fails afterwards. A partition is
+        not created if an existing partition overlaps its range, since the
+        database would reject it; its messages are stored in the existing
+        partition instead. Nothing is done if the message table is not partitioned.
+
+        :param timestamps: timestamps (or dates) without timezone info
+        :type timestamps: Iterable[str]
+        """
+        if self.partitioning is None:
+            return
+        missing = {}
+        for ts in timestamps:
+            partition_name, lower, upper = self._partition_bounds(ts)
+            if partition_name not in self._partitions and partition_name not in self._overlapped_partitions:
+                missing[partition_name] = (datetime(lower.year, lower.month, lower.day),
+                                           datetime(upper.year, upper.month, upper.day))
+        for partition_name, (lower, upper) in list(missing.items()):
+            if any((other_lower is None or other_lower < upper) and (other_upper is None or other_upper > lower)
+                   for other_lower, other_upper in self._partitions.values()):
+                self._overlapped_partitions.add(partition_name)
+                del missing[partition_name]
+        if len(missing) == 0:
+            return
+        with self._connection.cursor() as cur:
+            for partition_name, (lower, upper) in missing.items():
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS "{partition_name}"
+                    PARTITION OF "{self.MESSAGE_TABLE_NAME}"
+                    FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}');
+                """)
+            self._connection.commit()
+        self._partitions.update(missing)
+
+    def _ensure_key_ids(self, keys) -> None:
+        """Register the missing message keys in the key lookup table
+
+        Missing keys are inserted in a single statement and their ids are cached.
+        Keys are registered in their own transaction, so that they remain cached
+        even if the insertion of messages fails afterwards.
+
+        :param keys: message keys
+        :type keys: Iterable[str]
+        """
+        missing = {key for key in keys if key not in self._key_ids}
+        if len(missing) == 0:
+            return
+        with self._connection.cursor() as cur:
+            psycopg2.extras.execute_values(cur, f"""
+                INSERT INTO "{self.KEY_TABLE_NAME}" (key) VALUES %s ON CONFLICT (key) DO NOTHING;
+            """, [(key,) for key in missing])
+            cur.execute(f'SELECT key, id FROM "{self.KEY_TABLE_NAME}" WHERE key = ANY(%s);', (list(missing),))
+            self._key_ids.update((key.rstrip(), key_id) for key, key_id in cur.fetchall())
+            self._connection.commit()
+
+    def _update_rollups(self, cur, rows) -> None:
+        """Apply the aggregates of rows to the rollup tables
+
+        The rows are aggregated per key and bucket in Python, and the aggregates
+        are applied with a single upsert per rollup table, sorted by key and
+        bucket, so that concurrent transactions lock rollup rows in the same order.
+        Values are rounded to single precision first, as they are stored in the
+        message table, so the sums match the ones of staged rows (see
+        _rollup_merge_sql()).
+
+        :param cur: cursor of the transaction in which the rows are written
+        :type cur: psycopg2.extensions.cursor
+        :param rows: database table rows, or a pre-encoded batch
+        :type rows: list|EncodedBatch
+        """
+        if isinstance(rows, EncodedBatch):
+            rows = decode_copy_rows(rows.copy_data)
+        key_column = self._columns[0][0]
+        values = array("f", [float(row[1]) for row in rows]).tolist()  # rounded like the REAL column
+        for interval in self.rollups:
+            length, suffix = self.ROLLUP_INTERVALS[interval]
+            aggregates = {}
+            for (key, _, ts, _), value in zip(rows, values):
+                bucket = (key, ts[:length] + suffix)
+                aggregate = aggregates.get(bucket)
+                if aggregate is None:
+                    aggregates[bucket] = [1, value, value, value]
+                else:
+                    aggregate[0] += 1
+                    aggregate[1] += value
+                    aggregate[2] = min(aggregate[2], value)
+                    aggregate[3] = max(aggregate[3], value)
+            psycopg2.extras.execute_values(cur, f"""
+                INSERT INTO "{self.rollup_table_name(interval)}" AS rollup
+                ({key_column}, bucket, count, sum, min, max) VALUES %s
+                ON CONFLICT ({key_column}, bucket) DO UPDATE SET
+                    count = rollup.count + EXCLUDED.count, sum = rollup.sum + EXCLUDED.sum,
+                    min = LEAST(rollup.min, EXCLUDED.min), max = GREATEST(rollup.max, EXCLUDED.max);
+            """, [bucket + tuple(aggregate) for bucket, aggregate in sorted(aggregates.items())],
+                page_size=max(len(aggregates), 1))
+
+    def _rollup_merge_sql(self, interval: str, source: str) -> str:
+        """Get the upsert of the aggregates of a relation into a rollup table
+
+        The rows of the relation are aggregated per key and bucket by the
+        database, in the order of their key and bucket. Values are summed as
+        they are stored (single precision), like in _update_rollups().
+
+        :param interval: rollup interval
+        :type interval: str
+        :param source: name of the relation which holds the rows, e.g. the name
+                       of a common table expression
+        :type source: str
+
+        :return: 'INSERT ... ON CONFLICT DO UPDATE' statement
+        :rtype: str
+        """
+        key_column = self._columns[0][0]
+        return f"""
+            INSERT INTO "{self.rollup_table_name(interval)}" AS rollup
+            ({key_column}, bucket, count, sum, min, max)
+            SELECT {key_column}, date_trunc('{interval}', ts), count(*),
+                   sum(value::DOUBLE PRECISION), min(value), max(value)
+            FROM {source} GROUP BY 1, 2 ORDER BY 1, 2
+            ON CONFLICT ({key_column}, bucket) DO UPDATE SET
+                count = rollup.count + EXCLUDED.count, sum = rollup.sum + EXCLUDED.sum,
+                min = LEAST(rollup.min, EXCLUDED.min), max = GREATEST(rollup.max, EXCLUDED.max)
+        """
+
+    def _count_skipped(self, count: int) -> None:
+        """Count skipped duplicate messages
+
+        :param count: number of skipped duplicate messages
+        :type count: int
+        """
+        with self._stats_lock:
+            self._skipped_messages += count
+
+    def _messages_to_rows(self, messages: list) -> list:
+        """Convert messages to database table rows in the current layout
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :raises ValueError: improperly formatted timestamp
+
+        :return: database table rows
+        :rtype: list
+        """
+        rows = [self._message_to_row(message) for message in messages]
+        if not self.compact:
+            return rows
+        self._ensure_key_ids(row[0] for row in rows)
+        return [(self._key_ids[key], value, ts, tz_offset_minutes(tz)) for key, value, ts, tz in rows]
+
+    def _drop_secondary_indexes(self, cur) -> list:
+        """Drop all secondary indexes of the message table
+
+        Indexes which back a constraint (e.g. the primary key) are kept.
+
+        :param cur: cursor of the transaction in which indexes are dropped
+        :type cur: psycopg2.extensions.cursor
+
+        :return: definitions of the dropped indexes, used to rebuild them
+        :rtype: list
+        """
+        cur.execute("""
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = %s
+            AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass);
+        """, (self.MESSAGE_TABLE_NAME, f'"{self.MESSAGE_TABLE_NAME}"'))
+        indexes = cur.fetchall()
+        for index_name, _ in indexes:
+            cur.execute(f'DROP INDEX "{index_name}";')
+        return [index_definition for _, index_definition in indexes]
+
+    def _partition_bounds(self, ts: str) -> tuple:
+        """Get the partition which holds a timestamp
+
+        Partitions are named after the message table and their earliest date,
+        e.g. "Message_20201007" for daily and "Message_202010" for monthly ones.
+
+        :param ts: timestamp without timezone info
+        :type ts: str
+
+        :return: partition name, inclusive lower and exclusive upper date bounds
+        :rtype: tuple
+        """
+        year, month, day = int(ts[0:4]), int(ts[5:7]), int(ts[8:10])
+        if self.partitioning == "day":
+            lower = date(year, month, day)
+            suffix = f"{year:04d}{month:02d}{day:02d}"
+        else:  # monthly partitions
+            lower = date(year, month, 1)
+            suffix = f"{year:04d}{month:02d}"
+        return f"{self.MESSAGE_TABLE_NAME}_{suffix}", lower, self._next_bound(lower)
+
+    def _next_bound(self, lower: date) -> date:
+        """Get the exclusive upper date bound of a partition
+
+        :param lower: inclusive lower date bound of the partition
+        :type lower: date
+
+        :return: earliest date of the next partition
+        :rtype: date
+        """
+        if self.partitioning == "day":
+            return lower + timedelta(days=1)
+        if lower.month == 12:
+            return date(lower.year + 1, 1, 1)
+        return date(lower.year, lower.month + 1, 1)
+
+    def _load_partitions(self, cur) -> None:
+        """Load the existing partitions of the message table and their bounds
+
+        Bounds are read from the catalog, regardless of the names of the
+        partitions. A default partition is ignored, since it has no bounds.
+
+        :param cur: cursor of the transaction in which the partitions are loaded
+        :type cur: psycopg2.extensions.cursor
+        """
+        cur.execute("""
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits
+            JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+            WHERE pg_inherits.inhparent = %s::regclass;
+        """, (f'"{self.MESSAGE_TABLE_NAME}"',))
+        self._partitions = {}
+        self._overlapped_partitions = set()
+        for partition_name, bound in cur.fetchall():
+            match = self.PARTITION_BOUND_PATTERN.match(bound)
+            if match is not None:  # not the default partition
+                self._partitions[partition_name] = (self._parse_partition_bound(match.group(1)),
+                                                    self._parse_partition_bound(match.group(2)))
+
+    @staticmethod
+    def _message_to_row(message: dict) -> tuple:
+        """Convert a message to a database table row
+
+        :param message: body of the message
+        :type message: dict
+
+        :raises ValueError: improperly formatted timestamp
+
+        :return: values of the 'key', 'value', 'ts' and 'tz' columns
+        :rtype: tuple
+        """
+        ts, tz = split_timestamp(message["ts"])
+        return message["key"], message["value"], ts, tz
+
+    @staticmethod
+    def _copy_buffer(rows: list) -> StringIO:
+        """Serialize rows in the text format of COPY
+
+        Column values are separated by tabs and rows by newlines. Backslashes,
+        tabs and newlines inside values are escaped.
+
+        :param rows: database table rows
+        :type rows: list
+
+        :return: string stream, ready to be read by COPY
+        :rtype: StringIO
+        """
+        return StringIO(encode_copy_rows(rows))
+
+    @staticmethod
+    def _parse_partition_bound(bound: str) -> datetime:
+        """Parse a bound of a range partition, as formatted by PostgreSQL
+
+        :param bound: bound of the partition, e.g. "'2020-10-07 00:00:00'" or "MINVALUE"
+        :type bound: str
+
+        :return: timestamp of the bound, or None if it is unbounded
+        :rtype: datetime
+        """
+        if bound in ("MINVALUE", "MAXVALUE"):
+            return None
+        return datetime.fromisoformat(bound.strip("'"))
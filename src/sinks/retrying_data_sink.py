@@ -0,0 +1,207 @@
+import random
+import time
+
+from src.sinks.data_sink import DataSink
+
+
+class RetryingDataSink(DataSink):
+    """Data sink which isolates bad messages and retries transient errors
+
+    Batches are dumped into the wrapped data sink as they are. If a dump fails
+    with a transient error (e.g. a lost database connection - see
+    TRANSIENT_ERRORS, next to the ones of the wrapped data sink, see
+    DataSink.TRANSIENT_ERRORS), it is retried after an exponential backoff with full
+    jitter - a random delay of up to 'base_delay' * 2 ** attempt seconds, capped
+    at 'max_delay' - until 'max_retries' retries have failed, after which the
+    error is raised. Any other error is blamed on the messages: the batch is
+    split in halves, which are dumped recursively, so that the bad messages are
+    isolated with O(log n) extra dumps per bad message, while all other
+    messages are still dumped in batches. Bad messages are sent to the error
+    channel - the error data sink, if any, which receives every bad message with
+    an additional "error" field describing why it was rejected.
+
+    The wrapped data sink must write batches synchronously and must discard a
+    failed batch entirely (as the database sinks do by rolling back the
+    transaction), so that no message is dumped twice.
+
+    Class attributes:
+        TRANSIENT_ERRORS(tuple): types of errors which are retried by default, whichever the data sink
+
+    Attributes:
+        data_sink(DataSink): wrapped data sink
+        error_sink(DataSink): data sink which receives rejected messages, or None
+        max_retries(int): largest number of retries of a dump after transient errors
+        base_delay(float): delay before the first retry, in seconds
+        max_delay(float): longest delay before a retry, in seconds
+        transient_errors(tuple): types of errors which are retried
+        retries(int): number of retries after transient errors so far
+        bisections(int): number of failed batches which were split so far
+        rejected_messages(int): number of messages sent to the error channel so far
+
+    Properties:
+        stats(dict): number of retries, bisections and rejected messages, next to
+                     the statistics of the wrapped data sink
+
+    Methods:
+        __enter__(): (see DataSink)
+        __exit__(): (see DataSink)
+        initialize(): initialize the wrapped and error data sinks
+        dump(message): dump a single message
+        dump_batch(messages): dump a batch of messages, isolating any bad ones
+        close(): close the wrapped and error data sinks
+        backoff_delay(attempt): get a random delay before a retry
+        _dump_with_retries(messages): dump a batch, retrying transient errors
+        _reject(message, error): send a bad message to the error channel
+    """
+
+    TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+
+    def __init__(self, data_sink: DataSink, error_sink: DataSink = None, max_retries: int = 5,
+                 base_delay: float = 0.1, max_delay: float = 10.0, transient_errors: tuple = None) -> None:
+        """Construct retrying data sink
+
+        :param data_sink: wrapped data sink
+        :type data_sink: DataSink
+        :param error_sink: data sink which receives rejected messages
+        :type error_sink: DataSink
+        :param max_retries: largest number of retries of a dump after transient errors
+        :type max_retries: int
+        :param base_delay: delay before the first retry, in seconds
+        :type base_delay: float
+        :param max_delay: longest delay before a retry, in seconds
+        :type max_delay: float
+        :param transient_errors: types of errors which are retried (default is
+                                 TRANSIENT_ERRORS and the ones of the wrapped data sink)
+        :type transient_errors: tuple
+
+        :raises ValueError: invalid number of retries or delays
+        """
+        if max_retries < 0:
+            raise ValueError(f"Number of retries must be a non-negative integer: {max_retries}")
+        if base_delay < 0 or max_delay < base_delay:
+            raise ValueError(f"Invalid retry delays: base {base_delay}, maximum {max_delay}")
+        self.data_sink = data_sink
+        self.error_sink = error_sink
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        if transient_errors is None:
+            transient_errors = self.TRANSIENT_ERRORS + data_sink.TRANSIENT_ERRORS
+        self.transient_errors = tuple(transient_errors)
+        self.retries = 0
+        self.bisections = 0
+        self.rejected_messages = 0
+
+    def __enter__(self):
+        """Ensure proper initialization of retrying data sink"""
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of retrying data sink"""
+        self.close()
+
+    @property
+    def stats(self) -> dict:
+        """Number of retries, bisections and rejected messages, next to the statistics of the wrapped data sink"""
+        return {**self.data_sink.stats, "retries": self.retries, "bisections": self.bisections,
+                "rejected_messages": self.rejected_messages}
+
+    def initialize(self) -> None:
+        """Initialize the wrapped and error data sinks"""
+        self.retries, self.bisections, self.rejected_messages = 0, 0, 0
+        self.data_sink.initialize()
+        if self.error_sink is not None:
+            self.error_sink.initialize()
+
+    def dump(self, message: dict) -> bool:
+        """Dump a single message
+
+        :param message: body of the message
+        :type message: dict
+
+        :raises Exception: transient error which persisted after all retries
+
+        :return: status which indicates whether the message was dumped
+        :rtype: bool
+        """
+        return self.dump_batch([message])
+
+    def dump_batch(self, messages: list) -> bool:
+        """Dump a batch of messages, isolating any bad ones
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :raises Exception: transient error which persisted after all retries
+
+        :return: status which indicates whether all messages were dumped (false
+                 if any were rejected)
+        :rtype: bool
+        """
+        try:
+            return self._dump_with_retries(messages)
+        except self.transient_errors:
+            raise
+        except Exception as error:  # blamed on the messages
+            if len(messages) == 1:
+                self._reject(messages[0], error)
+                return False
+        self.bisections += 1
+        middle = len(messages) // 2
+        first = self.dump_batch(messages[:middle])
+        return self.dump_batch(messages[middle:]) and first
+
+    def close(self) -> None:
+        """Close the wrapped and error data sinks"""
+        try:
+            self.data_sink.close()
+        finally:
+            if self.error_sink is not None:
+                self.error_sink.close()
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Get a random delay before a retry ("full jitter")
+
+        :param attempt: number of failed retries so far
+        :type attempt: int
+
+        :return: delay, in seconds
+        :rtype: float
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _dump_with_retries(self, messages: list) -> bool:
+        """Dump a batch, retrying transient errors after a backoff
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :raises Exception: transient error which persisted after all retries,
+                           or any other error of the wrapped data sink
+
+        :return: status of the dump (see DataSink.dump_batch())
+        :rtype: bool
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.data_sink.dump_batch(messages)
+            except self.transient_errors:
+                if attempt >= self.max_retries:
+                    raise
+            time.sleep(self.backoff_delay(attempt))
+            attempt += 1
+            self.retries += 1
+
+    def _reject(self, message: dict, error: Exception) -> None:
+        """Send a bad message to the error channel
+
+        :param message: body of the message
+        :type message: dict
+        :param error: error raised while dumping the message
+        :type error: Exception
+        """
+        self.rejected_messages += 1
+        if self.error_sink is not None:
+            self.error_sink.dump({**message, "error": f"{type(error).__name__}: {error}"})
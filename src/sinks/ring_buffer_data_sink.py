@@ -0,0 +1,91 @@
+from src.ring_buffer import SharedRingBuffer
+from src.sinks.data_sink import DataSink
+
+
+class RingBufferDataSink(DataSink):
+    """Data sink which hands its messages over to another process via shared memory
+
+    This data sink is the producer side of a shared-memory ring buffer (see
+    SharedRingBuffer): every message is packed into a fixed-layout record right
+    in shared memory, from where the consumer process extracts it with a
+    RingBufferDataSource. A batch of messages is written at once; while the
+    ring buffer is full, dumping waits for the consumer. Closing the data sink
+    closes the ring buffer, i.e. tells the consumer that no more messages will
+    arrive. The ring buffer must be created beforehand, e.g. by the process
+    which starts the pipeline. If this process exits without closing the data
+    sink, the consumer stops waiting for messages (see SharedRingBuffer).
+
+    Attributes:
+        name(str): name of the shared memory block of the ring buffer
+        _ring_buffer(SharedRingBuffer): attached ring buffer, or None
+
+    Methods:
+        __enter__(): (see DataSink)
+        __exit__(): (see DataSink)
+        initialize(): attach to the ring buffer as its producer
+        dump(message): write a single message into the ring buffer
+        dump_batch(messages): write all messages into the ring buffer at once
+        close(): close the ring buffer and detach from it
+    """
+
+    def __init__(self, name: str) -> None:
+        """Construct ring buffer data sink
+
+        :param name: name of the shared memory block of the ring buffer
+        :type name: str
+        """
+        self.name = name
+        self._ring_buffer = None
+
+    def __enter__(self):
+        """Ensure proper initialization of ring buffer data sink"""
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of ring buffer data sink"""
+        self.close()
+
+    def initialize(self) -> None:
+        """Attach to the ring buffer as its producer
+
+        :raises FileNotFoundError: there is no ring buffer of that name
+        """
+        self._ring_buffer = SharedRingBuffer(name=self.name)
+        self._ring_buffer.attach_producer()
+
+    def dump(self, message: dict) -> bool:
+        """Write a single message into the ring buffer
+
+        :param message: body of the message
+        :type message: dict
+
+        :raises ValueError: key or timestamp is too long, or improperly formatted timestamp
+        :raises RingBufferClosed: the ring buffer has been closed
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        self._ring_buffer.put_batch([SharedRingBuffer.encode_message(message)])
+        return True
+
+    def dump_batch(self, messages: list) -> bool:
+        """Write all messages into the ring buffer at once
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :raises ValueError: key or timestamp is too long, or improperly formatted timestamp
+        :raises RingBufferClosed: the ring buffer has been closed
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        self._ring_buffer.put_batch([SharedRingBuffer.encode_message(message) for message in messages])
+        return True
+
+    def close(self) -> None:
+        """Close the ring buffer and detach from it"""
+        self._ring_buffer.close()
+        self._ring_buffer.release()
+        self._ring_buffer = None
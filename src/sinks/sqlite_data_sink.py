@@ -0,0 +1,160 @@
+import sqlite3
+
+from src.sinks.data_sink import DataSink
+from src.timestamps import split_timestamp
+
+
+class SQLiteDataSink(DataSink):
+    """Data sink which dumps its messages into an embedded SQLite database
+
+    The data sink stores messages in a database table with the same layout as
+    the one managed by PostgreSQLDataSink. Therefore, it can be used as a fast
+    embedded sink, or as a local stand-in for PostgreSQL when working on batching
+    logic without a running database server. Incoming messages must adhere to the
+    following format before they are stored in the database table:
+        `{"key": "<key>", "value": "<value>", "ts": "<timestamp>+<timezone>"}`
+
+    The database is tuned via SQLite pragmas which are applied every time a
+    connection is established. By default, the database runs in write-ahead
+    logging (WAL) mode, which lets readers work alongside the writer and turns
+    every commit into a sequential append. Batches of messages are inserted via
+    'executemany' and committed within a single transaction.
+
+    Class attributes:
+        MESSAGE_TABLE_NAME(str): name of database table where messages are dumped
+        DEFAULT_PRAGMAS(dict): pragmas which are applied unless overridden
+
+    Attributes:
+        database_filepath(str): path to SQLite database file (or ":memory:")
+        pragmas(dict): pragma names mapped to their values
+        _connection(sqlite3.Connection): established and active connection
+                                         to the SQLite database
+
+    Methods:
+        __enter__(): (see DataSink)
+        __exit__(): (see DataSink)
+        initialize(): connect to and setup the database
+        dump(message): save the message as a row in the database message table
+        dump_batch(messages): save all messages in the database message table
+                              within a single transaction
+        close(): terminate the connection to the database
+        _apply_pragmas(): apply all configured pragmas to the connection
+
+    Static methods:
+        _message_to_row(message): convert a message to a database table row
+    """
+
+    MESSAGE_TABLE_NAME = "Message"
+    DEFAULT_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",  # WAL is durable against crashes with NORMAL
+        "temp_store": "MEMORY",
+        "cache_size": -64000,  # negative values are in KiB
+    }
+
+    def __init__(self, database_filepath: str, pragmas: dict = None) -> None:
+        """Construct SQLite data sink
+
+        :param database_filepath: path to SQLite database file (or ":memory:")
+        :type database_filepath: str
+        :param pragmas: pragmas which override or extend the default ones
+        :type pragmas: dict
+        """
+        self.database_filepath = database_filepath
+        self.pragmas = dict(self.DEFAULT_PRAGMAS)
+        if pragmas is not None:
+            self.pragmas.update(pragmas)
+        self._connection = None
+
+    def __enter__(self):
+        """Ensure proper initialization of SQLite data sink"""
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of SQLite data sink"""
+        self.close()
+
+    def initialize(self) -> None:
+        """Connect to and setup the database
+
+        The database file is created if it does not exist. If the necessary
+        database message table does not exist, it is created.
+        """
+        self._connection = sqlite3.connect(self.database_filepath)
+        self._apply_pragmas()
+        self._connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS "{self.MESSAGE_TABLE_NAME}" (
+                id INTEGER PRIMARY KEY,
+                key CHAR(4) NOT NULL,
+                value REAL NOT NULL,
+                ts TIMESTAMP NOT NULL,
+                tz TEXT NOT NULL
+            );
+        """)
+        self._connection.commit()
+
+    def dump(self, message: dict) -> bool:
+        """Save the message as a row in the database message table
+
+        Note that the message's timestamp must contain timezone info.
+
+        :param message: body of the message
+        :type message: dict
+
+        :raises ValueError: improperly formatted timestamp
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        self._connection.execute(f"""
+            INSERT INTO "{self.MESSAGE_TABLE_NAME}" (key, value, ts, tz) VALUES (?, ?, ?, ?);
+        """, self._message_to_row(message))
+        self._connection.commit()
+        return True  # since no errors are raised by sqlite3, dump is successful
+
+    def dump_batch(self, messages: list) -> bool:
+        """Save all messages in the database message table
+
+        All rows are inserted via 'executemany' and committed within a single
+        transaction. If any message's timestamp is improperly formatted, none
+        of the messages are saved.
+
+        :param messages: bodies of the messages
+        :type messages: list
+
+        :raises ValueError: improperly formatted timestamp
+
+        :return: status which indicates whether the dump was successful
+        :rtype: bool
+        """
+        rows = [self._message_to_row(message) for message in messages]
+        self._connection.executemany(f"""
+            INSERT INTO "{self.MESSAGE_TABLE_NAME}" (key, value, ts, tz) VALUES (?, ?, ?, ?);
+        """, rows)
+        self._connection.commit()
+        return True  # since no errors are raised by sqlite3, dump is successful
+
+    def close(self) -> None:
+        """Terminate the connection to the database"""
+        self._connection.close()
+
+    def _apply_pragmas(self) -> None:
+        """Apply all configured pragmas to the connection"""
+        for name, value in self.pragmas.items():
+            self._connection.execute(f"PRAGMA {name} = {value};")
+
+    @staticmethod
+    def _message_to_row(message: dict) -> tuple:
+        """Convert a message to a database table row
+
+        :param message: body of the message
+        :type message: dict
+
+        :raises ValueError: improperly formatted timestamp
+
+        :return: values of the 'key', 'value', 'ts' and 'tz' columns
+        :rtype: tuple
+        """
+        ts, tz = split_timestamp(message["ts"])
+        return message["key"], float(message["value"]), ts, tz
@@ -0,0 +1,218 @@
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+
+from src.sources.data_source import DataSource
+
+
+class AsyncDataSource(ABC):
+    """Interface for container from which data can be extracted asynchronously
+
+    The asynchronous counterpart of 'DataSource': every operation is awaitable,
+    so many pipelines may share a single event loop (see ETL.run_async()).
+
+    Properties:
+        stats(dict): parameters and counters of the data source, reported in the
+                     statistics of an ETL run (empty by default)
+
+    Methods:
+        __aenter__(): asynchronous context manager entrance; ensure proper source initialization
+        __aexit__(): asynchronous context manager exit; ensure proper source termination
+        where(predicate): push a predicate down into the data source
+        initialize(): prepare the data source for message extraction
+        has_message(): indicate whether there is an available message for extraction
+        read(): extract a single message
+        read_batch(batch_size): extract the next batch of messages
+        close(): terminate the connection to the data source
+    """
+
+    @abstractmethod
+    async def __aenter__(self):
+        """Ensure proper source initialization"""
+        pass
+
+    @abstractmethod
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper source termination"""
+        pass
+
+    @property
+    def stats(self) -> dict:
+        """Parameters and counters of the data source (empty by default)"""
+        return {}
+
+    def where(self, predicate) -> bool:
+        """Push a predicate down into the data source, before it is initialized
+
+        (see DataSource.where())
+
+        :param predicate: condition which selects the extracted messages
+        :type predicate: Predicate
+
+        :return: true if only selected messages are extracted from now on
+        :rtype: bool
+        """
+        return False
+
+    @abstractmethod
+    async def initialize(self) -> None:
+        """Prepare the data source for message extraction"""
+        pass
+
+    @abstractmethod
+    async def has_message(self) -> bool:
+        """Indicate whether there is an available message for extraction
+
+        :return: status which indicates an available message
+        :rtype: bool
+        """
+        pass
+
+    @abstractmethod
+    async def read(self) -> dict:
+        """Extract a single message from the data source
+
+        :return: body of the extracted message
+        :rtype: dict
+        """
+        pass
+
+    async def read_batch(self, batch_size: int) -> list:
+        """Extract the next batch of messages from the data source
+
+        By default, up to 'batch_size' messages are extracted one by one (see
+        DataSource.read_batch()).
+
+        :param batch_size: number of messages per batch
+        :type batch_size: int
+
+        :return: bodies of the extracted messages
+        :rtype: list
+        """
+        batch = [await self.read()]
+        while len(batch) < batch_size and await self.has_message():
+            batch.append(await self.read())
+        return batch
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Clean up the source and terminate the connection to it"""
+        pass
+
+
+class ThreadedDataSource(AsyncDataSource):
+    """Asynchronous adapter of a synchronous data source
+
+    Every blocking call to the wrapped data source is run in a thread pool, so
+    the event loop is never blocked. The calls are serialized, since synchronous
+    data sources are not meant to be used from several threads at once. Extract
+    messages in batches (see read_batch()), so the cost of handing a call over to
+    the thread pool is paid once per batch.
+
+    Attributes:
+        data_source(DataSource): wrapped synchronous data source
+        executor(Executor): thread pool which runs the blocking calls, or None
+                            for the default executor of the event loop
+        _lock(asyncio.Lock): lock which serializes the blocking calls
+
+    Properties:
+        stats(dict): statistics of the wrapped data source
+
+    Methods:
+        __aenter__(): (see AsyncDataSource)
+        __aexit__(): (see AsyncDataSource)
+        where(predicate): push a predicate down into the wrapped data source
+        initialize(): (see AsyncDataSource)
+        has_message(): (see AsyncDataSource)
+        read(): (see AsyncDataSource)
+        read_batch(batch_size): extract the next batch of messages with a single blocking call
+        close(): (see AsyncDataSource)
+        _call(function, *args): run a blocking call in the thread pool
+    """
+
+    def __init__(self, data_source: DataSource, executor: Executor = None) -> None:
+        """Construct threaded data source
+
+        :param data_source: wrapped synchronous data source
+        :type data_source: DataSource
+        :param executor: thread pool which runs the blocking calls (default is
+                         the default executor of the event loop)
+        :type executor: Executor
+        """
+        self.data_source = data_source
+        self.executor = executor
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        """Ensure proper initialization of the wrapped data source"""
+        await self._call(self.data_source.__enter__)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of the wrapped data source"""
+        await self._call(self.data_source.__exit__, exc_type, exc_val, exc_tb)
+
+    @property
+    def stats(self) -> dict:
+        """Statistics of the wrapped data source"""
+        return self.data_source.stats
+
+    def where(self, predicate) -> bool:
+        """Push a predicate down into the wrapped data source
+
+        :param predicate: condition which selects the extracted messages
+        :type predicate: Predicate
+
+        :return: true if the wrapped data source only extracts selected messages
+        :rtype: bool
+        """
+        return self.data_source.where(predicate)
+
+    async def initialize(self) -> None:
+        """Prepare the wrapped data source for message extraction"""
+        await self._call(self.data_source.initialize)
+
+    async def has_message(self) -> bool:
+        """Indicate whether the wrapped data source has an available message
+
+        :return: status which indicates an available message
+        :rtype: bool
+        """
+        return await self._call(self.data_source.has_message)
+
+    async def read(self) -> dict:
+        """Extract a single message from the wrapped data source
+
+        :return: body of the extracted message
+        :rtype: dict
+        """
+        return await self._call(self.data_source.read)
+
+    async def read_batch(self, batch_size: int) -> list:
+        """Extract the next batch of messages with a single blocking call
+
+        :param batch_size: number of messages per batch
+        :type batch_size: int
+
+        :return: bodies of the extracted messages
+        :rtype: list
+        """
+        return await self._call(self.data_source.read_batch, batch_size)
+
+    async def close(self) -> None:
+        """Clean up the wrapped data source"""
+        await self._call(self.data_source.close)
+
+    async def _call(self, function, *args):
+        """Run a blocking call in the thread pool
+
+        :param function: blocking function
+        :type function: Callable
+        :param args: arguments to the function
+        :type args: tuple
+
+        :return: result of the function
+        :rtype: Any
+        """
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
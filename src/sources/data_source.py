@@ -4,12 +4,23 @@ from abc import ABC, abstractmethod
 class DataSource(ABC):
     """Interface for container from which data can be arbitrarily extracted
 
+    Data sources which can select messages by themselves accept a predicate
+    before they are initialized (see where()), so messages which are not
+    selected are dropped as early as possible; by default, predicates are not
+    pushed down and messages are filtered after extraction (see ETL.where()).
+
+    Properties:
+        stats(dict): parameters and counters of the data source, reported in the
+                     statistics of an ETL run (empty by default)
+
     Methods:
         __enter__(): context manager entrance; ensure proper source initialization
         __exit__(): context manager exit; ensure proper source termination
+        where(predicate): push a predicate down into the data source
         initialize(): prepare the data source for message extraction
         has_message(): indicate whether there is an available message for extraction
         read(): extract a single message
+        read_batch(batch_size): extract the next batch of messages
         close(): terminate the connection to the data source
     """
 
@@ -23,6 +34,25 @@ class DataSource(ABC):
         """Ensure proper source termination"""
         pass
 
+    @property
+    def stats(self) -> dict:
+        """Parameters and counters of the data source (empty by default)"""
+        return {}
+
+    def where(self, predicate) -> bool:
+        """Push a predicate down into the data source, before it is initialized
+
+        By default, predicates are not supported, and the caller must filter the
+        extracted messages itself.
+
+        :param predicate: condition which selects the extracted messages
+        :type predicate: Predicate
+
+        :return: true if only selected messages are extracted from now on
+        :rtype: bool
+        """
+        return False
+
     @abstractmethod
     def initialize(self) -> None:
         """Prepare the data source for message extraction"""
@@ -46,6 +76,25 @@ class DataSource(ABC):
         """
         pass
 
+    def read_batch(self, batch_size: int) -> list:
+        """Extract the next batch of messages from the data source
+
+        By default, up to 'batch_size' messages are extracted one by one. Data
+        sources which produce messages in batches of their own (e.g. pre-encoded
+        batches, see EncodedBatch) may override this method and return them whole.
+        The data source must have a message available (see has_message()).
+
+        :param batch_size: number of messages per batch
+        :type batch_size: int
+
+        :return: bodies of the extracted messages
+        :rtype: list
+        """
+        batch = [self.read()]
+        while len(batch) < batch_size and self.has_message():
+            batch.append(self.read())
+        return batch
+
     @abstractmethod
     def close(self) -> None:
         """Clean up the source and terminate the connection to it"""
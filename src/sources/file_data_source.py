@@ -1,8 +1,15 @@
-import json
+import codecs
+import io
+import os
 from collections import deque
 from typing import Iterator
 from io import StringIO
 
+from src.encoded_batch import EncodedBatch, encode_chunk
+from src.file_index import FileIndex
+from src.json_backends import get_backend
+from src.predicates import Predicate, TsBetween
+from src.raw_message import RawMessage
 from src.sources.data_source import DataSource
 from src.exceptions.file_not_open_error import FileNotOpenError
 from src.exceptions.file_source_depleted import FileSourceDepleted
@@ -22,50 +29,221 @@ class FileDataSource(DataSource):
     does not complete a full JSON object by itself, i.e. is not a full message, is
     written to a string stream and later prepended to the next loaded chunk.
 
-    Every time the data source is queried for a new message the leftmost string
-    message of the internal queue is popped and deserialized from JSON to a Python
-    dictionary.
+    Every time the data source is queried for a new message and no deserialized
+    messages are left, all complete string messages of the internal queue are
+    deserialized from JSON to Python dictionaries at once, with a single call to
+    the JSON decoder backend (see JSONBackend.loads_batch()). The backend is
+    pluggable: 'orjson' or 'simdjson' is picked automatically if installed,
+    otherwise the standard library's 'json' is used.
+
+    In auto-tune mode, the chunk size is picked when the source file is opened,
+    with respect to the file size and the block size of the filesystem: the file
+    is read in roughly AUTO_READS_PER_FILE chunks of at least AUTO_MIN_CHUNK_SIZE
+    and at most AUTO_MAX_CHUNK_SIZE bytes, rounded up to a whole number of blocks.
+    The file is opened in unbuffered binary mode and every chunk is read into the
+    same preallocated buffer via 'readinto', then decoded by an incremental UTF-8
+    decoder, so no intermediate byte strings are allocated and multibyte
+    characters may span chunk boundaries. The chosen parameters are reported
+    via 'stats'.
+
+    In raw mode, messages are not deserialized: every message is handed over as
+    a RawMessage which holds its original text and decodes its fields lazily.
+    Incomplete string messages are recognized by their missing enclosing
+    parentheses ('{}') instead of a failed deserialization.
+
+    In process mode, the data source only reads the source file: chunks of
+    complete messages are shipped to a pool of worker processes, which decode the
+    messages, validate and split their timestamps and return them as batches
+    pre-encoded for COPY (see EncodedBatch). Thus, parsing scales across cores.
+    Chunks are decoded concurrently, but handed over in the order of the file.
+    Batches are extracted whole via 'read_batch' (large chunks, e.g. in auto-tune
+    mode, are recommended), while 'read' decodes them back into messages.
+
+    Optionally, the data source reads only a part of the file: messages from a
+    given message number on ('start'), within a byte range which starts and ends
+    at message boundaries ('byte_range', see FileIndex.partitions()), or within
+    a range of timestamps ('ts_range'). With a sidecar offset index (see
+    FileIndex), which is loaded - or built and saved, if it is missing or stale,
+    and only kept in memory, if it cannot be saved - when the source file is
+    opened, the data source seeks right to the block of the first message, and
+    only reads the blocks whose timestamps overlap the range; messages of those
+    blocks outside the range are dropped. Without an index, the skipped messages
+    are scanned, but not decoded. The file is then read in binary mode, and the
+    read chunks are decoded incrementally.
+
+    A predicate may be pushed down into the data source (see where()), e.g. to
+    extract only messages with a few keys. Its prefilter rejects most messages
+    which are not selected by their text alone, before they are decoded (or
+    shipped to worker processes), and the decoded messages are then checked
+    exactly. The timestamp range is applied as a predicate as well.
+
+    Class attributes:
+        AUTO_MIN_CHUNK_SIZE(int): smallest auto-tuned chunk size, in bytes
+        AUTO_MAX_CHUNK_SIZE(int): largest auto-tuned chunk size, in bytes
+        AUTO_READS_PER_FILE(int): targeted number of reads per file in auto-tune mode
 
     Attributes:
         source_filepath(str): path to source JSON file
         chunk_size(int): size of string chunks, read from the source file
-        _source_file(TextIOWrapper): text stream from source JSON file
+        auto_tune(bool): pick the chunk size from file and block size and read
+                         into a reused buffer
+        raw(bool): hand over raw messages instead of deserialized ones
+        decoder(str): name of the JSON decoder backend, or "auto"
+        processes(int): number of worker processes which decode chunks (default
+                        is None, i.e. messages are decoded by the calling process)
+        index(bool|str): use a sidecar offset index - true for the default path of
+                         the index file, or the path to the index file
+        start(int): number of the first extracted message (starting at 0)
+        byte_range(tuple): start and end of the read byte range, or None
+        ts_range(tuple): earliest and latest timestamp of the extracted messages
+                         (either may be None), or None
+        predicate(Predicate): condition which selects the extracted messages, or None
+        file_index(FileIndex): sidecar offset index of the source file, or None
+        block_size(int): block size of the filesystem, in bytes
+        file_size(int): size of the source file, in bytes
+        _source_file(TextIOWrapper|FileIO): text stream (or raw binary stream in
+                                            auto-tune mode) from source JSON file
+        _buffer(bytearray): preallocated buffer, reused by every read in auto-tune mode
+        _buffer_view(memoryview): view of the preallocated buffer
+        _decoder(codecs.IncrementalDecoder): UTF-8 decoder of the read chunks
+        _reads(int): number of chunks read from the source file
+        _json_backend(JSONBackend): JSON decoder backend
         _loaded_messages(deque): queue of preloaded string messages
+        _decoded_messages(deque): queue of deserialized messages
         _text_chunk_prepend(StringIO): string stream, used to prepend incomplete
                                        string messages to the next chunk of data
         _finished_reading(bool): true if the source file is depleted, false otherwise
+        _executor(ProcessPoolExecutor): pool of worker processes (process mode)
+        _pending_batches(deque): futures of pre-encoded batches, in file order
+        _ready_batch(EncodedBatch): next non-empty pre-encoded batch, or None
+        _segments(deque): byte ranges which remain to be read, or None if the
+                          whole file is read
+        _skip_messages(int): number of messages which remain to be skipped
+        _predicate(Predicate): conjunction of the predicate and the timestamp
+                               range, or None if all messages are extracted
+        _prefiltered(int): number of messages rejected before they were decoded
 
     Properties:
         is_open(bool): true if source JSON file has been opened, false otherwise
+        stats(dict): chunk size, block size, file size, auto-tune mode, number of
+                     reads, JSON decoder backend, number of worker processes, number
+                     of indexed messages and number of prefiltered messages
 
     Methods:
         __enter__(): (see DataSource)
         __exit__(): (see DataSource)
+        where(predicate): push a predicate down into the data source
         initialize(): open the source file in 'read' mode
         has_message(): indicate whether there is an available message for extraction
-        read(): extract and deserialize a single JSON message
-        close(): close the source file
+        read(): extract and deserialize a single JSON message (or a raw message)
+        read_batch(batch_size): extract the next batch of messages (or the next
+                                pre-encoded batch in process mode)
+        close(): close the source file and shut down the worker processes
         _load_chunk(): load the next chunk of text data from the source file
+        _read_text_chunk(): read and decode the next chunk of text from the source file
+        _read_chunk(): read the next chunk of bytes into the preallocated buffer
+        _read_segment_chunk(): read the next chunk of bytes of the remaining byte ranges
+        _plan_segments(): get the byte ranges which hold the extracted messages
+        _skip_loaded_messages(): drop loaded string messages which are skipped
+        _submit_chunks(): ship chunks of complete messages to the worker processes
+        _next_encoded_batch(): wait for the next non-empty pre-encoded batch
+        _decode_loaded_messages(): deserialize all complete string messages at once
+        _decode_text_messages(text_messages): deserialize complete string messages
+        _combine_predicates(): combine the predicate and the timestamp range
+
+    Class methods:
+        _tune_chunk_size(file_size, block_size): pick the chunk size for a file
 
     Static methods:
         _split_json_chunk(chunk, prepend): properly split a JSON text chunk into
                                            multiple strings of JSON objects
     """
 
-    def __init__(self, source_filepath: str, chunk_size: int = 256) -> None:
+    AUTO_MIN_CHUNK_SIZE = 1024 * 1024
+    AUTO_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+    AUTO_READS_PER_FILE = 64
+
+    def __init__(self, source_filepath: str, chunk_size: int = 256, auto_tune: bool = False,
+                 raw: bool = False, decoder: str = "auto", processes: int = None, index=False,
+                 start: int = 0, byte_range: tuple = None, ts_range: tuple = None,
+                 predicate: Predicate = None) -> None:
         """Construct file data source
 
         :param source_filepath: path to source JSON file
         :type source_filepath: str
-        :param chunk_size: size of text chunks, in bytes
+        :param chunk_size: size of text chunks, in bytes (ignored in auto-tune mode)
         :type chunk_size: int
+        :param auto_tune: pick the chunk size from file and block size and read
+                          into a reused buffer
+        :type auto_tune: bool
+        :param raw: hand over raw messages instead of deserialized ones
+        :type raw: bool
+        :param decoder: name of the JSON decoder backend ("orjson", "simdjson",
+                        "json"), or "auto" for the fastest installed one
+        :type decoder: str
+        :param processes: number of worker processes which decode chunks
+        :type processes: int
+        :param index: use a sidecar offset index - true for the default path of the
+                      index file (see FileIndex.index_filepath_of()), or the path
+                      to the index file
+        :type index: bool|str
+        :param start: number of the first extracted message (starting at 0)
+        :type start: int
+        :param byte_range: start and end of the read byte range, which must start
+                           and end at message boundaries
+        :type byte_range: tuple
+        :param ts_range: earliest and latest timestamp (with timezone) of the
+                         extracted messages, either of which may be None
+        :type ts_range: tuple
+        :param predicate: condition which selects the extracted messages
+        :type predicate: Predicate
+
+        :raises ValueError: unknown JSON decoder backend, invalid number of worker
+                            processes, process mode combined with raw mode, invalid
+                            part of the file or improperly formatted timestamp
+        :raises ModuleNotFoundError: JSON decoder backend is not installed
         """
+        if processes is not None and processes < 1:
+            raise ValueError(f"Number of processes must be a positive integer: {processes}")
+        if processes is not None and raw:
+            raise ValueError("Raw mode cannot be combined with process mode")
+        if start < 0:
+            raise ValueError(f"Number of the first message must not be negative: {start}")
+        if start > 0 and byte_range is not None:
+            raise ValueError("First message cannot be combined with a byte range")
+        if ts_range is not None and not index:
+            raise ValueError("Timestamp range requires an index")
         self.source_filepath = source_filepath
         self.chunk_size = chunk_size
+        self.auto_tune = auto_tune
+        self.raw = raw
+        self.decoder = decoder
+        self.processes = processes
+        self.index = index
+        self.start = start
+        self.byte_range = tuple(byte_range) if byte_range is not None else None
+        self.ts_range = tuple(ts_range) if ts_range is not None else None
+        self.predicate = predicate
+        self.file_index = None
+        self.block_size = None
+        self.file_size = None
         self._source_file = None
+        self._buffer = None
+        self._buffer_view = None
+        self._decoder = None
+        self._reads = 0
+        self._json_backend = get_backend(decoder)
         self._loaded_messages = deque()
+        self._decoded_messages = deque()
         self._text_chunk_prepend = StringIO()
         self._finished_reading = False
+        self._executor = None
+        self._pending_batches = deque()
+        self._ready_batch = None
+        self._segments = None
+        self._skip_messages = 0
+        self._prefiltered = 0
+        self._predicate = self._combine_predicates()
 
     def __enter__(self):
         """Ensure proper initialization of file data source"""
@@ -83,9 +261,74 @@ class FileDataSource(DataSource):
             return False
         return not self._source_file.closed
 
+    @property
+    def stats(self) -> dict:
+        """Chunk size, block size, file size, auto-tune mode, number of reads, decoder,
+        number of worker processes, number of indexed messages and number of
+        prefiltered messages (in the calling process)"""
+        return {
+            "chunk_size": self.chunk_size,
+            "block_size": self.block_size,
+            "file_size": self.file_size,
+            "auto_tune": self.auto_tune,
+            "reads": self._reads,
+            "decoder": self._json_backend.name,
+            "processes": self.processes,
+            "indexed_messages": self.file_index.message_count if self.file_index is not None else None,
+            "prefiltered_messages": self._prefiltered,
+        }
+
+    def where(self, predicate: Predicate) -> bool:
+        """Push a predicate down into the data source, before it is initialized
+
+        The predicate replaces any previous one, and is combined with the
+        timestamp range.
+
+        :param predicate: condition which selects the extracted messages
+        :type predicate: Predicate
+
+        :return: true, since only selected messages are extracted from now on
+        :rtype: bool
+        """
+        self.predicate = predicate
+        self._predicate = self._combine_predicates()
+        return True
+
     def initialize(self) -> None:
-        """Open the source JSON file in 'read' mode"""
-        self._source_file = open(self.source_filepath, 'r')
+        """Open the source JSON file in 'read' mode
+
+        In auto-tune mode, the file is opened in unbuffered binary mode, the chunk
+        size is picked and the read buffer is preallocated. If only a part of the
+        file is read, the index is loaded (or built) and the byte ranges which
+        hold the extracted messages are planned. In process mode, the worker
+        processes are started.
+        """
+        partial = self.index or self.start > 0 or self.byte_range is not None
+        if self.auto_tune:
+            self._source_file = open(self.source_filepath, 'rb', buffering=0)
+        elif partial:
+            self._source_file = open(self.source_filepath, 'rb')
+        else:
+            self._source_file = open(self.source_filepath, 'r')
+        file_stat = os.fstat(self._source_file.fileno())
+        self.block_size = getattr(file_stat, "st_blksize", 0) or io.DEFAULT_BUFFER_SIZE
+        self.file_size = file_stat.st_size
+        self._reads = 0
+        if self.auto_tune:
+            self.chunk_size = self._tune_chunk_size(self.file_size, self.block_size)
+            self._buffer = bytearray(self.chunk_size)
+            self._buffer_view = memoryview(self._buffer)
+            self._decoder = codecs.getincrementaldecoder("utf-8")()
+        if partial:
+            if self.index:
+                self.file_index = FileIndex.open(self.source_filepath, None if self.index is True else self.index)
+            self._decoder = codecs.getincrementaldecoder("utf-8")()
+            self._segments = deque(self._plan_segments())
+            self._finished_reading = len(self._segments) == 0
+        if self.processes is not None:
+            from concurrent.futures import ProcessPoolExecutor  # imported lazily, since it slows down startup
+
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
 
     def has_message(self) -> bool:
         """Indicate whether there is an available message for extraction
@@ -101,45 +344,100 @@ class FileDataSource(DataSource):
         if not self.is_open:
             raise FileNotOpenError(self.source_filepath)
 
-        if len(self._loaded_messages) == 0:  # preemptively load the next chunk
-            self._load_chunk()
-        return True if len(self._loaded_messages) > 0 else False
+        if self.processes is not None:
+            if len(self._decoded_messages) == 0 and self._ready_batch is None:
+                self._ready_batch = self._next_encoded_batch()
+            return len(self._decoded_messages) > 0 or self._ready_batch is not None
+        if len(self._decoded_messages) == 0 and len(self._loaded_messages) == 0:
+            self._load_chunk()  # preemptively load the next chunk
+        while self._predicate is not None and len(self._decoded_messages) == 0:  # none may be selected
+            if len(self._loaded_messages) == 0:
+                if self._finished_reading:
+                    return False
+                self._load_chunk()
+                continue
+            self._decode_loaded_messages()
+        return True if len(self._decoded_messages) > 0 or len(self._loaded_messages) > 0 else False
 
     def read(self) -> dict:
         """Extract and deserialize a single JSON message
 
-        When the data source is queried for a message, leftmost string of the
-        internal message queue is extracted and an attempt is made to deserialize
-        it from a JSON object to a Python dictionary. If the extracted string
-        message is incomplete or the internal message queue is empty, text chunks
-        are continuously loaded from the source file until a proper message is
-        constructed.
+        When the data source is queried for a message, the leftmost deserialized
+        message is extracted. If there are none, all complete string messages of
+        the internal message queue are deserialized at once. If the internal
+        message queue is empty or only holds an incomplete string message, text
+        chunks are continuously loaded from the source file until a proper message
+        is constructed. In raw mode, the leftmost string message is not
+        deserialized, but returned as a RawMessage.
 
         :raises FileNotOpenError: the source file must be opened
         :raises FileSourceDepleted: when reading is attempted on a depleted source file
 
         :return: body of the extracted message
-        :rtype: dict
+        :rtype: dict|RawMessage
         """
         if not self.is_open:
             raise FileNotOpenError(self.source_filepath)
 
+        if self.processes is not None and len(self._decoded_messages) == 0:
+            batch, self._ready_batch = self._ready_batch or self._next_encoded_batch(), None
+            if batch is None:
+                raise FileSourceDepleted(self.source_filepath)
+            self._decoded_messages.extend(batch)
         while True:  # keep loading chunks until a proper message is constructed
+            if len(self._decoded_messages) > 0:
+                return self._decoded_messages.popleft()
             if len(self._loaded_messages) == 0:  # load the next chunk
                 self._load_chunk()
                 if len(self._loaded_messages) == 0:
                     raise FileSourceDepleted(self.source_filepath)
+            self._decode_loaded_messages()
 
-            text_message = self._loaded_messages.popleft()  # retrieve the next message
-            try:
-                message = json.loads(text_message)
-            except json.JSONDecodeError:  # read text chunk cannot be parsed as valid json
-                self._text_chunk_prepend.write(text_message)
-            else:
-                return message
+    def read_batch(self, batch_size: int) -> list:
+        """Extract the next batch of messages
+
+        Deserialized messages are extracted in bulk. In process mode, the next
+        pre-encoded batch is returned whole, regardless of the batch size, unless
+        messages of a batch have already been extracted one by one.
+
+        :param batch_size: number of messages per batch
+        :type batch_size: int
+
+        :raises FileNotOpenError: the source file must be opened
+        :raises FileSourceDepleted: when reading is attempted on a depleted source file
+
+        :return: bodies of the extracted messages, or a pre-encoded batch
+        :rtype: list|EncodedBatch
+        """
+        if not self.is_open:
+            raise FileNotOpenError(self.source_filepath)
+
+        if self.processes is not None and len(self._decoded_messages) == 0:
+            batch, self._ready_batch = self._ready_batch or self._next_encoded_batch(), None
+            if batch is None:
+                raise FileSourceDepleted(self.source_filepath)
+            return batch
+        batch = []
+        while len(batch) < batch_size and self.has_message():
+            if len(self._decoded_messages) == 0:
+                try:
+                    batch.append(self.read())  # deserializes the next chunk
+                except FileSourceDepleted:  # only an incomplete message was left
+                    if len(batch) > 0:
+                        break
+                    raise
+            count = min(batch_size - len(batch), len(self._decoded_messages))
+            batch.extend([self._decoded_messages.popleft() for _ in range(count)])
+        if len(batch) == 0:
+            raise FileSourceDepleted(self.source_filepath)
+        return batch
 
     def close(self) -> None:
-        """Close the source JSON file"""
+        """Close the source JSON file and shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            self._pending_batches.clear()
         self._source_file.close()
 
     def _load_chunk(self) -> None:
@@ -151,16 +449,248 @@ class FileDataSource(DataSource):
 
         When the source file is fully read a boolean flag is set, indicating that
         the data source has finished reading and will not try to load any more
-        chunks in the future.
+        chunks in the future. Skipped messages are dropped right away, and chunks
+        are loaded until any messages are left (or the file is fully read).
         """
-        if not self._finished_reading:
+        while not self._finished_reading:
+            text_chunk = self._read_text_chunk()
+            self._loaded_messages.extend(self._split_json_chunk(text_chunk, self._text_chunk_prepend.getvalue()))
+            # flush text chunk string stream
+            self._text_chunk_prepend.truncate(0)
+            self._text_chunk_prepend.seek(0)
+            self._skip_loaded_messages()
+            if len(self._loaded_messages) > 0:
+                break
+
+    def _read_text_chunk(self) -> str:
+        """Read and decode the next chunk of text from the source file
+
+        When the source file is fully read, the finished reading flag is set.
+
+        :return: chunk of text
+        :rtype: str
+        """
+        if self._segments is not None:
+            data = self._read_segment_chunk()
+            text_chunk = self._decoder.decode(data, final=self._finished_reading)
+        elif self.auto_tune:
+            bytes_read = self._read_chunk()
+            if bytes_read < self.chunk_size:  # file has been fully read (reached EOF)
+                self._finished_reading = True
+            text_chunk = self._decoder.decode(self._buffer_view[:bytes_read], final=self._finished_reading)
+        else:
             text_chunk = self._source_file.read(self.chunk_size)
             if len(text_chunk) < self.chunk_size:  # file has been fully read (reached EOF)
                 self._finished_reading = True
-            self._loaded_messages.extend(self._split_json_chunk(text_chunk, self._text_chunk_prepend.getvalue()))
-            # flush text chunk string stream
+        self._reads += 1
+        return text_chunk
+
+    def _submit_chunks(self) -> None:
+        """Ship chunks of complete messages to the worker processes
+
+        Chunks are read until there are two pending chunks per worker process, so
+        that the workers are kept busy while the batches are dumped. Every chunk is
+        cut after its last complete message (its last '}'), and the remainder is
+        prepended to the next chunk.
+        """
+        while len(self._pending_batches) < 2 * self.processes and not self._finished_reading:
+            text_chunk = self._text_chunk_prepend.getvalue() + self._read_text_chunk()
             self._text_chunk_prepend.truncate(0)
             self._text_chunk_prepend.seek(0)
+            if not self._finished_reading:
+                end = text_chunk.rfind('}') + 1
+                self._text_chunk_prepend.write(text_chunk[end:])
+                text_chunk = text_chunk[:end]
+            if self._skip_messages > 0:  # skipped messages are not shipped
+                text_messages = list(self._split_json_chunk(text_chunk))
+                skipped = min(self._skip_messages, len(text_messages))
+                self._skip_messages -= skipped
+                text_chunk = ",".join(text_messages[skipped:])
+            if len(text_chunk.strip()) > 0:
+                self._pending_batches.append(
+                    self._executor.submit(encode_chunk, text_chunk, self.decoder, self._predicate))
+
+    def _next_encoded_batch(self) -> EncodedBatch:
+        """Wait for the next non-empty pre-encoded batch
+
+        :raises ValueError: invalid JSON message or improperly formatted timestamp
+
+        :return: next pre-encoded batch, or None if the source file is depleted
+        :rtype: EncodedBatch
+        """
+        while True:
+            self._submit_chunks()
+            if len(self._pending_batches) == 0:
+                return None
+            batch = self._pending_batches.popleft().result()
+            if len(batch) > 0:
+                return batch
+
+    def _read_chunk(self) -> int:
+        """Read the next chunk of bytes into the preallocated buffer
+
+        Reading is repeated until the buffer is full or the end of the file is
+        reached, since raw reads may return fewer bytes than requested.
+
+        :return: number of bytes read into the buffer
+        :rtype: int
+        """
+        bytes_read = 0
+        while bytes_read < self.chunk_size:
+            count = self._source_file.readinto(self._buffer_view[bytes_read:])
+            if not count:  # reached EOF
+                break
+            bytes_read += count
+        return bytes_read
+
+    def _read_segment_chunk(self) -> bytes:
+        """Read the next chunk of bytes of the remaining byte ranges
+
+        A chunk never spans two byte ranges. After the last byte range has been
+        read, the finished reading flag is set.
+
+        :return: chunk of bytes
+        :rtype: bytes
+        """
+        data = b""
+        while len(self._segments) > 0 and len(data) == 0:
+            start, end = self._segments[0]
+            position = self._source_file.tell()
+            if not start <= position < end:  # jump to the next byte range
+                self._source_file.seek(start)
+                position = start
+            data = self._source_file.read(min(self.chunk_size, end - position))
+            if len(data) == 0 or position + len(data) >= end:
+                self._segments.popleft()
+        self._finished_reading = len(self._segments) == 0
+        return data
+
+    def _plan_segments(self) -> list:
+        """Get the byte ranges which hold the extracted messages
+
+        With an index, reading starts at the block of the first extracted message
+        and only the blocks which overlap the timestamp range are read. The
+        messages before the first extracted one within its block are skipped.
+
+        :return: byte ranges (start, end) in the order of the file
+        :rtype: list
+        """
+        lower, upper = self.byte_range if self.byte_range is not None else (0, self.file_size)
+        self._skip_messages = self.start
+        if self.file_index is not None and self.start > 0:
+            if self.start >= self.file_index.message_count:
+                return []
+            block = self.file_index.block_of(self.start)
+            lower = self.file_index.offsets[block]
+            self._skip_messages = self.start - block * self.file_index.stride
+        if self.ts_range is None:
+            return [(lower, upper)] if lower < upper else []
+        segments = self.file_index.segments(*self.ts_range, lower=lower, upper=upper)
+        if len(segments) == 0 or segments[0][0] != lower:  # the block of the first message is not read
+            self._skip_messages = 0
+        return segments
+
+    def _skip_loaded_messages(self) -> None:
+        """Drop loaded string messages which are skipped
+
+        Only complete string messages are dropped. An incomplete one at the end
+        of the chunk is prepended to the next chunk, which completes it.
+        """
+        while self._skip_messages > 0 and len(self._loaded_messages) > 0:
+            text_message = self._loaded_messages.popleft()
+            if not (text_message.startswith('{') and text_message.endswith('}')):
+                self._text_chunk_prepend.write(text_message)
+                return
+            self._skip_messages -= 1
+
+    def _decode_loaded_messages(self) -> None:
+        """Deserialize all complete string messages at once
+
+        The last string message of a chunk is usually incomplete, so it is not
+        decoded, but prepended to the next chunk unless it is enclosed in '{}'.
+        If the batch cannot be decoded at once, the string messages are decoded
+        one by one and any string message which cannot be parsed as valid JSON
+        is prepended to the next chunk as well. In raw mode, the complete string
+        messages are wrapped in raw messages instead. Messages which are not
+        selected by the predicate (if any) are dropped, mostly before decoding.
+        """
+        text_messages = list(self._loaded_messages)
+        self._loaded_messages.clear()
+        incomplete_message = None
+        if not (text_messages[-1].startswith('{') and text_messages[-1].endswith('}')):
+            incomplete_message = text_messages.pop()
+        if self._predicate is not None:
+            count = len(text_messages)
+            text_messages = [text_message for text_message in text_messages if self._predicate.prefilter(text_message)]
+            self._prefiltered += count - len(text_messages)
+        if self.raw:
+            messages = [RawMessage(text_message) for text_message in text_messages]
+        else:
+            messages = self._decode_text_messages(text_messages)
+        if self._predicate is not None:
+            messages = [message for message in messages if self._predicate.matches(message)]
+        self._decoded_messages.extend(messages)
+        if incomplete_message is not None:
+            self._text_chunk_prepend.write(incomplete_message)
+
+    def _decode_text_messages(self, text_messages: list) -> list:
+        """Deserialize complete string messages at once, or one by one if that fails
+
+        String messages which cannot be parsed as valid JSON are prepended to the
+        next chunk.
+
+        :param text_messages: complete string messages
+        :type text_messages: list
+
+        :return: bodies of the deserialized messages
+        :rtype: list
+        """
+        try:
+            messages = self._json_backend.loads_batch(text_messages)
+        except self._json_backend.decode_error:
+            messages = []
+            for text_message in text_messages:
+                try:
+                    messages.append(self._json_backend.loads(text_message))
+                except self._json_backend.decode_error:  # text cannot be parsed as valid json
+                    self._text_chunk_prepend.write(text_message)
+        return messages
+
+    def _combine_predicates(self) -> Predicate:
+        """Combine the predicate and the timestamp range into a single predicate
+
+        :raises ValueError: improperly formatted timestamp
+
+        :return: conjunction of the predicate and the timestamp range, or None
+        :rtype: Predicate
+        """
+        predicates = [] if self.predicate is None else [self.predicate]
+        if self.ts_range is not None:
+            predicates.append(TsBetween(*self.ts_range))
+        if len(predicates) == 0:
+            return None
+        return predicates[0] if len(predicates) == 1 else predicates[0] & predicates[1]
+
+    @classmethod
+    def _tune_chunk_size(cls, file_size: int, block_size: int) -> int:
+        """Pick the chunk size for a file
+
+        Small files are read at once, while large ones are read in about
+        AUTO_READS_PER_FILE chunks within the auto-tuned chunk size limits. The
+        chunk size is always a multiple of the block size.
+
+        :param file_size: size of the file, in bytes
+        :type file_size: int
+        :param block_size: block size of the filesystem, in bytes
+        :type block_size: int
+
+        :return: chunk size, in bytes
+        :rtype: int
+        """
+        chunk_size = file_size // cls.AUTO_READS_PER_FILE
+        chunk_size = min(cls.AUTO_MAX_CHUNK_SIZE, max(cls.AUTO_MIN_CHUNK_SIZE, chunk_size))
+        chunk_size = min(chunk_size, max(file_size, 1))  # small files are read at once
+        return -(-chunk_size // block_size) * block_size  # round up to a whole number of blocks
 
     @staticmethod
     def _split_json_chunk(chunk: str, prepend: str = "") -> Iterator[str]:
@@ -180,22 +710,34 @@ class FileDataSource(DataSource):
         :rtype: Iterator[str]
         """
         # Split the json chunk into multiple json strings
-        chunk = (prepend + chunk).strip()
+        chunk = (prepend + chunk).lstrip()  # trailing whitespace may belong to an incomplete object
         if len(chunk) == 0:
             return []
         result = []
-        in_json_message = False
         start_index = 0
-        for i in range(len(chunk)):
-            if chunk[i] == '{':
-                in_json_message = True
-            elif chunk[i] == '}':
-                in_json_message = False
-            elif chunk[i] == ',' and not in_json_message:
-                result.append(chunk[start_index:i])
-                start_index = i + 1
-        result.append(chunk[start_index:i+1])
+        position = 0
+        incomplete = False
+        while True:  # jump between JSON objects instead of inspecting every character
+            object_start = chunk.find('{', position)
+            outside_end = object_start if object_start != -1 else len(chunk)
+            comma = chunk.find(',', position, outside_end)
+            while comma != -1:  # only commas outside of JSON objects separate them
+                result.append(chunk[start_index:comma])
+                start_index = comma + 1
+                comma = chunk.find(',', start_index, outside_end)
+            if object_start == -1:
+                break
+            object_end = chunk.find('}', object_start)
+            if object_end == -1:  # incomplete JSON object at the end of the chunk
+                incomplete = True
+                break
+            position = object_end + 1
+        tail = chunk[start_index:]
 
         # Clean up the result
-        result = map(lambda s: s.replace('[', '', 1).replace(']', '', 1).strip(), result)
+        result = [s.replace('[', '', 1).replace(']', '', 1).strip() for s in result]
+        if incomplete:  # whitespace at the end of an incomplete object may be part of a string
+            result.append(tail.replace('[', '', 1).lstrip())
+        else:
+            result.append(tail.replace('[', '', 1).replace(']', '', 1).strip())
         return (s for s in result if len(s) > 0)
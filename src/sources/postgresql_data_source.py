@@ -0,0 +1,494 @@
+import queue
+import threading
+from collections import deque
+
+import psycopg2
+import psycopg2.pool
+
+from src.predicates import Predicate
+from src.sources.data_source import DataSource
+from src.exceptions.database_source_depleted import DatabaseSourceDepleted
+from src.timestamps import format_tz_offset
+
+
+class PostgreSQLDataSource(DataSource):
+    """Data source which retrieves messages from a PostgreSQL database
+
+    This data source reads the message table which is managed by PostgreSQLDataSink,
+    in either of its table layouts, and emits messages in the same format which
+    the file and simulation data sources use:
+        `{"key": <value>, "value": <value>, "ts": <value>}`
+
+    Rows are streamed through a named (server-side) cursor, which fetches
+    'itersize' rows per round trip. Therefore, the memory used by the data source
+    is constant, regardless of the size of the message table. Optionally, only
+    messages whose key and/or timestamp fall within given ranges are retrieved,
+    and a predicate may be pushed down (see where()), which is translated into
+    a WHERE clause - so messages which are not selected never leave the server.
+
+    For large tables, the scan may be split into several ranges of 'id' or 'ts',
+    which are exported concurrently by worker threads over a pool of connections.
+    Each worker pages through its range via keyset pagination, i.e. every page
+    continues after the last row of the previous one instead of using OFFSET,
+    and hands over pages of messages through a bounded queue. Messages are either
+    emitted in the order of the split column (ranges are emitted one after the
+    other, while later ranges are prefetched) or in whichever order pages arrive.
+    Pages of a split by 'ts' are ordered by 'ts' and 'id', which requires a B-tree
+    index on both columns (see PostgreSQLDataSink's 'export_index'); otherwise,
+    every page would sort its whole range again, so the export refuses to start.
+
+    Class attributes:
+        MESSAGE_TABLE_NAME(str): name of database table where messages are stored
+        KEY_TABLE_NAME(str): name of lookup table of message keys (compact layout)
+        CURSOR_NAME(str): name of the server-side cursor
+        SPLIT_COLUMNS(tuple): columns by which the scan may be split into ranges
+
+    Attributes:
+        dbname(str): database name
+        dbuser(str): valid PostgreSQL database user
+        dbpassword(str): password for valid PostgreSQL database user
+        dbhost(str): ip address of PostgreSQL host (default is "localhost")
+        dbport(int): port on which PostgreSQL is running (default is "5432")
+        itersize(int): number of rows fetched from the server per round trip
+        key_range(tuple): inclusive range of retrieved message keys (default is
+                          None, i.e. messages with any key are retrieved)
+        ts_range(tuple): inclusive range of retrieved message timestamps without
+                         timezone info (default is None, i.e. any timestamp)
+        predicate(Predicate): condition which selects the retrieved messages, or None
+        compact(bool): true if messages are stored in the compact table layout
+        workers(int): number of concurrently exported ranges (default is 1, i.e.
+                      the table is scanned through a single cursor)
+        split_column(str): column by which the scan is split - "id" or "ts"
+        ordered(bool): true if messages are emitted in the order of the split
+                       column, false if they are emitted in order of arrival
+        queue_depth(int): number of pages buffered per worker
+        _connection(psycopg2.extensions.connection): established and active connection
+                                                     to the PostgreSQL database
+        _cursor(psycopg2.extensions.cursor): named cursor over the retrieved rows
+        _next_row(tuple): row which has been fetched, but not yet read
+        _pool(psycopg2.pool.ThreadedConnectionPool): connections of the workers
+        _threads(list): worker threads
+        _queues(list): queues of pages of messages, one per range if ordered
+        _active_queues(deque): queues which have not been depleted yet
+        _pending(deque): messages of the current page which have not been read
+        _stop(threading.Event): set when the workers must stop exporting
+
+    Methods:
+        __enter__(): (see DataSource)
+        __exit__(): (see DataSource)
+        where(predicate): push a predicate down into the query
+        initialize(): connect to the database and start the scan
+        has_message(): indicate whether there is an available message for extraction
+        read(): extract a single message
+        close(): stop the scan and terminate the connections to the database
+        _select_clause(columns): build the query prefix and filters of retrieved messages
+        _select_query(): build the query and parameters which select messages
+        _fetch_next_row(): fetch the next row from the cursor, if required
+        _start_workers(): split the scan into ranges and start exporting them
+        _check_split_index(cur): ensure that the split by 'ts' is served by an index
+        _split_ranges(lowest, highest): split the values of the split column
+        _export_range(lower, upper, inclusive, output): export a single range
+        _put(output, item): put an item in a queue, unless the workers must stop
+        _fetch_next_page(): receive the next page of messages from the workers
+
+    Static methods:
+        _row_to_message(row): convert a database table row to a message
+    """
+
+    MESSAGE_TABLE_NAME = "Message"
+    KEY_TABLE_NAME = f"{MESSAGE_TABLE_NAME}Key"
+    CURSOR_NAME = "message_source"
+    SPLIT_COLUMNS = ("id", "ts")
+
+    _RANGE_EXPORTED = object()  # sentinel, put in a queue when a range is exported
+
+    def __init__(self, dbname: str, dbuser: str, dbpassword: str,
+                 dbhost: str = "127.0.0.1", dbport: int = 5432, itersize: int = 2000,
+                 key_range: tuple = None, ts_range: tuple = None, compact: bool = False,
+                 workers: int = 1, split_column: str = "id", ordered: bool = True,
+                 queue_depth: int = 4, predicate: Predicate = None) -> None:
+        """Construct PostgreSQL data source
+
+        :param dbname: database name
+        :type dbname: str
+        :param dbuser: valid PostgreSQL database user
+        :type dbuser: str
+        :param dbpassword: password for valid PostgreSQL database user
+        :type dbpassword: str
+        :param dbhost: ip address of PostgreSQL host (default is "localhost")
+        :type dbhost: str
+        :param dbport: port on which PostgreSQL is running (default is "5432")
+        :type dbport: int
+        :param itersize: number of rows fetched from the server per round trip
+        :type itersize: int
+        :param key_range: inclusive range of retrieved message keys
+        :type key_range: tuple
+        :param ts_range: inclusive range of retrieved message timestamps
+        :type ts_range: tuple
+        :param compact: read messages stored in the compact table layout
+        :type compact: bool
+        :param workers: number of concurrently exported ranges
+        :type workers: int
+        :param split_column: column by which the scan is split - "id" or "ts"
+        :type split_column: str
+        :param ordered: emit messages in the order of the split column
+        :type ordered: bool
+        :param queue_depth: number of pages buffered per worker
+        :type queue_depth: int
+        :param predicate: condition which selects the retrieved messages
+        :type predicate: Predicate
+
+        :raises ValueError: unsupported split column or number of workers
+        """
+        if split_column not in self.SPLIT_COLUMNS:
+            raise ValueError(f"Unsupported split column: {split_column}")
+        if workers < 1:
+            raise ValueError(f"Number of workers must be a positive integer: {workers}")
+        self.dbname = dbname
+        self.dbuser = dbuser
+        self.dbpassword = dbpassword
+        self.dbhost = dbhost
+        self.dbport = dbport
+        self.itersize = itersize
+        self.key_range = key_range
+        self.ts_range = ts_range
+        self.compact = compact
+        self.workers = workers
+        self.split_column = split_column
+        self.ordered = ordered
+        self.queue_depth = queue_depth
+        self.predicate = predicate
+        self._connection = None
+        self._cursor = None
+        self._next_row = None
+        self._pool = None
+        self._threads = []
+        self._queues = []
+        self._active_queues = deque()
+        self._pending = deque()
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        """Ensure proper initialization of PostgreSQL data source"""
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of PostgreSQL data source"""
+        self.close()
+
+    def where(self, predicate: Predicate) -> bool:
+        """Push a predicate down into the query, before the scan is started
+
+        The predicate replaces any previous one, and is combined with the key and
+        timestamp ranges.
+
+        :param predicate: condition which selects the retrieved messages
+        :type predicate: Predicate
+
+        :return: true, since only selected messages are retrieved from now on
+        :rtype: bool
+        """
+        self.predicate = predicate
+        return True
+
+    def initialize(self) -> None:
+        """Connect to the database and start the scan
+
+        With a single worker, a server-side cursor is opened over the whole scan.
+        Otherwise, a pool of connections is opened and the workers are started.
+        Note that, unlike PostgreSQLDataSink, the data source does not create
+        the database if it does not exist.
+
+        :raises ValueError: the scan is split by 'ts', but there is no index on 'ts' and 'id'
+        """
+        if self.workers > 1:
+            self._pool = psycopg2.pool.ThreadedConnectionPool(self.workers, self.workers,
+                                                              database=self.dbname,
+                                                              user=self.dbuser, password=self.dbpassword,
+                                                              host=self.dbhost, port=str(self.dbport))
+            try:
+                self._start_workers()
+            except Exception:
+                self._pool.closeall()
+                raise
+            return
+        self._connection = psycopg2.connect(database=self.dbname,
+                                            user=self.dbuser, password=self.dbpassword,
+                                            host=self.dbhost, port=str(self.dbport))
+        self._cursor = self._connection.cursor(name=self.CURSOR_NAME)
+        self._cursor.itersize = self.itersize
+        self._cursor.execute(*self._select_query())
+        self._next_row = None
+
+    def has_message(self) -> bool:
+        """Indicate whether there is an available message for extraction
+
+        :return: status which indicates an available message
+        :rtype: bool
+        """
+        if self.workers > 1:
+            self._fetch_next_page()
+            return len(self._pending) > 0
+        self._fetch_next_row()
+        return self._next_row is not None
+
+    def read(self) -> dict:
+        """Extract a single message
+
+        :raises DatabaseSourceDepleted: when reading is attempted on a depleted source
+
+        :return: body of the extracted message
+        :rtype: dict
+        """
+        if self.workers > 1:
+            self._fetch_next_page()
+            if len(self._pending) == 0:
+                raise DatabaseSourceDepleted(self.dbname)
+            return self._pending.popleft()
+        self._fetch_next_row()
+        if self._next_row is None:
+            raise DatabaseSourceDepleted(self.dbname)
+        row, self._next_row = self._next_row, None
+        return self._row_to_message(row)
+
+    def close(self) -> None:
+        """Stop the scan and terminate the connections to the database"""
+        if self.workers > 1:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join()
+            self._pool.closeall()
+            return
+        try:
+            if self._cursor is not None and not self._cursor.closed:
+                self._cursor.close()
+        finally:
+            self._connection.close()
+
+    def _select_clause(self, columns: str = None) -> tuple:
+        """Build the query prefix and the filters of the retrieved messages
+
+        By default, the message's key, value, timestamp and timezone columns are
+        selected, followed by the 'id' column, which is used for keyset pagination.
+
+        :param columns: selected columns, instead of the default ones
+        :type columns: str
+
+        :return: SQL query prefix, list of WHERE conditions and their parameters
+        :rtype: tuple
+        """
+        if self.compact:
+            columns = columns or "k.key, m.value, m.ts, m.tz_offset, m.id"
+            query = f"""
+                SELECT {columns} FROM "{self.MESSAGE_TABLE_NAME}" m
+                JOIN "{self.KEY_TABLE_NAME}" k ON m.key_id = k.id
+            """
+            key_column = "k.key"
+            utc_ts_column = "m.ts - make_interval(mins => m.tz_offset)"
+        else:
+            columns = columns or "m.key, m.value, m.ts, m.tz, m.id"
+            query = f'SELECT {columns} FROM "{self.MESSAGE_TABLE_NAME}" m'
+            key_column = "m.key"
+            # the timezone text may be "+HH:MM", "+HHMM" or "+HH", which only timestamptz input accepts alike
+            utc_ts_column = "(m.ts::text || m.tz)::timestamptz AT TIME ZONE 'UTC'"
+        conditions, parameters = [], []
+        if self.key_range is not None:
+            conditions.append(f"{key_column} BETWEEN %s AND %s")
+            parameters.extend(self.key_range)
+        if self.ts_range is not None:
+            conditions.append("m.ts BETWEEN %s AND %s")
+            parameters.extend(self.ts_range)
+        if self.predicate is not None:
+            condition, condition_parameters = self.predicate.to_sql(
+                {"key": key_column, "ts": "m.ts", "utc_ts": f"({utc_ts_column})"})
+            conditions.append(f"({condition})")
+            parameters.extend(condition_parameters)
+        return query, conditions, parameters
+
+    def _select_query(self) -> tuple:
+        """Build the query and parameters which select the retrieved messages
+
+        :return: SQL query and its parameters
+        :rtype: tuple
+        """
+        query, conditions, parameters = self._select_clause()
+        if len(conditions) > 0:
+            query += " WHERE " + " AND ".join(conditions)
+        return query + " ORDER BY m.id;", parameters
+
+    def _fetch_next_row(self) -> None:
+        """Fetch the next row from the cursor, unless one is already fetched"""
+        if self._next_row is None:
+            self._next_row = self._cursor.fetchone()
+
+    def _start_workers(self) -> None:
+        """Split the scan into ranges and start exporting them concurrently
+
+        The lowest and highest values of the split column are queried first,
+        after which their interval is split into one range per worker.
+
+        :raises ValueError: the scan is split by 'ts', but there is no index on 'ts' and 'id'
+        """
+        split = f"m.{self.split_column}"
+        query, conditions, parameters = self._select_clause(f"MIN({split}), MAX({split})")
+        if len(conditions) > 0:
+            query += " WHERE " + " AND ".join(conditions)
+        connection = self._pool.getconn()
+        try:
+            with connection.cursor() as cur:
+                if self.split_column == "ts":
+                    self._check_split_index(cur)
+                cur.execute(query, parameters)
+                lowest, highest = cur.fetchone()
+            connection.rollback()
+        finally:
+            self._pool.putconn(connection)
+
+        self._stop.clear()
+        self._pending.clear()
+        if lowest is None:  # there are no messages to export
+            self._queues, self._threads = [], []
+        else:
+            ranges = self._split_ranges(lowest, highest)
+            if self.ordered:
+                self._queues = [queue.Queue(self.queue_depth) for _ in ranges]
+            else:
+                self._queues = [queue.Queue(self.queue_depth * len(ranges))]
+            self._threads = [
+                threading.Thread(target=self._export_range,
+                                 args=(lower, upper, i == 0, self._queues[i if self.ordered else 0]),
+                                 daemon=True)
+                for i, (lower, upper) in enumerate(ranges)
+            ]
+        # an unordered queue is depleted once every range has been exported
+        self._active_queues = deque(self._queues if self.ordered else self._queues * len(self._threads))
+        for thread in self._threads:
+            thread.start()
+
+    def _check_split_index(self, cur) -> None:
+        """Ensure that the pages of a split by 'ts' are served by a B-tree index on 'ts' and 'id'
+
+        :param cur: cursor of a worker connection
+        :type cur: psycopg2.extensions.cursor
+
+        :raises ValueError: there is no such index on the message table
+        """
+        cur.execute("""
+            SELECT 1 FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = %s AND indexdef ~ 'USING btree \\(ts, id[,)]';
+        """, (self.MESSAGE_TABLE_NAME,))
+        if cur.fetchone() is None:
+            raise ValueError(f'Splitting by "ts" requires a B-tree index on "{self.MESSAGE_TABLE_NAME}" (ts, id), '
+                             f'e.g. built by PostgreSQLDataSink(indexes=True, export_index=True)')
+
+    def _split_ranges(self, lowest, highest) -> list:
+        """Split the values of the split column into one range per worker
+
+        :param lowest: lowest value of the split column
+        :type lowest: int or datetime
+        :param highest: highest value of the split column
+        :type highest: int or datetime
+
+        :return: list of (lower, upper) bounds of consecutive ranges
+        :rtype: list
+        """
+        span = highest - lowest
+        if self.split_column == "id":
+            bounds = [lowest + span * i // self.workers for i in range(self.workers)]
+        else:
+            bounds = [lowest + span * i / self.workers for i in range(self.workers)]
+        bounds.append(highest)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _export_range(self, lower, upper, inclusive: bool, output: queue.Queue) -> None:
+        """Export a single range of messages via keyset pagination
+
+        The range contains all messages whose split column value is greater than
+        (or equal to, if inclusive) the lower bound and not greater than the upper
+        bound. Pages are ordered by the split column (and 'id', which breaks ties
+        between timestamps), and every page continues after the last row of the
+        previous one. Any error is handed over to the reader via the queue.
+
+        :param lower: lower bound of the range
+        :type lower: int or datetime
+        :param upper: inclusive upper bound of the range
+        :type upper: int or datetime
+        :param inclusive: true if the lower bound is inclusive, false otherwise
+        :type inclusive: bool
+        :param output: queue where pages of messages are put
+        :type output: queue.Queue
+        """
+        split = f"m.{self.split_column}"
+        keyset = "m.id" if self.split_column == "id" else "m.ts, m.id"
+        query, conditions, parameters = self._select_clause()
+        conditions = conditions + [f"{split} {'>=' if inclusive else '>'} %s", f"{split} <= %s"]
+        parameters = parameters + [lower, upper]
+        connection = self._pool.getconn()
+        try:
+            last = None
+            with connection.cursor() as cur:
+                while not self._stop.is_set():
+                    page_conditions, page_parameters = conditions, parameters
+                    if last is not None:  # continue after the last row of the previous page
+                        page_conditions = conditions + [f"({keyset}) > %s"]
+                        page_parameters = parameters + [last]
+                    cur.execute(f"{query} WHERE {' AND '.join(page_conditions)} "
+                                f"ORDER BY {keyset} LIMIT %s;", page_parameters + [self.itersize])
+                    rows = cur.fetchall()
+                    if len(rows) > 0:
+                        self._put(output, [self._row_to_message(row) for row in rows])
+                        last = (rows[-1][4],) if self.split_column == "id" else (rows[-1][2], rows[-1][4])
+                    if len(rows) < self.itersize:
+                        break
+            connection.rollback()
+        except Exception as error:  # reraised by the reader
+            self._put(output, error)
+        finally:
+            self._pool.putconn(connection)
+            self._put(output, self._RANGE_EXPORTED)
+
+    def _put(self, output: queue.Queue, item) -> None:
+        """Put an item in a queue, unless the workers must stop
+
+        :param output: queue where the item is put
+        :type output: queue.Queue
+        :param item: page of messages, error or sentinel
+        :type item: object
+        """
+        while not self._stop.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _fetch_next_page(self) -> None:
+        """Receive the next page of messages from the workers, if required
+
+        :raises Exception: any error which occurred in a worker
+        """
+        while len(self._pending) == 0 and len(self._active_queues) > 0:
+            item = self._active_queues[0].get()
+            if item is self._RANGE_EXPORTED:
+                self._active_queues.popleft()
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                self._pending.extend(item)
+
+    @staticmethod
+    def _row_to_message(row: tuple) -> dict:
+        """Convert a database table row to a message
+
+        :param row: values of the key, value, timestamp and timezone columns,
+                    followed by any columns which are not part of the message
+        :type row: tuple
+
+        :return: body of the message
+        :rtype: dict
+        """
+        key, value, ts, tz = row[:4]
+        if isinstance(tz, int):  # compact table layout
+            tz = format_tz_offset(tz)
+        return {"key": key.rstrip(), "value": str(value), "ts": f"{ts}{tz}"}
@@ -0,0 +1,137 @@
+from collections import deque
+
+from src.encoded_batch import EncodedBatch, encode_copy_rows
+from src.exceptions.ring_buffer_closed import RingBufferClosed
+from src.ring_buffer import SharedRingBuffer
+from src.sources.data_source import DataSource
+
+
+class RingBufferDataSource(DataSource):
+    """Data source which receives messages from another process via shared memory
+
+    This data source is the consumer side of a shared-memory ring buffer (see
+    SharedRingBuffer), whose producer is a RingBufferDataSink in another
+    process. Records are unpacked right from shared memory, up to READ_SIZE at
+    a time, so messages are neither pickled nor sent through a pipe. Querying
+    the data source for a message waits until the producer has written one, or
+    has closed the ring buffer; the wait fails if the producer exits without
+    closing the ring buffer, or if it takes longer than 'timeout' seconds.
+
+    Batches are extracted as batches pre-encoded for COPY (see EncodedBatch),
+    which the PostgreSQL data sink streams to the database as they are, while
+    any other data sink sees ordinary messages (with their values as text).
+
+    Class attributes:
+        READ_SIZE(int): largest number of records unpacked at once
+
+    Attributes:
+        name(str): name of the shared memory block of the ring buffer
+        timeout(float): longest wait for a message in seconds, or None to wait
+                        while the producer is running
+        _ring_buffer(SharedRingBuffer): attached ring buffer, or None
+        _records(deque): unpacked records which have not been extracted yet
+
+    Methods:
+        __enter__(): (see DataSource)
+        __exit__(): (see DataSource)
+        initialize(): attach to the ring buffer
+        has_message(): wait for a message or for the end of the ring buffer
+        read(): extract a single message
+        read_batch(batch_size): extract the next batch of messages, pre-encoded for COPY
+        close(): detach from the ring buffer
+    """
+
+    READ_SIZE = 4096
+
+    def __init__(self, name: str, timeout: float = None) -> None:
+        """Construct ring buffer data source
+
+        :param name: name of the shared memory block of the ring buffer
+        :type name: str
+        :param timeout: longest wait for a message in seconds (default is to
+                        wait while the producer is running)
+        :type timeout: float
+
+        :raises ValueError: timeout must be positive
+        """
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"Timeout must be positive: {timeout}")
+        self.name = name
+        self.timeout = timeout
+        self._ring_buffer = None
+        self._records = deque()
+
+    def __enter__(self):
+        """Ensure proper initialization of ring buffer data source"""
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of ring buffer data source"""
+        self.close()
+
+    def initialize(self) -> None:
+        """Attach to the ring buffer
+
+        :raises FileNotFoundError: there is no ring buffer of that name
+        """
+        self._ring_buffer = SharedRingBuffer(name=self.name)
+        self._records.clear()
+
+    def has_message(self) -> bool:
+        """Wait for a message or for the end of the ring buffer
+
+        :raises RingBufferClosed: the producer has exited without closing the ring buffer
+        :raises TimeoutError: no message has arrived within 'timeout' seconds
+
+        :return: status which indicates an available message
+        :rtype: bool
+        """
+        if len(self._records) == 0:
+            self._records.extend(self._ring_buffer.get_batch(self.READ_SIZE, timeout=self.timeout))
+        return len(self._records) > 0
+
+    def read(self) -> dict:
+        """Extract a single message
+
+        :raises RingBufferClosed: when reading is attempted on a closed and
+                                  depleted ring buffer
+
+        :return: body of the extracted message
+        :rtype: dict
+        """
+        if not self.has_message():
+            raise RingBufferClosed(self.name, "Ring buffer is closed and depleted")
+        key, value, ts, tz = SharedRingBuffer.decode_record(self._records.popleft())
+        return {"key": key, "value": value, "ts": ts + tz}
+
+    def read_batch(self, batch_size: int) -> EncodedBatch:
+        """Extract the next batch of messages, pre-encoded for COPY
+
+        Records which have already been written into the ring buffer are added
+        to the batch, but the batch is not held back to wait for more.
+
+        :param batch_size: number of messages per batch
+        :type batch_size: int
+
+        :raises RingBufferClosed: when reading is attempted on a closed and
+                                  depleted ring buffer
+
+        :return: pre-encoded batch of the extracted messages
+        :rtype: EncodedBatch
+        """
+        if not self.has_message():
+            raise RingBufferClosed(self.name, "Ring buffer is closed and depleted")
+        records = [self._records.popleft() for _ in range(min(batch_size, len(self._records)))]
+        while len(records) < batch_size:
+            more = self._ring_buffer.get_batch(batch_size - len(records), wait=False)
+            if len(more) == 0:
+                break
+            records.extend(more)
+        rows = [SharedRingBuffer.decode_record(record) for record in records]
+        return EncodedBatch(encode_copy_rows(rows), len(rows), sorted({row[2][:10] for row in rows}))
+
+    def close(self) -> None:
+        """Detach from the ring buffer"""
+        self._ring_buffer.release()
+        self._ring_buffer = None
@@ -0,0 +1,194 @@
+from itertools import islice
+
+from src.external_sort import ExternalSorter, key_ts_sort_key, ts_sort_key
+from src.sources.data_source import DataSource
+from src.exceptions.sorted_source_depleted import SortedSourceDepleted
+
+
+class SortedDataSource(DataSource):
+    """Data source which extracts the messages of another data source in sorted order
+
+    Exports often arrive in random timestamp order, while loading them in order
+    keeps BRIN indexes tight and writes every partition of the message table in
+    one go. When this data source is initialized, all messages of the wrapped
+    data source are read in batches and sorted by an external merge sort (see
+    ExternalSorter): sorted runs of at most 'max_memory_messages' messages are
+    spilled to temporary files, which are then merged while the messages are
+    extracted. Thus, inputs many times larger than the memory can be sorted;
+    roughly, a message takes a few hundred bytes of memory, so e.g. a budget of
+    4 GB is about 10 million messages.
+
+    Messages are sorted by their timestamp ("ts"), or by their key and then by
+    their timestamp ("key_ts"). Timestamps are compared as points in time, i.e.
+    regardless of their timezone, and messages with equal sort keys keep their
+    original order. Predicates are pushed down into the wrapped data source (see
+    where()), so messages which are not selected are not sorted at all.
+
+    Class attributes:
+        SORT_ORDERS(dict): supported orders, mapped to the sort keys of messages
+
+    Attributes:
+        data_source(DataSource): wrapped data source
+        sort_by(str): order of the extracted messages - "ts" or "key_ts"
+        max_memory_messages(int): largest number of messages held in memory
+        directory(str): parent directory of the run files (default is the
+                        system's temporary directory)
+        fan_in(int): largest number of runs merged at once
+        read_batch_size(int): number of messages read from the wrapped data source at once
+        _sorter(ExternalSorter): external sorter of the messages, or None
+        _messages(Iterator): messages in sorted order, or None
+        _next_message(dict): message which has been taken out, but not yet read
+
+    Properties:
+        stats(dict): statistics of the wrapped data source, number of sorted
+                     messages, written run files, spilled messages and
+                     intermediate merges
+
+    Methods:
+        __enter__(): (see DataSource)
+        __exit__(): (see DataSource)
+        where(predicate): push a predicate down into the wrapped data source
+        initialize(): read and sort all messages of the wrapped data source
+        has_message(): indicate whether there is an available message for extraction
+        read(): extract a single message
+        read_batch(batch_size): extract the next batch of messages
+        close(): delete the run files and clean up the wrapped data source
+    """
+
+    SORT_ORDERS = {"ts": ts_sort_key, "key_ts": key_ts_sort_key}
+
+    def __init__(self, data_source: DataSource, sort_by: str = "ts", max_memory_messages: int = 1000000,
+                 directory: str = None, fan_in: int = 64, read_batch_size: int = 10000) -> None:
+        """Construct sorted data source
+
+        :param data_source: wrapped data source
+        :type data_source: DataSource
+        :param sort_by: order of the extracted messages - "ts" or "key_ts"
+        :type sort_by: str
+        :param max_memory_messages: largest number of messages held in memory
+        :type max_memory_messages: int
+        :param directory: parent directory of the run files (default is the
+                          system's temporary directory)
+        :type directory: str
+        :param fan_in: largest number of runs merged at once
+        :type fan_in: int
+        :param read_batch_size: number of messages read from the wrapped data source at once
+        :type read_batch_size: int
+
+        :raises ValueError: unsupported order, or invalid limits
+        """
+        if sort_by not in self.SORT_ORDERS:
+            raise ValueError(f"Unsupported order: {sort_by}, expected one of: {', '.join(self.SORT_ORDERS)}")
+        if read_batch_size < 1:
+            raise ValueError(f"Read batch size must be a positive integer: {read_batch_size}")
+        ExternalSorter(max_memory_messages=max_memory_messages, fan_in=fan_in)  # validates the limits
+        self.data_source = data_source
+        self.sort_by = sort_by
+        self.max_memory_messages = max_memory_messages
+        self.directory = directory
+        self.fan_in = fan_in
+        self.read_batch_size = read_batch_size
+        self._sorter = None
+        self._messages = None
+        self._next_message = None
+        self._sorted_messages = 0
+
+    def __enter__(self):
+        """Ensure proper initialization of sorted data source"""
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Ensure proper termination of sorted data source"""
+        self.close()
+
+    @property
+    def stats(self) -> dict:
+        """Statistics of the wrapped data source, number of sorted messages, written run files,
+        spilled messages and intermediate merges"""
+        stats = {**self.data_source.stats, "sorted_messages": self._sorted_messages}
+        if self._sorter is not None:
+            stats.update(self._sorter.stats)
+        return stats
+
+    def where(self, predicate) -> bool:
+        """Push a predicate down into the wrapped data source
+
+        :param predicate: condition which selects the extracted messages
+        :type predicate: Predicate
+
+        :return: true if the wrapped data source only extracts selected messages
+        :rtype: bool
+        """
+        return self.data_source.where(predicate)
+
+    def initialize(self) -> None:
+        """Read all messages of the wrapped data source and sort them
+
+        The wrapped data source is initialized and fully read, while sorted runs
+        are spilled to disk; the runs are merged lazily, as messages are read.
+        """
+        self.data_source.initialize()
+        self._sorter = ExternalSorter(self.SORT_ORDERS[self.sort_by], self.max_memory_messages,
+                                      self.directory, self.fan_in)
+        self._sorted_messages = 0
+        try:
+            while self.data_source.has_message():
+                batch = self.data_source.read_batch(self.read_batch_size)
+                self._sorter.add(batch)
+                self._sorted_messages += len(batch)
+        except Exception:
+            self._sorter.cleanup()
+            self.data_source.close()
+            raise
+        self._messages = self._sorter.sorted()
+        self._next_message = None
+
+    def has_message(self) -> bool:
+        """Indicate whether there is an available message for extraction
+
+        :return: status which indicates an available message
+        :rtype: bool
+        """
+        if self._next_message is None:
+            self._next_message = next(self._messages, None)
+        return self._next_message is not None
+
+    def read(self) -> dict:
+        """Extract the next message in sorted order
+
+        :raises SortedSourceDepleted: when reading is attempted on a depleted source
+
+        :return: body of the extracted message
+        :rtype: dict
+        """
+        if not self.has_message():
+            raise SortedSourceDepleted(self.sort_by)
+        message, self._next_message = self._next_message, None
+        return message
+
+    def read_batch(self, batch_size: int) -> list:
+        """Extract the next batch of messages in sorted order
+
+        :param batch_size: number of messages per batch
+        :type batch_size: int
+
+        :raises SortedSourceDepleted: when reading is attempted on a depleted source
+
+        :return: bodies of the extracted messages
+        :rtype: list
+        """
+        batch = [self.read()]
+        batch.extend(islice(self._messages, batch_size - 1))
+        return batch
+
+    def close(self) -> None:
+        """Delete the run files and clean up the wrapped data source"""
+        try:
+            if self._messages is not None:
+                self._messages.close()
+                self._messages = None
+            if self._sorter is not None:
+                self._sorter.cleanup()
+        finally:
+            self.data_source.close()
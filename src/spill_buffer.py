@@ -0,0 +1,209 @@
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import threading
+from collections import deque
+
+
+class SpillBuffer:
+    """First-in, first-out buffer of batches which spills to disk when full
+
+    The buffer holds up to 'max_memory_messages' messages in memory. Batches
+    which do not fit are spilled to append-only segment files on local disk
+    (pickled, each prefixed by its length), and every later batch follows them
+    to disk until the spilled batches have been replayed, so batches are always
+    taken out in the order they were put in. Segment files are rotated once they
+    reach 'segment_size' bytes, deleted as soon as they have been replayed, and
+    all of them are deleted once the buffer has caught up. Thus, putting a batch
+    never blocks, while memory use stays bounded.
+
+    The buffer is thread-safe: typically, one thread puts batches, while another
+    one takes them out, waiting while the buffer is empty. After the buffer is
+    closed, the remaining batches are still taken out.
+
+    Class attributes:
+        LENGTH(struct.Struct): length prefix of a spilled batch
+
+    Attributes:
+        max_memory_messages(int): largest number of messages held in memory
+        directory(str): parent directory of the segment files (default is the
+                        system's temporary directory)
+        segment_size(int): size of a segment file after which a new one is
+                           started, in bytes
+        spilled_batches(int): number of batches spilled to disk so far
+        spilled_messages(int): number of messages spilled to disk so far
+        _memory(deque): batches held in memory, oldest first
+        _memory_messages(int): number of messages held in memory
+        _disk_batches(int): number of spilled batches which have not been replayed
+        _segments(deque): paths of the segment files, oldest first
+        _segment_directory(str): directory of the segment files, or None
+        _write_file(BufferedWriter): segment file which is being written, or None
+        _read_file(BufferedReader): segment file which is being replayed, or None
+        _closed(bool): true if no more batches will be put
+        _condition(threading.Condition): condition which guards the buffer
+
+    Properties:
+        stats(dict): number of batches and messages in memory and on disk, and
+                     number of spilled batches and messages
+
+    Methods:
+        put(batch): add a batch, spilling it to disk if memory is full
+        get(): take out the oldest batch, waiting for one if required
+        close(): indicate that no more batches will be put
+        cleanup(): delete all segment files
+        _spill(batch): append a batch to the current segment file
+        _replay(): read the oldest spilled batch
+        _remove_segments(): close and delete all segment files
+    """
+
+    LENGTH = struct.Struct("<Q")
+
+    def __init__(self, max_memory_messages: int = 100000, directory: str = None,
+                 segment_size: int = 64 * 1024 * 1024) -> None:
+        """Construct spill buffer
+
+        :param max_memory_messages: largest number of messages held in memory
+        :type max_memory_messages: int
+        :param directory: parent directory of the segment files (default is the
+                          system's temporary directory)
+        :type directory: str
+        :param segment_size: size of a segment file after which a new one is
+                             started, in bytes
+        :type segment_size: int
+
+        :raises ValueError: limits must be positive integers
+        """
+        if max_memory_messages < 1:
+            raise ValueError(f"Number of messages in memory must be a positive integer: {max_memory_messages}")
+        if segment_size < 1:
+            raise ValueError(f"Segment size must be a positive integer: {segment_size}")
+        self.max_memory_messages = max_memory_messages
+        self.directory = directory
+        self.segment_size = segment_size
+        self.spilled_batches = 0
+        self.spilled_messages = 0
+        self._memory = deque()
+        self._memory_messages = 0
+        self._disk_batches = 0
+        self._segments = deque()
+        self._segment_directory = None
+        self._write_file = None
+        self._read_file = None
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def stats(self) -> dict:
+        """Number of batches and messages in memory and on disk, and number of spilled batches and messages"""
+        with self._condition:
+            return {"memory_batches": len(self._memory), "memory_messages": self._memory_messages,
+                    "disk_batches": self._disk_batches, "segments": len(self._segments),
+                    "spilled_batches": self.spilled_batches, "spilled_messages": self.spilled_messages}
+
+    def put(self, batch) -> None:
+        """Add a batch, spilling it to disk if memory is full
+
+        :param batch: bodies of the messages (any picklable sequence)
+        :type batch: list
+
+        :raises ValueError: the buffer has been closed
+        """
+        with self._condition:
+            if self._closed:
+                raise ValueError("Spill buffer has been closed")
+            if self._disk_batches == 0 and self._memory_messages + len(batch) <= self.max_memory_messages:
+                self._memory.append(batch)
+                self._memory_messages += len(batch)
+            else:  # memory is full, or older batches are on disk
+                self._spill(batch)
+            self._condition.notify()
+
+    def get(self):
+        """Take out the oldest batch, waiting for one if required
+
+        :return: oldest batch, or None if the buffer has been closed and all
+                 batches have been taken out
+        :rtype: list
+        """
+        with self._condition:
+            while len(self._memory) == 0 and self._disk_batches == 0 and not self._closed:
+                self._condition.wait()
+            if len(self._memory) > 0:  # batches in memory are older than those on disk
+                batch = self._memory.popleft()
+                self._memory_messages -= len(batch)
+                return batch
+            if self._disk_batches > 0:
+                batch = self._replay()
+                if self._disk_batches == 0:  # caught up, so new batches are held in memory again
+                    self._remove_segments()
+                return batch
+            return None
+
+    def close(self) -> None:
+        """Indicate that no more batches will be put"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def cleanup(self) -> None:
+        """Delete all segment files, including any batches which have not been replayed"""
+        with self._condition:
+            self._remove_segments()
+            self._disk_batches = 0
+
+    def _spill(self, batch) -> None:
+        """Append a batch to the current segment file
+
+        :param batch: bodies of the messages
+        :type batch: list
+        """
+        if self._write_file is None:
+            if self._segment_directory is None:
+                if self.directory is not None:
+                    os.makedirs(self.directory, exist_ok=True)
+                self._segment_directory = tempfile.mkdtemp(prefix="spill-", dir=self.directory)
+            path = os.path.join(self._segment_directory, f"segment-{self.spilled_batches:012d}.spill")
+            self._write_file = open(path, 'ab')
+            self._segments.append(path)
+        data = pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+        self._write_file.write(self.LENGTH.pack(len(data)) + data)
+        self._write_file.flush()  # readable by the replay right away
+        if self._write_file.tell() >= self.segment_size:
+            self._write_file.close()
+            self._write_file = None
+        self._disk_batches += 1
+        self.spilled_batches += 1
+        self.spilled_messages += len(batch)
+
+    def _replay(self):
+        """Read the oldest spilled batch
+
+        Segment files which have been fully replayed are deleted.
+
+        :return: oldest spilled batch
+        :rtype: list
+        """
+        while True:
+            if self._read_file is None:
+                self._read_file = open(self._segments[0], 'rb')
+            prefix = self._read_file.read(self.LENGTH.size)
+            if len(prefix) == self.LENGTH.size:
+                break
+            self._read_file.close()  # segment is fully replayed (and no longer written)
+            self._read_file = None
+            os.remove(self._segments.popleft())
+        self._disk_batches -= 1
+        return pickle.loads(self._read_file.read(self.LENGTH.unpack(prefix)[0]))
+
+    def _remove_segments(self) -> None:
+        """Close and delete all segment files"""
+        for file in (self._write_file, self._read_file):
+            if file is not None:
+                file.close()
+        self._write_file, self._read_file = None, None
+        self._segments.clear()
+        if self._segment_directory is not None:
+            shutil.rmtree(self._segment_directory, ignore_errors=True)
+            self._segment_directory = None
@@ -0,0 +1,15 @@
+from unittest import TestCase
+
+from src.exceptions.database_source_depleted import DatabaseSourceDepleted
+
+
+class TestDatabaseSourceDepleted(TestCase):
+
+    def test_raise_error(self):
+        dbname = "default_schema"
+        expected_full_message = f"{dbname}: Database source is depleted"
+        with self.assertRaises(DatabaseSourceDepleted) as context:
+            raise DatabaseSourceDepleted(dbname)
+        self.assertEqual(dbname, context.exception.dbname)
+        self.assertEqual("Database source is depleted", context.exception.message)
+        self.assertEqual(expected_full_message, str(context.exception))
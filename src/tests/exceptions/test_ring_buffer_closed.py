@@ -0,0 +1,15 @@
+from unittest import TestCase
+
+from src.exceptions.ring_buffer_closed import RingBufferClosed
+
+
+class TestRingBufferClosed(TestCase):
+
+    def test_raise_error(self):
+        name = "psm_1234"
+        expected_full_message = f"{name}: Ring buffer is closed"
+        with self.assertRaises(RingBufferClosed) as context:
+            raise RingBufferClosed(name)
+        self.assertEqual(name, context.exception.name)
+        self.assertEqual("Ring buffer is closed", context.exception.message)
+        self.assertEqual(expected_full_message, str(context.exception))
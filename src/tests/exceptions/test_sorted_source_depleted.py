@@ -0,0 +1,15 @@
+from unittest import TestCase
+
+from src.exceptions.sorted_source_depleted import SortedSourceDepleted
+
+
+class TestSortedSourceDepleted(TestCase):
+
+    def test_raise_error(self):
+        sort_by = "ts"
+        expected_full_message = f"{sort_by}: Sorted source is depleted"
+        with self.assertRaises(SortedSourceDepleted) as context:
+            raise SortedSourceDepleted(sort_by)
+        self.assertEqual(sort_by, context.exception.sort_by)
+        self.assertEqual("Sorted source is depleted", context.exception.message)
+        self.assertEqual(expected_full_message, str(context.exception))
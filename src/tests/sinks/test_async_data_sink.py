@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from src.sinks.async_data_sink import AsyncDataSink, ThreadedDataSink
+from src.sinks.data_sink import DataSink
+
+
+class ListDataSink(DataSink):
+
+    def __init__(self):
+        self.messages = []
+        self.threads = set()
+        self.concurrent_dumps = 0
+        self.max_concurrent_dumps = 0
+        self.closed = False
+
+    def __enter__(self):
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def initialize(self):
+        self.closed = False
+
+    def dump(self, message):
+        self.threads.add(threading.get_ident())
+        self.concurrent_dumps += 1
+        self.max_concurrent_dumps = max(self.max_concurrent_dumps, self.concurrent_dumps)
+        time.sleep(0.001)
+        self.messages.append(message)
+        self.concurrent_dumps -= 1
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+class TestThreadedDataSink(TestCase):
+
+    def test_object_creation(self):
+        data_sink = ListDataSink()
+        sink = ThreadedDataSink(data_sink)
+        self.assertIsInstance(sink, AsyncDataSink)
+        self.assertIs(data_sink, sink.data_sink)
+        self.assertIsNone(sink.executor)
+
+    def test_dump(self):
+        data_sink = ListDataSink()
+
+        async def dump_all():
+            async with ThreadedDataSink(data_sink) as sink:
+                self.assertTrue(await sink.dump({"key": "A123"}))
+                self.assertTrue(await sink.dump_batch([{"key": "B123"}, {"key": "C123"}]))
+
+        asyncio.run(dump_all())
+        self.assertEqual(["A123", "B123", "C123"], [message["key"] for message in data_sink.messages])
+        self.assertNotIn(threading.get_ident(), data_sink.threads)  # the event loop was not blocked
+        self.assertTrue(data_sink.closed)
+
+    def test_concurrent_dumps_are_serialized(self):
+        data_sink = ListDataSink()
+
+        async def dump_concurrently():
+            async with ThreadedDataSink(data_sink) as sink:
+                await asyncio.gather(*(sink.dump_batch([{"key": key}]) for key in range(20)))
+
+        asyncio.run(dump_concurrently())
+        self.assertEqual(1, data_sink.max_concurrent_dumps)
+        self.assertEqual(list(range(20)), [message["key"] for message in data_sink.messages])  # in call order
+
+    def test_timed_dump_batch_excludes_waiting(self):
+        data_sink = ListDataSink()
+
+        async def dump_concurrently():
+            async with ThreadedDataSink(data_sink) as sink:
+                return await asyncio.gather(*(sink.timed_dump_batch([{"key": key}] * 20) for key in range(5)))
+
+        latencies = asyncio.run(dump_concurrently())
+        self.assertEqual(100, len(data_sink.messages))
+        self.assertTrue(all(latency >= 0.02 for latency in latencies))
+        self.assertLess(max(latencies), 0.06)  # the last dump waited for the other four (about 0.08 s)
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from src.sinks.buffered_data_sink import BufferedDataSink
+from src.sinks.data_sink import DataSink
+
+
+class SlowDataSink(DataSink):
+
+    def __init__(self, fail_at=None):
+        self.messages = []
+        self.released = threading.Event()
+        self.fail_at = fail_at
+        self.closed = False
+
+    def __enter__(self):
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def initialize(self):
+        self.closed = False
+
+    def dump(self, message):
+        self.released.wait(5)  # stalls until released
+        if message["value"] == self.fail_at:
+            raise RuntimeError("Dump failed")
+        self.messages.append(message)
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+class TestBufferedDataSink(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _messages(self, count):
+        return [{"key": f"K{index}", "value": index} for index in range(count)]
+
+    def test_object_creation(self):
+        data_sink = SlowDataSink()
+        sink = BufferedDataSink(data_sink, 10, self.directory.name, 1024)
+        self.assertIs(data_sink, sink.data_sink)
+        self.assertEqual(10, sink.max_memory_messages)
+        self.assertEqual(self.directory.name, sink.spill_directory)
+        self.assertEqual(1024, sink.segment_size)
+        self.assertEqual({}, sink.stats)
+
+    def test_dump_does_not_wait_for_slow_sink(self):
+        data_sink = SlowDataSink()
+        messages = self._messages(100)
+        with BufferedDataSink(data_sink, 10, self.directory.name, 256) as sink:
+            for start in range(0, 100, 5):
+                self.assertTrue(sink.dump_batch(messages[start:start + 5]))
+            self.assertTrue(sink.dump({"key": "K100", "value": 100}))
+            stats = sink.stats
+            self.assertLessEqual(stats["memory_messages"], 10)
+            self.assertGreater(stats["spilled_messages"], 0)
+            data_sink.released.set()
+        self.assertEqual(messages + [{"key": "K100", "value": 100}], data_sink.messages)  # replayed in order
+        self.assertTrue(data_sink.closed)
+        self.assertEqual([], [name for _, _, names in os.walk(self.directory.name) for name in names])
+
+    def test_failed_dump(self):
+        data_sink = SlowDataSink(fail_at=3)
+        data_sink.released.set()
+        sink = BufferedDataSink(data_sink, 10, self.directory.name)
+        sink.initialize()
+        sink.dump_batch(self._messages(5))
+        deadline = time.monotonic() + 5
+        while sink._writer_error is None and time.monotonic() < deadline:  # wait for the failure
+            time.sleep(0.01)
+        with self.assertRaises(RuntimeError):
+            sink.dump_batch(self._messages(5))
+        sink.close()
+        self.assertEqual(self._messages(3), data_sink.messages)
+        self.assertTrue(data_sink.closed)
+
+    def test_failed_dump_is_raised_on_close(self):
+        data_sink = SlowDataSink(fail_at=3)
+        data_sink.released.set()
+        sink = BufferedDataSink(data_sink, 10, self.directory.name)
+        sink.initialize()
+        sink.dump_batch(self._messages(5))
+        with self.assertRaises(RuntimeError):
+            sink.close()
+        self.assertTrue(data_sink.closed)
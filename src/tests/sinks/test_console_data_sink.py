@@ -1,5 +1,6 @@
 from unittest import TestCase
 
+from src.raw_message import RawMessage
 from src.sinks.console_data_sink import ConsoleDataSink
 from src.sinks.data_sink import DataSink
 from src.tests.test_helpers.capture_stdout import CaptureSTDOUT
@@ -54,3 +55,26 @@ class TestConsoleDataSink(TestCase):
             self.assertTrue(success)
         self.assertEqual(expected_output1, output[0])
         self.assertEqual(expected_output2, output[1])
+
+    def test_dump_batch(self):
+        batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620+02:00"}
+        ]
+        with CaptureSTDOUT() as output:
+            success = self.sink.dump_batch(batch)
+        self.assertTrue(success)
+        self.assertEqual(2, len(output))
+        self.assertEqual(self.output_format.format("A123", "15.6", "2020-10-07 13:28:43.399620+02:00"), output[0])
+        self.assertEqual(self.output_format.format("B123", "12.6", "2022-10-07 13:28:43.399620+02:00"), output[1])
+
+    def test_dump_without_output_format(self):
+        raw = '{"key":"A123","value":"15.6","ts":"2020-10-07 13:28:43.399620+02:00"}'
+        message = RawMessage(raw)
+        sink = ConsoleDataSink()
+        self.assertIsNone(sink.output_format)
+        with CaptureSTDOUT() as output:
+            sink.dump(message)
+            sink.dump({"key": "B123"})
+        self.assertEqual([raw, '{"key": "B123"}'], output)
+        self.assertIsNone(message._fields)  # raw message is never decoded
@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from src.raw_message import RawMessage
+from src.sinks.data_sink import DataSink
+from src.sinks.file_data_sink import FileDataSink
+
+
+class TestFileDataSink(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.target_filepath = os.path.join(self.directory.name, "messages.ndjson")
+        self.message = {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"}
+
+    def _read_lines(self):
+        with open(self.target_filepath) as target_file:
+            return target_file.read().splitlines()
+
+    def test_object_construction(self):
+        sink = FileDataSink(self.target_filepath, append=True)
+        self.assertIsInstance(sink, DataSink)
+        self.assertEqual(self.target_filepath, sink.target_filepath)
+        self.assertTrue(sink.append)
+        self.assertFalse(sink.is_open)
+
+    def test_dump(self):
+        with FileDataSink(self.target_filepath) as sink:
+            self.assertTrue(sink.is_open)
+            self.assertTrue(sink.dump(self.message))
+        self.assertFalse(sink.is_open)
+        self.assertEqual([json.dumps(self.message)], self._read_lines())
+
+    def test_dump_raw_message(self):
+        raw = '{"key":"A123",  "value":"15.6","ts":"2020-10-07 13:28:43.399620+02:00"}'
+        message = RawMessage(raw)
+        with FileDataSink(self.target_filepath) as sink:
+            sink.dump(message)
+        self.assertEqual([raw], self._read_lines())  # written through untouched
+        self.assertIsNone(message._fields)  # never decoded
+
+    def test_dump_multi_line_raw_message(self):
+        messages = [RawMessage(json.dumps(self.message, indent=4)), RawMessage(json.dumps(self.message))]
+        with FileDataSink(self.target_filepath) as sink:
+            sink.dump_batch(messages)
+        lines = self._read_lines()
+        self.assertEqual([json.dumps(self.message)] * 2, lines)  # re-encoded on a single line
+        self.assertEqual([self.message] * 2, [json.loads(line) for line in lines])
+
+    def test_dump_batch(self):
+        messages = [RawMessage(json.dumps(self.message)), dict(self.message, key="B123")]
+        with FileDataSink(self.target_filepath) as sink:
+            self.assertTrue(sink.dump_batch(messages))
+        self.assertEqual([json.dumps(self.message), json.dumps(dict(self.message, key="B123"))], self._read_lines())
+
+    def test_append(self):
+        with FileDataSink(self.target_filepath) as sink:
+            sink.dump(self.message)
+        with FileDataSink(self.target_filepath, append=True) as sink:
+            sink.dump(self.message)
+        self.assertEqual(2, len(self._read_lines()))
+        with FileDataSink(self.target_filepath) as sink:
+            sink.dump(self.message)
+        self.assertEqual(1, len(self._read_lines()))
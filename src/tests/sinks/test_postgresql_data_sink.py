@@ -1,12 +1,20 @@
+import json
+import time
+import unittest.mock
+from array import array
 from unittest import TestCase
-from datetime import datetime
+from datetime import date, datetime
 
 import psycopg2
 import psycopg2.errors
 
 from src.definitions import DATABASE_ENV
+from src.encoded_batch import encode_chunk
+from src.reorder_buffer import ReorderBuffer
 from src.sinks.data_sink import DataSink
 from src.sinks.postgresql_data_sink import PostgreSQLDataSink
+from src.sinks.retrying_data_sink import RetryingDataSink
+from src.tests.test_helpers.dedicated_database import DedicatedDatabaseTestCase
 
 
 class TestPostgreSQLDataSink(TestCase):
@@ -126,6 +134,37 @@ class TestPostgreSQLDataSink(TestCase):
                 cur.execute(f'DELETE FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}";')  # delete all dumped messages
                 self.con.commit()
 
+    def test_dump_batch(self):
+        self.sink.initialize()
+        # Make sure there are no messages before dumping
+        with self.con.cursor() as cur:
+            cur.execute(f'SELECT * FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}";')
+            messages = cur.fetchall()
+        self.assertEqual(0, len(messages))
+
+        batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620+02:00"}
+        ]
+        try:
+            success = self.sink.dump_batch(batch)
+            self.assertTrue(success, "Dump was not successful")
+            self.sink.close()
+            with self.con.cursor() as cur:
+                cur.execute(f'SELECT * FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}" ORDER BY id;')
+                messages = cur.fetchall()
+            self.assertEqual(2, len(messages))
+            self.assertEqual("A123", messages[0][1])  # key
+            self.assertEqual(15.6, messages[0][2])  # value
+            self.assertEqual("2020-10-07 13:28:43.399620+02:00", f"{messages[0][3]}{messages[0][4]}")  # timestamp
+            self.assertEqual("B123", messages[1][1])  # key
+            self.assertEqual(12.6, messages[1][2])  # value
+            self.assertEqual("2022-10-07 13:28:43.399620+02:00", f"{messages[1][3]}{messages[1][4]}")  # timestamp
+        finally:  # Clean-up
+            with self.con.cursor() as cur:
+                cur.execute(f'DELETE FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}";')  # delete all dumped messages
+                self.con.commit()
+
     def test_dump_with_invalid_timestamp(self):
         self.sink.initialize()
         # Make sure there are no messages before dumping
@@ -151,3 +190,704 @@ class TestPostgreSQLDataSink(TestCase):
             with self.con.cursor() as cur:
                 cur.execute(f'DELETE FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}";')  # delete all dumped messages
                 self.con.commit()
+
+
+class TestPartitionedPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def _fetch_partitions(self):
+        with self.con.cursor() as cur:
+            cur.execute("""
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                WHERE parent.relname = %s ORDER BY child.relname;
+            """, (PostgreSQLDataSink.MESSAGE_TABLE_NAME,))
+            return [row[0] for row in cur.fetchall()]
+
+    def test_object_creation_with_unsupported_partitioning(self):
+        with self.assertRaises(ValueError):
+            self._create_sink(partitioning="week")
+
+    def test_dump_batch_with_daily_partitions(self):
+        batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2020-10-07 23:59:59.999999+02:00"},
+            {"key": "C123", "value": "65.6", "ts": "2020-10-08 00:00:00.000000+02:00"}
+        ]
+        with self._create_sink(partitioning="day") as sink:
+            self.assertTrue(sink.dump_batch(batch), "Dump was not successful")
+            sink.dump({"key": "D123", "value": "1.5", "ts": "1020-10-07 13:28:43.399620+02:00"})
+        self.assertEqual(["Message_10201007", "Message_20201007", "Message_20201008"], self._fetch_partitions())
+        with self.con.cursor() as cur:
+            cur.execute('SELECT key FROM "Message_20201007" ORDER BY key;')
+            self.assertEqual([("A123",), ("B123",)], cur.fetchall())
+            cur.execute(f'SELECT COUNT(*) FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}";')
+            self.assertEqual(4, cur.fetchone()[0])
+
+    def test_initialize_loads_existing_partitions(self):
+        with self._create_sink(partitioning="month") as sink:
+            sink.dump({"key": "A123", "value": "15.6", "ts": "2020-12-07 13:28:43.399620+02:00"})
+        sink = self._create_sink(partitioning="month")
+        with sink:
+            self.assertEqual({"Message_202012": (datetime(2020, 12, 1), datetime(2021, 1, 1))}, sink._partitions)
+            sink.dump({"key": "B123", "value": "12.6", "ts": "2020-12-31 13:28:43.399620+02:00"})
+        self.assertEqual(["Message_202012"], self._fetch_partitions())
+
+    def test_initialize_with_unpartitioned_table(self):
+        with self._create_sink() as sink:
+            sink.dump({"key": "A123", "value": "15.6", "ts": "2020-12-07 13:28:43.399620+02:00"})
+        with self.assertRaises(ValueError) as context:
+            self._create_sink(partitioning="day").initialize()
+        self.assertIn("not partitioned", str(context.exception))
+
+    def test_partitions_created_otherwise_are_respected(self):
+        with self._create_sink(partitioning="month"):
+            pass
+        with self.con.cursor() as cur:
+            cur.execute(f"""
+                CREATE TABLE "Message_2020_q4" PARTITION OF "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}"
+                FOR VALUES FROM ('2020-10-01') TO ('2021-01-01');
+                CREATE TABLE "Message_old" PARTITION OF "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}"
+                FOR VALUES FROM (MINVALUE) TO ('2020-10-01');
+            """)
+        with self._create_sink(partitioning="month") as sink:
+            self.assertEqual((None, datetime(2020, 10, 1)), sink._partitions["Message_old"])
+            sink.dump_batch([
+                {"key": "A123", "value": "15.6", "ts": "2020-12-07 13:28:43.399620+02:00"},
+                {"key": "B123", "value": "12.6", "ts": "2021-01-07 13:28:43.399620+02:00"},
+            ])
+            self.assertEqual(["Message_2020_q4", "Message_old"], sink.drop_partitions_before(date(2021, 1, 1)))
+        self.assertEqual(["Message_202101"], self._fetch_partitions())
+
+    def test_drop_partitions_before(self):
+        batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2020-11-07 13:28:43.399620+02:00"},
+            {"key": "C123", "value": "65.6", "ts": "2020-12-07 13:28:43.399620+02:00"}
+        ]
+        with self._create_sink(partitioning="month") as sink:
+            sink.dump_batch(batch)
+            dropped = sink.drop_partitions_before(date(2020, 11, 15))  # keeps November
+            self.assertEqual(["Message_202010"], dropped)
+        self.assertEqual(["Message_202011", "Message_202012"], self._fetch_partitions())
+        with self.con.cursor() as cur:
+            cur.execute(f'SELECT key FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}" ORDER BY key;')
+            self.assertEqual([("B123",), ("C123",)], cur.fetchall())
+
+    def test_drop_partitions_on_unpartitioned_table(self):
+        sink = self._create_sink()
+        with self.assertRaises(ValueError):
+            sink.drop_partitions_before(date(2020, 11, 15))
+
+
+class TestStagedPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620+02:00"}
+        ]
+
+    def test_staged_messages_are_merged_on_close(self):
+        with self._create_sink(staging=True) as sink:
+            self.assertTrue(sink.dump_batch(self.batch), "Dump was not successful")
+            sink.dump({"key": "C123", "value": "65.6", "ts": "1020-10-07 13:28:43.399620+02:00"})
+            self.assertEqual(0, len(self._fetch_messages()))
+            self.assertEqual(3, len(self._fetch_messages(PostgreSQLDataSink.STAGING_TABLE_NAME)))
+        messages = self._fetch_messages()
+        self.assertEqual(3, len(messages))
+        self.assertEqual("A123", messages[0][0])  # key
+        self.assertEqual(15.6, messages[0][1])  # value
+        self.assertEqual("2020-10-07 13:28:43.399620+02:00", f"{messages[0][2]}{messages[0][3]}")  # timestamp
+        self.assertEqual(0, len(self._fetch_messages(PostgreSQLDataSink.STAGING_TABLE_NAME)))
+        with self.con.cursor() as cur:
+            cur.execute("SELECT relpersistence FROM pg_class WHERE relname = %s;",
+                        (PostgreSQLDataSink.STAGING_TABLE_NAME,))
+            self.assertEqual("u", cur.fetchone()[0])  # unlogged table
+
+    def test_checkpoint_on_commit_interval(self):
+        with self._create_sink(staging=True, commit_interval=2) as sink:
+            sink.dump_batch(self.batch[:1])
+            self.assertEqual(0, len(self._fetch_messages()))
+            sink.dump_batch(self.batch[1:])
+            self.assertEqual(2, len(self._fetch_messages()))
+            self.assertEqual(0, sink.checkpoint())
+
+    def test_checkpoint_rebuilds_secondary_indexes(self):
+        with self._create_sink(staging=True, rebuild_indexes=True) as sink:
+            with sink._connection.cursor() as cur:
+                cur.execute(f'CREATE INDEX "Message_key_idx" ON "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}" (key);')
+                sink._connection.commit()
+            sink.dump_batch(self.batch)
+            self.assertEqual(2, sink.checkpoint())
+        self.assertEqual(2, len(self._fetch_messages()))
+        with self.con.cursor() as cur:
+            cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s ORDER BY indexname;",
+                        (PostgreSQLDataSink.MESSAGE_TABLE_NAME,))
+            self.assertEqual([("Message_key_idx",), ("Message_pkey",)], cur.fetchall())
+
+    def test_staged_partitioned_table(self):
+        with self._create_sink(staging=True, partitioning="month") as sink:
+            sink.dump_batch(self.batch)
+        self.assertEqual(2, len(self._fetch_messages()))
+        self.assertEqual(1, len(self._fetch_messages("Message_202010")))
+
+    def test_copy_buffer(self):
+        rows = [("A123", "15.6", "2020-10-07 13:28:43.399620", "+02:00"), ("B\t\n", 1.5, "ts", "tz")]
+        buffer = PostgreSQLDataSink._copy_buffer(rows)
+        self.assertEqual("A123\t15.6\t2020-10-07 13:28:43.399620\t+02:00\nB\\t\\n\t1.5\tts\ttz\n",
+                         buffer.getvalue())
+
+
+class TestEncodedBatchPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch = encode_chunk(
+            '{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},'
+            '{"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620+02:00"}'
+        )
+
+    def _assert_messages(self, messages):
+        self.assertEqual(2, len(messages))
+        self.assertEqual("A123", messages[0][0])  # key
+        self.assertEqual(15.6, messages[0][1])  # value
+        self.assertEqual("2020-10-07 13:28:43.399620+02:00", f"{messages[0][2]}{messages[0][3]}")  # timestamp
+
+    def test_dump_encoded_batch_is_copied(self):
+        with self._create_sink() as sink:
+            with unittest.mock.patch.object(sink, "_messages_to_rows") as messages_to_rows:
+                self.assertTrue(sink.dump_batch(self.batch), "Dump was not successful")
+            messages_to_rows.assert_not_called()  # not decoded by the calling process
+        self._assert_messages(self._fetch_messages())
+
+    def test_staged_dump_encoded_batch(self):
+        with self._create_sink(staging=True) as sink:
+            sink.dump_batch(self.batch)
+            self.assertEqual(2, len(self._fetch_messages(PostgreSQLDataSink.STAGING_TABLE_NAME)))
+        self._assert_messages(self._fetch_messages())
+
+    def test_dump_encoded_batch_into_partitioned_table(self):
+        with self._create_sink(partitioning="month", writers=2) as sink:
+            sink.dump_batch(self.batch)
+        self._assert_messages(self._fetch_messages())
+        self.assertEqual(1, len(self._fetch_messages("Message_202010")))
+        self.assertEqual(1, len(self._fetch_messages("Message_202210")))
+
+    def test_compact_dump_encoded_batch(self):
+        with self._create_sink(compact=True) as sink:
+            sink.dump_batch(self.batch)
+        with self.con.cursor() as cur:
+            cur.execute(f'''
+                SELECT k.key, m.value FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}" m
+                JOIN "{PostgreSQLDataSink.KEY_TABLE_NAME}" k ON m.key_id = k.id ORDER BY k.key;
+            ''')
+            self.assertEqual([("A123", 15.6), ("B123", 12.6)], cur.fetchall())
+
+
+class TestCompactPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620-05:30"},
+            {"key": "A123", "value": "65.6", "ts": "1020-10-07 13:28:43.399620+00:00"}
+        ]
+
+    def _fetch_compact_messages(self):
+        with self.con.cursor() as cur:
+            cur.execute(f"""
+                SELECT k.key, m.value, m.ts, m.tz_offset FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}" m
+                JOIN "{PostgreSQLDataSink.KEY_TABLE_NAME}" k ON m.key_id = k.id ORDER BY m.id;
+            """)
+            return cur.fetchall()
+
+    def test_dump_batch(self):
+        with self._create_sink(compact=True) as sink:
+            self.assertTrue(sink.dump_batch(self.batch), "Dump was not successful")
+            self.assertEqual({"A123", "B123"}, set(sink._key_ids))
+            sink.dump({"key": "C123", "value": "1.5", "ts": "2020-10-07 13:28:43.399620+02:00"})
+        messages = self._fetch_compact_messages()
+        self.assertEqual(4, len(messages))
+        self.assertEqual(("A123", 15.6, datetime(2020, 10, 7, 13, 28, 43, 399620), 120), messages[0])
+        self.assertEqual(("B123", 12.6, datetime(2022, 10, 7, 13, 28, 43, 399620), -330), messages[1])
+        self.assertEqual("A123", messages[2][0])
+        self.assertEqual("C123", messages[3][0])
+        with self.con.cursor() as cur:
+            cur.execute(f'SELECT COUNT(*) FROM "{PostgreSQLDataSink.KEY_TABLE_NAME}";')
+            self.assertEqual(3, cur.fetchone()[0])
+
+    def test_dump_batch_with_hour_only_timezone(self):
+        with self._create_sink(compact=True) as sink:
+            sink.dump_batch([{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02"},
+                             {"key": "B123", "value": "12.6", "ts": "2020-10-07 13:28:43.399620-05"}])
+        self.assertEqual([120, -300], [message[3] for message in self._fetch_compact_messages()])
+
+    def test_initialize_loads_key_ids(self):
+        with self._create_sink(compact=True) as sink:
+            sink.dump_batch(self.batch)
+            key_ids = dict(sink._key_ids)
+        with self._create_sink(compact=True) as sink:
+            self.assertEqual(key_ids, sink._key_ids)
+
+    def test_staged_dump_batch(self):
+        with self._create_sink(compact=True, staging=True, partitioning="month") as sink:
+            sink.dump_batch(self.batch)
+        self.assertEqual(3, len(self._fetch_compact_messages()))
+
+
+class TestIndexedPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620+02:00"}
+        ]
+
+    def _fetch_indexes(self):
+        with self.con.cursor() as cur:
+            cur.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s ORDER BY indexname;",
+                        (PostgreSQLDataSink.MESSAGE_TABLE_NAME,))
+            return cur.fetchall()
+
+    def test_indexes_are_built_on_close(self):
+        with self._create_sink(indexes=True, concurrent_indexes=True, maintenance_work_mem="64MB") as sink:
+            sink.dump_batch(self.batch)
+            self.assertEqual(1, len(self._fetch_indexes()))  # only the primary key during the load
+        indexes = self._fetch_indexes()
+        self.assertEqual(["Message_key_ts_idx", "Message_pkey", "Message_ts_brin"], [name for name, _ in indexes])
+        self.assertIn("USING btree (key, ts)", indexes[0][1])
+        self.assertIn("USING brin (ts)", indexes[2][1])
+        with self.con.cursor() as cur:  # table statistics are fresh
+            cur.execute("SELECT reltuples FROM pg_class WHERE relname = %s;",
+                        (PostgreSQLDataSink.MESSAGE_TABLE_NAME,))
+            self.assertEqual(2, cur.fetchone()[0])
+
+    def test_indexes_are_rebuilt_after_load(self):
+        def fetch_relfilenode():
+            with self.con.cursor() as cur:
+                cur.execute("SELECT relfilenode FROM pg_class WHERE relname = %s;",
+                            (PostgreSQLDataSink.TS_INDEX_NAME,))
+                return cur.fetchone()[0]
+
+        with self._create_sink(indexes=True) as sink:
+            sink.dump_batch(self.batch)
+        relfilenode = fetch_relfilenode()
+        with self._create_sink(indexes=True):  # nothing is loaded, so nothing is rebuilt
+            pass
+        self.assertEqual(relfilenode, fetch_relfilenode())
+        with self._create_sink(indexes=True) as sink:
+            sink.dump_batch(self.batch)
+        self.assertNotEqual(relfilenode, fetch_relfilenode())  # reindexed into new storage
+        self.assertEqual(3, len(self._fetch_indexes()))
+
+    def test_export_index(self):
+        with self._create_sink(indexes=True, export_index=True, partitioning="month") as sink:
+            sink.dump_batch(self.batch)
+        indexes = dict(self._fetch_indexes())
+        self.assertIn("USING btree (ts, id)", indexes[PostgreSQLDataSink.TS_ID_INDEX_NAME])
+
+    def test_indexes_on_compact_partitioned_table(self):
+        with self._create_sink(indexes=True, concurrent_indexes=True, compact=True, partitioning="month") as sink:
+            sink.dump_batch(self.batch)
+        indexes = dict(self._fetch_indexes())
+        self.assertIn("USING btree (key_id, ts)", indexes["Message_key_ts_idx"])
+        with self.con.cursor() as cur:  # partitions inherit the indexes
+            cur.execute("SELECT COUNT(*) FROM pg_indexes WHERE tablename = 'Message_202010';")
+            self.assertEqual(3, cur.fetchone()[0])
+
+
+class TestPooledPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.messages = [
+            {"key": f"{chr(ord('A') + i % 5)}123", "value": f"{i}.5", "ts": "2020-10-07 13:28:43.399620+02:00"}
+            for i in range(100)
+        ]
+
+    def _dump_in_batches(self, sink, batch_size=7):
+        for i in range(0, len(self.messages), batch_size):
+            self.assertTrue(sink.dump_batch(self.messages[i:i + batch_size]), "Dump was not successful")
+
+    def test_object_creation_with_invalid_writers(self):
+        with self.assertRaises(ValueError):
+            self._create_sink(writers=0)
+        self.assertTrue(self._create_sink(writers=2).pooled)
+
+    def test_connections_are_reused_across_runs(self):
+        with self._create_sink(pooled=True) as sink:
+            backend_pid = sink._connection.info.backend_pid
+        with self._create_sink(pooled=True) as sink:
+            self.assertEqual(backend_pid, sink._connection.info.backend_pid)
+            self.assertFalse(sink._connection.closed)
+
+    def test_concurrent_sinks_share_the_pool(self):
+        with self._create_sink(writers=2) as first, self._create_sink(writers=2) as second:
+            self.assertIs(first._pool, second._pool)
+            self.assertEqual(6, first._pool.maxconn)  # 3 reserved connections each
+            first.dump_batch(self.messages[:5])
+            second.dump_batch(self.messages[5:])
+        with self._create_sink(pooled=True) as sink:
+            self.assertEqual(6, len(sink._pool._pool) + len(sink._pool._used))  # idle connections are kept
+        with self.con.cursor() as cur:
+            cur.execute(f'SELECT COUNT(*) FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}";')
+            self.assertEqual(len(self.messages), cur.fetchone()[0])
+
+    def test_dump_batch_with_writers(self):
+        with self._create_sink(writers=3) as sink:
+            self.assertEqual(3, len(sink._writer_threads))
+            threads = list(sink._writer_threads)
+            backend_pids = {connection.info.backend_pid for connection in sink._writer_connections}
+            self.assertEqual(3, len(backend_pids))
+            self._dump_in_batches(sink)
+            sink.dump({"key": "Z123", "value": "1.0", "ts": "2020-10-07 13:28:43.399620+02:00"})
+        self.assertEqual(len(self.messages) + 1, len(self._fetch_messages()))
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+
+    def test_partition_by_key_preserves_order_per_key(self):
+        with self._create_sink(writers=3, partition_by_key=True) as sink:
+            self._dump_in_batches(sink, batch_size=3)
+        with self.con.cursor() as cur:
+            cur.execute(f'SELECT key, value FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}" ORDER BY id;')
+            rows = cur.fetchall()
+        self.assertEqual(len(self.messages), len(rows))
+        for key in {message["key"] for message in self.messages}:
+            values = [value for row_key, value in rows if row_key == key]
+            self.assertEqual(sorted(values), values, msg=key)
+
+    def test_object_creation_with_order(self):
+        self.assertEqual("none", self._create_sink(writers=2).order)
+        self.assertEqual("key", self._create_sink(writers=2, partition_by_key=True).order)
+        self.assertTrue(self._create_sink(writers=2, order="key").partition_by_key)
+        with self.assertRaises(ValueError):
+            self._create_sink(order="file")
+        with self.assertRaisesRegex(ValueError, "not in global order"):
+            self._create_sink(partition_by_key=True, order="global")
+        with self.assertRaisesRegex(ValueError, "not in none order"):
+            self._create_sink(partition_by_key=True, order="none")
+        with self.assertRaises(ValueError):
+            self._create_sink(order="global", rollups=("hour",))
+        with self.assertRaises(ValueError):
+            self._create_sink(order="global", idempotent=True)
+
+    def test_global_order_commits_batches_in_order(self):
+        committed = []
+        wait = ReorderBuffer.wait
+
+        def record_commit(buffer, sequence):  # commits follow their turn one at a time
+            wait(buffer, sequence)
+            committed.append(sequence)
+
+        with self._create_sink(writers=3, order="global") as sink:
+            write_rows = sink._write_rows
+
+            def slow_first_batch(connection, rows, sequence=None):
+                if sequence == 0:
+                    time.sleep(0.05)  # executed last, but still committed first
+                write_rows(connection, rows, sequence)
+
+            with unittest.mock.patch.object(sink, "_write_rows", slow_first_batch), \
+                    unittest.mock.patch.object(ReorderBuffer, "wait", record_commit):
+                self._dump_in_batches(sink)
+                sink._wait_for_writers()
+            self.assertEqual(0, sink._reorder_buffer.pending)
+        self.assertEqual(list(range(15)), committed)
+        self.assertEqual(len(self.messages), len(self._fetch_messages()))
+
+    def test_global_order_with_writer_error(self):
+        sink = self._create_sink(writers=2, order="global")
+        sink.initialize()
+        sink.dump_batch([{"key": "A123", "value": "invalid", "ts": "2020-10-07 13:28:43.399620+02:00"}])
+        sink.dump_batch(self.messages[:3])  # discarded, but its turn is passed on
+        with self.assertRaises(psycopg2.DataError):
+            sink.close()
+        self.assertEqual(0, sink._reorder_buffer.pending)
+
+    def test_global_order_does_not_commit_after_failed_batch(self):
+        bad_batch = [{"key": "A123", "value": "invalid", "ts": "2020-10-07 13:28:43.399620+02:00"}]
+        sink = self._create_sink(writers=3, order="global")
+        sink.initialize()
+        write_rows = sink._write_rows
+
+        def slow_second_batch(connection, rows, sequence=None):
+            if sequence == 1:
+                time.sleep(0.05)  # fails after the third batch waits for its turn
+            write_rows(connection, rows, sequence)
+
+        with unittest.mock.patch.object(sink, "_write_rows", slow_second_batch):
+            sink.dump_batch(self.messages[:3])
+            sink.dump_batch(bad_batch)
+            sink.dump_batch(self.messages[3:6])
+            with self.assertRaises(psycopg2.DataError):
+                sink.close()
+        self.assertEqual(["A123", "B123", "C123"], [row[0] for row in self._fetch_messages()])  # first batch only
+
+    def test_staged_dump_batch_with_writers(self):
+        with self._create_sink(writers=2, staging=True, commit_interval=5) as sink:
+            self._dump_in_batches(sink)
+        self.assertEqual(len(self.messages), len(self._fetch_messages()))
+        self.assertEqual(0, len(self._fetch_messages(PostgreSQLDataSink.STAGING_TABLE_NAME)))
+
+    def test_writer_error_is_raised(self):
+        sink = self._create_sink(writers=2)
+        sink.initialize()
+        threads = list(sink._writer_threads)
+        sink.dump_batch([{"key": "A123", "value": "invalid", "ts": "2020-10-07 13:28:43.399620+02:00"}])
+        with self.assertRaises(psycopg2.DataError):
+            sink.close()
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+
+
+class TestRollupPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch = [
+            {"key": "A123", "value": "1.5", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "A123", "value": "2.5", "ts": "2020-10-07 13:28:59.000000+02:00"},
+            {"key": "A123", "value": "4.5", "ts": "2020-10-07 13:29:01.000000+02:00"},
+            {"key": "B123", "value": "3.5", "ts": "2020-10-07 14:00:00.000000-05:30"}
+        ]
+        self.expected_minutes = [
+            ("A123", datetime(2020, 10, 7, 13, 28), 2, 4.0, 1.5, 2.5),
+            ("A123", datetime(2020, 10, 7, 13, 29), 1, 4.5, 4.5, 4.5),
+            ("B123", datetime(2020, 10, 7, 14, 0), 1, 3.5, 3.5, 3.5)
+        ]
+        self.expected_hours = [
+            ("A123", datetime(2020, 10, 7, 13), 3, 8.5, 1.5, 4.5),
+            ("B123", datetime(2020, 10, 7, 14), 1, 3.5, 3.5, 3.5)
+        ]
+
+    def _fetch_rollup(self, interval, key_column="key"):
+        with self.con.cursor() as cur:
+            cur.execute(f'''
+                SELECT {key_column}, bucket, count, sum, min, max
+                FROM "{PostgreSQLDataSink.rollup_table_name(interval)}" ORDER BY 1, 2;
+            ''')
+            return cur.fetchall()
+
+    def test_object_creation_with_unsupported_rollup(self):
+        self.assertEqual(("minute", "hour"), self._create_sink(rollups=["minute", "hour"]).rollups)
+        with self.assertRaises(ValueError):
+            self._create_sink(rollups=("week",))
+
+    def test_dump_batch_updates_rollups(self):
+        with self._create_sink(rollups=("minute", "hour")) as sink:
+            sink.dump_batch(self.batch)
+        self.assertEqual(self.expected_minutes, self._fetch_rollup("minute"))
+        self.assertEqual(self.expected_hours, self._fetch_rollup("hour"))
+        self.assertEqual(4, len(self._fetch_messages()))
+
+    def test_rollups_are_maintained_incrementally(self):
+        with self._create_sink(rollups=("day",)) as sink:
+            sink.dump_batch(self.batch[:2])
+            sink.dump(self.batch[2])
+            sink.dump_batch(encode_chunk(",".join(json.dumps(message) for message in self.batch[3:])))
+        self.assertEqual([("A123", datetime(2020, 10, 7), 3, 8.5, 1.5, 4.5),
+                          ("B123", datetime(2020, 10, 7), 1, 3.5, 3.5, 3.5)], self._fetch_rollup("day"))
+
+    def test_staged_rollups(self):
+        with self._create_sink(staging=True, rollups=("minute", "hour")) as sink:
+            sink.dump_batch(self.batch[:2])
+            sink.dump_batch(self.batch[2:])
+            self.assertEqual([], self._fetch_rollup("minute"))  # applied at the checkpoint
+        self.assertEqual(self.expected_minutes, self._fetch_rollup("minute"))
+        self.assertEqual(self.expected_hours, self._fetch_rollup("hour"))
+
+    def test_rollup_sums_are_rounded_as_stored(self):
+        messages = [{"key": "A123", "value": value, "ts": f"2020-10-07 13:{minute}:00+00:00"}
+                    for minute in ("28", "29") for value in ("15.6", "0.1", "2.7")]
+        with self._create_sink(rollups=("minute",)) as sink:
+            sink.dump_batch(messages[:3])
+        with self._create_sink(staging=True, rollups=("minute",)) as sink:
+            sink.dump_batch(messages[3:])
+        direct, staged = self._fetch_rollup("minute")
+        self.assertEqual(sum(array("f", [15.6, 0.1, 2.7]).tolist()), direct[3])
+        self.assertEqual(staged[3], direct[3])
+
+    def test_compact_rollups(self):
+        with self._create_sink(compact=True, rollups=("hour",)) as sink:
+            sink.dump_batch(self.batch)
+        with self.con.cursor() as cur:
+            cur.execute(f'''
+                SELECT k.key, r.bucket, r.count, r.sum, r.min, r.max
+                FROM "{PostgreSQLDataSink.rollup_table_name("hour")}" r
+                JOIN "{PostgreSQLDataSink.KEY_TABLE_NAME}" k ON r.key_id = k.id ORDER BY 1, 2;
+            ''')
+            self.assertEqual(self.expected_hours, cur.fetchall())
+
+    def test_concurrent_writers_update_rollups(self):
+        messages = [{"key": f"{chr(ord('A') + i % 3)}123", "value": "1.0",
+                     "ts": f"2020-10-07 13:{i % 2:02d}:00+00:00"} for i in range(120)]
+        with self._create_sink(writers=3, rollups=("minute",)) as sink:
+            for start in range(0, 120, 10):
+                sink.dump_batch(messages[start:start + 10])
+        rollup = self._fetch_rollup("minute")
+        self.assertEqual(6, len(rollup))
+        self.assertEqual(120, sum(row[2] for row in rollup))
+        self.assertTrue(all(row[2] == 20 and row[3] == 20.0 for row in rollup))
+
+
+class TestIdempotentPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch = [
+            {"key": "A123", "value": "1.5", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "A123", "value": "2.5", "ts": "2020-10-07 13:28:59.000000+02:00"},
+            {"key": "B123", "value": "3.5", "ts": "2020-10-07 14:00:00.000000-05:30"}
+        ]
+
+    def test_stats_without_idempotence(self):
+        with self._create_sink() as sink:
+            sink.dump_batch(self.batch)
+            self.assertEqual({}, sink.stats)
+
+    def test_dump_batch_skips_duplicates(self):
+        with self._create_sink(idempotent=True) as sink:
+            self.assertTrue(sink.dump_batch(self.batch[:2]), "Dump was not successful")
+            self.assertTrue(sink.dump_batch(self.batch), "Dump was not successful")
+            self.assertTrue(sink.dump(self.batch[0]), "Dump was not successful")
+            self.assertEqual({"skipped_duplicates": 3}, sink.stats)
+        self.assertEqual(3, len(self._fetch_messages()))
+
+    def test_same_key_and_time_in_another_timezone_is_not_a_duplicate(self):
+        other = dict(self.batch[0], ts="2020-10-07 13:28:43.399620+03:00")
+        with self._create_sink(idempotent=True) as sink:
+            sink.dump_batch([self.batch[0], other])
+            self.assertEqual({"skipped_duplicates": 0}, sink.stats)
+        self.assertEqual(2, len(self._fetch_messages()))
+
+    def test_rerun_skips_stored_messages(self):
+        with self._create_sink(idempotent=True) as sink:
+            sink.dump_batch(self.batch[:2])
+        with self._create_sink(idempotent=True) as sink:  # e.g. a resumed load
+            sink.dump_batch(self.batch)
+            self.assertEqual({"skipped_duplicates": 2}, sink.stats)
+        self.assertEqual(3, len(self._fetch_messages()))
+
+    def test_duplicates_in_encoded_batch_are_skipped(self):
+        batch = encode_chunk(",".join(json.dumps(message) for message in self.batch))
+        with self._create_sink(idempotent=True) as sink:
+            sink.dump_batch(self.batch[1:])
+            sink.dump_batch(batch)
+            sink.dump_batch(batch)
+            self.assertEqual({"skipped_duplicates": 5}, sink.stats)
+        self.assertEqual(3, len(self._fetch_messages()))
+
+    def test_staged_duplicates_are_skipped_at_checkpoint(self):
+        with self._create_sink(idempotent=True, staging=True) as sink:
+            sink.dump_batch(self.batch)
+            sink.dump_batch(self.batch[:1])
+            self.assertEqual(3, sink.checkpoint())
+            self.assertEqual({"skipped_duplicates": 1}, sink.stats)
+            sink.dump_batch(self.batch)
+            self.assertEqual(0, sink.checkpoint())
+            self.assertEqual({"skipped_duplicates": 4}, sink.stats)
+        self.assertEqual(3, len(self._fetch_messages()))
+
+    def test_rollups_only_count_stored_messages(self):
+        expected = [("A123", datetime(2020, 10, 7, 13), 2, 4.0, 1.5, 2.5),
+                    ("B123", datetime(2020, 10, 7, 14), 1, 3.5, 3.5, 3.5)]
+        encoded = encode_chunk(",".join(json.dumps(message) for message in self.batch))
+        for options in ({}, {"staging": True}):
+            with self.subTest(**options):
+                with self._create_sink(idempotent=True, rollups=("hour",), **options) as sink:
+                    sink.dump_batch(self.batch[:2])
+                    sink.dump_batch(self.batch)
+                    sink.dump_batch(encoded)
+                with self.con.cursor() as cur:
+                    cur.execute(f'''
+                        SELECT key, bucket, count, sum, min, max
+                        FROM "{PostgreSQLDataSink.rollup_table_name("hour")}" ORDER BY 1, 2;
+                    ''')
+                    self.assertEqual(expected, cur.fetchall())
+                    cur.execute(f'DROP TABLE "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}", '
+                                f'"{PostgreSQLDataSink.rollup_table_name("hour")}";')
+                self.con.commit()
+
+    def test_compact_duplicates_are_skipped(self):
+        with self._create_sink(idempotent=True, compact=True) as sink:
+            sink.dump_batch(self.batch)
+            sink.dump_batch(self.batch)
+            self.assertEqual({"skipped_duplicates": 3}, sink.stats)
+        with self.con.cursor() as cur:
+            cur.execute(f'SELECT count(*) FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}";')
+            self.assertEqual(3, cur.fetchone()[0])
+
+    def test_concurrent_writers_skip_duplicates(self):
+        with self._create_sink(idempotent=True, writers=2, partitioning="month") as sink:
+            for _ in range(4):
+                sink.dump_batch(self.batch)
+        self.assertEqual({"skipped_duplicates": 9}, sink.stats)  # counted by all writers
+        self.assertEqual(3, len(self._fetch_messages()))
+
+
+class TestRetryingPostgreSQLDataSink(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch = [
+            {"key": "A123", "value": "1.5", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "not a number", "ts": "2020-10-07 13:28:59.000000+02:00"},
+            {"key": "C123", "value": "3.5", "ts": "2020-10-07 14:00:00.000000-05:30"},
+            {"key": "D123", "value": "4.5", "ts": "2020-10-07"}
+        ]
+
+    def test_failed_batch_is_rolled_back(self):
+        with self._create_sink() as sink:
+            with self.assertRaises(psycopg2.DataError):
+                sink.dump_batch(self.batch[:2])
+            self.assertTrue(sink.dump_batch(self.batch[:1]), "Dump was not successful")
+        self.assertEqual(1, len(self._fetch_messages()))
+
+    def test_lost_connection_is_reestablished(self):
+        with self._create_sink() as sink:
+            sink._connection.close()
+            with self.assertRaises(psycopg2.InterfaceError):
+                sink.dump_batch(self.batch[:1])
+            self.assertTrue(sink.dump_batch(self.batch[:1]), "Dump was not successful")
+        self.assertEqual(1, len(self._fetch_messages()))
+
+    def test_lost_connection_is_retried(self):
+        with RetryingDataSink(self._create_sink(), base_delay=0.0) as sink:
+            sink.data_sink._connection.close()
+            self.assertTrue(sink.dump_batch(self.batch[:1]), "Dump was not successful")
+            self.assertEqual(1, sink.stats["retries"])
+        self.assertEqual(1, len(self._fetch_messages()))
+
+    def test_bad_messages_are_isolated(self):
+        rejected = []
+        error_sink = unittest.mock.Mock(spec=DataSink, dump=rejected.append)
+        for options in ({}, {"staging": True}):
+            with self.subTest(**options):
+                rejected.clear()
+                with RetryingDataSink(self._create_sink(**options), error_sink) as sink:
+                    self.assertFalse(sink.dump_batch(self.batch), "Bad messages were not rejected")
+                    self.assertEqual(2, sink.stats["rejected_messages"])
+                self.assertEqual(["A123", "C123"], [message[0] for message in self._fetch_messages()])
+                self.assertEqual(["B123", "D123"], [message["key"] for message in rejected])
+                self.assertTrue(rejected[0]["error"].startswith("InvalidTextRepresentation"))
+                with self.con.cursor() as cur:
+                    cur.execute(f'DROP TABLE "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}";')
+                self.con.commit()
+
+    def test_bad_keys_are_isolated(self):
+        rejected = []
+        error_sink = unittest.mock.Mock(spec=DataSink, dump=rejected.append)
+        batch = [self.batch[0], {**self.batch[0], "key": "E1234"}, self.batch[2]]
+        with RetryingDataSink(self._create_sink(compact=True), error_sink) as sink:
+            self.assertFalse(sink.dump_batch(batch), "Bad messages were not rejected")
+            self.assertEqual(1, sink.stats["rejected_messages"])
+        self.assertEqual(["E1234"], [message["key"] for message in rejected])
+        self.assertTrue(rejected[0]["error"].startswith("StringDataRightTruncation"))
+        with self.con.cursor() as cur:
+            cur.execute(f'''
+                SELECT k.key FROM "{PostgreSQLDataSink.MESSAGE_TABLE_NAME}" m
+                JOIN "{PostgreSQLDataSink.KEY_TABLE_NAME}" k ON m.key_id = k.id ORDER BY m.id;
+            ''')
+            self.assertEqual(["A123", "C123"], [row[0] for row in cur.fetchall()])
@@ -0,0 +1,122 @@
+import unittest.mock
+from unittest import TestCase
+
+from src.sinks.data_sink import DataSink
+from src.sinks.retrying_data_sink import RetryingDataSink
+
+
+class FlakyDataSink(DataSink):
+
+    def __init__(self, bad_values=(), connection_failures=0):
+        self.messages = []
+        self.batches = 0
+        self.bad_values = set(bad_values)
+        self.connection_failures = connection_failures
+        self.closed = False
+
+    def __enter__(self):
+        self.initialize()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def initialize(self):
+        self.closed = False
+
+    def dump(self, message):
+        return self.dump_batch([message])
+
+    def dump_batch(self, messages):
+        self.batches += 1
+        if self.connection_failures > 0:
+            self.connection_failures -= 1
+            raise ConnectionError("Connection lost")
+        if any(message["value"] in self.bad_values for message in messages):
+            raise ValueError("Invalid value")  # the whole batch is discarded
+        self.messages.extend(messages)
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+class TestRetryingDataSink(TestCase):
+
+    def setUp(self):
+        self.messages = [{"key": f"K{index}", "value": index} for index in range(16)]
+        patcher = unittest.mock.patch("src.sinks.retrying_data_sink.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_object_creation(self):
+        data_sink, error_sink = FlakyDataSink(), FlakyDataSink()
+        sink = RetryingDataSink(data_sink, error_sink, max_retries=3, base_delay=0.5, max_delay=2.0)
+        self.assertIs(data_sink, sink.data_sink)
+        self.assertIs(error_sink, sink.error_sink)
+        self.assertEqual(3, sink.max_retries)
+        self.assertEqual(RetryingDataSink.TRANSIENT_ERRORS, sink.transient_errors)
+        self.assertEqual({"retries": 0, "bisections": 0, "rejected_messages": 0}, sink.stats)
+
+    def test_object_creation_with_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            RetryingDataSink(FlakyDataSink(), max_retries=-1)
+        with self.assertRaises(ValueError):
+            RetryingDataSink(FlakyDataSink(), base_delay=2.0, max_delay=1.0)
+
+    def test_clean_batch_is_dumped_at_once(self):
+        with RetryingDataSink(FlakyDataSink()) as sink:
+            self.assertTrue(sink.dump_batch(self.messages), "Dump was not successful")
+            self.assertTrue(sink.dump(self.messages[0]), "Dump was not successful")
+        self.assertEqual(2, sink.data_sink.batches)
+        self.assertTrue(sink.data_sink.closed)
+
+    def test_bad_messages_are_isolated_by_bisection(self):
+        error_sink = FlakyDataSink()
+        with RetryingDataSink(FlakyDataSink(bad_values={5, 11}), error_sink) as sink:
+            self.assertFalse(sink.dump_batch(self.messages), "Bad messages were not rejected")
+        expected = [message for message in self.messages if message["value"] not in (5, 11)]
+        self.assertEqual(expected, sink.data_sink.messages)  # in order
+        self.assertEqual([5, 11], [message["value"] for message in error_sink.messages])
+        self.assertEqual("ValueError: Invalid value", error_sink.messages[0]["error"])
+        self.assertEqual(2, sink.stats["rejected_messages"])
+        self.assertLessEqual(sink.data_sink.batches, 1 + 2 * 2 * 4)  # O(log n) dumps per bad message
+        self.assertTrue(error_sink.closed)
+
+    def test_rejected_message_without_error_sink(self):
+        with RetryingDataSink(FlakyDataSink(bad_values={0})) as sink:
+            self.assertFalse(sink.dump(self.messages[0]), "Bad message was not rejected")
+        self.assertEqual([], sink.data_sink.messages)
+        self.assertEqual(1, sink.stats["rejected_messages"])
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        with RetryingDataSink(FlakyDataSink(connection_failures=3), base_delay=0.1, max_delay=0.3) as sink:
+            self.assertTrue(sink.dump_batch(self.messages), "Dump was not successful")
+        self.assertEqual(self.messages, sink.data_sink.messages)
+        self.assertEqual(3, sink.stats["retries"])
+        self.assertEqual(0, sink.stats["bisections"])
+        delays = [call.args[0] for call in self.sleep.call_args_list]
+        self.assertEqual(3, len(delays))
+        self.assertTrue(0 <= delays[0] <= 0.1 and 0 <= delays[1] <= 0.2 and 0 <= delays[2] <= 0.3)
+
+    def test_persistent_transient_error_is_raised(self):
+        sink = RetryingDataSink(FlakyDataSink(connection_failures=10), max_retries=2)
+        with self.assertRaises(ConnectionError):
+            sink.dump_batch(self.messages)
+        self.assertEqual(3, sink.data_sink.batches)  # not bisected
+        self.assertEqual(2, self.sleep.call_count)
+
+    def test_transient_errors_of_the_data_sink_are_retried(self):
+        data_sink = FlakyDataSink(bad_values={3})
+        data_sink.TRANSIENT_ERRORS = (ValueError,)
+        sink = RetryingDataSink(data_sink, max_retries=2)
+        self.assertEqual((ConnectionError, TimeoutError, ValueError), sink.transient_errors)
+        with self.assertRaises(ValueError):
+            sink.dump_batch(self.messages)
+        self.assertEqual(3, data_sink.batches)  # not bisected
+        self.assertEqual(2, sink.retries)
+
+    def test_backoff_delay_is_capped(self):
+        sink = RetryingDataSink(FlakyDataSink(), base_delay=1.0, max_delay=4.0)
+        with unittest.mock.patch("src.sinks.retrying_data_sink.random.uniform", side_effect=lambda a, b: b):
+            self.assertEqual([1.0, 2.0, 4.0, 4.0], [sink.backoff_delay(attempt) for attempt in range(4)])
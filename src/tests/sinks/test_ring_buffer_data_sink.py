@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from src.exceptions.ring_buffer_closed import RingBufferClosed
+from src.ring_buffer import SharedRingBuffer
+from src.sinks.ring_buffer_data_sink import RingBufferDataSink
+
+
+class TestRingBufferDataSink(TestCase):
+
+    def setUp(self):
+        self.ring_buffer = SharedRingBuffer(16)
+        self.messages = [{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+                         {"key": "B123", "value": 12.6, "ts": "2020-10-08 13:28:43.399620-0530"}]
+
+    def tearDown(self):
+        self.ring_buffer.release()
+        self.ring_buffer.unlink()
+
+    def test_object_creation(self):
+        sink = RingBufferDataSink(self.ring_buffer.name)
+        self.assertEqual(self.ring_buffer.name, sink.name)
+        self.assertIsNone(sink._ring_buffer)
+
+    def test_dump(self):
+        with RingBufferDataSink(self.ring_buffer.name) as sink:
+            self.assertTrue(sink.dump(self.messages[0]))
+            self.assertTrue(sink.dump_batch(self.messages[1:]))
+            self.assertFalse(self.ring_buffer.closed)
+        self.assertTrue(self.ring_buffer.closed)  # end of the messages
+        self.assertEqual([("A123", 15.6, "2020-10-07 13:28:43.399620", "+02:00"),
+                          ("B123", 12.6, "2020-10-08 13:28:43.399620", "-05:30")],
+                         [SharedRingBuffer.decode_record(record) for record in self.ring_buffer.get_batch(10)])
+
+    def test_dump_into_closed_ring_buffer(self):
+        self.ring_buffer.close()
+        with RingBufferDataSink(self.ring_buffer.name) as sink:
+            with self.assertRaises(RingBufferClosed):
+                sink.dump_batch(self.messages)
+
+    def test_dump_invalid_message(self):
+        with RingBufferDataSink(self.ring_buffer.name) as sink:
+            with self.assertRaises(ValueError):
+                sink.dump({"key": "A123", "value": "15.6", "ts": "yesterday"})
+
+    def test_initialize_with_missing_ring_buffer(self):
+        with self.assertRaises(FileNotFoundError):
+            RingBufferDataSink("missing_ring_buffer").initialize()
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from src.sinks.data_sink import DataSink
+from src.sinks.sqlite_data_sink import SQLiteDataSink
+
+
+class TestSQLiteDataSink(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.database_filepath = os.path.join(self.tempdir.name, "test.db")
+        self.sink = SQLiteDataSink(self.database_filepath)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _fetch_messages(self):
+        con = sqlite3.connect(self.database_filepath)
+        try:
+            return con.execute(f'SELECT * FROM "{SQLiteDataSink.MESSAGE_TABLE_NAME}" ORDER BY id;').fetchall()
+        finally:
+            con.close()
+
+    def test_object_creation(self):
+        self.assertIsInstance(self.sink, SQLiteDataSink)
+        self.assertIsInstance(self.sink, DataSink)
+        self.assertEqual(self.database_filepath, self.sink.database_filepath)
+        self.assertEqual(SQLiteDataSink.DEFAULT_PRAGMAS, self.sink.pragmas)
+
+    def test_object_creation_with_custom_pragmas(self):
+        sink = SQLiteDataSink(self.database_filepath, {"synchronous": "OFF", "page_size": 8192})
+        self.assertEqual("OFF", sink.pragmas["synchronous"])
+        self.assertEqual(8192, sink.pragmas["page_size"])
+        self.assertEqual("WAL", sink.pragmas["journal_mode"])
+
+    def test_initialize(self):
+        with self.sink:
+            journal_mode = self.sink._connection.execute("PRAGMA journal_mode;").fetchone()[0]
+            self.assertEqual("wal", journal_mode)
+        self.assertEqual(0, len(self._fetch_messages()))
+
+    def test_dump(self):
+        message = {
+            "key": "A123",
+            "value": "15.6",
+            "ts": "2020-10-07 13:28:43.399620+02:00"
+        }
+        with self.sink:
+            success = self.sink.dump(message)
+            self.assertTrue(success, "Dump was not successful")
+        messages = self._fetch_messages()
+        self.assertEqual(1, len(messages))
+        self.assertEqual("A123", messages[0][1])  # key
+        self.assertEqual(15.6, messages[0][2])  # value
+        self.assertEqual("2020-10-07 13:28:43.399620+02:00", f"{messages[0][3]}{messages[0][4]}")  # timestamp
+
+    def test_dump_batch(self):
+        batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620+02:00"},
+            {"key": "C123", "value": "65.6", "ts": "1020-10-07 13:28:43.399620-05:00"}
+        ]
+        with self.sink:
+            success = self.sink.dump_batch(batch)
+            self.assertTrue(success, "Dump was not successful")
+        messages = self._fetch_messages()
+        self.assertEqual(3, len(messages))
+        for expected, message in zip(batch, messages):
+            self.assertEqual(expected["key"], message[1])
+            self.assertEqual(float(expected["value"]), message[2])
+            self.assertEqual(expected["ts"], f"{message[3]}{message[4]}")
+
+    def test_dump_batch_with_invalid_timestamp(self):
+        batch = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620"}
+        ]
+        with self.sink:
+            with self.assertRaises(ValueError):
+                self.sink.dump_batch(batch)
+        self.assertEqual(0, len(self._fetch_messages()))
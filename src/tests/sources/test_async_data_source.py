@@ -0,0 +1,59 @@
+import asyncio
+import os
+import threading
+from unittest import TestCase
+
+from src.definitions import INPUT_FILES_DIR
+from src.sources.async_data_source import AsyncDataSource, ThreadedDataSource
+from src.predicates import KeyIn
+from src.sources.file_data_source import FileDataSource
+
+
+class TestThreadedDataSource(TestCase):
+
+    def setUp(self):
+        self.source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+
+    def test_object_creation(self):
+        data_source = FileDataSource(self.source_filepath)
+        source = ThreadedDataSource(data_source)
+        self.assertIsInstance(source, AsyncDataSource)
+        self.assertIs(data_source, source.data_source)
+        self.assertIsNone(source.executor)
+
+    def test_read(self):
+        async def read_all():
+            messages = []
+            async with ThreadedDataSource(FileDataSource(self.source_filepath)) as source:
+                while await source.has_message():
+                    messages.append(await source.read())
+            return messages
+
+        with FileDataSource(self.source_filepath) as data_source:
+            expected_messages = [data_source.read() for _ in range(3)]
+        self.assertEqual(expected_messages, asyncio.run(read_all()))
+
+    def test_read_batch_in_thread_pool(self):
+        data_source = FileDataSource(self.source_filepath)
+        threads = []
+        read_batch = data_source.read_batch
+        data_source.read_batch = lambda batch_size: threads.append(threading.get_ident()) or read_batch(batch_size)
+
+        async def read_batches():
+            async with ThreadedDataSource(data_source) as source:
+                return [await source.read_batch(2), await source.read_batch(2)]
+
+        batches = asyncio.run(read_batches())
+        self.assertEqual([2, 1], [len(batch) for batch in batches])
+        self.assertNotIn(threading.get_ident(), threads)  # the event loop was not blocked
+        self.assertFalse(data_source.is_open)
+
+    def test_stats(self):
+        source = ThreadedDataSource(FileDataSource(self.source_filepath, 64))
+        self.assertEqual(64, source.stats["chunk_size"])
+
+    def test_where(self):
+        data_source = FileDataSource(self.source_filepath)
+        predicate = KeyIn({"A123"})
+        self.assertTrue(ThreadedDataSource(data_source).where(predicate))
+        self.assertIs(predicate, data_source.predicate)
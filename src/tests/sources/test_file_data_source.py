@@ -1,8 +1,14 @@
 import os
 import json
-from unittest import TestCase
+import tempfile
+from unittest import TestCase, mock
 
 from src.definitions import INPUT_FILES_DIR
+from src.encoded_batch import EncodedBatch
+from src.file_index import FileIndex
+from src.json_backends import JSONBackend, available_backends
+from src.predicates import KeyIn
+from src.raw_message import RawMessage
 from src.sources.data_source import DataSource
 from src.sources.file_data_source import FileDataSource
 from src.exceptions.file_not_open_error import FileNotOpenError
@@ -20,6 +26,12 @@ class TestFileDataSource(TestCase):
         self.assertEqual(source_filepath, source.source_filepath)
         self.assertEqual(chunk_size, source.chunk_size)
 
+    def test_object_creation_with_auto_tune(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "single_message.json")
+        source = FileDataSource(source_filepath, auto_tune=True)
+        self.assertTrue(source.auto_tune)
+        self.assertFalse(FileDataSource(source_filepath).auto_tune)
+
     def test_initialize(self):
         source_filepath = os.path.join(INPUT_FILES_DIR, "single_message.json")
         source = FileDataSource(source_filepath)
@@ -90,6 +102,17 @@ class TestFileDataSource(TestCase):
         finally:
             source.close()  # assumes FileDataSource.close() works
 
+    def test_read_with_whitespace_at_chunk_boundary(self):
+        message = {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"}
+        text = json.dumps([message])
+        chunk_size = text.index("2020-10-07 ") + len("2020-10-07 ")  # the first chunk ends with the space
+        with tempfile.TemporaryDirectory() as directory:
+            source_filepath = os.path.join(directory, "messages.json")
+            with open(source_filepath, 'w') as source_file:
+                source_file.write(text)
+            with FileDataSource(source_filepath, chunk_size) as source:
+                self.assertEqual(message, source.read())
+
     def test_multiple_reads(self):
         source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
         source = FileDataSource(source_filepath)
@@ -190,6 +213,11 @@ class TestFileDataSource(TestCase):
         with self.assertRaises(json.JSONDecodeError):
             json.loads(result[2])
 
+    def test_split_json_chunk_keeps_whitespace_of_incomplete_chunk(self):
+        chunk = '{"key": "11", "ts": "2020-10-07 '
+        result = tuple(FileDataSource._split_json_chunk(chunk))
+        self.assertEqual(('{"key": "11", "ts": "2020-10-07 ',), result)
+
     def test_split_json_chunk_with_prepend(self):
         prepend = '{"key": "33", "val'
         chunk = 'ue": "333"} , {"key": "44", "value": "444"}  ]  '
@@ -204,3 +232,339 @@ class TestFileDataSource(TestCase):
         self.assertEqual(2, len(result))
         self.assertEqual('{"key": "33", "value": "333"}', result[0])
         self.assertEqual('{"key": "44", "value": "444"}', result[1])
+
+    def test_read_with_auto_tune(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with FileDataSource(source_filepath, auto_tune=True) as source:
+            self.assertEqual(0, source.chunk_size % source.block_size)
+            self.assertGreaterEqual(source.chunk_size, source.file_size)  # small file is read at once
+            keys = []
+            while source.has_message():
+                keys.append(source.read()["key"])
+            self.assertEqual(["A123", "B123", "C123"], keys)
+            self.assertEqual(1, source.stats["reads"])
+
+    def test_read_with_auto_tune_and_multibyte_characters(self):
+        messages = [{"key": f"{i:04}", "value": "\u20ac" * 100, "ts": "2020-10-07 13:28:43.399620+02:00"}
+                    for i in range(100)]
+        with tempfile.TemporaryDirectory() as directory:
+            source_filepath = os.path.join(directory, "messages.json")
+            with open(source_filepath, 'w', encoding="utf-8") as source_file:
+                json.dump(messages, source_file, ensure_ascii=False)
+
+            class SmallChunkFileDataSource(FileDataSource):
+                AUTO_MIN_CHUNK_SIZE = 1  # chunk size is a single block
+
+            with SmallChunkFileDataSource(source_filepath, auto_tune=True) as source:
+                self.assertEqual(source.block_size, source.chunk_size)
+                read_messages = []
+                while source.has_message():
+                    read_messages.append(source.read())
+                self.assertGreater(source.stats["reads"], 1)
+        self.assertEqual(messages, read_messages)
+
+    def test_stats(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with FileDataSource(source_filepath, 16) as source:
+            while source.has_message():
+                source.read()
+            stats = source.stats
+        self.assertEqual(16, stats["chunk_size"])
+        self.assertEqual(os.path.getsize(source_filepath), stats["file_size"])
+        self.assertGreater(stats["block_size"], 0)
+        self.assertFalse(stats["auto_tune"])
+        self.assertEqual(-(-stats["file_size"] // 16), stats["reads"])
+
+    def test_tune_chunk_size(self):
+        mib = 1024 * 1024
+        self.assertEqual(4096, FileDataSource._tune_chunk_size(0, 4096))
+        self.assertEqual(4096, FileDataSource._tune_chunk_size(100, 4096))
+        self.assertEqual(8192, FileDataSource._tune_chunk_size(5000, 4096))
+        self.assertEqual(mib, FileDataSource._tune_chunk_size(10 * mib, 4096))
+        self.assertEqual(2 * mib, FileDataSource._tune_chunk_size(128 * mib, 4096))
+        self.assertEqual(16 * mib, FileDataSource._tune_chunk_size(10 * 1024 * mib, 4096))
+        self.assertEqual(mib + 2048, FileDataSource._tune_chunk_size(10 * mib, 3072))
+
+    def test_read_raw(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with FileDataSource(source_filepath) as source:
+            expected_messages = [source.read() for _ in range(3)]
+        for chunk_size in (8, 256):
+            with FileDataSource(source_filepath, chunk_size, raw=True) as source, \
+                    mock.patch.object(JSONBackend, "loads") as loads, \
+                    mock.patch.object(JSONBackend, "loads_batch") as loads_batch:
+                messages = []
+                while source.has_message():
+                    messages.append(source.read())
+                loads.assert_not_called()
+                loads_batch.assert_not_called()
+            self.assertTrue(all(isinstance(message, RawMessage) for message in messages))
+            self.assertEqual(expected_messages, [json.loads(message.raw) for message in messages])
+
+    def test_read_with_each_decoder(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        for decoder in available_backends():
+            for chunk_size in (8, 256):
+                with FileDataSource(source_filepath, chunk_size, decoder=decoder) as source:
+                    messages = []
+                    while source.has_message():
+                        messages.append(source.read())
+                    self.assertEqual(decoder, source.stats["decoder"])
+                self.assertEqual(["A123", "B123", "C123"], [message["key"] for message in messages])
+                self.assertEqual("65.6", messages[2]["value"])
+        with self.assertRaises(ValueError):
+            FileDataSource(source_filepath, decoder="yaml")
+
+    def test_messages_are_decoded_in_batches(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with FileDataSource(source_filepath, decoder="json") as source, \
+                mock.patch.object(JSONBackend, "loads_batch", autospec=True,
+                                  side_effect=JSONBackend.loads_batch) as loads_batch:
+            messages = [source.read() for _ in range(3)]
+        loads_batch.assert_called_once()
+        self.assertEqual(3, len(loads_batch.call_args.args[1]))
+        self.assertEqual(["A123", "B123", "C123"], [message["key"] for message in messages])
+
+    def test_decode_loaded_messages_with_invalid_message(self):
+        source = FileDataSource("/path/to/file.json", decoder="json")
+        source._loaded_messages.extend(['{"key": "A123"}', '{"key": }', '{"key": "C123"}', '{"key": "D1'])
+        source._decode_loaded_messages()
+        self.assertEqual([{"key": "A123"}, {"key": "C123"}], list(source._decoded_messages))
+        self.assertEqual('{"key": }{"key": "D1', source._text_chunk_prepend.getvalue())
+        self.assertEqual(0, len(source._loaded_messages))
+
+    def test_read_batch(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        for chunk_size in (8, 256):
+            with FileDataSource(source_filepath, chunk_size) as source:
+                batches = []
+                while source.has_message():
+                    batches.append(source.read_batch(2))
+                with self.assertRaises(FileSourceDepleted):
+                    source.read_batch(2)
+            self.assertEqual([["A123", "B123"], ["C123"]], [[message["key"] for message in batch]
+                                                            for batch in batches])
+
+    def test_object_creation_with_processes(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        self.assertEqual(2, FileDataSource(source_filepath, processes=2).processes)
+        with self.assertRaises(ValueError):
+            FileDataSource(source_filepath, processes=0)
+        with self.assertRaises(ValueError):
+            FileDataSource(source_filepath, raw=True, processes=2)
+
+    def test_read_batch_with_processes(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with FileDataSource(source_filepath) as source:
+            expected_messages = [source.read() for _ in range(3)]
+        for chunk_size in (8, 100, 4096):
+            with FileDataSource(source_filepath, chunk_size, processes=2) as source:
+                batches = []
+                while source.has_message():
+                    batches.append(source.read_batch(1000))
+                with self.assertRaises(FileSourceDepleted):
+                    source.read_batch(1000)
+                self.assertEqual(2, source.stats["processes"])
+            self.assertTrue(all(isinstance(batch, EncodedBatch) for batch in batches))
+            self.assertEqual(expected_messages, [message for batch in batches for message in batch])
+        self.assertIsNone(source._executor)  # worker processes are shut down
+
+    def test_read_with_processes(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with FileDataSource(source_filepath, 100, processes=1) as source:
+            messages = []
+            while source.has_message():
+                messages.append(source.read())
+            with self.assertRaises(FileSourceDepleted):
+                source.read()
+        self.assertEqual(["A123", "B123", "C123"], [message["key"] for message in messages])
+        self.assertEqual("2020-10-07 13:28:43.399620+02:00", messages[0]["ts"])
+
+    def test_read_with_processes_and_invalid_timestamp(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source_filepath = os.path.join(directory, "messages.json")
+            with open(source_filepath, 'w') as source_file:
+                source_file.write('[{"key": "A123", "value": "15.6", "ts": "yesterday"}]')
+            with FileDataSource(source_filepath, processes=1) as source:
+                with self.assertRaises(ValueError):
+                    source.has_message()
+
+
+class TestPartialFileDataSource(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source_filepath = os.path.join(self.directory.name, "messages.json")
+        self.messages = [{"key": f"K{i % 3:03}", "value": f"{i}.5", "ts": f"2020-10-07 13:{i:02d}:00+02:00"}
+                         for i in range(25)]
+        self.messages[7]["ts"] = "2020-10-07 12:00:00+00:00"  # 14:00 in the timezone of the others
+        with open(self.source_filepath, 'w') as source_file:
+            source_file.write("[\n    " + ",\n    ".join(json.dumps(message) for message in self.messages) + "\n]")
+        self.index_filepath = FileIndex.index_filepath_of(self.source_filepath)
+        FileIndex.build(self.source_filepath, stride=5).save(self.index_filepath)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _read_all(self, source):
+        messages = []
+        with source:
+            while source.has_message():
+                messages.extend(source.read_batch(4))
+            with self.assertRaises(FileSourceDepleted):
+                source.read()
+        return messages
+
+    def test_object_creation_with_invalid_part(self):
+        with self.assertRaises(ValueError):
+            FileDataSource(self.source_filepath, start=-1)
+        with self.assertRaises(ValueError):
+            FileDataSource(self.source_filepath, start=1, byte_range=(0, 10))
+        with self.assertRaises(ValueError):
+            FileDataSource(self.source_filepath, ts_range=("2020-10-07 13:00:00+02:00", None))
+        with self.assertRaises(ValueError):
+            FileDataSource(self.source_filepath, index=True, ts_range=("yesterday", None))
+
+    def test_index_is_used(self):
+        source = FileDataSource(self.source_filepath, 16, index=True)
+        self.assertEqual(self.messages, self._read_all(source))
+        self.assertEqual(5, source.file_index.stride)  # loaded, not rebuilt
+        self.assertEqual(25, source.stats["indexed_messages"])
+
+    def test_index_is_built_if_missing(self):
+        os.remove(self.index_filepath)
+        index_filepath = os.path.join(self.directory.name, "other.idx")
+        source = FileDataSource(self.source_filepath, index=index_filepath, start=3)
+        self.assertEqual(self.messages[3:], self._read_all(source))
+        self.assertTrue(os.path.exists(index_filepath))
+
+    def test_index_is_kept_in_memory_if_it_cannot_be_saved(self):
+        os.remove(self.index_filepath)
+        with mock.patch.object(FileIndex, "save", side_effect=PermissionError("Read-only directory")):
+            source = FileDataSource(self.source_filepath, index=True, start=3)
+            self.assertEqual(self.messages[3:], self._read_all(source))
+        self.assertFalse(os.path.exists(self.index_filepath))
+
+    def test_start(self):
+        for start in (0, 4, 5, 13, 24, 25, 30):
+            for options in ({"index": True}, {"index": True, "auto_tune": True}, {}):
+                with self.subTest(start=start, **options):
+                    source = FileDataSource(self.source_filepath, 16, start=start, **options)
+                    self.assertEqual(self.messages[start:], self._read_all(source))
+
+    def test_start_seeks_to_block(self):
+        with FileDataSource(self.source_filepath, 16, index=True, start=17) as source:
+            self.assertEqual(self.messages[17], source.read())
+            indexed_reads = source.stats["reads"]
+        with FileDataSource(self.source_filepath, 16, start=17) as source:
+            self.assertEqual(self.messages[17], source.read())
+            self.assertLess(3 * indexed_reads, source.stats["reads"])  # only the block of message 17 is scanned
+
+    def test_byte_range_partitions(self):
+        index = FileIndex.load(self.index_filepath)
+        messages = []
+        for byte_range in index.partitions(3):
+            messages.extend(self._read_all(FileDataSource(self.source_filepath, 32, byte_range=byte_range)))
+        self.assertEqual(self.messages, messages)
+
+    def test_ts_range(self):
+        ts_range = ("2020-10-07 13:16:00+02:00", "2020-10-07 12:00:00+00:00")
+        expected = [message for i, message in enumerate(self.messages) if i >= 16 or i == 7]
+        for options in ({}, {"auto_tune": True}, {"start": 7}):
+            with self.subTest(**options):
+                source = FileDataSource(self.source_filepath, 16, index=True, ts_range=ts_range, **options)
+                self.assertEqual(expected, self._read_all(source))
+        source = FileDataSource(self.source_filepath, index=True, ts_range=(None, "2020-10-07 10:00:00+00:00"))
+        self.assertEqual([], self._read_all(source))
+
+    def test_ts_range_with_processes(self):
+        ts_range = ("2020-10-07 13:20:00+02:00", None)
+        with FileDataSource(self.source_filepath, 64, index=True, ts_range=ts_range, processes=1) as source:
+            messages = []
+            while source.has_message():
+                messages.extend(source.read_batch(100))
+        expected = [self.messages[7]] + self.messages[20:]
+        self.assertEqual([message["value"] for message in expected], [message["value"] for message in messages])
+
+    def test_start_with_processes(self):
+        with FileDataSource(self.source_filepath, 64, start=11, processes=1) as source:
+            messages = []
+            while source.has_message():
+                messages.extend(source.read_batch(100))
+        self.assertEqual([message["value"] for message in self.messages[11:]],
+                         [message["value"] for message in messages])
+
+
+class TestPredicateFileDataSource(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source_filepath = os.path.join(self.directory.name, "messages.json")
+        self.messages = [{"key": f"K{i % 5:03}", "value": f"{i}.5", "ts": f"2020-10-07 13:{i:02d}:00+02:00"}
+                         for i in range(40)]
+        with open(self.source_filepath, 'w') as source_file:
+            source_file.write(json.dumps(self.messages, indent=4))
+        self.predicate = KeyIn({"K001", "K003"})
+        self.expected = [message for message in self.messages if message["key"] in ("K001", "K003")]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _read_all(self, source):
+        messages = []
+        with source:
+            while source.has_message():
+                messages.extend(source.read_batch(7))
+        return messages
+
+    def test_where(self):
+        source = FileDataSource(self.source_filepath, 64)
+        self.assertIsNone(source.predicate)
+        self.assertTrue(source.where(self.predicate))
+        self.assertIs(self.predicate, source.predicate)
+        self.assertEqual(self.expected, self._read_all(source))
+        self.assertEqual(24, source.stats["prefiltered_messages"])  # not decoded at all
+
+    def test_predicate_in_constructor(self):
+        for options in ({"chunk_size": 16}, {"auto_tune": True}):
+            with self.subTest(**options):
+                source = FileDataSource(self.source_filepath, predicate=self.predicate, **options)
+                self.assertEqual(self.expected, self._read_all(source))
+
+    def test_predicate_with_read(self):
+        with FileDataSource(self.source_filepath, 64, predicate=self.predicate) as source:
+            self.assertEqual(self.expected[0], source.read())
+            self.assertEqual(self.expected[1], source.read())
+
+    def test_predicate_with_no_selected_messages(self):
+        with FileDataSource(self.source_filepath, 64, predicate=KeyIn({"K999"})) as source:
+            self.assertFalse(source.has_message())
+            with self.assertRaises(FileSourceDepleted):
+                source.read()
+
+    def test_predicate_is_exact(self):
+        with open(self.source_filepath, 'w') as source_file:  # keys which the prefilter cannot check
+            source_file.write(json.dumps([{"key": "Ké", "value": "1.5", "ts": "2020-10-07 13:00:00+02:00"},
+                                          {"key": "K001", "value": "2.5", "ts": "2020-10-07 13:01:00+02:00"}]))
+        source = FileDataSource(self.source_filepath, predicate=self.predicate)
+        self.assertEqual(["2.5"], [message["value"] for message in self._read_all(source)])
+        self.assertEqual(0, source.stats["prefiltered_messages"])
+
+    def test_predicate_with_ts_range(self):
+        FileIndex.build(self.source_filepath, stride=4).save(FileIndex.index_filepath_of(self.source_filepath))
+        ts_range = ("2020-10-07 13:10:00+02:00", "2020-10-07 13:29:00+02:00")
+        source = FileDataSource(self.source_filepath, 64, index=True, ts_range=ts_range, predicate=self.predicate)
+        self.assertEqual(self.expected[4:12], self._read_all(source))
+
+    def test_predicate_in_raw_mode(self):
+        source = FileDataSource(self.source_filepath, 64, raw=True, predicate=self.predicate)
+        messages = self._read_all(source)
+        self.assertTrue(all(isinstance(message, RawMessage) for message in messages))
+        self.assertEqual(self.expected, [json.loads(message.raw) for message in messages])
+
+    def test_predicate_with_processes(self):
+        with FileDataSource(self.source_filepath, 256, processes=2, predicate=self.predicate) as source:
+            messages = []
+            while source.has_message():
+                messages.extend(source.read_batch(100))
+        self.assertEqual([message["value"] for message in self.expected], [message["value"] for message in messages])
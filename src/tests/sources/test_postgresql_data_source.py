@@ -0,0 +1,197 @@
+import psycopg2
+
+from src.predicates import KeyIn, TsBetween
+from src.sources.data_source import DataSource
+from src.sinks.postgresql_data_sink import PostgreSQLDataSink
+from src.sources.postgresql_data_source import PostgreSQLDataSource
+from src.exceptions.database_source_depleted import DatabaseSourceDepleted
+from src.tests.test_helpers.dedicated_database import DedicatedDatabaseTestCase
+
+
+class TestPostgreSQLDataSource(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.messages = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620-05:30"},
+            {"key": "C123", "value": "65.6", "ts": "1020-10-07 13:28:43.399620+00:00"}
+        ]
+
+    def _create_source(self, **kwargs):
+        return PostgreSQLDataSource(self.dbname, self.dbuser, self.dbpassword, self.dbhost, self.dbport, **kwargs)
+
+    def _read_all(self, source):
+        messages = []
+        with source:
+            while source.has_message():
+                messages.append(source.read())
+        return messages
+
+    def test_object_creation(self):
+        source = self._create_source(itersize=10)
+        self.assertIsInstance(source, PostgreSQLDataSource)
+        self.assertIsInstance(source, DataSource)
+        self.assertEqual(self.dbname, source.dbname)
+        self.assertEqual(10, source.itersize)
+        self.assertIsNone(source.key_range)
+        self.assertIsNone(source.ts_range)
+
+    def test_read(self):
+        with self._create_sink() as sink:
+            sink.dump_batch(self.messages)
+        self.assertEqual(self.messages, self._read_all(self._create_source(itersize=2)))
+
+    def test_read_uses_server_side_cursor(self):
+        with self._create_sink() as sink:
+            sink.dump_batch(self.messages)
+        with self._create_source() as source:
+            self.assertTrue(source.has_message())
+            with source._connection.cursor() as cur:
+                cur.execute("SELECT name FROM pg_cursors;")  # cursors of the source's session
+                self.assertIn((PostgreSQLDataSource.CURSOR_NAME,), cur.fetchall())
+
+    def test_read_compact_layout(self):
+        with self._create_sink(compact=True) as sink:
+            sink.dump_batch(self.messages)
+        self.assertEqual(self.messages, self._read_all(self._create_source(compact=True)))
+
+    def test_read_with_ranges(self):
+        with self._create_sink() as sink:
+            sink.dump_batch(self.messages)
+        messages = self._read_all(self._create_source(key_range=("B000", "C999")))
+        self.assertEqual(["B123", "C123"], [message["key"] for message in messages])
+        messages = self._read_all(self._create_source(ts_range=("2020-01-01", "2023-01-01")))
+        self.assertEqual(["A123", "B123"], [message["key"] for message in messages])
+        messages = self._read_all(self._create_source(key_range=("B000", "C999"),
+                                                      ts_range=("2020-01-01", "2023-01-01")))
+        self.assertEqual(["B123"], [message["key"] for message in messages])
+
+    def _assert_predicates_are_pushed_down(self, compact):
+        with self._create_sink(compact=compact) as sink:
+            sink.dump_batch(self.messages)
+        source = self._create_source(compact=compact)
+        self.assertTrue(source.where(KeyIn({"A123", "C123"})))
+        self.assertEqual(["A123", "C123"], [message["key"] for message in self._read_all(source)])
+        # 2020-10-07 13:28 at +02:00 is 11:28 UTC, 2022-10-07 13:28 at -05:30 is 18:58 UTC
+        source = self._create_source(compact=compact, predicate=TsBetween("2020-10-07 11:00:00+00:00",
+                                                                          "2022-10-07 18:58:00+00:00"))
+        self.assertEqual(["A123"], [message["key"] for message in self._read_all(source)])
+        source.where(TsBetween("2022-10-07 18:58:00+00:00") & KeyIn({"B123", "C123"}))
+        self.assertEqual(["B123"], [message["key"] for message in self._read_all(source)])
+
+    def test_read_with_predicate(self):
+        self._assert_predicates_are_pushed_down(compact=False)
+
+    def test_read_compact_layout_with_predicate(self):
+        self._assert_predicates_are_pushed_down(compact=True)
+
+    def test_read_with_predicate_on_short_timezone_forms(self):
+        messages = [{"key": "D123", "value": "1.5", "ts": "2021-01-01 12:00:00+0545"},  # 06:15 UTC
+                    {"key": "E123", "value": "2.5", "ts": "2021-01-01 12:00:00+02"}]  # 10:00 UTC
+        with self._create_sink() as sink:
+            sink.dump_batch(messages)
+        source = self._create_source(predicate=TsBetween("2021-01-01 06:00:00+00:00", "2021-01-01 07:00:00+00:00"))
+        self.assertEqual(["D123"], [message["key"] for message in self._read_all(source)])
+        source = self._create_source(predicate=TsBetween("2021-01-01 09:30:00+00:00", "2021-01-01 10:30:00+00:00"))
+        self.assertEqual(["E123"], [message["key"] for message in self._read_all(source)])
+
+    def test_read_on_depleted_source(self):
+        with self._create_sink():
+            pass  # create an empty message table
+        with self._create_source() as source:
+            self.assertFalse(source.has_message())
+            with self.assertRaises(DatabaseSourceDepleted) as context:
+                source.read()
+            self.assertEqual(self.dbname, context.exception.dbname)
+
+
+class TestParallelPostgreSQLDataSource(DedicatedDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.messages = [
+            {"key": f"{chr(ord('A') + i % 26)}{100 + i}", "value": f"{i}.5",
+             "ts": f"{2000 + i % 20}-{1 + i % 12:02d}-07 13:28:{i % 60:02d}.399620+02:00"}
+            for i in range(200)
+        ]
+        with self._create_sink(indexes=True, export_index=True) as sink:  # split by 'ts' requires its index
+            sink.dump_batch(self.messages)
+
+    def _create_source(self, **kwargs):
+        return PostgreSQLDataSource(self.dbname, self.dbuser, self.dbpassword, self.dbhost, self.dbport, **kwargs)
+
+    def _read_all(self, source):
+        messages = []
+        with source:
+            while source.has_message():
+                messages.append(source.read())
+        return messages
+
+    def test_object_creation_with_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            self._create_source(split_column="key")
+        with self.assertRaises(ValueError):
+            self._create_source(workers=0)
+
+    def test_ordered_export_by_id(self):
+        source = self._create_source(workers=4, itersize=7)
+        self.assertEqual(self.messages, self._read_all(source))
+
+    def test_ordered_export_by_ts(self):
+        source = self._create_source(workers=3, itersize=16, split_column="ts")
+        expected = sorted(self.messages, key=lambda message: message["ts"])
+        self.assertEqual(expected, self._read_all(source))
+
+    def test_export_by_ts_requires_index(self):
+        with self.con.cursor() as cur:
+            cur.execute(f'DROP INDEX "{PostgreSQLDataSink.TS_ID_INDEX_NAME}";')
+        source = self._create_source(workers=2, split_column="ts")
+        with self.assertRaises(ValueError):
+            source.initialize()
+        self.assertEqual(self.messages, self._read_all(self._create_source(workers=2)))  # split by 'id'
+
+    def test_unordered_export(self):
+        source = self._create_source(workers=4, itersize=10, ordered=False, split_column="ts")
+        messages = self._read_all(source)
+        self.assertEqual(len(self.messages), len(messages))
+        key = lambda message: message["key"]  # noqa: E731
+        self.assertEqual(sorted(self.messages, key=key), sorted(messages, key=key))
+
+    def test_export_with_ranges(self):
+        source = self._create_source(workers=2, itersize=10, key_range=("A000", "B999"))
+        expected = [message for message in self.messages if message["key"][0] in "AB"]
+        self.assertEqual(expected, self._read_all(source))
+
+    def test_export_with_predicate(self):
+        predicate = KeyIn({"A100", "B101", "C102"}) & TsBetween(ts_to="2001-12-31 23:00:00+00:00")
+        source = self._create_source(workers=3, itersize=10, split_column="ts", predicate=predicate)
+        self.assertEqual(["A100", "B101"], [message["key"] for message in self._read_all(source)])
+
+    def test_export_of_empty_range(self):
+        source = self._create_source(workers=2, key_range=("a000", "a999"))
+        with source:
+            self.assertFalse(source.has_message())
+            with self.assertRaises(DatabaseSourceDepleted):
+                source.read()
+
+    def test_close_before_depletion(self):
+        source = self._create_source(workers=4, itersize=5, queue_depth=1)
+        with source:
+            source.read()
+        self.assertFalse(any(thread.is_alive() for thread in source._threads))
+
+    def test_worker_error_is_reraised(self):
+        def fail(row):
+            raise ValueError(f"Cannot convert row: {row}")
+
+        source = self._create_source(workers=2)
+        source._row_to_message = fail
+        with self.assertRaises(ValueError):
+            with source:
+                source.has_message()
+
+    def test_error_before_export_is_raised(self):
+        source = self._create_source(workers=2, compact=True)  # there is no key lookup table
+        with self.assertRaises(psycopg2.Error):
+            source.initialize()
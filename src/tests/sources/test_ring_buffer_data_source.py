@@ -0,0 +1,91 @@
+import json
+import multiprocessing
+import os
+import tempfile
+from unittest import TestCase
+
+from src.definitions import INPUT_FILES_DIR
+from src.encoded_batch import EncodedBatch
+from src.etl import ETL
+from src.exceptions.ring_buffer_closed import RingBufferClosed
+from src.ring_buffer import SharedRingBuffer
+from src.sources.file_data_source import FileDataSource
+from src.sources.ring_buffer_data_source import RingBufferDataSource
+
+
+def produce(source_filepath, name):
+    ETL().source("file", source_filepath).sink("ring_buffer", name).batch(2).run()
+
+
+class TestRingBufferDataSource(TestCase):
+
+    def setUp(self):
+        self.ring_buffer = SharedRingBuffer(16)
+        self.messages = [{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+                         {"key": "B123", "value": "12.6", "ts": "2020-10-08 13:28:43.399620-05:30"},
+                         {"key": "C123", "value": "10.6", "ts": "2020-10-08 15:28:43.399620+00:00"}]
+
+    def tearDown(self):
+        self.ring_buffer.release()
+        self.ring_buffer.unlink()
+
+    def _write_messages(self):
+        self.ring_buffer.put_batch([SharedRingBuffer.encode_message(message) for message in self.messages])
+        self.ring_buffer.close()
+
+    def test_object_creation(self):
+        source = RingBufferDataSource(self.ring_buffer.name)
+        self.assertEqual(self.ring_buffer.name, source.name)
+        self.assertIsNone(source._ring_buffer)
+        self.assertIsNone(source.timeout)
+        with self.assertRaises(ValueError):
+            RingBufferDataSource(self.ring_buffer.name, timeout=0)
+
+    def test_read(self):
+        self._write_messages()
+        with RingBufferDataSource(self.ring_buffer.name) as source:
+            messages = []
+            while source.has_message():
+                messages.append(source.read())
+            with self.assertRaises(RingBufferClosed):
+                source.read()
+        self.assertEqual([{**message, "value": float(message["value"])} for message in self.messages], messages)
+
+    def test_read_batch(self):
+        self._write_messages()
+        with RingBufferDataSource(self.ring_buffer.name) as source:
+            batches = []
+            while source.has_message():
+                batches.append(source.read_batch(2))
+            with self.assertRaises(RingBufferClosed):
+                source.read_batch(2)
+        self.assertTrue(all(isinstance(batch, EncodedBatch) for batch in batches))
+        self.assertEqual([2, 1], [len(batch) for batch in batches])
+        self.assertEqual(["2020-10-07", "2020-10-08"], batches[0].dates)
+        self.assertEqual(self.messages, [message for batch in batches for message in batch])
+
+    def test_read_batch_does_not_wait_for_more(self):
+        self.ring_buffer.put_batch([SharedRingBuffer.encode_message(self.messages[0])])
+        with RingBufferDataSource(self.ring_buffer.name) as source:
+            self.assertEqual(1, len(source.read_batch(100)))
+
+    def test_has_message_timeout(self):
+        with RingBufferDataSource(self.ring_buffer.name, timeout=0.01) as source:
+            with self.assertRaises(TimeoutError):
+                source.has_message()
+
+    def test_pipeline_between_processes(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        producer = multiprocessing.get_context("spawn").Process(target=produce,
+                                                               args=(source_filepath, self.ring_buffer.name))
+        producer.start()
+        with tempfile.TemporaryDirectory() as directory:
+            target_filepath = os.path.join(directory, "messages.ndjson")
+            ETL().source("ring_buffer", self.ring_buffer.name).sink("file", target_filepath).batch(100).run()
+            with open(target_filepath) as target_file:
+                messages = [json.loads(line) for line in target_file]
+        producer.join(10)
+        self.assertEqual(0, producer.exitcode)
+        with FileDataSource(source_filepath) as source:
+            expected_messages = [source.read() for _ in range(3)]
+        self.assertEqual(expected_messages, messages)
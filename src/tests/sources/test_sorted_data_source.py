@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from src.definitions import INPUT_FILES_DIR
+from src.exceptions.sorted_source_depleted import SortedSourceDepleted
+from src.predicates import KeyIn
+from src.sources.file_data_source import FileDataSource
+from src.sources.sorted_data_source import SortedDataSource
+
+
+class TestSortedDataSource(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.messages = [{"key": f"K{index % 4}", "value": str(index),
+                          "ts": f"2020-10-07 {(index * 7) % 24:02d}:{index % 60:02d}:00.000000+02:00"}
+                         for index in range(100)]
+        self.source_filepath = os.path.join(self.directory.name, "messages.json")
+        with open(self.source_filepath, 'w') as source_file:
+            json.dump(self.messages, source_file)
+        self.run_directory = os.path.join(self.directory.name, "runs")
+
+    def _source(self, **kwargs):
+        return SortedDataSource(FileDataSource(self.source_filepath, 256), directory=self.run_directory, **kwargs)
+
+    def _read_all(self, source, batch_size=1):
+        messages = []
+        with source:
+            while source.has_message():
+                if batch_size == 1:
+                    messages.append(source.read())
+                else:
+                    messages.extend(source.read_batch(batch_size))
+        return messages
+
+    def test_object_creation(self):
+        file_source = FileDataSource(self.source_filepath)
+        source = SortedDataSource(file_source)
+        self.assertIs(file_source, source.data_source)
+        self.assertEqual("ts", source.sort_by)
+        self.assertEqual(1000000, source.max_memory_messages)
+        self.assertIsNone(source.directory)
+        self.assertEqual(64, source.fan_in)
+        self.assertEqual(10000, source.read_batch_size)
+        with self.assertRaises(ValueError):
+            SortedDataSource(file_source, "value")
+        with self.assertRaises(ValueError):
+            SortedDataSource(file_source, max_memory_messages=0)
+        with self.assertRaises(ValueError):
+            SortedDataSource(file_source, read_batch_size=0)
+
+    def test_read_in_ts_order(self):
+        expected = sorted(self.messages, key=lambda message: message["ts"])  # same timezone
+        for batch_size in (1, 7):
+            source = self._source(max_memory_messages=16, fan_in=3, read_batch_size=5)
+            self.assertEqual(expected, self._read_all(source, batch_size))
+            stats = source.stats
+            self.assertEqual(100, stats["sorted_messages"])
+            self.assertGreater(stats["runs"], 6)
+            self.assertGreater(stats["merge_passes"], 0)
+            self.assertEqual([], os.listdir(self.run_directory))
+
+    def test_read_in_key_ts_order(self):
+        source = self._source(sort_by="key_ts", max_memory_messages=30)
+        expected = sorted(self.messages, key=lambda message: (message["key"], message["ts"]))
+        self.assertEqual(expected, self._read_all(source, 10))
+
+    def test_read_in_memory(self):
+        source = self._source()
+        self.assertEqual(sorted(self.messages, key=lambda message: message["ts"]), self._read_all(source))
+        self.assertEqual(0, source.stats["runs"])
+        self.assertFalse(os.path.exists(self.run_directory))
+
+    def test_read_depleted_source(self):
+        source = SortedDataSource(FileDataSource(os.path.join(INPUT_FILES_DIR, "no_message.json")))
+        with source:
+            self.assertFalse(source.has_message())
+            with self.assertRaises(SortedSourceDepleted):
+                source.read()
+            with self.assertRaises(SortedSourceDepleted):
+                source.read_batch(2)
+
+    def test_where_is_pushed_down(self):
+        source = self._source(max_memory_messages=8)
+        self.assertTrue(source.where(KeyIn({"K1"})))
+        messages = self._read_all(source, 4)
+        self.assertEqual([message for message in sorted(self.messages, key=lambda message: message["ts"])
+                          if message["key"] == "K1"], messages)
+        self.assertEqual(25, source.stats["sorted_messages"])
+
+    def test_close_before_depletion(self):
+        source = self._source(max_memory_messages=10)
+        with source:
+            self.assertEqual(3, len(source.read_batch(3)))
+            self.assertGreater(len(os.listdir(self.run_directory)), 0)
+        self.assertEqual([], os.listdir(self.run_directory))
@@ -0,0 +1,213 @@
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stderr
+from unittest import TestCase
+
+from src.cli import build_config, build_etl, build_parser, format_summary, load_config, main, parse_option
+from src.definitions import INPUT_FILES_DIR
+from src.flow_control import AdaptiveBatchSize
+from src.sources.file_data_source import FileDataSource
+from src.sources.sorted_data_source import SortedDataSource
+from src.sinks.console_data_sink import ConsoleDataSink
+from src.tests.test_helpers.capture_stdout import CaptureSTDOUT
+
+
+class TestCLI(TestCase):
+
+    def setUp(self):
+        self.source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _write_config(self, filename, content):
+        filepath = os.path.join(self.directory.name, filename)
+        with open(filepath, 'w') as config_file:
+            config_file.write(content)
+        return filepath
+
+    def test_parse_option(self):
+        self.assertEqual(("chunk_size", 1024), parse_option("chunk_size:=1024"))
+        self.assertEqual(("auto_tune", True), parse_option("auto_tune:=true"))
+        self.assertEqual(("keys", ["A123"]), parse_option('keys := ["A123"]'))
+        self.assertEqual(("chunk_size", "1024"), parse_option("chunk_size=1024"))
+        self.assertEqual(("output_format", "{} = {}"), parse_option("output_format={} = {}"))
+        self.assertEqual(("output_format", "{}"), parse_option("output_format={}"))
+        self.assertEqual(("source_filepath", "123"), parse_option("source_filepath=123"))
+        self.assertEqual(("dbname", "etl"), parse_option(" dbname =etl"))
+        with self.assertRaises(ValueError):
+            parse_option("chunk_size")
+        with self.assertRaises(ValueError):
+            parse_option(":=1024")
+        with self.assertRaises(ValueError):
+            parse_option("keys:=[A123]")
+
+    def test_load_config(self):
+        toml_filepath = self._write_config("pipeline.toml", (
+            '[source]\ntype = "file"\nauto_tune = true\n\n'
+            '[sink]\ntype = "postgresql"\nwriters = 4\n\n'
+            '[batch]\nbatch_size = 1000\n'
+        ))
+        json_filepath = self._write_config("pipeline.json", json.dumps({
+            "source": {"type": "file", "auto_tune": True},
+            "sink": {"type": "postgresql", "writers": 4},
+            "batch": {"batch_size": 1000},
+        }))
+        self.assertEqual(load_config(json_filepath), load_config(toml_filepath))
+        self.assertEqual(4, load_config(toml_filepath)["sink"]["writers"])
+
+    def test_load_config_with_invalid_file(self):
+        with self.assertRaises(ValueError):
+            load_config(self._write_config("pipeline.yaml", "source: file"))
+        with self.assertRaises(ValueError):
+            load_config(self._write_config("pipeline.json", '{"extract": {}}'))
+
+    def test_build_config(self):
+        config_filepath = self._write_config("pipeline.json", json.dumps({
+            "source": {"type": "file", "source_filepath": self.source_filepath},
+            "sink": {"type": "postgresql", "writers": 4, "queue_depth": 2},
+            "batch": {"batch_size": 1000},
+        }))
+        args = build_parser().parse_args([
+            "run", "--config", config_filepath, "--sink", "sqlite", "-K", "database_filepath=:memory:",
+            "--batch-size", "500", "--writers", "2", "--commit-interval", "10", "--workers", "3",
+            "--order", "global", "-W", 'keys:=["A123"]', "-W", "ts_to=2021-01-01 00:00:00+00:00",
+            "--sort-by", "key_ts", "--max-memory-messages", "1000",
+        ])
+        config = build_config(args)
+        self.assertEqual({"type": "file", "source_filepath": self.source_filepath, "processes": 3}, config["source"])
+        self.assertEqual({"type": "sqlite", "database_filepath": ":memory:", "writers": 2, "queue_depth": 2,
+                          "order": "global", "commit_interval": 10}, config["sink"])
+        self.assertEqual({"batch_size": 500}, config["batch"])
+        self.assertEqual({"keys": ["A123"], "ts_to": "2021-01-01 00:00:00+00:00"}, config["where"])
+        self.assertEqual({"sort_by": "key_ts", "max_memory_messages": 1000}, config["sort"])
+
+    def test_build_config_maps_workers_of_file_source(self):
+        args = build_parser().parse_args(["run", "--source", "file", "--sink", "console", "--workers", "2"])
+        self.assertEqual({"type": "file", "processes": 2}, build_config(args)["source"])
+        args = build_parser().parse_args(["run", "--source", "postgresql", "--sink", "console", "--workers", "2"])
+        self.assertEqual({"type": "postgresql", "workers": 2}, build_config(args)["source"])
+
+    def test_build_config_without_sink(self):
+        args = build_parser().parse_args(["run", "--source", "file"])
+        with self.assertRaises(ValueError):
+            build_config(args)
+
+    def test_build_etl(self):
+        etl = build_etl({
+            "source": {"type": "file", "source_filepath": self.source_filepath, "chunk_size": 64},
+            "sink": {"type": "console", "output_format": "{} {} {}"},
+            "batch": {"batch_size": 100, "target_latency": 0.5},
+        })
+        self.assertIsInstance(etl.data_source, FileDataSource)
+        self.assertEqual(64, etl.data_source.chunk_size)
+        self.assertIsInstance(etl.data_sink, ConsoleDataSink)
+        self.assertIsInstance(etl.adaptive_batch_size, AdaptiveBatchSize)
+        self.assertEqual(100, etl.batch_size)
+        etl = build_etl({"source": {"type": "file", "source_filepath": self.source_filepath},
+                         "sink": {"type": "console", "output_format": "{} {} {}"}, "batch": {}})
+        self.assertEqual(1, etl.batch_size)
+        etl = build_etl({"source": {"type": "file", "source_filepath": self.source_filepath},
+                         "sink": {"type": "console", "output_format": "{} {} {}"}, "batch": {"target_latency": 0.5}})
+        self.assertEqual(1000, etl.batch_size)
+        self.assertEqual(250, etl.adaptive_batch_size.increase)
+        self.assertIsInstance(etl.data_source, FileDataSource)
+        etl = build_etl({"source": {"type": "file", "source_filepath": self.source_filepath},
+                         "sink": {"type": "console", "output_format": "{} {} {}"}, "batch": {},
+                         "sort": {"fan_in": 8}})
+        self.assertIsInstance(etl.data_source, SortedDataSource)
+        self.assertEqual("ts", etl.data_source.sort_by)
+        self.assertEqual(8, etl.data_source.fan_in)
+
+    def test_format_summary(self):
+        stats = {"messages": 3, "batches": 2, "elapsed": 0.5, "throughput": 6.0, "dump_latency": 0.25,
+                 "batch_size": 2, "source": {"reads": 1}, "sink": {"skipped_duplicates": 1}}
+        self.assertEqual("messages: 3 | batches: 2 | elapsed: 0.500 s | throughput: 6.0 msg/s | "
+                         "dump latency: 0.250 s | batch size: 2 | source: reads=1 | sink: skipped_duplicates=1",
+                         format_summary(stats))
+        self.assertEqual(stats, json.loads(format_summary(stats, "json")))
+
+    def test_main_run(self):
+        stderr = io.StringIO()
+        with CaptureSTDOUT() as output, redirect_stderr(stderr):
+            status = main(["run", "--source", "file", "--sink", "console", "-S", f"source_filepath={self.source_filepath}",
+                           "-K", "output_format=key: {} | value: {} | ts: {}", "--batch-size", "2", "--summary", "json"])
+        self.assertEqual(0, status)
+        self.assertEqual(3, len(output))
+        self.assertEqual("key: A123 | value: 15.6 | ts: 2020-10-07 13:28:43.399620+02:00", output[0])
+        summary = json.loads(stderr.getvalue())
+        self.assertEqual(3, summary["messages"])
+        self.assertEqual(2, summary["batches"])
+
+    def test_main_run_with_where(self):
+        stderr = io.StringIO()
+        with CaptureSTDOUT() as output, redirect_stderr(stderr):
+            status = main(["run", "--source", "file", "--sink", "console", "-S", f"source_filepath={self.source_filepath}",
+                           "-K", "output_format={} {} {}", "-W", 'keys:=["A123", "C123"]', "--summary", "json"])
+        self.assertEqual(0, status)
+        self.assertEqual(["A123", "C123"], [line.split()[0] for line in output])
+        summary = json.loads(stderr.getvalue())
+        self.assertEqual(2, summary["messages"])
+        self.assertEqual(1, summary["source"]["prefiltered_messages"])
+
+    def test_main_run_with_string_options(self):
+        source_filepath = os.path.join(self.directory.name, "123")
+        with open(source_filepath, 'w') as source_file, open(self.source_filepath) as messages_file:
+            source_file.write(messages_file.read())
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory.name)
+        stderr = io.StringIO()
+        with CaptureSTDOUT() as output, redirect_stderr(stderr):
+            status = main(["run", "--source", "file", "--sink", "console", "-S", "source_filepath=123",
+                           "-K", "output_format={}", "--summary", "json"])
+        self.assertEqual(0, status)
+        self.assertEqual(["A123", "B123", "C123"], output)
+
+    def test_main_run_with_missing_source_file(self):
+        stderr = io.StringIO()
+        with CaptureSTDOUT() as output, redirect_stderr(stderr):
+            status = main(["run", "--source", "file", "--sink", "console",
+                           "-S", f"source_filepath={os.path.join(self.directory.name, 'missing.json')}"])
+        self.assertEqual(1, status)
+        self.assertEqual([], output)
+        self.assertIn("error: [Errno 2] No such file or directory", stderr.getvalue())
+        self.assertNotIn("Traceback", stderr.getvalue())
+
+    def test_main_run_with_database_error(self):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            status = main(["run", "--source", "file", "--sink", "postgresql",
+                           "-S", f"source_filepath={self.source_filepath}", "-K", "dbhost=127.0.0.1", "-K", "dbport:=1"])
+        self.assertEqual(1, status)
+        self.assertIn('error: connection to server at "127.0.0.1", port 1 failed', stderr.getvalue())
+
+    def test_main_run_with_sort(self):
+        stderr = io.StringIO()
+        with CaptureSTDOUT() as output, redirect_stderr(stderr):
+            status = main(["run", "--source", "file", "--sink", "console", "-S", f"source_filepath={self.source_filepath}",
+                           "-K", "output_format={} {} {}", "--sort-by", "ts", "--max-memory-messages", "2",
+                           "--summary", "json"])
+        self.assertEqual(0, status)
+        self.assertEqual(["C123", "A123", "B123"], [line.split()[0] for line in output])
+        summary = json.loads(stderr.getvalue())
+        self.assertEqual(3, summary["source"]["sorted_messages"])
+        self.assertEqual(1, summary["source"]["runs"])
+
+    def test_main_list(self):
+        with CaptureSTDOUT() as output:
+            status = main(["list"])
+        self.assertEqual(0, status)
+        self.assertIn("file", output[0])
+        self.assertIn("postgresql", output[1])
+
+    def test_main_with_unknown_component(self):
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit) as context:
+            main(["run", "--source", "kafka", "--sink", "console"])
+        self.assertEqual(2, context.exception.code)
+
+    def test_main_error_messages_are_not_mangled(self):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr), self.assertRaises(SystemExit):
+            main(["run", "--source", "kafka", "--sink", "console"])
+        self.assertIn("error: Unknown component 'kafka', expected one of:", stderr.getvalue())
@@ -0,0 +1,57 @@
+import pickle
+from unittest import TestCase
+
+from src.encoded_batch import EncodedBatch, decode_copy_rows, encode_chunk, encode_copy_rows
+
+
+class TestEncodedBatch(TestCase):
+
+    def setUp(self):
+        self.chunk = ('[{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},\n'
+                      '{"key": "B123", "value": "12.6", "ts": "2020-10-08 13:28:43.399620-05:30"}')
+        self.messages = [{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+                         {"key": "B123", "value": "12.6", "ts": "2020-10-08 13:28:43.399620-05:30"}]
+
+    def test_encode_chunk(self):
+        batch = encode_chunk(self.chunk)
+        self.assertIsInstance(batch, EncodedBatch)
+        self.assertEqual(2, len(batch))
+        self.assertEqual("A123\t15.6\t2020-10-07 13:28:43.399620\t+02:00\n"
+                         "B123\t12.6\t2020-10-08 13:28:43.399620\t-05:30\n", batch.copy_data)
+        self.assertEqual(["2020-10-07", "2020-10-08"], batch.dates)
+
+    def test_encode_chunk_with_invalid_message(self):
+        with self.assertRaises(ValueError):
+            encode_chunk('{"key": "A123", "value": }')
+        with self.assertRaises(ValueError):
+            encode_chunk('{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43"}')  # no timezone
+
+    def test_encode_empty_chunk(self):
+        batch = encode_chunk("]")
+        self.assertEqual(0, len(batch))
+        self.assertEqual("", batch.copy_data)
+
+    def test_messages_are_decoded_lazily(self):
+        batch = encode_chunk(self.chunk)
+        self.assertIsNone(batch._messages)
+        self.assertEqual(self.messages, list(batch))
+        self.assertEqual(self.messages[1], batch[1])
+
+    def test_pickling(self):
+        batch = encode_chunk(self.chunk)
+        list(batch)  # decoded messages are not pickled
+        unpickled = pickle.loads(pickle.dumps(batch))
+        self.assertEqual(batch.copy_data, unpickled.copy_data)
+        self.assertEqual(batch.dates, unpickled.dates)
+        self.assertEqual(2, len(unpickled))
+        self.assertIsNone(unpickled._messages)
+
+    def test_encode_copy_rows(self):
+        rows = [("A123", "15.6", "ts", "tz"), ("B\t\n", 1.5, "back\\slash", "c\rr")]
+        self.assertEqual("A123\t15.6\tts\ttz\nB\\t\\n\t1.5\tback\\\\slash\tc\\rr\n", encode_copy_rows(rows))
+        self.assertEqual("", encode_copy_rows([]))
+
+    def test_decode_copy_rows(self):
+        rows = [("A123", "15.6", "ts", "tz"), ("B\t\n", "1.5", "back\\slash", "c\rr\x1c")]
+        self.assertEqual(rows, decode_copy_rows(encode_copy_rows(rows)))
+        self.assertEqual([], decode_copy_rows(""))
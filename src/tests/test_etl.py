@@ -1,21 +1,97 @@
+import asyncio
+import json
 import os
+import tempfile
 from unittest import TestCase
 
 from src.definitions import INPUT_FILES_DIR
 from src.etl import ETL
+from src.flow_control import AdaptiveBatchSize, TokenBucket
+from src.predicates import KeyIn
+from src.sources.async_data_source import AsyncDataSource
 from src.sources.data_source import DataSource
 from src.sources.file_data_source import FileDataSource
+from src.sources.sorted_data_source import SortedDataSource
+from src.sinks.async_data_sink import AsyncDataSink
 from src.sinks.data_sink import DataSink
 from src.sinks.console_data_sink import ConsoleDataSink
 from src.tests.test_helpers.capture_stdout import CaptureSTDOUT
 
 
+class MemoryAsyncDataSource(AsyncDataSource):
+
+    def __init__(self, count):
+        self.messages = [{"key": f"K{index}", "value": index} for index in range(count)]
+        self.position = 0
+
+    async def __aenter__(self):
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def initialize(self):
+        self.position = 0
+
+    async def has_message(self):
+        return self.position < len(self.messages)
+
+    async def read(self):
+        await asyncio.sleep(0)
+        self.position += 1
+        return self.messages[self.position - 1]
+
+    async def close(self):
+        pass
+
+
+class MemoryAsyncDataSink(AsyncDataSink):
+
+    def __init__(self, fail_at=None):
+        self.messages = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_at = fail_at
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def initialize(self):
+        pass
+
+    async def dump(self, message):
+        self.messages.append(message)
+        return True
+
+    async def dump_batch(self, messages):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            if self.fail_at is not None and messages[0]["value"] >= self.fail_at:
+                raise RuntimeError("Dump failed")
+            return await super().dump_batch(messages)
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        pass
+
+
 class TestETL(TestCase):
 
     def test_object_construction(self):
         etl = ETL()
         self.assertIsNone(etl.data_source)
         self.assertIsNone(etl.data_sink)
+        self.assertEqual(1, etl.batch_size)
+        self.assertIsNone(etl.adaptive_batch_size)
+        self.assertIsNone(etl.rate_limiter)
+        self.assertEqual({}, etl.stats)
 
     def test_source(self):
         source_filepath = "/path/to/file.json"
@@ -37,6 +113,78 @@ class TestETL(TestCase):
         self.assertIsInstance(etl.data_sink, ConsoleDataSink)
         self.assertEqual(output_format, etl.data_sink.output_format)
 
+    def test_batch(self):
+        etl = ETL()
+        self.assertIsInstance(etl.batch(64), ETL)
+        self.assertEqual(64, etl.batch_size)
+        with self.assertRaises(ValueError):
+            etl.batch(0)
+        etl.batch(64, target_latency=0.5, min_batch_size=16, max_batch_size=1024, max_rate=1000)
+        self.assertIsInstance(etl.adaptive_batch_size, AdaptiveBatchSize)
+        self.assertEqual(0.5, etl.adaptive_batch_size.target_latency)
+        self.assertEqual(16, etl.adaptive_batch_size.minimum)
+        self.assertEqual(1024, etl.adaptive_batch_size.maximum)
+        self.assertIsInstance(etl.rate_limiter, TokenBucket)
+        self.assertEqual(1000, etl.rate_limiter.rate)
+        etl.batch(64)
+        self.assertIsNone(etl.adaptive_batch_size)
+        self.assertIsNone(etl.rate_limiter)
+        with self.assertRaises(ValueError):
+            etl.batch(64, target_latency=-1)
+
+    def test_where(self):
+        etl = ETL()
+        self.assertIsNone(etl.predicate)
+        predicate = KeyIn({"A123"})
+        self.assertIsInstance(etl.where(predicate), ETL)
+        self.assertIs(predicate, etl.predicate)
+
+    def test_sort(self):
+        with self.assertRaises(ValueError):
+            ETL().sort()
+        etl = ETL().source(FileDataSource, "/path/to/file.json")
+        self.assertIsInstance(etl.sort("key_ts", max_memory_messages=100), ETL)
+        self.assertIsInstance(etl.data_source, SortedDataSource)
+        self.assertIsInstance(etl.data_source.data_source, FileDataSource)
+        self.assertEqual("key_ts", etl.data_source.sort_by)
+        self.assertEqual(100, etl.data_source.max_memory_messages)
+
+    def test_run_sorted(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        for batch_size in (1, 2):
+            etl = ETL().source(FileDataSource, source_filepath).sort(max_memory_messages=1)
+            etl.sink(ConsoleDataSink, "{} {} {}").batch(batch_size).where(KeyIn({"A123", "B123", "C123"}))
+            with CaptureSTDOUT() as output:
+                etl.run()
+            self.assertEqual(["C123", "A123", "B123"], [line.split()[0] for line in output])
+            self.assertEqual(3, etl.stats["messages"])
+            self.assertEqual(3, etl.stats["source"]["sorted_messages"])
+            self.assertEqual(3, etl.stats["source"]["runs"])
+
+    def test_run_with_pushed_down_predicate(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        for batch_size in (1, 2):
+            etl = ETL().source(FileDataSource, source_filepath).sink(ConsoleDataSink, "{} {} {}")
+            etl.batch(batch_size).where(KeyIn({"A123", "C123"}))
+            with CaptureSTDOUT() as output:
+                etl.run()
+            self.assertEqual(["A123", "C123"], [line.split()[0] for line in output])
+            self.assertEqual(2, etl.stats["messages"])
+            self.assertEqual(0, etl.stats["filtered"])  # dropped by the source
+            self.assertEqual(1, etl.stats["source"]["prefiltered_messages"])
+
+    def test_run_with_filtered_predicate(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        for batch_size in (1, 2):
+            etl = ETL().source(FileDataSource, source_filepath).sink(ConsoleDataSink, "{} {} {}")
+            etl.batch(batch_size).where(KeyIn({"B123"}))
+            etl.data_source.where = lambda predicate: False  # predicates are not supported
+            with CaptureSTDOUT() as output:
+                etl.run()
+            self.assertEqual(["B123"], [line.split()[0] for line in output])
+            self.assertEqual(1, etl.stats["messages"])
+            self.assertEqual(2, etl.stats["filtered"])
+
     def test_run(self):
         source_filepath = os.path.join(INPUT_FILES_DIR, "single_message.json")
         sink_output_format = "key: {} | value: {} | ts: {}"
@@ -61,3 +209,144 @@ class TestETL(TestCase):
             ETL().source(FileDataSource, source_filepath).sink(ConsoleDataSink, sink_output_format).run()
         self.assertEqual(1, len(output))
         self.assertEqual(expected_output, output[0])
+
+    def test_run_with_batches(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        sink_output_format = "key: {} | value: {} | ts: {}"
+        etl = ETL().source(FileDataSource, source_filepath).sink(ConsoleDataSink, sink_output_format).batch(2)
+        dumped_batches = []
+        dump_batch = etl.data_sink.dump_batch
+        etl.data_sink.dump_batch = lambda messages: dumped_batches.append(len(messages)) or dump_batch(messages)
+        with CaptureSTDOUT() as output:
+            etl.run()
+        self.assertEqual([2, 1], dumped_batches)
+        self.assertEqual(3, len(output))
+        self.assertEqual("key: A123 | value: 15.6 | ts: 2020-10-07 13:28:43.399620+02:00", output[0])
+        self.assertEqual("key: C123 | value: 65.6 | ts: 1020-10-07 13:28:43.399620+02:00", output[2])
+
+    def test_run_stats(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        sink_output_format = "key: {} | value: {} | ts: {}"
+        etl = ETL().source(FileDataSource, source_filepath).sink(ConsoleDataSink, sink_output_format).batch(2)
+        with CaptureSTDOUT():
+            etl.run()
+        self.assertEqual(3, etl.stats["messages"])
+        self.assertEqual(2, etl.stats["batches"])
+        self.assertGreater(etl.stats["elapsed"], 0)
+        self.assertGreater(etl.stats["throughput"], 0)
+        self.assertEqual(2, etl.stats["batch_size"])
+        self.assertEqual(etl.data_source.chunk_size, etl.stats["source"]["chunk_size"])
+        self.assertEqual({}, etl.stats["sink"])
+
+    def test_run_with_adaptive_batches(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        sink_output_format = "key: {} | value: {} | ts: {}"
+        etl = ETL().source(FileDataSource, source_filepath).sink(ConsoleDataSink, sink_output_format)
+        etl.batch(1, target_latency=60.0)
+        dumped_batches = []
+        dump_batch = etl.data_sink.dump_batch
+        etl.data_sink.dump_batch = lambda messages: dumped_batches.append(len(messages)) or dump_batch(messages)
+        with CaptureSTDOUT() as output:
+            etl.run()
+        self.assertEqual([1, 2], dumped_batches)  # batch size grows while latency is below target
+        self.assertEqual(3, len(output))
+        self.assertEqual(3, etl.stats["batch_size"])
+
+    def test_run_with_rate_limit(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        sink_output_format = "key: {} | value: {} | ts: {}"
+        etl = ETL().source(FileDataSource, source_filepath).sink(ConsoleDataSink, sink_output_format)
+        etl.batch(1, max_rate=1)
+        acquired = []
+        etl.rate_limiter.acquire = lambda count: acquired.append(count)
+        with CaptureSTDOUT() as output:
+            etl.run()
+        self.assertEqual([1, 1, 1], acquired)
+        self.assertEqual(3, len(output))
+
+    def test_run_raw_passthrough(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with tempfile.TemporaryDirectory() as directory:
+            target_filepath = os.path.join(directory, "messages.ndjson")
+            ETL().source("file", source_filepath, raw=True).sink("file", target_filepath).batch(2).run()
+            with open(target_filepath) as target_file:
+                lines = target_file.read().splitlines()
+        with FileDataSource(source_filepath) as source:
+            expected_messages = [source.read() for _ in range(3)]
+        self.assertEqual(expected_messages, [json.loads(line) for line in lines])
+
+    def test_run_with_processes(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with tempfile.TemporaryDirectory() as directory:
+            target_filepath = os.path.join(directory, "messages.ndjson")
+            etl = ETL().source("file", source_filepath, processes=2).sink("file", target_filepath).batch(1000)
+            etl.run()
+            with open(target_filepath) as target_file:
+                lines = target_file.read().splitlines()
+        with FileDataSource(source_filepath) as source:
+            expected_messages = [source.read() for _ in range(3)]
+        self.assertEqual(expected_messages, [json.loads(line) for line in lines])
+        self.assertEqual(3, etl.stats["messages"])
+
+    def test_run_async(self):
+        etl = ETL().source(MemoryAsyncDataSource, 100).sink(MemoryAsyncDataSink).batch(10)
+        asyncio.run(etl.run_async(max_in_flight=3))
+        self.assertEqual(etl.data_source.messages, sorted(etl.data_sink.messages, key=lambda m: m["value"]))
+        self.assertEqual(3, etl.data_sink.max_in_flight)
+        self.assertEqual(100, etl.stats["messages"])
+        self.assertEqual(10, etl.stats["batches"])
+        self.assertEqual({}, etl.stats["source"])
+        with self.assertRaises(ValueError):
+            asyncio.run(etl.run_async(max_in_flight=0))
+
+    def test_run_async_with_sync_source_and_sink(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with tempfile.TemporaryDirectory() as directory:
+            target_filepath = os.path.join(directory, "messages.ndjson")
+            etl = ETL().source("file", source_filepath).sink("file", target_filepath).batch(2)
+            asyncio.run(etl.run_async())
+            with open(target_filepath) as target_file:
+                lines = target_file.read().splitlines()
+        with FileDataSource(source_filepath) as source:
+            expected_messages = [source.read() for _ in range(3)]
+        self.assertEqual(expected_messages, [json.loads(line) for line in lines])
+        self.assertEqual(2, etl.stats["batches"])
+        self.assertEqual(256, etl.stats["source"]["chunk_size"])
+
+    def test_run_async_pipelines_share_event_loop(self):
+        source_filepath = os.path.join(INPUT_FILES_DIR, "multiple_messages.json")
+        with tempfile.TemporaryDirectory() as directory:
+            etls = [ETL().source("file", source_filepath).sink("file", os.path.join(directory, f"{index}.ndjson"))
+                    for index in range(100)]
+
+            async def run_all():
+                await asyncio.gather(*(etl.run_async() for etl in etls))
+
+            asyncio.run(run_all())
+            for index in range(100):
+                with open(os.path.join(directory, f"{index}.ndjson")) as target_file:
+                    self.assertEqual(3, len(target_file.read().splitlines()))
+        self.assertTrue(all(etl.stats["messages"] == 3 for etl in etls))
+
+    def test_run_async_with_predicate(self):
+        etl = ETL().source(MemoryAsyncDataSource, 100).sink(MemoryAsyncDataSink).batch(10)
+        etl.where(KeyIn({"K3", "K42", "K99"}))
+        asyncio.run(etl.run_async())
+        self.assertEqual(["K3", "K42", "K99"], sorted(message["key"] for message in etl.data_sink.messages))
+        self.assertEqual(3, etl.stats["batches"])  # empty batches are not dumped
+        self.assertEqual(97, etl.stats["filtered"])
+
+    def test_run_async_failed_dump(self):
+        etl = ETL().source(MemoryAsyncDataSource, 100).sink(MemoryAsyncDataSink, fail_at=20).batch(10)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(etl.run_async(max_in_flight=4))
+        self.assertLess(etl.data_source.position, 100)  # reading stopped
+        self.assertEqual(0, etl.data_sink.in_flight)  # pending dumps were cancelled or finished
+
+    def test_run_async_with_rate_limit(self):
+        etl = ETL().source(MemoryAsyncDataSource, 30).sink(MemoryAsyncDataSink).batch(10, max_rate=1000)
+        reserved = []
+        etl.rate_limiter.reserve = lambda count: reserved.append(count) or 0.0
+        asyncio.run(etl.run_async())
+        self.assertEqual([10, 10, 10], reserved)
+        self.assertEqual(30, len(etl.data_sink.messages))
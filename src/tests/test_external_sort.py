@@ -0,0 +1,108 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from src.external_sort import ExternalSorter, key_ts_sort_key, ts_sort_key
+from src.raw_message import RawMessage
+
+
+class TestExternalSort(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        shuffled = random.Random(7)
+        self.messages = [{"key": f"K{index % 3}", "value": str(index),
+                          "ts": f"2020-10-07 {index // 60:02d}:{index % 60:02d}:00.000000+00:00"}
+                         for index in range(200)]
+        shuffled.shuffle(self.messages)
+
+    def _sorter(self, **kwargs):
+        return ExternalSorter(directory=self.directory.name, **kwargs)
+
+    def _run_files(self):
+        return [name for _, _, names in os.walk(self.directory.name) for name in names]
+
+    def test_object_creation(self):
+        sorter = ExternalSorter()
+        self.assertIs(ts_sort_key, sorter.key)
+        self.assertEqual(1000000, sorter.max_memory_messages)
+        self.assertIsNone(sorter.directory)
+        self.assertEqual(64, sorter.fan_in)
+        self.assertEqual({"runs": 0, "spilled_messages": 0, "merge_passes": 0}, sorter.stats)
+        with self.assertRaises(ValueError):
+            ExternalSorter(max_memory_messages=0)
+        with self.assertRaises(ValueError):
+            ExternalSorter(fan_in=1)
+        with self.assertRaises(ValueError):
+            ExternalSorter(block_messages=0)
+
+    def test_sort_keys(self):
+        message = {"key": "A123", "ts": "2020-10-07 13:28:43.399620+02:00"}
+        self.assertEqual(ts_sort_key({"key": "B123", "ts": "2020-10-07 11:28:43.399620+00:00"}), ts_sort_key(message))
+        self.assertEqual(("A123", ts_sort_key(message)), key_ts_sort_key(message))
+        with self.assertRaises(ValueError):
+            ts_sort_key({"key": "A123", "ts": "yesterday"})
+
+    def test_sort_in_memory(self):
+        sorter = self._sorter()
+        sorter.add(self.messages[:100])
+        sorter.add(self.messages[100:])
+        self.assertEqual(sorted(self.messages, key=ts_sort_key), list(sorter.sorted()))
+        self.assertEqual({"runs": 0, "spilled_messages": 0, "merge_passes": 0}, sorter.stats)
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_sort_with_spilled_runs(self):
+        sorter = self._sorter(max_memory_messages=30, block_messages=7)
+        sorter.add(self.messages)
+        self.assertEqual(6, sorter.stats["runs"])  # the last 20 messages stay in memory
+        self.assertEqual(180, sorter.stats["spilled_messages"])
+        self.assertEqual(6, len(self._run_files()))
+        self.assertEqual(sorted(self.messages, key=ts_sort_key), list(sorter.sorted()))
+        self.assertEqual(0, sorter.stats["merge_passes"])
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_sort_with_intermediate_merges(self):
+        sorter = self._sorter(max_memory_messages=10, fan_in=3, block_messages=4)
+        sorter.add(self.messages)
+        self.assertEqual(sorted(self.messages, key=ts_sort_key), list(sorter.sorted()))
+        self.assertGreater(sorter.stats["merge_passes"], 0)
+        self.assertGreater(sorter.stats["spilled_messages"], len(self.messages))  # merged runs are written again
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_sort_is_stable(self):
+        timestamps = ("2020-10-07 11:00:00+00:00", "2020-10-07 13:00:00+02:00")  # the same point in time
+        messages = [{"key": f"K{index}", "ts": timestamps[index % 2]} for index in range(50)]
+        sorter = self._sorter(max_memory_messages=4, fan_in=2)
+        sorter.add(messages)
+        self.assertEqual([message["key"] for message in messages], [message["key"] for message in sorter.sorted()])
+
+    def test_sort_by_key_and_ts(self):
+        sorter = self._sorter(key=key_ts_sort_key, max_memory_messages=16)
+        sorter.add(self.messages)
+        result = list(sorter.sorted())
+        self.assertEqual(sorted(self.messages, key=key_ts_sort_key), result)
+        self.assertEqual(["K0", "K1", "K2"], sorted({message["key"] for message in result}))
+        self.assertEqual("K0", result[0]["key"])
+        self.assertEqual("K2", result[-1]["key"])
+
+    def test_sort_raw_messages(self):
+        raw_messages = [RawMessage('{"key": "%s", "value": "1.0", "ts": "%s"}' % (message["key"], message["ts"]))
+                        for message in self.messages]
+        sorter = self._sorter(max_memory_messages=50)
+        sorter.add(raw_messages)
+        self.assertEqual(sorted(message["ts"] for message in self.messages),
+                         [message["ts"] for message in sorter.sorted()])
+
+    def test_cleanup_without_merge(self):
+        sorter = self._sorter(max_memory_messages=10)
+        sorter.add(self.messages)
+        merged = sorter.sorted()
+        self.assertEqual(min(self.messages, key=ts_sort_key), next(merged))
+        merged.close()  # abandoned merge
+        self.assertEqual([], os.listdir(self.directory.name))
+        sorter = self._sorter(max_memory_messages=10)
+        sorter.add(self.messages)
+        sorter.cleanup()
+        self.assertEqual([], os.listdir(self.directory.name))
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from src.file_index import FileIndex
+
+
+class TestFileIndex(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source_filepath = os.path.join(self.directory.name, "messages.json")
+        self.messages = [{"key": f"K{i % 3:03}", "value": f"{i}.5", "ts": f"2020-10-07 13:{i:02d}:00+02:00"}
+                         for i in range(25)]
+        self.messages[7]["ts"] = "2020-10-07 12:00:00+00:00"  # 14:00 in the timezone of the others
+        with open(self.source_filepath, 'w') as source_file:
+            source_file.write("[\n    " + ",\n    ".join(json.dumps(message) for message in self.messages) + "\n]")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _message_offset(self, number):
+        with open(self.source_filepath, 'rb') as source_file:
+            data = source_file.read()
+        return data.index(json.dumps(self.messages[number]).encode())
+
+    def test_build(self):
+        index = FileIndex.build(self.source_filepath, stride=10, chunk_size=64)  # messages span chunks
+        self.assertEqual(25, index.message_count)
+        self.assertEqual(3, index.block_count)
+        self.assertEqual(os.path.getsize(self.source_filepath), index.file_size)
+        self.assertEqual([self._message_offset(number) for number in (0, 10, 20)], list(index.offsets))
+        self.assertEqual(FileIndex.build(self.source_filepath, stride=10).offsets, index.offsets)
+        first_minute = 1602068400000000  # 2020-10-07 11:00:00 UTC
+        self.assertEqual(first_minute, index.min_ts[0])
+        self.assertEqual(first_minute + 3600000000, index.max_ts[0])  # message 7
+        self.assertEqual(first_minute + 24 * 60000000, index.max_ts[2])
+
+    def test_build_with_invalid_stride(self):
+        with self.assertRaises(ValueError):
+            FileIndex.build(self.source_filepath, stride=0)
+
+    def test_build_empty_file(self):
+        with open(self.source_filepath, 'w') as source_file:
+            source_file.write("[\n\n]")
+        index = FileIndex.build(self.source_filepath)
+        self.assertEqual(0, index.message_count)
+        self.assertEqual(0, index.block_count)
+        self.assertEqual([(0, index.file_size)], index.partitions(4))
+
+    def test_invalid_timestamps_do_not_affect_blocks(self):
+        self.messages[0]["ts"] = "yesterday"
+        with open(self.source_filepath, 'w') as source_file:
+            source_file.write(json.dumps(self.messages))
+        index = FileIndex.build(self.source_filepath, stride=10)
+        self.assertEqual(25, index.message_count)
+        self.assertEqual(1602068460000000, index.min_ts[0])  # 13:01
+
+    def test_save_and_load(self):
+        index = FileIndex.build(self.source_filepath, stride=10)
+        index_filepath = FileIndex.index_filepath_of(self.source_filepath)
+        index.save(index_filepath)
+        loaded = FileIndex.load(index_filepath)
+        for attribute in ("stride", "message_count", "file_size", "file_mtime_ns", "offsets", "min_ts", "max_ts"):
+            self.assertEqual(getattr(index, attribute), getattr(loaded, attribute), msg=attribute)
+        self.assertEqual(FileIndex.HEADER.size + 3 * 3 * 8, os.path.getsize(index_filepath))
+        self.assertEqual([index_filepath], [os.path.join(self.directory.name, name)
+                                            for name in os.listdir(self.directory.name) if name.endswith(".idx")])
+
+    def test_load_invalid_file(self):
+        with self.assertRaises(ValueError):
+            FileIndex.load(self.source_filepath)
+
+    def test_open_builds_missing_or_stale_index(self):
+        index = FileIndex.open(self.source_filepath, stride=10)
+        self.assertTrue(os.path.exists(FileIndex.index_filepath_of(self.source_filepath)))
+        self.assertTrue(index.is_fresh(self.source_filepath))
+        self.assertEqual(10, FileIndex.open(self.source_filepath, stride=5).stride)  # loaded
+        with open(self.source_filepath, 'a') as source_file:
+            source_file.write("\n")
+        self.assertFalse(index.is_fresh(self.source_filepath))
+        self.assertEqual(5, FileIndex.open(self.source_filepath, stride=5).stride)  # rebuilt
+
+    def test_open_keeps_unsaved_index_in_memory(self):
+        index_filepath = os.path.join(self.directory.name, "missing", "messages.idx")  # cannot be written
+        index = FileIndex.open(self.source_filepath, index_filepath, stride=10)
+        self.assertEqual(25, index.message_count)
+        self.assertFalse(os.path.exists(os.path.dirname(index_filepath)))
+
+    def test_block_of(self):
+        index = FileIndex.build(self.source_filepath, stride=10)
+        self.assertEqual(0, index.block_of(9))
+        self.assertEqual(2, index.block_of(24))
+        with self.assertRaises(IndexError):
+            index.block_of(25)
+
+    def test_segments(self):
+        index = FileIndex.build(self.source_filepath, stride=5)
+        offsets, file_size = list(index.offsets), index.file_size
+        self.assertEqual([(offsets[0], file_size)], index.segments())
+        self.assertEqual([(offsets[1], offsets[2])],  # message 7 belongs to the second block
+                         index.segments("2020-10-07 13:59:00+02:00", "2020-10-07 14:00:00+02:00"))
+        self.assertEqual([(offsets[1], offsets[2]), (offsets[3], file_size)],
+                         index.segments("2020-10-07 13:16:00+02:00", "2020-10-07 12:00:00+00:00",
+                                        lower=offsets[1]))
+        self.assertEqual([(offsets[1], offsets[2]), (offsets[4], file_size)],
+                         index.segments(ts_from="2020-10-07 11:22:00+00:00"))
+        self.assertEqual([], index.segments(ts_to="2020-10-07 10:00:00+00:00"))
+
+    def test_partitions(self):
+        index = FileIndex.build(self.source_filepath, stride=5)
+        partitions = index.partitions(2)
+        self.assertEqual([(0, index.offsets[2]), (index.offsets[2], index.file_size)], partitions)
+        self.assertEqual(5, len(index.partitions(10)))  # at most one per block
+        with self.assertRaises(ValueError):
+            index.partitions(0)
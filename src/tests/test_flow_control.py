@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+from src.flow_control import AdaptiveBatchSize, TokenBucket
+
+
+class TestAdaptiveBatchSize(TestCase):
+
+    def test_object_construction(self):
+        adaptive_batch_size = AdaptiveBatchSize(100, 0.5)
+        self.assertEqual(100, adaptive_batch_size.batch_size)
+        self.assertEqual(0.5, adaptive_batch_size.target_latency)
+        self.assertEqual(25, adaptive_batch_size.increase)
+        self.assertEqual(5, AdaptiveBatchSize(1, 0.5, minimum=5).batch_size)
+        self.assertEqual(10, AdaptiveBatchSize(100, 0.5, maximum=10).batch_size)
+        with self.assertRaises(ValueError):
+            AdaptiveBatchSize(100, 0)
+        with self.assertRaises(ValueError):
+            AdaptiveBatchSize(100, 0.5, minimum=10, maximum=5)
+        with self.assertRaises(ValueError):
+            AdaptiveBatchSize(100, 0.5, decrease=1)
+
+    def test_update(self):
+        adaptive_batch_size = AdaptiveBatchSize(100, 0.5, minimum=10, maximum=200, increase=40)
+        self.assertEqual(140, adaptive_batch_size.update(0.1))
+        self.assertEqual(180, adaptive_batch_size.update(0.5))  # target latency is still acceptable
+        self.assertEqual(200, adaptive_batch_size.update(0.1))  # capped by maximum
+        self.assertEqual(100, adaptive_batch_size.update(0.6))
+        self.assertEqual(50, adaptive_batch_size.update(2.0))
+        self.assertEqual(25, adaptive_batch_size.update(2.0))
+        self.assertEqual(12, adaptive_batch_size.update(2.0))
+        self.assertEqual(10, adaptive_batch_size.update(2.0))  # capped by minimum
+        self.assertEqual(50, adaptive_batch_size.update(0.1))
+
+
+class TestTokenBucket(TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def _create_bucket(self, rate, capacity=None):
+        bucket = TokenBucket(rate, capacity)
+        bucket.clock = lambda: self.now
+        bucket.sleep = self._sleep
+        bucket._last_refill = self.now
+        return bucket
+
+    def _sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def test_object_construction(self):
+        bucket = TokenBucket(100)
+        self.assertEqual(100, bucket.rate)
+        self.assertEqual(100, bucket.capacity)
+        self.assertEqual(100, bucket.tokens)
+        self.assertEqual(10, TokenBucket(100, 10).capacity)
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+        with self.assertRaises(ValueError):
+            TokenBucket(100, 0)
+
+    def test_acquire(self):
+        bucket = self._create_bucket(100)
+        self.assertEqual(0.0, bucket.acquire(60))  # burst within capacity
+        self.assertEqual(0.0, bucket.acquire(40))
+        self.assertAlmostEqual(0.5, bucket.acquire(50))
+        self.now += 0.2  # refill 20 tokens
+        self.assertAlmostEqual(0.1, bucket.acquire(30))
+        self.assertEqual(2, len(self.sleeps))
+
+    def test_acquire_refill_is_capped(self):
+        bucket = self._create_bucket(100)
+        self.now += 60.0
+        bucket.acquire(1)
+        self.assertAlmostEqual(99, bucket.tokens)
+
+    def test_acquire_more_than_capacity(self):
+        bucket = self._create_bucket(100, 10)
+        self.assertAlmostEqual(2.4, bucket.acquire(250))
+        self.assertAlmostEqual(0, bucket.tokens)
+        self.assertAlmostEqual(0.1, bucket.acquire(10))
+
+    def test_reserve(self):
+        bucket = self._create_bucket(100, 50)
+        self.assertEqual(0.0, bucket.reserve(40))
+        self.assertAlmostEqual(0.3, bucket.reserve(40))  # deficit of 30 tokens
+        self.assertAlmostEqual(0.7, bucket.reserve(40))  # queued up behind the previous reservation
+        self.assertEqual([], self.sleeps)
+        self.now += 0.7
+        self.assertAlmostEqual(0.0, bucket.reserve(0))
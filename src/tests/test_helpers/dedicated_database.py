@@ -0,0 +1,44 @@
+from unittest import TestCase
+from datetime import datetime
+
+import psycopg2
+
+from src.definitions import DATABASE_ENV
+from src.sinks.postgresql_data_sink import PostgreSQLDataSink
+
+
+class DedicatedDatabaseTestCase(TestCase):
+    """Base test case which runs every test in a new, uniquely named database"""
+
+    def setUp(self):
+        self.dbname = f"__dedicated_test_schema_{datetime.now()}"  # ensure uniqueness of database name
+        self.dbuser = DATABASE_ENV["POSTGRES_USER"]
+        self.dbpassword = DATABASE_ENV["POSTGRES_PASSWORD"]
+        self.dbhost = "127.0.0.1"
+        self.dbport = 5432
+        try:
+            self.admin_con = psycopg2.connect(database="test_schema", user=self.dbuser, password=self.dbpassword,
+                                              host=self.dbhost, port=self.dbport)
+        except psycopg2.OperationalError:
+            self.fail("Test database with name 'test_schema' does not exist")
+        self.admin_con.autocommit = True  # cannot create db inside a transaction
+        with self.admin_con.cursor() as cur:
+            cur.execute(f'CREATE DATABASE "{self.dbname}"')
+        self.con = psycopg2.connect(database=self.dbname, user=self.dbuser, password=self.dbpassword,
+                                    host=self.dbhost, port=self.dbport)
+        self.con.autocommit = True  # do not hold locks between test queries
+
+    def tearDown(self):
+        PostgreSQLDataSink.close_connection_pools()  # pooled connections keep the database open
+        self.con.close()
+        with self.admin_con.cursor() as cur:
+            cur.execute(f'DROP DATABASE "{self.dbname}"')  # clean up created database
+        self.admin_con.close()
+
+    def _create_sink(self, **kwargs):
+        return PostgreSQLDataSink(self.dbname, self.dbuser, self.dbpassword, self.dbhost, self.dbport, **kwargs)
+
+    def _fetch_messages(self, table_name=PostgreSQLDataSink.MESSAGE_TABLE_NAME):
+        with self.con.cursor() as cur:
+            cur.execute(f'SELECT key, value, ts, tz FROM "{table_name}" ORDER BY key;')
+            return cur.fetchall()
@@ -0,0 +1,56 @@
+import json
+from unittest import TestCase, mock
+
+from src import json_backends
+from src.json_backends import BACKEND_PREFERENCE, JSONBackend, available_backends, get_backend
+
+
+class TestJSONBackends(TestCase):
+
+    def setUp(self):
+        self.texts = ['{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"}',
+                      '{"key": "B123", "value": "12.6", "ts": "2022-10-07 13:28:43.399620+02:00"}']
+
+    def test_available_backends(self):
+        backends = available_backends()
+        self.assertEqual("json", backends[-1])  # standard library is always available
+        self.assertEqual([name for name in BACKEND_PREFERENCE if name in backends], backends)
+
+    def test_get_backend(self):
+        backend = get_backend("json")
+        self.assertIsInstance(backend, JSONBackend)
+        self.assertEqual("json", backend.name)
+        self.assertIs(json.JSONDecodeError, backend.decode_error)
+        self.assertIs(backend, get_backend("json"))
+        self.assertEqual(available_backends()[0], get_backend().name)
+        with self.assertRaises(ValueError):
+            get_backend("yaml")
+
+    def test_get_backend_which_is_not_installed(self):
+        with mock.patch.dict(json_backends._backends, clear=True), \
+                mock.patch("src.json_backends.import_module", side_effect=ModuleNotFoundError):
+            self.assertEqual(["json"], available_backends())
+            self.assertEqual("json", get_backend().name)
+            with self.assertRaises(ModuleNotFoundError):
+                get_backend("orjson")
+
+    def test_loads(self):
+        for name in available_backends():
+            backend = get_backend(name)
+            self.assertEqual(json.loads(self.texts[0]), backend.loads(self.texts[0]))
+            with self.assertRaises(backend.decode_error):
+                backend.loads('{"key": "A123", ')
+
+    def test_loads_batch(self):
+        for name in available_backends():
+            backend = get_backend(name)
+            self.assertEqual([json.loads(text) for text in self.texts], backend.loads_batch(self.texts))
+            self.assertEqual([], backend.loads_batch([]))
+            with self.assertRaises(backend.decode_error):
+                backend.loads_batch(self.texts + ['{"key": "A123", '])
+
+    def test_loads_batch_calls_library_once(self):
+        loads = mock.Mock(return_value=[{}, {}])
+        backend = JSONBackend("mock", loads, ValueError)
+        backend.loads_batch(['{}', '{}'])
+        loads.assert_called_once_with("[{},{}]")
@@ -0,0 +1,81 @@
+import json
+import pickle
+from datetime import datetime
+from unittest import TestCase
+
+from src.predicates import AllOf, KeyIn, TsBetween, build_predicate
+
+COLUMNS = {"key": "m.key", "ts": "m.ts", "utc_ts": "m.utc_ts"}
+
+
+class TestPredicates(TestCase):
+
+    def setUp(self):
+        self.messages = [
+            {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"},
+            {"key": "B123", "value": "12.6", "ts": "2020-10-07 12:28:43.399620+00:00"},
+            {"key": "C123", "value": "65.6", "ts": "2020-10-07 13:28:43.399620-05:30"},
+        ]
+
+    def _selected_keys(self, predicate):
+        return [message["key"] for message in self.messages if predicate.matches(message)]
+
+    def _prefiltered_keys(self, predicate):
+        return [message["key"] for message in self.messages if predicate.prefilter(json.dumps(message))]
+
+    def test_key_in(self):
+        predicate = KeyIn(["A123", "C123"])
+        self.assertEqual(["A123", "C123"], self._selected_keys(predicate))
+        self.assertEqual(["A123", "C123"], self._prefiltered_keys(predicate))
+        self.assertEqual(("m.key = ANY(%s)", [["A123", "C123"]]), predicate.to_sql(COLUMNS))
+        with self.assertRaises(ValueError):
+            KeyIn([])
+
+    def test_key_in_prefilter_accepts_unchecked_text(self):
+        predicate = KeyIn(["A123"])
+        self.assertTrue(predicate.prefilter('{"key": "B\\"123", "value": "1.0"}'))  # escaped string
+        self.assertTrue(predicate.prefilter('{"value": "1.0"}'))
+        self.assertFalse(predicate.prefilter('{"value": "1.0", "key" : "B123"}'))
+
+    def test_ts_between(self):
+        predicate = TsBetween("2020-10-07 12:00:00+00:00", "2020-10-07 13:00:00+00:00")
+        self.assertEqual(["B123"], self._selected_keys(predicate))  # A123 is at 11:28 UTC, C123 at 18:58 UTC
+        self.assertEqual(["B123"], self._prefiltered_keys(predicate))
+        self.assertEqual(["A123", "B123"], self._selected_keys(TsBetween(ts_to="2020-10-07 13:00:00+00:00")))
+        self.assertEqual(self.messages, [message for message in self.messages if TsBetween().matches(message)])
+        with self.assertRaises(ValueError):
+            TsBetween("yesterday")
+
+    def test_ts_between_prefilter_accepts_invalid_timestamps(self):
+        predicate = TsBetween("2020-10-07 12:00:00+00:00")
+        self.assertTrue(predicate.prefilter('{"key": "A123", "ts": "yesterday"}'))
+        with self.assertRaises(ValueError):
+            predicate.matches({"key": "A123", "ts": "yesterday"})
+
+    def test_ts_between_to_sql(self):
+        condition, parameters = TsBetween("2020-10-07 12:00:00+02:00", "2020-10-07 13:00:00+00:00").to_sql(COLUMNS)
+        self.assertEqual("m.ts >= %s AND m.utc_ts >= %s AND m.ts <= %s AND m.utc_ts <= %s", condition)
+        self.assertEqual([datetime(2020, 10, 6, 20), datetime(2020, 10, 7, 10),  # widened for the local column
+                          datetime(2020, 10, 8, 3), datetime(2020, 10, 7, 13)], parameters)
+        self.assertEqual(("TRUE", []), TsBetween().to_sql(COLUMNS))
+
+    def test_all_of(self):
+        predicate = KeyIn(["A123", "B123"]) & TsBetween("2020-10-07 12:00:00+00:00")
+        self.assertIsInstance(predicate, AllOf)
+        self.assertEqual(["B123"], self._selected_keys(predicate))
+        self.assertEqual(["B123"], self._prefiltered_keys(predicate))
+        self.assertEqual(3, len((predicate & KeyIn(["B123"])).predicates))  # flattened
+        condition, parameters = predicate.to_sql(COLUMNS)
+        self.assertEqual("(m.key = ANY(%s)) AND (m.ts >= %s AND m.utc_ts >= %s)", condition)
+        self.assertEqual(3, len(parameters))
+
+    def test_predicates_are_picklable(self):  # shipped to worker processes
+        predicate = KeyIn(["A123"]) & TsBetween("2020-10-07 12:00:00+00:00")
+        self.assertEqual(self._selected_keys(predicate), self._selected_keys(pickle.loads(pickle.dumps(predicate))))
+
+    def test_build_predicate(self):
+        self.assertEqual(["A123"], self._selected_keys(build_predicate(keys="A123")))
+        self.assertIsInstance(build_predicate(keys=["A123"], ts_to="2020-10-07 13:00:00+00:00"), AllOf)
+        self.assertIsInstance(build_predicate(ts_from="2020-10-07 13:00:00+00:00"), TsBetween)
+        with self.assertRaises(ValueError):
+            build_predicate()
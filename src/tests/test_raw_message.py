@@ -0,0 +1,32 @@
+import json
+from collections.abc import Mapping
+from unittest import TestCase
+
+from src.raw_message import RawMessage
+
+
+class TestRawMessage(TestCase):
+
+    def setUp(self):
+        self.raw = '{"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"}'
+
+    def test_object_construction(self):
+        message = RawMessage(self.raw)
+        self.assertIsInstance(message, Mapping)
+        self.assertEqual(self.raw, message.raw)
+        self.assertIsNone(message._fields)  # fields are not decoded yet
+
+    def test_fields_are_decoded_lazily(self):
+        message = RawMessage(self.raw)
+        self.assertEqual("A123", message["key"])
+        self.assertIsNotNone(message._fields)
+        self.assertIs(message.fields, message.fields)  # decoded only once
+        self.assertEqual(["key", "value", "ts"], list(message))
+        self.assertEqual(3, len(message))
+        self.assertEqual(json.loads(self.raw), dict(message))
+        self.assertEqual(json.loads(self.raw), message)
+
+    def test_invalid_raw_message(self):
+        message = RawMessage('{"key": "A123", ')
+        with self.assertRaises(json.JSONDecodeError):
+            message["key"]
@@ -0,0 +1,64 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+from src.definitions import ROOT_DIR
+from src.registry import Registry, SOURCES, SINKS
+from src.sources.file_data_source import FileDataSource
+from src.sinks.console_data_sink import ConsoleDataSink
+
+
+class TestRegistry(TestCase):
+
+    def test_object_construction(self):
+        registry = Registry("test.group", {"file": "src.sources.file_data_source:FileDataSource"})
+        self.assertEqual("test.group", registry.entry_point_group)
+        self.assertEqual(["file"], registry.names())
+
+    def test_register(self):
+        registry = Registry()
+        registry.register("console", ConsoleDataSink)
+        registry.register("file", "src.sources.file_data_source:FileDataSource")
+        self.assertEqual(["console", "file"], registry.names())
+        self.assertIs(ConsoleDataSink, registry.get("console"))
+
+    def test_get(self):
+        registry = Registry(components={"file": "src.sources.file_data_source:FileDataSource"})
+        self.assertIs(FileDataSource, registry.get("file"))
+        self.assertIs(FileDataSource, registry._components["file"])  # import path is replaced by the class
+        with self.assertRaises(KeyError):
+            registry.get("unknown")
+
+    def test_get_with_invalid_import_path(self):
+        registry = Registry(components={"file": "src.sources.file_data_source.FileDataSource"})
+        with self.assertRaises(ValueError):
+            registry.get("file")
+
+    def test_entry_points_do_not_override_registered_components(self):
+        registry = Registry("console_scripts", {"pip": "src.sinks.console_data_sink:ConsoleDataSink"})
+        self.assertIs(ConsoleDataSink, registry.get("pip"))
+
+    def test_builtin_components(self):
+        sources = ["file", "postgresql", "ring_buffer", "simulation"]
+        self.assertEqual(sources, [name for name in SOURCES.names() if name in sources])
+        sinks = ["console", "file", "postgresql", "ring_buffer", "sqlite"]
+        self.assertEqual(sinks, [name for name in SINKS.names() if name in sinks])
+        self.assertIs(FileDataSource, SOURCES.get("file"))
+        self.assertIs(ConsoleDataSink, SINKS.get("console"))
+
+    def test_heavy_dependencies_are_imported_lazily(self):
+        code = (
+            "import os, sys, contextlib\n"
+            "import main\n"
+            "from src import definitions\n"
+            "from src.etl import ETL\n"
+            "from src.sinks.retrying_data_sink import RetryingDataSink\n"
+            "with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):\n"
+            "    ETL().source('file', os.path.join('input_files', 'multiple_messages.json'))"
+            ".sink('console', '{} {} {}').run()\n"
+            "heavy_modules = ('psycopg2', 'pytz', 'asyncio', 'concurrent.futures.process')\n"
+            "print(sorted(name for name in heavy_modules if name in sys.modules))\n"
+            "print('DATABASE_ENV' in vars(definitions))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        self.assertEqual(["[]", "False"], result.stdout.split())
@@ -0,0 +1,67 @@
+import random
+import threading
+import time
+from unittest import TestCase
+
+from src.reorder_buffer import ReorderBuffer
+
+
+class TestReorderBuffer(TestCase):
+
+    def test_object_creation(self):
+        buffer = ReorderBuffer(4)
+        self.assertEqual(4, buffer.window)
+        self.assertEqual(0, buffer.pending)
+        with self.assertRaises(ValueError):
+            ReorderBuffer(0)
+
+    def test_stamp_and_retire_in_order(self):
+        buffer = ReorderBuffer(4)
+        self.assertEqual([0, 1, 2], [buffer.stamp() for _ in range(3)])
+        self.assertEqual(3, buffer.pending)
+        buffer.wait(0)  # returns right away, since it is the turn of 0
+        buffer.retire(0)
+        buffer.retire(1)
+        self.assertEqual(1, buffer.pending)
+
+    def test_work_done_out_of_order_is_retired_in_order(self):
+        buffer = ReorderBuffer(8)
+        retired = []
+
+        def work(sequence):
+            time.sleep(random.uniform(0, 0.01))  # finishes in any order
+            buffer.wait(sequence)
+            retired.append(sequence)
+            buffer.retire(sequence)
+
+        threads = [threading.Thread(target=work, args=(buffer.stamp(),)) for _ in range(8)]
+        for thread in reversed(threads):
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(list(range(8)), retired)
+        self.assertEqual(0, buffer.pending)
+
+    def test_stamp_waits_while_window_is_full(self):
+        buffer = ReorderBuffer(2)
+        buffer.stamp(), buffer.stamp()
+        stamped = []
+        thread = threading.Thread(target=lambda: stamped.append(buffer.stamp()))
+        thread.start()
+        thread.join(0.05)
+        self.assertEqual([], stamped)
+        buffer.retire(0)
+        thread.join(5)
+        self.assertEqual([2], stamped)
+
+    def test_retire_waits_for_earlier_sequences(self):
+        buffer = ReorderBuffer(4)
+        buffer.stamp(), buffer.stamp()
+        thread = threading.Thread(target=buffer.retire, args=(1,))
+        thread.start()
+        thread.join(0.05)
+        self.assertTrue(thread.is_alive())
+        buffer.retire(0)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(0, buffer.pending)
@@ -0,0 +1,144 @@
+import multiprocessing
+import threading
+from unittest import TestCase
+
+from src.exceptions.ring_buffer_closed import RingBufferClosed
+from src.ring_buffer import SharedRingBuffer
+
+
+def record(index):
+    return b"K%d" % index, index / 2, b"2020-10-07 13:%02d:%02d" % divmod(index % 3600, 60), 60
+
+
+def produce(name, count):
+    ring_buffer = SharedRingBuffer(name=name)
+    for start in range(0, count, 100):
+        ring_buffer.put_batch([record(index) for index in range(start, min(count, start + 100))])
+    ring_buffer.close()
+    ring_buffer.release()
+
+
+def produce_and_exit(name, count):
+    ring_buffer = SharedRingBuffer(name=name)
+    ring_buffer.attach_producer()
+    ring_buffer.put_batch([record(index) for index in range(count)])
+    ring_buffer.release()  # without closing the ring buffer
+
+
+class TestSharedRingBuffer(TestCase):
+
+    def setUp(self):
+        self.ring_buffer = SharedRingBuffer(8)
+
+    def tearDown(self):
+        self.ring_buffer.release()
+        self.ring_buffer.unlink()
+
+    def _records(self, start, stop):
+        return [record(index) for index in range(start, stop)]
+
+    @staticmethod
+    def _strip(records):
+        return [(key.rstrip(b"\0"), value, ts.rstrip(b"\0"), tz) for key, value, ts, tz in records]
+
+    def test_object_creation(self):
+        self.assertEqual(8, self.ring_buffer.capacity)
+        self.assertEqual(0, self.ring_buffer.write_sequence)
+        self.assertEqual(0, self.ring_buffer.read_sequence)
+        self.assertFalse(self.ring_buffer.closed)
+        attached = SharedRingBuffer(name=self.ring_buffer.name)
+        self.assertEqual(8, attached.capacity)
+        attached.release()
+        with self.assertRaises(ValueError):
+            SharedRingBuffer(0)
+
+    def test_put_and_get_batch(self):
+        self.ring_buffer.put_batch(self._records(0, 5))
+        self.assertEqual(self._records(0, 3), self._strip(self.ring_buffer.get_batch(3)))
+        self.assertEqual(self._records(3, 5), self._strip(self.ring_buffer.get_batch(10)))
+        self.assertEqual(5, self.ring_buffer.read_sequence)
+        self.assertEqual([], self.ring_buffer.get_batch(10, wait=False))
+
+    def test_wrap_around(self):
+        self.ring_buffer.put_batch(self._records(0, 6))
+        self.ring_buffer.get_batch(6)
+        self.ring_buffer.put_batch(self._records(6, 12))  # slots 6, 7, 0, 1, 2, 3
+        self.assertEqual(self._records(6, 8), self._strip(self.ring_buffer.get_batch(10)))  # up to the end
+        self.assertEqual(self._records(8, 12), self._strip(self.ring_buffer.get_batch(10)))
+
+    def test_full_buffer_waits_for_consumer(self):
+        records = []
+
+        def consume():
+            consumer = SharedRingBuffer(name=self.ring_buffer.name)
+            while True:
+                batch = consumer.get_batch(3)
+                if len(batch) == 0:
+                    break
+                records.extend(batch)
+            consumer.release()
+
+        consumer_thread = threading.Thread(target=consume)
+        consumer_thread.start()
+        self.ring_buffer.put_batch(self._records(0, 50))
+        self.ring_buffer.close()
+        consumer_thread.join(5)
+        self.assertEqual(self._records(0, 50), self._strip(records))
+
+    def test_closed(self):
+        self.ring_buffer.put_batch(self._records(0, 2))
+        self.ring_buffer.close()
+        self.assertTrue(self.ring_buffer.closed)
+        with self.assertRaises(RingBufferClosed):
+            self.ring_buffer.put_batch(self._records(2, 3))
+        self.assertEqual(2, len(self.ring_buffer.get_batch(10)))  # remaining records are still read
+        self.assertEqual([], self.ring_buffer.get_batch(10))
+
+    def test_producer_process(self):
+        producer = multiprocessing.get_context("spawn").Process(target=produce, args=(self.ring_buffer.name, 1000))
+        producer.start()
+        records = []
+        while True:
+            batch = self.ring_buffer.get_batch(64)
+            if len(batch) == 0:
+                break
+            records.extend(batch)
+        producer.join(10)
+        self.assertEqual(0, producer.exitcode)
+        self.assertEqual(self._records(0, 1000), self._strip(records))
+
+    def test_producer_exits_without_closing(self):
+        self.assertTrue(self.ring_buffer.producer_alive)  # no producer yet
+        producer = multiprocessing.get_context("spawn").Process(target=produce_and_exit,
+                                                               args=(self.ring_buffer.name, 3))
+        producer.start()
+        records = []
+        with self.assertRaises(RingBufferClosed):
+            while True:  # the exited producer is not joined yet
+                records.extend(self.ring_buffer.get_batch(64))
+        producer.join(10)
+        self.assertFalse(self.ring_buffer.producer_alive)
+        self.assertEqual(self._records(0, 3), self._strip(records))  # records written before the exit are read
+
+    def test_get_batch_timeout(self):
+        self.ring_buffer.attach_producer()
+        self.assertTrue(self.ring_buffer.producer_alive)
+        with self.assertRaises(TimeoutError):
+            self.ring_buffer.get_batch(10, timeout=0.01)
+        self.ring_buffer.put_batch(self._records(0, 1))
+        self.assertEqual(1, len(self.ring_buffer.get_batch(10, timeout=0.01)))
+
+    def test_encode_and_decode_message(self):
+        message = {"key": "A123", "value": "15.6", "ts": "2020-10-07 13:28:43.399620+02:00"}
+        record = SharedRingBuffer.encode_message(message)
+        self.assertEqual((b"A123", 15.6, b"2020-10-07 13:28:43.399620", 120), record)
+        self.assertEqual(("A123", 15.6, "2020-10-07 13:28:43.399620", "+02:00"), SharedRingBuffer.decode_record(
+            SharedRingBuffer.RECORD.unpack(SharedRingBuffer.RECORD.pack(*record))))
+        self.assertEqual(("B1", 1.0, "1969-12-31 23:59:59", "-05:30"), SharedRingBuffer.decode_record(
+            SharedRingBuffer.encode_message({"key": "B1", "value": 1, "ts": "1969-12-31 23:59:59-0530"})))
+        with self.assertRaises(ValueError):
+            SharedRingBuffer.encode_message({"key": "K" * 33, "value": 1, "ts": message["ts"]})
+        with self.assertRaises(ValueError):
+            SharedRingBuffer.encode_message({"key": "A123", "value": 1, "ts": "2020-10-07 13:28:43.3996201234+02:00"})
+        with self.assertRaises(ValueError):
+            SharedRingBuffer.encode_message({"key": "A123", "value": 1, "ts": "yesterday"})
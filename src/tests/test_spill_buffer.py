@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase
+
+from src.raw_message import RawMessage
+from src.spill_buffer import SpillBuffer
+
+
+class TestSpillBuffer(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.buffer = SpillBuffer(4, self.directory.name, segment_size=64)
+
+    def tearDown(self):
+        self.buffer.cleanup()
+        self.directory.cleanup()
+
+    def _batch(self, index, size=2):
+        return [{"key": f"K{index}", "value": position} for position in range(size)]
+
+    def _segment_files(self):
+        return [name for _, _, names in os.walk(self.directory.name) for name in names]
+
+    def test_object_creation(self):
+        self.assertEqual(4, self.buffer.max_memory_messages)
+        self.assertEqual(self.directory.name, self.buffer.directory)
+        self.assertEqual(64, self.buffer.segment_size)
+        with self.assertRaises(ValueError):
+            SpillBuffer(0)
+        with self.assertRaises(ValueError):
+            SpillBuffer(10, segment_size=0)
+
+    def test_put_and_get_in_memory(self):
+        self.buffer.put(self._batch(0))
+        self.buffer.put(self._batch(1))
+        self.assertEqual({"memory_batches": 2, "memory_messages": 4, "disk_batches": 0, "segments": 0,
+                          "spilled_batches": 0, "spilled_messages": 0}, self.buffer.stats)
+        self.assertEqual(self._batch(0), self.buffer.get())
+        self.assertEqual(self._batch(1), self.buffer.get())
+        self.assertEqual([], self._segment_files())
+
+    def test_spill_and_replay_in_order(self):
+        for index in range(10):
+            self.buffer.put(self._batch(index))
+        stats = self.buffer.stats
+        self.assertEqual(2, stats["memory_batches"])
+        self.assertEqual(8, stats["disk_batches"])
+        self.assertEqual(16, stats["spilled_messages"])
+        self.assertGreater(stats["segments"], 1)  # segments are rotated
+        self.assertEqual([self._batch(index) for index in range(3)], [self.buffer.get() for _ in range(3)])
+        self.buffer.put(self._batch(10))  # follows the spilled batches to disk
+        self.assertEqual(0, self.buffer.stats["memory_batches"])
+        self.assertEqual(8, self.buffer.stats["disk_batches"])
+        self.assertEqual([self._batch(index) for index in range(3, 11)], [self.buffer.get() for _ in range(8)])
+        self.assertEqual([], self._segment_files())  # caught up
+        self.buffer.put(self._batch(11))
+        self.assertEqual(1, self.buffer.stats["memory_batches"])
+
+    def test_spilled_batches_keep_their_type(self):
+        self.buffer.put(self._batch(0, 4))
+        self.buffer.put([RawMessage('{"key": "A123"}')])
+        self.buffer.get()
+        batch = self.buffer.get()
+        self.assertIsInstance(batch[0], RawMessage)
+        self.assertEqual('{"key": "A123"}', batch[0].raw)
+
+    def test_oversize_batch_is_spilled(self):
+        self.buffer.put(self._batch(0, 5))
+        self.assertEqual(1, self.buffer.stats["disk_batches"])
+        self.assertEqual(self._batch(0, 5), self.buffer.get())
+
+    def test_close(self):
+        self.buffer.put(self._batch(0))
+        self.buffer.close()
+        with self.assertRaises(ValueError):
+            self.buffer.put(self._batch(1))
+        self.assertEqual(self._batch(0), self.buffer.get())
+        self.assertIsNone(self.buffer.get())
+
+    def test_get_waits_for_batch(self):
+        batches = []
+        consumer = threading.Thread(target=lambda: batches.extend(iter(self.buffer.get, None)))
+        consumer.start()
+        for index in range(20):
+            self.buffer.put(self._batch(index))
+        self.buffer.close()
+        consumer.join(5)
+        self.assertEqual([self._batch(index) for index in range(20)], batches)
+
+    def test_cleanup(self):
+        for index in range(5):
+            self.buffer.put(self._batch(index))
+        self.assertNotEqual([], self._segment_files())
+        self.buffer.cleanup()
+        self.assertEqual([], self._segment_files())
+        self.assertEqual(0, self.buffer.stats["disk_batches"])
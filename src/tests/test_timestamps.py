@@ -0,0 +1,46 @@
+from unittest import TestCase
+
+from src.timestamps import split_timestamp, tz_offset_minutes, format_tz_offset, utc_microseconds
+
+
+class TestTimestamps(TestCase):
+
+    def test_split_timestamp(self):
+        self.assertEqual(("2020-10-07 13:28:43.399620", "+02:00"),
+                         split_timestamp("2020-10-07 13:28:43.399620+02:00"))
+        self.assertEqual(("1020-10-07 13:28:43", "-05:30"), split_timestamp("1020-10-07 13:28:43-05:30"))
+
+    def test_split_timestamp_without_timezone(self):
+        with self.assertRaises(ValueError):
+            split_timestamp("2020-10-07 13:28:43.399620")
+
+    def test_tz_offset_minutes(self):
+        self.assertEqual(120, tz_offset_minutes("+02:00"))
+        self.assertEqual(-330, tz_offset_minutes("-05:30"))
+        self.assertEqual(345, tz_offset_minutes("+0545"))
+        self.assertEqual(0, tz_offset_minutes("+00:00"))
+        self.assertEqual(120, tz_offset_minutes("+02"))
+        self.assertEqual(-300, tz_offset_minutes("-05"))
+
+    def test_tz_offset_minutes_with_invalid_timezone(self):
+        for tz in ("02:00", "+2:00", "+02:00:30", "+ab:cd", "+2", "+02:", "+020"):
+            with self.assertRaises(ValueError, msg=tz):
+                tz_offset_minutes(tz)
+
+    def test_format_tz_offset(self):
+        self.assertEqual("+02:00", format_tz_offset(120))
+        self.assertEqual("-05:30", format_tz_offset(-330))
+        self.assertEqual("+00:00", format_tz_offset(0))
+        for tz in ("+05:45", "-12:00", "+14:00"):
+            self.assertEqual(tz, format_tz_offset(tz_offset_minutes(tz)))
+
+    def test_utc_microseconds(self):
+        self.assertEqual(0, utc_microseconds("1970-01-01 00:00:00+00:00"))
+        self.assertEqual(1602070123399620, utc_microseconds("2020-10-07 13:28:43.399620+02:00"))
+        self.assertEqual(utc_microseconds("2020-10-07 11:28:43.399620+00:00"),
+                         utc_microseconds("2020-10-07 13:28:43.399620+0200"))
+        self.assertEqual(utc_microseconds("2020-10-07 13:28:43.399620+02:00"),
+                         utc_microseconds("2020-10-07 13:28:43.399620+02"))
+        self.assertLess(utc_microseconds("1020-10-07 13:28:43+02:00"), 0)
+        with self.assertRaises(ValueError):
+            utc_microseconds("2020-10-07 13:28:43")
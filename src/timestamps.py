@@ -0,0 +1,77 @@
+import re
+from datetime import datetime, timedelta
+
+# Compiled regex object for timestamps with timezone info attached at the end,
+# e.g. "2020-10-07 13:28:43.399620+02:00"
+TIMESTAMP_PATTERN = re.compile(r"^(?P<ts>[-.:0-9 ]+)(?P<tz>[+-][0-9:]+)$")
+# Compiled regex object for the timezone part of a timestamp, e.g. "+02:00", "+0200" or "+02"
+TZ_PATTERN = re.compile(r"^([+-])([0-9]{2})(?::?([0-9]{2}))?$")
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def split_timestamp(timestamp: str) -> tuple:
+    """Split a timestamp into its datetime and timezone parts
+
+    :param timestamp: timestamp with timezone info attached at the end
+    :type timestamp: str
+
+    :raises ValueError: improperly formatted timestamp
+
+    :return: datetime and timezone parts of the timestamp
+    :rtype: tuple
+    """
+    match = TIMESTAMP_PATTERN.match(timestamp)
+    if not match:  # improperly formatted timestamp
+        raise ValueError(f'Improperly formatted timestamp: {timestamp}')
+    return match.group("ts"), match.group("tz")
+
+
+def tz_offset_minutes(tz: str) -> int:
+    """Convert the timezone part of a timestamp to its UTC offset in minutes
+
+    :param tz: timezone part of a timestamp, e.g. "+02:00", "-0530" or "+02"
+    :type tz: str
+
+    :raises ValueError: improperly formatted timezone
+
+    :return: UTC offset in minutes
+    :rtype: int
+    """
+    match = TZ_PATTERN.match(tz)
+    if not match:  # improperly formatted timezone
+        raise ValueError(f'Improperly formatted timezone: {tz}')
+    sign, hours, minutes = match.groups()
+    minutes = int(hours) * 60 + int(minutes or 0)
+    return -minutes if sign == '-' else minutes
+
+
+def format_tz_offset(minutes: int) -> str:
+    """Convert a UTC offset in minutes to the timezone part of a timestamp
+
+    :param minutes: UTC offset in minutes
+    :type minutes: int
+
+    :return: timezone part of a timestamp, e.g. "+02:00"
+    :rtype: str
+    """
+    sign = '-' if minutes < 0 else '+'
+    hours, minutes = divmod(abs(minutes), 60)
+    return f"{sign}{hours:02d}:{minutes:02d}"
+
+
+def utc_microseconds(timestamp: str) -> int:
+    """Convert a timestamp to microseconds since the epoch, in UTC
+
+    Unlike their text, the results are comparable across timezones.
+
+    :param timestamp: timestamp with timezone info attached at the end
+    :type timestamp: str
+
+    :raises ValueError: improperly formatted timestamp
+
+    :return: microseconds since the epoch (1970-01-01 00:00:00+00:00)
+    :rtype: int
+    """
+    ts, tz = split_timestamp(timestamp)
+    return (datetime.fromisoformat(ts) - EPOCH) // MICROSECOND - tz_offset_minutes(tz) * 60000000